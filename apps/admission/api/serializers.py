@@ -20,9 +20,14 @@ class InterviewSlotBaseSerializer(serializers.ModelSerializer):
 
 
 class OpenRegistrationCampaignField(serializers.PrimaryKeyRelatedField):
+    """
+    Registration is checked at `registered_at` from the serializer context,
+    e.g. the time the form was submitted, or at the current time.
+    """
     def get_queryset(self):
         if self.queryset:
             return self.queryset.all()
-        return Campaign.with_open_registration().filter(
+        registered_at = self.context.get('registered_at')
+        return Campaign.with_open_registration(registered_at).filter(
             branch__site_id=settings.SITE_ID
         )
@@ -1,8 +1,15 @@
+from unittest.mock import MagicMock
+
 import pytest
 
 from django.conf import settings
 
-from admission.tests.factories import CampaignFactory
+from admission.stats import (
+    STATS_SNAPSHOT_CACHE_KEY, StatsScopes, get_stats_snapshot,
+    invalidate_stats_snapshots
+)
+from admission.tests.factories import ApplicantFactory, CampaignFactory
+from core.locks import acquire_cache_lock
 from core.urls import reverse
 from users.tests.factories import CuratorFactory
 
@@ -18,3 +25,53 @@ def test_api_admission_campaign_stages_by_year_smoke(client):
     )
     response = client.get(url)
     assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_api_admission_campaign_stages_by_year_snapshot(client, mocker):
+    client.login(CuratorFactory())
+    campaign = CampaignFactory()
+    ApplicantFactory(campaign=campaign)
+    url = reverse(
+        "stats-api:stats_admission_campaign_stages_by_years",
+        kwargs={"branch_id": campaign.branch_id},
+        subdomain=settings.LMS_SUBDOMAIN,
+    )
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response["X-Stats-Is-Fresh"] == "true"
+    calculated_at = response["X-Stats-Calculated-At"]
+    assert response.data[0]["application_form"] == 1
+    # Recently calculated snapshot is served even if it's outdated
+    ApplicantFactory(campaign=campaign)
+    response = client.get(url)
+    assert response["X-Stats-Is-Fresh"] == "false"
+    assert response["X-Stats-Calculated-At"] == calculated_at
+    assert response.data[0]["application_form"] == 1
+    mocker.patch("admission.stats.STATS_SNAPSHOT_MIN_AGE", 0)
+    response = client.get(url)
+    assert response["X-Stats-Is-Fresh"] == "true"
+    assert response.data[0]["application_form"] == 2
+    response = client.get(url)
+    assert response["X-Stats-Is-Fresh"] == "true"
+
+
+def test_stats_snapshot_per_renderer_format(mocker):
+    mocker.patch("admission.stats.STATS_SNAPSHOT_MIN_AGE", 0)
+    calculate = MagicMock(side_effect=[[1], "frame", [2]])
+    snapshot, _ = get_stats_snapshot("Stats", StatsScopes.CAMPAIGN, 1, calculate,
+                                     renderer_format="json")
+    assert snapshot.data == [1]
+    snapshot, _ = get_stats_snapshot("Stats", StatsScopes.CAMPAIGN, 1, calculate,
+                                     renderer_format="csv")
+    assert snapshot.data == "frame"
+    invalidate_stats_snapshots(campaign_ids=[1], branch_ids=[])
+    # Outdated snapshot is served while the other request recalculates it
+    assert acquire_cache_lock(STATS_SNAPSHOT_CACHE_KEY.format(
+        name="Stats", renderer_format="json", scope=StatsScopes.CAMPAIGN,
+        scope_id=1), 10)
+    snapshot, is_fresh = get_stats_snapshot("Stats", StatsScopes.CAMPAIGN, 1,
+                                            calculate, renderer_format="json")
+    assert snapshot.data == [1]
+    assert not is_fresh
+    assert calculate.call_count == 2
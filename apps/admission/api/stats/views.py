@@ -10,6 +10,7 @@ from django.db.models import Case, Count, IntegerField, Q, When
 from django.db.models.functions import TruncDate
 
 from admission.models import Applicant, Campaign, Exam, Test
+from admission.stats import StatsScopes, get_stats_snapshot
 from api.permissions import CuratorAccessPermission
 from core.db.functions import TruncDateInTZ
 from core.timezone import now_local
@@ -48,12 +49,37 @@ STATUSES = [
 ]
 
 
-class CampaignStagesByYears(ReadOnlyModelViewSet):
+class StatsSnapshotMixin:
+    """
+    Serves response data from the stats snapshot of the campaign or
+    the branch provided in URL kwargs. Freshness of the snapshot is
+    returned in response headers.
+    """
+
+    snapshot_scope = StatsScopes.CAMPAIGN
+
+    def calculate_stats(self):
+        return super().list(self.request, *self.args, **self.kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        scope_id = self.kwargs[f"{self.snapshot_scope}_id"]
+        snapshot, is_fresh = get_stats_snapshot(
+            self.__class__.__name__, self.snapshot_scope, scope_id,
+            self.calculate_stats, renderer_format=request.accepted_renderer.format
+        )
+        response = Response(snapshot.data)
+        response["X-Stats-Calculated-At"] = snapshot.calculated_at.isoformat()
+        response["X-Stats-Is-Fresh"] = "true" if is_fresh else "false"
+        return response
+
+
+class CampaignStagesByYears(StatsSnapshotMixin, ReadOnlyModelViewSet):
     """Admission stages by years for provided branch."""
 
     permission_classes = [CuratorAccessPermission]
+    snapshot_scope = StatsScopes.BRANCH
 
-    def list(self, request, *args, **kwargs):
+    def calculate_stats(self):
         branch_id = self.kwargs.get("branch_id")
         applicants = (
             Applicant.objects.filter(campaign__branch=branch_id)
@@ -67,10 +93,10 @@ class CampaignStagesByYears(ReadOnlyModelViewSet):
             # Under the assumption that campaign year is unique
             .order_by("campaign__year")
         )
-        return Response(applicants)
+        return list(applicants)
 
 
-class CampaignStagesByUniversities(ReadOnlyModelViewSet):
+class CampaignStagesByUniversities(StatsSnapshotMixin, ReadOnlyModelViewSet):
     """Admission campaign stages by universities."""
 
     permission_classes = [CuratorAccessPermission]
@@ -90,7 +116,7 @@ class CampaignStagesByUniversities(ReadOnlyModelViewSet):
         )
 
 
-class CampaignStagesByCourses(ReadOnlyModelViewSet):
+class CampaignStagesByCourses(StatsSnapshotMixin, ReadOnlyModelViewSet):
     """Admission campaign stages by courses."""
 
     permission_classes = [CuratorAccessPermission]
@@ -111,16 +137,16 @@ class CampaignStagesByCourses(ReadOnlyModelViewSet):
         )
 
 
-class ApplicationFormSubmissionByDays(ListAPIView):
+class ApplicationFormSubmissionByDays(StatsSnapshotMixin, ListAPIView):
     permission_classes = [CuratorAccessPermission]
     serializer_class = SimpleSerializer
+    snapshot_scope = StatsScopes.BRANCH
 
-    def list(self, request, *args, **kwargs):
+    def calculate_stats(self):
         campaigns = Campaign.objects.filter(
             branch_id=self.kwargs["branch_id"], year__gte=2017
         )
-        data = self.get_stat(campaigns)
-        return Response(data)
+        return self.get_stat(campaigns)
 
     @staticmethod
     def get_filters(campaigns):
@@ -182,7 +208,7 @@ class ApplicationFormSubmissionByDays(ListAPIView):
         return data
 
 
-class CampaignStatsApplicantsResults(ListRenderersMixin, PandasView):
+class CampaignStatsApplicantsResults(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """
     Admission campaign results by applicants.
 
@@ -193,6 +219,7 @@ class CampaignStatsApplicantsResults(ListRenderersMixin, PandasView):
     permission_classes = [CuratorAccessPermission]
     serializer_class = SimpleSerializer
     pandas_serializer_class = CampaignResultsTimelineSerializer
+    snapshot_scope = StatsScopes.BRANCH
 
     def get_queryset(self):
         branch_id = self.kwargs.get("branch_id")
@@ -206,7 +233,7 @@ class CampaignStatsApplicantsResults(ListRenderersMixin, PandasView):
         return qs
 
 
-class CampaignResultsByUniversities(ListRenderersMixin, PandasView):
+class CampaignResultsByUniversities(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Admission campaign stages by universities."""
 
     permission_classes = [CuratorAccessPermission]
@@ -223,7 +250,7 @@ class CampaignResultsByUniversities(ListRenderersMixin, PandasView):
         return qs
 
 
-class CampaignResultsByCourses(ListRenderersMixin, PandasView):
+class CampaignResultsByCourses(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     permission_classes = [CuratorAccessPermission]
     serializer_class = SimpleSerializer
     pandas_serializer_class = CampaignResultsByEducationLevelSerializer
@@ -249,7 +276,7 @@ class CampaignStatsStudentsResults(ReadOnlyModelViewSet):
         return Response({})
 
 
-class CampaignStatsTestingScoreByUniversities(ListRenderersMixin, PandasView):
+class CampaignStatsTestingScoreByUniversities(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Distribution of online test results by universities."""
 
     permission_classes = [CuratorAccessPermission]
@@ -265,7 +292,7 @@ class CampaignStatsTestingScoreByUniversities(ListRenderersMixin, PandasView):
         )
 
 
-class CampaignStatsTestingScoreByCourses(ListRenderersMixin, PandasView):
+class CampaignStatsTestingScoreByCourses(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Distribution of online test results by level of education"""
 
     permission_classes = [CuratorAccessPermission]
@@ -282,7 +309,7 @@ class CampaignStatsTestingScoreByCourses(ListRenderersMixin, PandasView):
         )
 
 
-class CampaignStatsExamScoreByUniversities(ListRenderersMixin, PandasView):
+class CampaignStatsExamScoreByUniversities(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Distribution of exam results by universities."""
 
     permission_classes = [CuratorAccessPermission]
@@ -298,7 +325,7 @@ class CampaignStatsExamScoreByUniversities(ListRenderersMixin, PandasView):
         )
 
 
-class CampaignStatsExamScoreByCourses(ListRenderersMixin, PandasView):
+class CampaignStatsExamScoreByCourses(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Distribution of exam results by level of education"""
 
     permission_classes = [CuratorAccessPermission]
@@ -315,7 +342,7 @@ class CampaignStatsExamScoreByCourses(ListRenderersMixin, PandasView):
         )
 
 
-class ApplicationSubmission(ListRenderersMixin, PandasView):
+class ApplicationSubmission(StatsSnapshotMixin, ListRenderersMixin, PandasView):
     """Application submission by day in UTC timezone"""
 
     permission_classes = [CuratorAccessPermission]
@@ -98,6 +98,13 @@ class ChallengeStatuses(DjangoChoices):
     MANUAL = ChoiceItem("manual", _("Manual score input"))
 
 
+class ApplicationFormSubmissionStatuses(DjangoChoices):
+    NEW = ChoiceItem("new", _("New"))
+    PROCESSED = ChoiceItem("processed", _("Processed"))
+    DUPLICATE = ChoiceItem("duplicate", _("Duplicate"))
+    FAILED = ChoiceItem("failed", _("Failed"))
+
+
 class InterviewFormats(DjangoChoices):
     OFFLINE = ChoiceItem("offline", _("Offline"))
     ONLINE = ChoiceItem("online", _("Online"))
@@ -1,15 +1,13 @@
 from datetime import datetime
 
 import pytz
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import formats
 
 from admission.models import Applicant
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import (
     CurrentCampaignMixin,
@@ -74,26 +72,13 @@ class Command(
             self.stdout.write(f"{campaign}")
             email_from = sender or get_email_from(campaign)
             template = get_email_template(template_name)
-            processed = 0
-            new_emails = 0
-            applicants = manager.filter(campaign=campaign).only("pk", "email")
-            for a in applicants:
-                processed += 1
-                recipient = a.email
-                if not Email.objects.filter(to=recipient, template=template).exists():
-                    mail.send(
-                        recipient,
-                        sender=email_from,
-                        template=template,
-                        scheduled_time=scheduled_time,
-                        context={},
-                        # If emails rendered on delivery, they will store
-                        # value of the template id. It makes `exists`
-                        # method above works correctly.
-                        render_on_delivery=True,
-                        backend="ses",
-                    )
-                    new_emails += 1
-            self.stdout.write(f"  Processed: {processed}")
-            self.stdout.write(f"  New emails: {new_emails}")
+            applicants = manager.filter(campaign=campaign)
+            emails = (
+                BulkEmail(recipient=email, template=template, context={})
+                for email in applicants.values_list("email", flat=True)
+            )
+            stats = send_bulk_emails(emails, sender=email_from,
+                                     scheduled_time=scheduled_time)
+            self.stdout.write(f"  Processed: {stats.total}")
+            self.stdout.write(f"  New emails: {stats.queued}")
         self.stdout.write("Done")
@@ -1,11 +1,9 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand, CommandError
 
 from admission.models import Applicant, Campaign
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 
@@ -73,29 +71,21 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
             .distinct()
             .values_list("email", flat=True)
         )
-        total = 0
-        generated = 0
+        already_applied = set(
+            Applicant.objects.filter(campaign_id=current_campaign.pk)
+            .values_list("email", flat=True)
+        )
         template = get_email_template(template_name)
+        total = 0
+        emails = []
         for email in failed_in_prev_campaigns:
             total += 1
-            is_already_applied = Applicant.objects.filter(
-                campaign_id=current_campaign.pk, email=email
-            ).exists()
-            if not is_already_applied:
-                recipients = [email]
-                if not Email.objects.filter(to=recipients, template=template).exists():
-                    mail.send(
-                        recipients,
-                        sender=email_from,
-                        template=template_name,
-                        # If emails rendered on delivery, they will store
-                        # value of the template id. It makes `exists`
-                        # method above works correctly.
-                        render_on_delivery=True,
-                        context={},
-                        backend="ses",
-                    )
-                    generated += 1
+            if email not in already_applied:
+                emails.append(BulkEmail(recipient=email, template=template,
+                                        context={}))
+        stats = send_bulk_emails(emails, sender=email_from)
         self.stdout.write(
-            f"Total: {total}\nGenerated {generated}\nAlready applied: {total - generated}"
+            f"Total: {total}\nGenerated {stats.queued}\n"
+            f"Already applied: {total - stats.total}\n"
+            f"Already sent: {stats.already_sent}"
         )
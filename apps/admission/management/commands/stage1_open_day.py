@@ -1,11 +1,9 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.models import Applicant
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 
@@ -30,20 +28,9 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
         email_from = get_email_from(campaign)
         template = get_email_template(template_name)
         applicants = Applicant.subscribed.filter(campaign_id=campaign.pk)
-        sent = 0
-        for applicant in applicants:
-            recipients = [applicant.email]
-            if not Email.objects.filter(to=recipients, template=template).exists():
-                mail.send(
-                    recipients,
-                    sender=email_from,
-                    template=template_name,
-                    context={},
-                    # If emails rendered on delivery, they will store
-                    # value of the template id. It makes `exists`
-                    # method above works correctly.
-                    render_on_delivery=True,
-                    backend="ses",
-                )
-                sent += 1
-        self.stdout.write(f"Emails generated {sent}.")
+        emails = (
+            BulkEmail(recipient=email, template=template, context={})
+            for email in applicants.values_list("email", flat=True)
+        )
+        stats = send_bulk_emails(emails, sender=email_from)
+        self.stdout.write(f"Emails generated {stats.queued}.")
@@ -1,11 +1,9 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.models import Applicant
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 from ...constants import ApplicantStatuses
@@ -58,44 +56,27 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
                 "yandex_login",
                 "email",
             )
-            total = 0
-            generated = 0
+            template_name_pattern = options["template_pattern"] or self.TEMPLATE_PATTERN
+            template = get_email_template(template_name_pattern)
+            emails = []
             for a in applicants:
-                total += 1
                 score = (
                     0
                     if a["online_test__score"] is None
                     else int(a["online_test__score"])
                 )
-
-                recipients = [a["email"]]
-
-                template_name_pattern = options["template_pattern"] or self.TEMPLATE_PATTERN
-                template = get_email_template(template_name_pattern)
-
-                if not Email.objects.filter(to=recipients, template=template).exists():
-                    context = {
-                        "FIRST_NAME": a["first_name"],
-                        "YANDEX_LOGIN": a["yandex_login"],
-                        "TEST_SCORE": score,
-                        "TEST_CONTEST_ID": a["online_test__yandex_contest_id"],
-                    }
-                    if send_emails:
-                        mail.send(
-                            recipients,
-                            sender=email_from,
-                            template=template,
-                            context=context,
-                            # If emails rendered on delivery, they will store
-                            # value of the template id. It makes `exists`
-                            # method above works correctly.
-                            render_on_delivery=True,
-                            backend="ses",
-                        )
-                        generated += 1
-                    else:
-                        print(recipients[0], template)
-            self.stdout.write(f"    total: {total}")
-            self.stdout.write(f"    updated: {generated}")
+                context = {
+                    "FIRST_NAME": a["first_name"],
+                    "YANDEX_LOGIN": a["yandex_login"],
+                    "TEST_SCORE": score,
+                    "TEST_CONTEST_ID": a["online_test__yandex_contest_id"],
+                }
+                emails.append(BulkEmail(recipient=a["email"], template=template,
+                                        context=context))
+            stats = send_bulk_emails(emails, sender=email_from,
+                                     dry_run=not send_emails)
+            self.stdout.write(f"    total: {stats.total}")
+            self.stdout.write(f"    already sent: {stats.already_sent}")
+            self.stdout.write(f"    updated: {stats.queued}")
             self.stdout.write(f"    is sent: {send_emails}")
         self.stdout.write("Done")
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from admission.models import Applicant
+from admission.models import Applicant, ApplicantRanking
 
 from ._utils import CurrentCampaignMixin
 from ...constants import ApplicantStatuses
@@ -75,6 +75,8 @@ class Command(CurrentCampaignMixin, BaseCommand):
                     )
                 )
                 updated += 1
+            # Statuses are updated in bulk and bypass signals
+            ApplicantRanking.refresh(Applicant.objects.filter(campaign=campaign))
             self.stdout.write(f"    selected: {selected}")
             self.stdout.write(f"    updated: {updated}")
         self.stdout.write("Done")
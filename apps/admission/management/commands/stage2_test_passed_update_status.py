@@ -2,7 +2,7 @@ from decimal import Decimal
 
 from django.core.management.base import BaseCommand
 
-from admission.models import Applicant
+from admission.models import Applicant, ApplicantRanking
 
 from ._utils import CurrentCampaignMixin
 from ...constants import ApplicantStatuses
@@ -81,6 +81,8 @@ class Command(CurrentCampaignMixin, BaseCommand):
                     )
                 )
                 updated += 1
+            # Statuses are updated in bulk and bypass signals
+            ApplicantRanking.refresh(Applicant.objects.filter(campaign=campaign))
             self.stdout.write(f"    selected: {selected}")
             self.stdout.write(f"    updated: {updated}")
         self.stdout.write("Done")
@@ -1,11 +1,9 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.models import Applicant
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 
@@ -30,6 +28,15 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
             help="Send email only for applicant.id == applicant_id"
         )
 
+    def get_template(self, campaign, status):
+        if status == Applicant.REJECTED_BY_TEST:
+            template_name = f"shad-admission-{campaign.year}-testing-failed"
+        elif status == Applicant.REJECTED_BY_CHEATING:
+            template_name = f"shad-admission-{campaign.year}-cheater-testing-failed"
+        else:
+            raise NotImplementedError(f"Unexpected applicant status: {status}")
+        return get_email_template(template_name)
+
     def handle(self, *args, **options):
         send_emails = options.get('send_emails')
         applicant_id = options.get('applicant_id')
@@ -57,50 +64,30 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
                 "yandex_login",
                 "email",
             )
-            total = 0
-            generated = 0
+            # Templates are resolved only for the statuses in use
+            templates = {}
+            emails = []
             for a in applicants:
-                total += 1
                 score = (
                     0
                     if a["online_test__score"] is None
                     else int(a["online_test__score"])
                 )
-
-                recipients = [a["email"]]
-
-                year = campaigns[0].year
-                if a['status'] == Applicant.REJECTED_BY_TEST:
-                    template_name = f"shad-admission-{year}-testing-failed"
-                elif a['status'] == Applicant.REJECTED_BY_CHEATING:
-                    template_name = f"shad-admission-{year}-cheater-testing-failed"
-                else:
-                    raise NotImplementedError(f"Unexpected applicant status: {a.status}")
-                template = get_email_template(template_name)
-
-                if not Email.objects.filter(to=recipients, template=template).exists():
-                    context = {
-                        "FIRST_NAME": a["first_name"],
-                        "YANDEX_LOGIN": a["yandex_login"],
-                        "TEST_SCORE": score,
-                        "TEST_CONTEST_ID": a["online_test__yandex_contest_id"],
-                    }
-                    if send_emails:
-                        mail.send(
-                            recipients,
-                            sender=email_from,
-                            template=template,
-                            context=context,
-                            # If emails rendered on delivery, they will store
-                            # value of the template id. It makes `exists`
-                            # method above works correctly.
-                            render_on_delivery=True,
-                            backend="ses",
-                        )
-                        generated += 1
-                    else:
-                        print(recipients[0], template)
-            self.stdout.write(f"    total: {total}")
-            self.stdout.write(f"    updated: {generated}")
+                context = {
+                    "FIRST_NAME": a["first_name"],
+                    "YANDEX_LOGIN": a["yandex_login"],
+                    "TEST_SCORE": score,
+                    "TEST_CONTEST_ID": a["online_test__yandex_contest_id"],
+                }
+                if a["status"] not in templates:
+                    templates[a["status"]] = self.get_template(campaign, a["status"])
+                emails.append(BulkEmail(recipient=a["email"],
+                                        template=templates[a["status"]],
+                                        context=context))
+            stats = send_bulk_emails(emails, sender=email_from,
+                                     dry_run=not send_emails)
+            self.stdout.write(f"    total: {stats.total}")
+            self.stdout.write(f"    already sent: {stats.already_sent}")
+            self.stdout.write(f"    updated: {stats.queued}")
             self.stdout.write(f"    is sent: {send_emails}")
         self.stdout.write("Done")
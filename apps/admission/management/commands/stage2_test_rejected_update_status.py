@@ -3,7 +3,7 @@ from decimal import Decimal
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
-from admission.models import Applicant
+from admission.models import Applicant, ApplicantRanking
 
 from ._utils import CurrentCampaignMixin
 from ...constants import ApplicantStatuses
@@ -94,6 +94,8 @@ class Command(CurrentCampaignMixin, BaseCommand):
                     update_rejected += 1
                 else:
                     update_cheater += 1
+            # Statuses are updated in bulk and bypass signals
+            ApplicantRanking.refresh(Applicant.objects.filter(campaign=campaign))
             self.stdout.write(f"    total: {total}")
             self.stdout.write(f"    updated rejected: {update_rejected}")
             self.stdout.write(f"    updated cheater: {update_cheater}")
@@ -1,11 +1,9 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.models import Applicant
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 from ...constants import ApplicantStatuses
@@ -90,38 +88,25 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
         succeed = 0
         cheater = 0
         failed = 0
-        total = 0
-        generated = 0
+        emails = []
         for a in applicants.iterator():
-            total += 1
             succeed += int(a.status == ApplicantStatuses.PASSED_EXAM)
             cheater += int(a.status == ApplicantStatuses.REJECTED_BY_EXAM_CHEATING)
             failed += int(a.status == ApplicantStatuses.REJECTED_BY_EXAM)
-            template = status_to_pattern[a.status]
-            recipients = [a.email]
-            if not Email.objects.filter(to=recipients, template=template).exists():
-                context = {
-                    "BRANCH": campaign.branch.name,
-                    "name": a.first_name,
-                }
-                if commit:
-                    mail.send(
-                        recipients,
-                        sender=email_from,
-                        template=template,
-                        # If emails rendered on delivery, they will store
-                        # value of the template id. It makes
-                        # `Email.objects.exists()` work correctly.
-                        render_on_delivery=True,
-                        context=context,
-                        backend="ses",
-                    )
-                    generated += 1
-        self.stdout.write("Total: {}".format(total))
+            context = {
+                "BRANCH": campaign.branch.name,
+                "name": a.first_name,
+            }
+            emails.append(BulkEmail(recipient=a.email,
+                                    template=status_to_pattern[a.status],
+                                    context=context))
+        stats = send_bulk_emails(emails, sender=email_from, dry_run=not commit)
+        self.stdout.write("Total: {}".format(stats.total))
         self.stdout.write("Succeed: {}".format(succeed))
         self.stdout.write("Cheater: {}".format(cheater))
         self.stdout.write("Fail: {}".format(failed))
-        self.stdout.write("Emails generated: {}".format(generated))
+        self.stdout.write("Already sent: {}".format(stats.already_sent))
+        self.stdout.write("Emails generated: {}".format(stats.queued))
         if commit:
             self.stdout.write("Done")
         else:
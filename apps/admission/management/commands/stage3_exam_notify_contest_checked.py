@@ -1,14 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.constants import ChallengeStatuses
 from admission.models import Applicant, Exam
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
 
@@ -36,28 +34,18 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
                 status__in=[ChallengeStatuses.NEW, ChallengeStatuses.REGISTERED],
             ).select_related("applicant")
 
+            emails = []
             for e in exam_results:
                 if e.status == ChallengeStatuses.NEW:
                     self.stdout.write(f"{e} wasn't registered in the contest!")
                     continue
-                applicant = e.applicant
-                recipients = [applicant.email]
-                if not Email.objects.filter(to=recipients, template=template).exists():
-                    context = {
-                        "SCORE": str(e.score if e.score is not None else 0),
-                        "CONTEST_ID": e.yandex_contest_id,
-                    }
-                    mail.send(
-                        recipients,
-                        sender=email_from,
-                        template=template,
-                        context=context,
-                        # If emails rendered on delivery, they will store
-                        # value of the template id. It makes
-                        # `Email.objects.exists()` work correctly.
-                        render_on_delivery=True,
-                        backend="ses",
-                    )
-                    generated += 1
+                context = {
+                    "SCORE": str(e.score if e.score is not None else 0),
+                    "CONTEST_ID": e.yandex_contest_id,
+                }
+                emails.append(BulkEmail(recipient=e.applicant.email,
+                                        template=template, context=context))
+            stats = send_bulk_emails(emails, sender=email_from)
+            generated += stats.queued
         self.stdout.write("Generated emails: {}".format(generated))
         self.stdout.write("Done")
@@ -1,12 +1,10 @@
-from post_office import mail
-from post_office.models import Email
 from post_office.utils import get_email_template
 
 from django.core.management.base import BaseCommand
 
 from admission.constants import ChallengeStatuses
 from admission.models import Applicant, Exam
-from admission.services import get_email_from
+from admission.services import BulkEmail, get_email_from, send_bulk_emails
 from core.jinja2.filters import pluralize
 
 from ._utils import CurrentCampaignMixin, EmailTemplateMixin
@@ -33,33 +31,23 @@ class Command(EmailTemplateMixin, CurrentCampaignMixin, BaseCommand):
                 applicant__status=Applicant.PERMIT_TO_EXAM,
                 status=ChallengeStatuses.MANUAL,
             ).select_related("applicant")
+            emails = []
             for e in exams.iterator():
-                applicant = e.applicant
-                recipients = [applicant.email]
-                if not Email.objects.filter(to=recipients, template=template).exists():
-                    details = {}
-                    for k, value in e.details.items():
-                        # Pluralize scores
-                        if "Задание" in k:
-                            try:
-                                value = int(value)
-                                plural_part = pluralize(value, "", "a", "ов")
-                            except ValueError:
-                                plural_part = "а"
-                            value = f"{value} балл{plural_part}"
-                        details[k] = value
-                    context = {"total": str(e.score), "details": details}
-                    mail.send(
-                        recipients,
-                        sender=email_from,
-                        template=template,
-                        context=context,
-                        # If emails rendered on delivery, they will store
-                        # value of the template id. It makes
-                        # `Email.objects.exists()` work correctly.
-                        render_on_delivery=True,
-                        backend="ses",
-                    )
-                    generated += 1
+                details = {}
+                for k, value in e.details.items():
+                    # Pluralize scores
+                    if "Задание" in k:
+                        try:
+                            value = int(value)
+                            plural_part = pluralize(value, "", "a", "ов")
+                        except ValueError:
+                            plural_part = "а"
+                        value = f"{value} балл{plural_part}"
+                    details[k] = value
+                context = {"total": str(e.score), "details": details}
+                emails.append(BulkEmail(recipient=e.applicant.email,
+                                        template=template, context=context))
+            stats = send_bulk_emails(emails, sender=email_from)
+            generated += stats.queued
         self.stdout.write("Generated emails: {}".format(generated))
         self.stdout.write("Done")
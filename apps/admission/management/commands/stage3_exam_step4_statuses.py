@@ -4,7 +4,7 @@ from django.core.management import BaseCommand, CommandError
 from django.db import transaction
 from django.db.models import Q
 
-from admission.models import Applicant
+from admission.models import Applicant, ApplicantRanking
 
 from ._utils import CurrentCampaignMixin
 from ...constants import ApplicantStatuses
@@ -105,6 +105,10 @@ class Command(CurrentCampaignMixin, BaseCommand):
             exam_cheaters_total = applicants.filter(
                 exam__score__gte=cheater_score
             ).update(status=ApplicantStatuses.REJECTED_BY_EXAM_CHEATING)
+            # Bulk update bypasses signals
+            ApplicantRanking.refresh(
+                Applicant.objects.filter(campaign=campaign, new_track=new_track)
+            )
 
             pass_exam_total = applicants.filter(
                 status__in=ApplicantStatuses.RIGHT_BEFORE_INTERVIEW
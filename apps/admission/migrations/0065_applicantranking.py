@@ -0,0 +1,45 @@
+# Generated by Django 3.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_applicant_ranking(apps, schema_editor):
+    # Rows are built with the same statement that maintains them
+    from admission.models import Applicant, ApplicantRanking
+    ApplicantRanking.refresh(Applicant.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admission', '0064_applicant_unique_emails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicantRanking',
+            fields=[
+                ('applicant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='admission.applicant', verbose_name='Applicant')),
+                ('status', models.CharField(blank=True, choices=[('rejected_form_check', 'Rejected by form check'), ('golden_ticket', 'Golden ticket from the previous year'), ('rejected_cheating', 'Cheating'), ('rejected_test', 'Rejected by test'), ('permit_to_olympiad', 'Permitted to the olympiad'), ('permit_to_exam', 'Permitted to the exam'), ('passed_olympiad', 'Passed the olympiad'), ('failed_olympiad', 'Failed the olympiad, will write the exam'), ('reject_exam_cheater', 'Rejected by exam cheating'), ('rejected_exam', 'Rejected by exam'), ('passed_exam', 'Passed the exam'), ('rejected_interview', 'Rejected by interview'), ('rejected_with_bonus', 'Rejected by interview. Offered a bonus'), ('accept', 'Accept'), ('accept_if', 'Accept with condition'), ('they_refused', 'He or she refused'), ('permit_to_intensive', 'Permitted to the intensive'), ('pending', 'Pending'), ('rejected_intensive', 'Rejected by intensive'), ('rejected_intensive_bonus', 'Rejected by intensive. Offered a bonus'), ('accept_paid', 'Accept on paid'), ('entering_masters_preselect', "Entering the master's program (pre-selection)"), ('passed_exam_preselect', 'Passed the exam (pre-selection)'), ('rejected_exam_preselect', 'Rejected by exam (pre-selection)'), ('recommended_masters_preselect', "Recommended for the master's program (pre-selection)"), ('rejected_interview_preselect', 'Rejected by interview (pre-selection)'), ('accepted_masters_preselect', "Accepted for the master's program (pre-selection)"), ('rejected_masters_preselect', "Refused to enroll the master's program (pre-selection)")], max_length=30, null=True, verbose_name='Applicant|Status')),
+                ('exam_score', models.DecimalField(decimal_places=3, default=-1, max_digits=6)),
+                ('olympiad_score', models.DecimalField(decimal_places=3, default=-1, max_digits=7)),
+                ('test_score', models.SmallIntegerField(default=-1)),
+                ('interview_score', models.IntegerField(default=0)),
+                ('campaign', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='admission.campaign', verbose_name='Applicant|Campaign')),
+            ],
+            options={
+                'verbose_name': 'Applicant Ranking',
+                'verbose_name_plural': 'Applicant Rankings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='applicantranking',
+            index=models.Index(fields=['campaign', '-exam_score', '-olympiad_score', '-test_score', '-applicant'], name='applicant_ranking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicantranking',
+            index=models.Index(fields=['campaign', 'status', '-exam_score', '-olympiad_score', '-test_score', '-applicant'], name='applicant_ranking_status_idx'),
+        ),
+        migrations.RunPython(fill_applicant_ranking, migrations.RunPython.noop),
+    ]
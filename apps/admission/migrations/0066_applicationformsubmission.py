@@ -0,0 +1,48 @@
+# Generated by Django 3.2.18 on 2026-10-18 14:00
+
+import admission.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import files.models
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admission', '0065_applicantranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationFormSubmission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('photo', files.models.ConfigurableStorageFileField(blank=True, max_length=200, upload_to=admission.models.application_form_submission_upload_to, verbose_name='Applicant photo')),
+                ('mipt_grades_file', files.models.ConfigurableStorageFileField(blank=True, max_length=200, upload_to=admission.models.application_form_submission_upload_to, verbose_name='MIPT grades file')),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('new', 'New'), ('processed', 'Processed'), ('duplicate', 'Duplicate'), ('failed', 'Failed')], default='new', max_length=15, verbose_name='Status')),
+                ('errors', models.JSONField(blank=True, null=True, verbose_name='Errors')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed at')),
+                ('applicant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='admission.applicant', verbose_name='Applicant')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='admission.campaign', verbose_name='Campaign')),
+            ],
+            options={
+                'verbose_name': 'Application Form Submission',
+                'verbose_name_plural': 'Application Form Submissions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='applicationformsubmission',
+            index=models.Index(condition=models.Q(('status', 'new')), fields=['id'], name='application_form_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicationformsubmission',
+            index=models.Index(fields=['campaign', 'email'], name='application_form_email_idx'),
+        ),
+    ]
@@ -1,9 +1,11 @@
 import datetime
+import json
 import os
 import string
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import Any, ClassVar, NamedTuple, Optional, Type, Union
+from typing import Any, ClassVar, Dict, List, NamedTuple, Optional, Tuple, Type, Union
 
 from django.utils.functional import cached_property
 from djchoices import DjangoChoices
@@ -17,7 +19,7 @@ from django.conf import settings
 from django.core import checks
 from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.validators import MinValueValidator, RegexValidator, MaxValueValidator
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models import Count, OuterRef, Q, F, Subquery, Value, query
 from django.db.models.functions import Coalesce
 from django.utils import numberformat, timezone
@@ -28,6 +30,7 @@ from django.utils.translation import gettext_lazy as _
 
 from admission.constants import (
     ApplicantStatuses,
+    ApplicationFormSubmissionStatuses,
     ChallengeStatuses,
     ContestTypes,
     DefaultInterviewRatingSystem,
@@ -38,6 +41,7 @@ from admission.constants import (
     MIPTTracks,
     YandexDataSchoolInterviewRatingSystem, HasDiplomaStatuses, DiplomaDegrees,
 )
+from admission.stats import invalidate_stats_snapshots
 from admission.utils import get_next_process, slot_range
 from api.services import generate_hash, generate_random_string
 from api.settings import DIGEST_MAX_LENGTH
@@ -52,6 +56,7 @@ from files.models import ConfigurableStorageFileField
 from files.storage import private_storage
 from grading.api.yandex_contest import Error as YandexContestError
 from grading.api.yandex_contest import RegisterStatus
+from grading.api.yandex_contest import Unavailable as YandexContestUnavailable
 from learning.settings import AcademicDegreeLevels
 from lms.settings.base import YDS_SITE_ID
 from notifications.base_models import EmailAddressSuspension
@@ -206,9 +211,12 @@ class Campaign(TimezoneAwareMixin, models.Model):
             raise ValidationError(errors)
 
     @classmethod
-    def with_open_registration(cls):
-        """Returns campaigns marked as `current` with open registration form"""
-        today = timezone.now()
+    def with_open_registration(cls, at: Optional[datetime.datetime] = None):
+        """
+        Returns campaigns marked as `current` with open registration form
+        at the given time (now by default)
+        """
+        today = at or timezone.now()
         return cls.objects.filter(
             current=True,
             application_starts_at__lte=today,
@@ -848,6 +856,104 @@ class ApplicantStatusLog(TimestampedModel):
     def __str__(self):
         return str(self.pk)
 
+
+class ApplicantRanking(models.Model):
+    """
+    Denormalized scores of the applicant that are used for sorting the
+    applicant list. Missing scores are stored as -1, so applicants without
+    results go last. Call `ApplicantRanking.refresh` after bulk updates of
+    applicant statuses or contest results since they bypass signals.
+    Refresh also invalidates admission stats of the affected campaigns.
+    """
+    applicant = models.OneToOneField(
+        Applicant,
+        verbose_name=_("Applicant"),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ranking",
+    )
+    campaign = models.ForeignKey(
+        Campaign,
+        verbose_name=_("Applicant|Campaign"),
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name="+",
+    )
+    status = models.CharField(
+        choices=ApplicantStatuses.choices,
+        verbose_name=_("Applicant|Status"),
+        max_length=30,
+        blank=True,
+        null=True,
+    )
+    exam_score = models.DecimalField(max_digits=6, decimal_places=3,
+                                     default=-1)
+    olympiad_score = models.DecimalField(max_digits=7, decimal_places=3,
+                                         default=-1)
+    test_score = models.SmallIntegerField(default=-1)
+    # Sum of the interview comment scores
+    interview_score = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = "admission"
+        verbose_name = _("Applicant Ranking")
+        verbose_name_plural = _("Applicant Rankings")
+        indexes = [
+            models.Index(fields=["campaign", "-exam_score", "-olympiad_score",
+                                 "-test_score", "-applicant"],
+                         name="applicant_ranking_idx"),
+            models.Index(fields=["campaign", "status", "-exam_score",
+                                 "-olympiad_score", "-test_score",
+                                 "-applicant"],
+                         name="applicant_ranking_status_idx"),
+        ]
+
+    def __str__(self):
+        return str(self.pk)
+
+    @classmethod
+    def refresh(cls, applicants: query.QuerySet) -> int:
+        """Recalculates ranking rows of the applicants with one statement."""
+        subquery, params = (applicants.order_by().values("pk")
+                            .query.sql_with_params())
+        interview_score = (f'SELECT SUM(c.score) FROM "{Comment._meta.db_table}" AS c '
+                           f' INNER JOIN "{Interview._meta.db_table}" AS i '
+                           f'  ON i.id = c.interview_id '
+                           f' WHERE i.applicant_id = a.id')
+        sql = (f'INSERT INTO "{cls._meta.db_table}" '
+               f' (applicant_id, campaign_id, status, exam_score, '
+               f'  olympiad_score, test_score, interview_score) '
+               f'SELECT a.id, a.campaign_id, a.status, '
+               f' COALESCE(e.score, -1), '
+               f' COALESCE(o.score + o.math_score, -1), '
+               f' COALESCE(t.score, -1), '
+               f' COALESCE(({interview_score}), 0) '
+               f'FROM "{Applicant._meta.db_table}" AS a '
+               f' LEFT JOIN "{Exam._meta.db_table}" AS e ON e.applicant_id = a.id '
+               f' LEFT JOIN "{Olympiad._meta.db_table}" AS o ON o.applicant_id = a.id '
+               f' LEFT JOIN "{Test._meta.db_table}" AS t ON t.applicant_id = a.id '
+               f'WHERE a.id IN ({subquery}) '
+               f'ON CONFLICT (applicant_id) DO UPDATE SET '
+               f' campaign_id = EXCLUDED.campaign_id, '
+               f' status = EXCLUDED.status, '
+               f' exam_score = EXCLUDED.exam_score, '
+               f' olympiad_score = EXCLUDED.olympiad_score, '
+               f' test_score = EXCLUDED.test_score, '
+               f' interview_score = EXCLUDED.interview_score '
+               f'RETURNING campaign_id')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        campaign_ids = {campaign_id for campaign_id, in rows}
+        if campaign_ids:
+            branch_ids = (Campaign.objects
+                          .filter(pk__in=campaign_ids)
+                          .values_list("branch_id", flat=True))
+            invalidate_stats_snapshots(campaign_ids=campaign_ids,
+                                       branch_ids=branch_ids)
+        return len(rows)
+
+
 def contest_assignments_upload_to(instance, filename):
     # TODO: Can be visible for unauthenticated. Is it ok?
     return instance.FILE_PATH_TEMPLATE.format(
@@ -912,6 +1018,48 @@ class YandexContestImportResults(NamedTuple):
     updated: int
 
 
+SCOREBOARD_PAGE_SIZE = 200
+# The number of scoreboard pages requested at the same time
+SCOREBOARD_CONCURRENT_PAGES = 4
+SCOREBOARD_PAGE_RETRIES = 2
+
+
+class ScoreboardRow(NamedTuple):
+    yandex_login: str
+    participant_id: int
+    score: int
+    details: Dict[str, Any]
+
+
+def fetch_scoreboard_page(api, contest_id: str, page: int,
+                          page_size: int) -> Tuple[List[str], List[ScoreboardRow]]:
+    """
+    Returns problem titles and rows of the scoreboard page. Request is
+    retried on network problems, so the import is resumed from the failed
+    page instead of starting over.
+    """
+    attempt = 0
+    while True:
+        try:
+            status, json_data = api.standings(contest_id, page=page,
+                                              page_size=page_size)
+            break
+        except YandexContestUnavailable:
+            attempt += 1
+            if attempt > SCOREBOARD_PAGE_RETRIES:
+                raise
+    titles = [t["name"] for t in json_data["titles"]]
+    rows = []
+    for row in json_data["rows"]:
+        total_score_str: str = row["score"].replace(",", ".")
+        rows.append(ScoreboardRow(
+            yandex_login=row["participantInfo"]["login"],
+            participant_id=row["participantInfo"]["id"],
+            score=int(round(float(total_score_str))),
+            details={"scores": [a["score"] for a in row["problemResults"]]}))
+    return titles, rows
+
+
 class YandexContestIntegration(models.Model):
     CONTEST_TYPE: ClassVar[int]
     applicant: Any
@@ -1058,56 +1206,104 @@ class YandexContestIntegration(models.Model):
                 setattr(self, k, v)
 
     @classmethod
-    def import_scores(cls, *, api, contest: Contest) -> YandexContestImportResults:
+    def import_scores(cls, *, api, contest: Contest,
+                      page_size: int = SCOREBOARD_PAGE_SIZE,
+                      concurrency: int = SCOREBOARD_CONCURRENT_PAGES) -> YandexContestImportResults:
         """
-        Imports contest results page by page.
+        Imports contest results. Scoreboard pages are requested
+        concurrently, then all scores are applied with a single UPDATE,
+        so the import could be safely repeated.
 
         Since scoreboard can be modified at any moment we could miss some
         results during the importing if someone has improved his position
         and moved to a scoreboard `page` that has already been processed.
         """
-        paging = {"page_size": 50, "page": 1}
-        scoreboard_total = 0
-        updated_total = 0
+        titles: Optional[List[str]] = None
+        # The latest row of the participant wins if the participant has
+        # been moved to the next page during the importing
+        scoreboard: Dict[int, ScoreboardRow] = {}
+        page = 1
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            is_last_page = False
+            while not is_last_page:
+                pages = range(page, page + concurrency)
+                futures = [executor.submit(fetch_scoreboard_page, api,
+                                           contest.contest_id, p, page_size)
+                           for p in pages]
+                for future in futures:
+                    page_titles, rows = future.result()
+                    if titles is None:
+                        titles = page_titles
+                    for row in rows:
+                        scoreboard.pop(row.participant_id, None)
+                        scoreboard[row.participant_id] = row
+                    if len(rows) < page_size:
+                        is_last_page = True
+                        break
+                page += concurrency
         if not contest.details:
             contest.details = {}
-        while True:
-            try:
-                status, json_data = api.standings(contest.contest_id, **paging)
-                # XXX: Assignments order on a scoreboard could differ from
-                # the similar contest problems API call response
-                contest.details["titles"] = [t["name"] for t in json_data["titles"]]
-                contest.save(update_fields=("details",))
-                page_total = 0
-                for row in json_data["rows"]:
-                    scoreboard_total += 1
-                    page_total += 1
-                    total_score_str: str = row["score"].replace(",", ".")
-                    total_score = int(round(float(total_score_str)))
-                    score_details = [a["score"] for a in row["problemResults"]]
-                    update_fields = {
-                        "score": total_score,
-                        "details": {"scores": score_details},
-                    }
-                    yandex_login = row["participantInfo"]["login"]
-                    participant_id = row["participantInfo"]["id"]
-                    updated = cls.objects.filter(
-                        Q(applicant__yandex_login=yandex_login)
-                        | Q(contest_participant_id=participant_id),
-                        applicant__campaign_id=contest.campaign_id,
-                        yandex_contest_id=contest.contest_id,
-                        status=ChallengeStatuses.REGISTERED,
-                    ).update(**update_fields)
-                    updated_total += updated
-                if page_total < paging["page_size"]:
-                    break
-                paging["page"] += 1
-            except YandexContestError as e:
-                raise
+        # XXX: Assignments order on a scoreboard could differ from
+        # the similar contest problems API call response
+        contest.details["titles"] = titles
+        contest.save(update_fields=("details",))
+        updated_total = cls.update_scores(contest, list(scoreboard.values()))
         return YandexContestImportResults(
-            on_scoreboard=scoreboard_total, updated=updated_total
+            on_scoreboard=len(scoreboard), updated=updated_total
         )
 
+    @classmethod
+    def update_scores(cls, contest: Contest, scoreboard: List[ScoreboardRow]) -> int:
+        """
+        Updates scores of the registered participants with a single
+        statement. Participant is matched by yandex login or participant id,
+        the latest matched scoreboard row is used.
+        Returns the number of updated records.
+        """
+        if not scoreboard:
+            return 0
+        table = cls._meta.db_table
+        applicant_table = Applicant._meta.db_table
+        values = ", ".join(["(%s::integer, %s::text, %s::integer, %s::integer, %s::jsonb)"]
+                           * len(scoreboard))
+        params = []
+        for position, row in enumerate(scoreboard):
+            params.extend([position, row.yandex_login, row.participant_id,
+                           row.score, json.dumps(row.details)])
+        sql = (f'WITH scoreboard (position, yandex_login, participant_id, score, details) '
+               f' AS (VALUES {values}), '
+               f'registered AS ('
+               f' SELECT c.id, c.contest_participant_id, a.yandex_login '
+               f' FROM "{table}" AS c '
+               f' INNER JOIN "{applicant_table}" AS a ON a.id = c.applicant_id '
+               f' WHERE a.campaign_id = %s AND c.yandex_contest_id = %s '
+               f'  AND c.status = %s), '
+               # Separate equi-joins instead of OR condition allow hash joins
+               f'candidates AS ('
+               f' SELECT r.id, s.position, s.score, s.details '
+               f' FROM registered AS r '
+               f' INNER JOIN scoreboard AS s ON s.yandex_login = r.yandex_login '
+               f' UNION ALL '
+               f' SELECT r.id, s.position, s.score, s.details '
+               f' FROM registered AS r '
+               f' INNER JOIN scoreboard AS s '
+               f'  ON s.participant_id = r.contest_participant_id), '
+               f'matched AS ('
+               f' SELECT DISTINCT ON (id) id, score, details '
+               f' FROM candidates '
+               f' ORDER BY id, position DESC) '
+               f'UPDATE "{table}" AS c SET score = matched.score, details = matched.details '
+               f'FROM matched WHERE c.id = matched.id '
+               f'RETURNING c.applicant_id')
+        params.extend([contest.campaign_id, contest.contest_id,
+                       ChallengeStatuses.REGISTERED])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            applicant_ids = [row[0] for row in cursor.fetchall()]
+        if applicant_ids:
+            ApplicantRanking.refresh(Applicant.objects.filter(pk__in=applicant_ids))
+        return len(applicant_ids)
+
 
 class ApplicantRandomizeContestMixin:
     pk: Optional[int]
@@ -2009,3 +2205,72 @@ class CampaignCity(models.Model):
 
     def __str__(self):
         return f"CampaignCity campaign={self.campaign} city={self.city}"
+
+
+def application_form_submission_upload_to(instance, filename):
+    _, ext = os.path.splitext(filename)
+    return f"applications/staging/{uuid.uuid4().hex}{ext}"
+
+
+class ApplicationFormSubmission(TimeStampedModel):
+    """
+    Raw application form staged by the intake endpoint. Submissions are
+    turned into applicants in batches by the background consumer, see
+    `application.intake`.
+    """
+    campaign = models.ForeignKey(
+        Campaign,
+        verbose_name=_("Campaign"),
+        on_delete=models.PROTECT,
+        related_name="+",
+    )
+    # Normalized email is used to find resubmissions
+    email = models.EmailField(_("Email"))
+    payload = models.JSONField(_("Payload"))
+    photo = ConfigurableStorageFileField(
+        _("Applicant photo"),
+        upload_to=application_form_submission_upload_to,
+        max_length=200,
+        blank=True,
+        storage=private_storage,
+    )
+    mipt_grades_file = ConfigurableStorageFileField(
+        _("MIPT grades file"),
+        upload_to=application_form_submission_upload_to,
+        max_length=200,
+        blank=True,
+        storage=private_storage,
+    )
+    # Content types of the uploaded files, language code of the request
+    meta = models.JSONField(blank=True, default=dict)
+    status = models.CharField(
+        _("Status"),
+        choices=ApplicationFormSubmissionStatuses.choices,
+        default=ApplicationFormSubmissionStatuses.NEW,
+        max_length=15,
+    )
+    applicant = models.ForeignKey(
+        Applicant,
+        verbose_name=_("Applicant"),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    errors = models.JSONField(_("Errors"), blank=True, null=True)
+    processed_at = models.DateTimeField(_("Processed at"), null=True, blank=True)
+
+    class Meta:
+        app_label = "admission"
+        verbose_name = _("Application Form Submission")
+        verbose_name_plural = _("Application Form Submissions")
+        indexes = [
+            models.Index(fields=["id"],
+                         condition=Q(status=ApplicationFormSubmissionStatuses.NEW),
+                         name="application_form_new_idx"),
+            models.Index(fields=["campaign", "email"],
+                         name="application_form_email_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.email} [{self.status}]"
@@ -3,7 +3,7 @@ from dataclasses import asdict, dataclass, fields
 from datetime import date, datetime, timedelta
 from operator import attrgetter
 import threading
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 import pytz
 from post_office import mail
@@ -851,24 +851,92 @@ class EmailQueueService:
     def time_to_start_yandex_contest(
         *, campaign: Campaign, template: EmailTemplate, participants
     ):
-        email_from = get_email_from(campaign)
-        generated = 0
-        for participant in participants:
-            recipients = [participant["applicant__email"]]
-            if not Email.objects.filter(to=recipients, template=template).exists():
-                mail.send(
-                    recipients,
-                    sender=email_from,
-                    template=template,
-                    context={
-                        "CONTEST_ID": participant["yandex_contest_id"],
-                        "YANDEX_LOGIN": participant["applicant__yandex_login"],
-                    },
-                    render_on_delivery=True,
-                    backend="ses",
-                )
-                generated += 1
-        return generated
+        emails = (
+            BulkEmail(
+                recipient=participant["applicant__email"],
+                template=template,
+                context={
+                    "CONTEST_ID": participant["yandex_contest_id"],
+                    "YANDEX_LOGIN": participant["applicant__yandex_login"],
+                },
+            )
+            for participant in participants
+        )
+        stats = send_bulk_emails(emails, sender=get_email_from(campaign))
+        return stats.queued
+
+
+BULK_EMAIL_BATCH_SIZE = 500
+
+
+class BulkEmail(NamedTuple):
+    recipient: str
+    template: EmailTemplate
+    context: Dict[str, Any]
+
+
+class BulkEmailStats(NamedTuple):
+    total: int
+    already_sent: int
+    queued: int
+
+
+def get_sent_emails(templates: Iterable[EmailTemplate]) -> Set[Tuple[str, int]]:
+    """
+    Returns (recipient, template id) pairs of the generated emails. Only
+    emails rendered on delivery store value of the template id.
+    """
+    emails = (
+        Email.objects.filter(template__in=templates)
+        .values_list("to", "template_id")
+    )
+    return {(", ".join(to), template_id) for to, template_id in emails}
+
+
+def send_bulk_emails(
+    emails: Iterable[BulkEmail],
+    *,
+    sender: str,
+    scheduled_time: Optional[datetime] = None,
+    dry_run: bool = False,
+    batch_size: int = BULK_EMAIL_BATCH_SIZE,
+) -> BulkEmailStats:
+    """
+    Queues emails in batches skipping those that have already been
+    generated for the recipient with the same template. Nothing is
+    queued in a dry run mode, but stats are collected in the same way.
+    """
+    emails = list(emails)
+    templates = {email.template.pk: email.template for email in emails}
+    sent = get_sent_emails(templates.values())
+    to_send = []
+    for email in emails:
+        key = (email.recipient, email.template.pk)
+        if key not in sent:
+            sent.add(key)
+            to_send.append(email)
+    if not dry_run:
+        for i in range(0, len(to_send), batch_size):
+            mail.send_many([
+                {
+                    "recipients": [email.recipient],
+                    "sender": sender,
+                    "template": email.template,
+                    "context": email.context,
+                    "scheduled_time": scheduled_time,
+                    # If emails rendered on delivery, they will store
+                    # value of the template id. It makes `get_sent_emails`
+                    # work correctly.
+                    "render_on_delivery": True,
+                    "backend": "ses",
+                }
+                for email in to_send[i:i + batch_size]
+            ])
+    return BulkEmailStats(
+        total=len(emails),
+        already_sent=len(emails) - len(to_send),
+        queued=len(to_send),
+    )
 
 
 # Flag to track if we're handling a status change manually
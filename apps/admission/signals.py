@@ -2,8 +2,12 @@ from django.db.models.signals import post_delete, post_save, pre_delete, pre_sav
 from django.dispatch import receiver
 
 from admission.constants import InterviewSections
-from admission.models import Applicant, Campaign, Comment, Interview, InterviewSlot
+from admission.models import (
+    Applicant, ApplicantRanking, Campaign, Comment, Exam, Interview,
+    InterviewSlot, Olympiad, Test
+)
 from admission.services import EmailQueueService, create_applicant_status_log, is_status_change_handled
+from admission.stats import invalidate_stats_snapshots
 
 APPLICANT_FINAL_STATES = (
     Applicant.ACCEPT,
@@ -100,3 +104,36 @@ def track_status_changes(sender, instance, **kwargs):
             applicant=instance,
             new_status=instance.status
         )
+
+
+@receiver(post_save, sender=Applicant)
+def post_save_applicant_refresh_ranking(sender, instance, *args, **kwargs):
+    ApplicantRanking.refresh(Applicant.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+@receiver(post_save, sender=Olympiad)
+@receiver(post_delete, sender=Olympiad)
+def contest_results_refresh_ranking(sender, instance, *args, **kwargs):
+    ApplicantRanking.refresh(Applicant.objects.filter(pk=instance.applicant_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def interview_comment_refresh_ranking(sender, instance, *args, **kwargs):
+    ApplicantRanking.refresh(Applicant.objects.filter(interviews=instance.interview_id))
+
+
+@receiver(post_save, sender=Interview)
+@receiver(post_delete, sender=Interview)
+def interview_invalidate_stats(sender, instance, *args, **kwargs):
+    campaign = (Campaign.objects
+                .filter(applicants=instance.applicant_id)
+                .values('pk', 'branch_id')
+                .first())
+    if campaign is not None:
+        invalidate_stats_snapshots(campaign_ids=[campaign['pk']],
+                                   branch_ids=[campaign['branch_id']])
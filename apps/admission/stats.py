@@ -0,0 +1,91 @@
+"""
+Admission statistics are served from snapshots stored in the default
+cache. Snapshot is bound to the version of the campaign or the branch
+it was calculated for. Versions are dropped on changes of applicants,
+contest results and interviews of the campaign, so only stats of the
+affected campaign and its branch are recalculated.
+
+Outdated snapshot is still served if it was calculated less than
+`STATS_SNAPSHOT_MIN_AGE` seconds ago. It limits recalculation to once per
+interval when applicants keep coming at the peak of the campaign.
+Only one request recalculates the outdated snapshot, the others are served
+the outdated one meanwhile.
+"""
+import datetime
+from typing import Any, Callable, Iterable, NamedTuple, Tuple, Union
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.locks import acquire_cache_lock, release_cache_lock
+
+# Response data depends on the negotiated renderer (e.g. pandas renderers
+# expect a data frame), snapshot is stored per renderer format
+STATS_SNAPSHOT_CACHE_KEY = 'admission.stats.{name}.{renderer_format}.{scope}.{scope_id}'
+STATS_VERSION_CACHE_KEY = 'admission.stats.version.{scope}.{scope_id}'
+STATS_SNAPSHOT_CACHE_TIMEOUT = 3600  # seconds
+STATS_SNAPSHOT_MIN_AGE = 60  # seconds
+STATS_SNAPSHOT_LOCK_TIMEOUT = 300  # seconds
+
+
+class StatsScopes:
+    CAMPAIGN = 'campaign'
+    BRANCH = 'branch'
+
+
+class StatsSnapshot(NamedTuple):
+    data: Any
+    version: int
+    calculated_at: datetime.datetime
+
+
+def get_stats_version(scope: str, scope_id: Union[int, str]) -> int:
+    version_key = STATS_VERSION_CACHE_KEY.format(scope=scope, scope_id=scope_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = int(timezone.now().timestamp() * 1000)
+        cache.set(version_key, version, STATS_SNAPSHOT_CACHE_TIMEOUT)
+    return version
+
+
+def get_stats_snapshot(name: str, scope: str, scope_id: Union[int, str],
+                       calculate: Callable[[], Any], *,
+                       renderer_format: str = 'json') -> Tuple[StatsSnapshot, bool]:
+    """
+    Returns snapshot of the stats and flag whether it matches the current
+    version of the scope.
+    """
+    version = get_stats_version(scope, scope_id)
+    cache_key = STATS_SNAPSHOT_CACHE_KEY.format(
+        name=name, renderer_format=renderer_format, scope=scope,
+        scope_id=scope_id)
+    snapshot = cache.get(cache_key)
+    if snapshot is not None:
+        if snapshot.version == version:
+            return snapshot, True
+        age = (timezone.now() - snapshot.calculated_at).total_seconds()
+        if age < STATS_SNAPSHOT_MIN_AGE:
+            return snapshot, False
+    is_locked = acquire_cache_lock(cache_key, STATS_SNAPSHOT_LOCK_TIMEOUT)
+    if not is_locked and snapshot is not None:
+        # Snapshot is being recalculated by the other request
+        return snapshot, False
+    try:
+        snapshot = StatsSnapshot(data=calculate(), version=version,
+                                 calculated_at=timezone.now())
+        cache.set(cache_key, snapshot, STATS_SNAPSHOT_CACHE_TIMEOUT)
+    finally:
+        if is_locked:
+            release_cache_lock(cache_key)
+    return snapshot, True
+
+
+def invalidate_stats_snapshots(*, campaign_ids: Iterable[int],
+                               branch_ids: Iterable[int]) -> None:
+    version_keys = [
+        *(STATS_VERSION_CACHE_KEY.format(scope=StatsScopes.CAMPAIGN, scope_id=pk)
+          for pk in set(campaign_ids)),
+        *(STATS_VERSION_CACHE_KEY.format(scope=StatsScopes.BRANCH, scope_id=pk)
+          for pk in set(branch_ids)),
+    ]
+    cache.delete_many(version_keys)
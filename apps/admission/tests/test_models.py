@@ -6,11 +6,13 @@ from django.core.exceptions import ValidationError
 from django.db.models import ProtectedError
 
 from admission.constants import ContestTypes, InterviewSections, InterviewInvitationStatuses, ApplicantStatuses, ChallengeStatuses
-from admission.models import Applicant, Interview, Olympiad
+from admission.models import Applicant, ApplicantRanking, Interview, Olympiad
 from admission.tests.factories import (
     ApplicantFactory,
     CampaignFactory,
+    CommentFactory,
     ContestFactory,
+    ExamFactory,
     InterviewFactory,
     InterviewInvitationFactory,
     InterviewSlotFactory,
@@ -372,3 +374,43 @@ def test_olympiad_applicant_integration():
     assert applicant.olympiad == olympiad
     with pytest.raises(ProtectedError):
         applicant.delete()
+
+
+@pytest.mark.django_db
+def test_applicant_ranking_sync():
+    applicant = ApplicantFactory(status=ApplicantStatuses.PERMIT_TO_EXAM)
+    ranking = ApplicantRanking.objects.get(applicant=applicant)
+    assert ranking.campaign_id == applicant.campaign_id
+    assert ranking.status == ApplicantStatuses.PERMIT_TO_EXAM
+    assert ranking.exam_score == -1
+    assert ranking.olympiad_score == -1
+    assert ranking.test_score == -1
+    assert ranking.interview_score == 0
+    applicant.online_test.score = 5
+    applicant.online_test.save()
+    ExamFactory(applicant=applicant, score=7)
+    OlympiadFactory(applicant=applicant, score=3, math_score=4)
+    applicant.status = ApplicantStatuses.PASSED_EXAM
+    applicant.save()
+    interview = InterviewFactory(applicant=applicant)
+    comment = CommentFactory(interview=interview, score=2)
+    CommentFactory(interview=interview, score=1)
+    ranking.refresh_from_db()
+    assert ranking.status == ApplicantStatuses.PASSED_EXAM
+    assert ranking.test_score == 5
+    assert ranking.exam_score == 7
+    assert ranking.olympiad_score == 7
+    assert ranking.interview_score == 3
+    comment.delete()
+    ranking.refresh_from_db()
+    assert ranking.interview_score == 1
+    applicant.exam.delete()
+    ranking.refresh_from_db()
+    assert ranking.exam_score == -1
+    # Bulk updates bypass signals
+    Applicant.objects.filter(pk=applicant.pk).update(status=ApplicantStatuses.ACCEPT)
+    ranking.refresh_from_db()
+    assert ranking.status == ApplicantStatuses.PASSED_EXAM
+    assert ApplicantRanking.refresh(Applicant.objects.filter(pk=applicant.pk)) == 1
+    ranking.refresh_from_db()
+    assert ranking.status == ApplicantStatuses.ACCEPT
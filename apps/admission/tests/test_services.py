@@ -4,6 +4,7 @@ import itertools
 
 import pytest
 import pytz
+from post_office.models import Email
 from rest_framework.exceptions import NotFound
 
 from django.core.exceptions import ValidationError
@@ -20,6 +21,7 @@ from admission.constants import (
 from admission.models import Acceptance, Applicant, Exam, Interview, InterviewSlot
 from admission.services import (
     AccountData,
+    BulkEmail,
     EmailQueueService,
     StudentProfileData,
     accept_interview_invitation,
@@ -34,7 +36,8 @@ from admission.services import (
     get_or_create_student_profile,
     get_streams,
     manual_status_change,
-    is_status_change_handled
+    is_status_change_handled,
+    send_bulk_emails
 )
 from admission.tests.factories import (
     AcceptanceFactory,
@@ -90,6 +93,37 @@ def test_new_exam_invitation_email():
     assert email3.pk > email2.pk
 
 
+@pytest.mark.django_db
+def test_send_bulk_emails():
+    template1, template2 = EmailTemplateFactory.create_batch(2)
+    emails = [
+        BulkEmail(recipient="a@example.com", template=template1,
+                  context={"NAME": "a"}),
+        BulkEmail(recipient="b@example.com", template=template1, context={}),
+        # Duplicate within the same run
+        BulkEmail(recipient="a@example.com", template=template1, context={}),
+        BulkEmail(recipient="a@example.com", template=template2, context={}),
+    ]
+    stats = send_bulk_emails(emails, sender="admission@example.com",
+                             dry_run=True)
+    assert stats.total == 4
+    assert stats.already_sent == 1
+    assert stats.queued == 3
+    assert not Email.objects.exists()
+    stats = send_bulk_emails(emails, sender="admission@example.com",
+                             batch_size=2)
+    assert stats.queued == 3
+    assert Email.objects.count() == 3
+    email = Email.objects.get(to="a@example.com", template=template1)
+    assert email.context == {"NAME": "a"}
+    # Render on delivery
+    assert not email.subject
+    stats = send_bulk_emails(emails, sender="admission@example.com")
+    assert stats.already_sent == 4
+    assert stats.queued == 0
+    assert Email.objects.count() == 3
+
+
 @pytest.mark.django_db
 def test_create_student_from_applicant(settings):
     branch = BranchFactory(time_zone=pytz.timezone("Asia/Yekaterinburg"))
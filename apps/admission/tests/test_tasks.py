@@ -103,6 +103,40 @@ def test_olympiad_contest_integration(mocker):
     assert contest.details["titles"] == ["Task 1", "Task 2", "Task 3"]
 
 
+@pytest.mark.django_db
+def test_import_scores_paging(mocker):
+    campaign = CampaignFactory()
+    contest = ContestFactory(campaign=campaign, type=ContestTypes.OLYMPIAD,
+                             contest_id="12345")
+    olympiads = [OlympiadFactory(applicant=ApplicantFactory(campaign=campaign,
+                                                            yandex_login=f"user{i}"),
+                                 yandex_contest_id=contest.contest_id,
+                                 status=ChallengeStatuses.REGISTERED,
+                                 contest_participant_id=i)
+                 for i in range(5)]
+
+    def standings(contest_id, page, page_size):
+        # 2 rows per page, the last participant is on the last page
+        rows = [{"score": str(i * 10),
+                 "problemResults": [{"score": str(i * 10)}],
+                 "participantInfo": {"login": f"user{i}", "id": i}}
+                for i in range((page - 1) * 2, min(page * 2, 5))]
+        return 200, {"titles": [{"name": "Task 1"}], "rows": rows}
+
+    mock_api = mocker.MagicMock()
+    mock_api.standings.side_effect = standings
+    results = Olympiad.import_scores(api=mock_api, contest=contest,
+                                     page_size=2, concurrency=2)
+    assert results == (5, 5)
+    for i, olympiad in enumerate(olympiads):
+        olympiad.refresh_from_db()
+        assert olympiad.score == i * 10
+        assert olympiad.details == {"scores": [str(i * 10)]}
+    # Import is idempotent
+    assert Olympiad.import_scores(api=mock_api, contest=contest,
+                                  page_size=2, concurrency=2) == (5, 5)
+
+
 @pytest.mark.django_db
 def test_olympiad_import_errors(mocker):
     campaign = CampaignFactory()
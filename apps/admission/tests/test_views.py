@@ -26,6 +26,7 @@ from admission.tests.factories import (
     ApplicantFactory,
     CampaignFactory,
     CommentFactory,
+    ExamFactory,
     InterviewerFactory,
     InterviewFactory,
     InterviewInvitationFactory,
@@ -705,6 +706,24 @@ def test_applicant_list_view_smoke(client, settings):
     assert soup.find(text=applicant2.full_name) is not None
 
 
+@pytest.mark.django_db
+def test_applicant_list_view_ordering(client, settings):
+    branch = BranchFactory(site=SiteFactory(pk=settings.SITE_ID))
+    campaign = CampaignFactory(current=True, branch=branch)
+    no_exam = ApplicantFactory(campaign=campaign)
+    low_exam = ExamFactory(applicant__campaign=campaign, score=3).applicant
+    high_exam = ExamFactory(applicant__campaign=campaign, score=8).applicant
+    client.login(CuratorFactory())
+    base_url = reverse("admission:applicants:list")
+    response = client.get(f"{base_url}?campaign={campaign.id}&status=")
+    assert response.status_code == 200
+    assert list(response.context["applicants"]) == [high_exam, low_exam, no_exam]
+    # Applicant without a ranking row is still listed
+    high_exam.ranking.delete()
+    response = client.get(f"{base_url}?campaign={campaign.id}&status=")
+    assert list(response.context["applicants"]) == [low_exam, no_exam, high_exam]
+
+
 @pytest.mark.django_db
 def test_applicant_status_update_view(client, settings):
     """Test that ApplicantStatusUpdateView creates a log entry with the editor."""
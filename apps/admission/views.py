@@ -562,9 +562,12 @@ class ApplicantListView(CuratorOnlyMixin, FilterMixin, generic.ListView):
 
     def get_queryset(self):
         branches = Branch.objects.for_site(site_id=settings.SITE_ID)
+        # Ranking is joined with LEFT JOIN, applicants without a ranking
+        # row go last
         return (
             Applicant.objects.filter(campaign__branch__in=branches)
             .select_related(
+                "ranking",
                 "exam",
                 "online_test",
                 "olympiad",
@@ -572,18 +575,12 @@ class ApplicantListView(CuratorOnlyMixin, FilterMixin, generic.ListView):
                 "university_legacy",
                 "campaign__branch",
             )
-            .prefetch_related("interviews")
-            .annotate(
-                exam__score_coalesce=Coalesce(
-                    "exam__score", Value(-1, output_field=ScoreField())
-                ),
-                test__score_coalesce=Coalesce("online_test__score", Value(-1)),
-                olympiad__total_score_coalesce=Coalesce(
-                    F("olympiad__score") + F("olympiad__math_score"),
-                    Value(-1, output_field=ScoreField())
-                ),
+            .order_by(
+                F("ranking__exam_score").desc(nulls_last=True),
+                F("ranking__olympiad_score").desc(nulls_last=True),
+                F("ranking__test_score").desc(nulls_last=True),
+                "-pk",
             )
-            .order_by("-exam__score_coalesce", "-olympiad__total_score_coalesce", "-test__score_coalesce", "-pk")
         )
 
     def get(self, request: AuthenticatedHttpRequest, *args, **kwargs):
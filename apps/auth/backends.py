@@ -1,4 +1,6 @@
 import logging
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Optional, Tuple
 
 from social_core.backends.gitlab import GitLabOAuth2
 from social_core.backends.oauth import BaseOAuth2
@@ -6,6 +8,7 @@ from social_core.utils import handle_http_errors
 
 from django.contrib.auth import get_user_model
 
+from .permissions import Role
 from .registry import role_registry
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,33 @@ logger = logging.getLogger(__name__)
 UserModel = get_user_model()
 
 
+class PermissionCache:
+    """
+    Memoizes permission check results of `RBACPermissions` for the
+    lifetime of a request. Cache key includes user and object identity,
+    references are kept to make sure identities are not reused.
+    """
+    def __init__(self):
+        self._cache: Dict[Tuple[int, str, int], Tuple[Any, Any, bool]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user, perm, obj) -> Optional[bool]:
+        key = (id(user), perm, id(obj))
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key][2]
+        self.misses += 1
+        return None
+
+    def set(self, user, perm, obj, value: bool) -> None:
+        self._cache[(id(user), perm, id(obj))] = (user, obj, value)
+
+
+permission_cache: ContextVar[Optional[PermissionCache]] = ContextVar(
+    'permission_cache', default=None)
+
+
 class RBACPermissions:
     """
     Backend uses RBAC model approach allowing to check permissions
@@ -20,6 +50,10 @@ class RBACPermissions:
 
     Implementation relies on `UserModel.roles` attribute that must return
     set of available roles for the user.
+
+    Rule chains are compiled once for each combination of user roles,
+    results are memoized if permission cache is activated for
+    the current request (see `auth.middleware.PermissionCacheMiddleware`).
     """
     def authenticate(self, *args, **kwargs):
         return None
@@ -27,8 +61,18 @@ class RBACPermissions:
     def has_perm(self, user, perm, obj=None):
         if not user.is_active and not user.is_anonymous:
             return False
+        cache = permission_cache.get()
+        if cache is None:
+            return self._check_perm(user, perm, obj)
+        result = cache.get(user, perm, obj)
+        if result is None:
+            result = self._check_perm(user, perm, obj)
+            cache.set(user, perm, obj, result)
+        return result
+
+    def _check_perm(self, user, perm, obj) -> bool:
         if user.is_anonymous:
-            return self._has_perm(user, perm, {role_registry.anonymous_role}, obj)
+            return self._has_perm(user, perm, frozenset([role_registry.anonymous_role]), obj)
         elif hasattr(user, 'roles'):
             roles = [role_registry.anonymous_role, role_registry.authenticated_role]
             for role_code in user.roles:
@@ -38,29 +82,25 @@ class RBACPermissions:
                     continue
                 role = role_registry[role_code]
                 roles.append(role)
-            roles.sort(key=lambda r: r.priority)
-            return self._has_perm(user, perm, roles, obj)
+            return self._has_perm(user, perm, frozenset(roles), obj)
         return False
 
-    def _has_perm(self, user, perm_name, roles, obj):
-        for role in roles:
-            if role.permissions.rule_exists(perm_name):
-                return role.permissions[perm_name].test(user, obj)
+    def _has_perm(self, user, perm_name, roles: FrozenSet[Role], obj) -> bool:
+        for link in role_registry.get_rule_chain(perm_name, roles):
+            if link.is_terminal:
+                return link.rules[0].test(user, obj)
             # Case when using base permission name, e.g.,
             # `.has_perm('update_comment', obj)` and expecting
             # .has_perm('update_own_comment', obj) will be in a call chain
-            # if relation exists
-            if perm_name in role.relations:
-                # Related `Permission.rule` checks only object level
-                # permission
-                if obj is None:
-                    continue
-                for rel_perm_name in role.relations[perm_name]:
-                    # Don't terminate access check here since less priority
-                    # role still could have a permission relation that returns
-                    # positive result
-                    if self._has_perm(user, rel_perm_name, {role}, obj):
-                        return True
+            # if relation exists.
+            # Related `Permission.rule` checks only object level permission
+            if obj is None:
+                continue
+            # Don't terminate access check here since less priority
+            # role still could have a permission relation that returns
+            # positive result
+            if any(rule.test(user, obj) for rule in link.rules):
+                return True
         return False
 
     def has_module_perms(self, user, app_label):
@@ -1,3 +1,5 @@
+import logging
+
 from django.conf import settings
 from django.contrib.auth import get_user as auth_get_user
 from django.contrib.auth.middleware import \
@@ -5,8 +7,11 @@ from django.contrib.auth.middleware import \
 from django.contrib.auth.models import AnonymousUser
 from django.utils.functional import SimpleLazyObject
 
+from auth.backends import PermissionCache, permission_cache
 from users.models import ExtendedAnonymousUser
 
+logger = logging.getLogger(__name__)
+
 
 def get_user(request):
     if not hasattr(request, '_cached_user'):
@@ -25,3 +30,23 @@ class AuthenticationMiddleware(_AuthenticationMiddleware):
             "'django.contrib.auth.middleware.AuthenticationMiddleware'."
         ) % ("_CLASSES" if settings.MIDDLEWARE is None else "")
         request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+class PermissionCacheMiddleware:
+    """
+    Activates memoization of permission check results for the lifetime
+    of the request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache = PermissionCache()
+        request.permission_cache = cache
+        token = permission_cache.set(cache)
+        try:
+            return self.get_response(request)
+        finally:
+            permission_cache.reset(token)
+            logger.debug(f"Permission cache for {request.path}: "
+                         f"{cache.hits} hits, {cache.misses} misses")
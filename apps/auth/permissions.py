@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Dict, Iterable, Optional, Set, Type, Union
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Type, Union
 
 from rest_framework.permissions import BasePermission
 from rules import Predicate, RuleSet, always_true
@@ -74,7 +74,21 @@ def add_perm(cls: Type[Permission]) -> Type[Permission]:
     return cls
 
 
+class RuleChainLink(NamedTuple):
+    """
+    Compiled rules of the role for the permission. Terminal link contains
+    the only permission rule and its result is final, otherwise
+    it contains rules of the related permissions which are checked
+    on object level only until the first positive result.
+    """
+    rules: Tuple[Predicate, ...]
+    is_terminal: bool
+
+
 class Role:
+    # Incremented on any role modification to invalidate compiled rules
+    version = 0
+
     def __init__(self, *, id: Union[int, str], description: str,
                  permissions: Iterable[Type[Permission]],
                  code: Optional[str] = None,
@@ -111,6 +125,7 @@ class Role:
             raise PermissionNotRegistered(msg)
         pred = always_true if perm.rule is None else perm.rule
         self._permissions.add_rule(perm.name, pred)
+        Role.version += 1
 
     def has_permission(self, perm: Union[str, Type[Permission]]) -> bool:
         if isinstance(perm, str):
@@ -178,6 +193,32 @@ class Role:
         if parent not in self._relations:
             self._relations[parent] = set()
         self._relations[parent].add(child)
+        Role.version += 1
+
+    def compile_rules(self, perm_name: PermissionId) -> Optional[RuleChainLink]:
+        """
+        Returns rules to check for the permission name with
+        expanded relations or None if role has no such permission.
+        """
+        if self._permissions.rule_exists(perm_name):
+            return RuleChainLink((self._permissions[perm_name],), True)
+        if perm_name not in self._relations:
+            return None
+        rules: List[Predicate] = []
+        visited = {perm_name}
+        related = list(self._relations[perm_name])
+        while related:
+            rel_perm_name = related.pop(0)
+            if rel_perm_name in visited:
+                continue
+            visited.add(rel_perm_name)
+            if self._permissions.rule_exists(rel_perm_name):
+                rules.append(self._permissions[rel_perm_name])
+            elif rel_perm_name in self._relations:
+                related.extend(self._relations[rel_perm_name])
+        if not rules:
+            return None
+        return RuleChainLink(tuple(rules), False)
 
     def has_relation(self, parent: Type[Permission], child: Type[Permission]):
         return parent.name in self._relations and child.name in self._relations[parent.name]
@@ -1,4 +1,6 @@
-from auth.permissions import Role
+from typing import Dict, FrozenSet, Tuple
+
+from auth.permissions import PermissionId, Role, RuleChainLink
 
 from .errors import AlreadyRegistered, NotRegistered
 
@@ -17,6 +19,9 @@ class RolePermissionsRegistry:
 
     def __init__(self):
         self._registry = {}
+        self._rule_chains: Dict[Tuple[PermissionId, FrozenSet[Role]],
+                                Tuple[RuleChainLink, ...]] = {}
+        self._rule_chains_version = Role.version
         self._register_default_roles()
 
     def _register_default_roles(self):
@@ -36,6 +41,7 @@ class RolePermissionsRegistry:
                                     f"{self._registry[role.code]} is already "
                                     f"registered with the same code")
         self._registry[role.code] = role
+        self._rule_chains = {}
 
     def unregister(self, role: Role):
         """
@@ -47,6 +53,7 @@ class RolePermissionsRegistry:
             raise NotRegistered('The role %s is not '
                                 'registered' % role.code)
         del self._registry[role.code]
+        self._rule_chains = {}
 
     def __contains__(self, role):
         if isinstance(role, Role):
@@ -77,5 +84,28 @@ class RolePermissionsRegistry:
     def items(self):
         return self._registry.items()
 
+    def get_rule_chain(self, perm_name: PermissionId,
+                       roles: FrozenSet[Role]) -> Tuple[RuleChainLink, ...]:
+        """
+        Returns compiled rules of the permission for the given set of roles
+        ordered by role priority. Chain ends with the first terminal link
+        since rules of the less priority roles are never checked.
+        """
+        if self._rule_chains_version != Role.version:
+            self._rule_chains = {}
+            self._rule_chains_version = Role.version
+        key = (perm_name, roles)
+        if key not in self._rule_chains:
+            chain = []
+            for role in sorted(roles, key=lambda r: (r.priority, r.code)):
+                link = role.compile_rules(perm_name)
+                if link is None:
+                    continue
+                chain.append(link)
+                if link.is_terminal:
+                    break
+            self._rule_chains[key] = tuple(chain)
+        return self._rule_chains[key]
+
 
 role_registry = RolePermissionsRegistry()
@@ -1,7 +1,9 @@
 import pytest
 import rules
 
-from auth.backends import RBACModelBackend, RBACPermissions
+from auth.backends import (
+    PermissionCache, RBACModelBackend, RBACPermissions, permission_cache
+)
 from auth.errors import PermissionNotRegistered
 from auth.permissions import Permission, Role, perm_registry
 from auth.registry import role_registry
@@ -161,3 +163,38 @@ def test_rbac_backend_has_perm_role_priority(mocker):
     user.roles = {'role1', 'role2', 'role3'}
     # role3.priority > role1.priority => check Permission3 predicate
     assert RBACPermissions().has_perm(user, Permission3.name, Permission3.VALID_VALUE)
+
+
+@pytest.mark.django_db
+def test_rbac_backend_permission_cache(mocker):
+    mocker.patch.dict(role_registry._registry, clear=True)
+    mocker.patch.dict(perm_registry._dict, clear=True)
+    role_registry._register_default_roles()
+    perm_registry.add_permission(Permission1)
+    perm_registry.add_permission(Permission3)
+    role1 = Role(id='role1', description="TestRole1", priority=10,
+                 permissions=(Permission1,))
+    role1.add_relation(Permission3, Permission1)
+    role_registry.register(role1)
+    user = UserFactory()
+    user.roles = {'role1'}
+    roles = frozenset([role_registry.anonymous_role,
+                       role_registry.authenticated_role, role1])
+    chain = role_registry.get_rule_chain(Permission3.name, roles)
+    assert len(chain) == 1
+    assert not chain[0].is_terminal
+    assert role_registry.get_rule_chain(Permission3.name, roles) is chain
+    cache = PermissionCache()
+    token = permission_cache.set(cache)
+    try:
+        backend = RBACPermissions()
+        assert backend.has_perm(user, Permission3.name, 42)
+        assert backend.has_perm(user, Permission3.name, 42)
+        assert not backend.has_perm(user, Permission3.name)
+        assert cache.hits == 1
+        assert cache.misses == 2
+    finally:
+        permission_cache.reset(token)
+    # Cache is not activated outside of the request
+    assert not RBACPermissions().has_perm(user, Permission3.name, 43)
+    assert cache.misses == 2
@@ -1,15 +1,26 @@
 import csv
 import io
+import itertools
+import tempfile
 from abc import ABC, abstractmethod
 from datetime import datetime
 
 from xlsxwriter import Workbook
 
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import formats
 from django.utils.encoding import force_str
 
 
+class Echo:
+    """
+    Implements just the `write` method of the file-like interface, returns
+    written value instead of buffering it.
+    """
+    def write(self, value):
+        return value
+
+
 class ReportFileOutput(ABC):
     """Interface for exporting a report in csv or xlsx formats"""
 
@@ -42,9 +53,21 @@ class ReportFileOutput(ABC):
 
         return response
 
-    def output_xlsx(self):
-        output = io.BytesIO()
-        workbook = Workbook(output, {'in_memory': True})
+    def output_csv_stream(self) -> StreamingHttpResponse:
+        """
+        Yields csv rows as soon as they are produced by `.data`, use it
+        with lazy data sources to keep memory usage bounded.
+        """
+        writer = csv.writer(Echo())
+        rows = itertools.chain([self.headers],
+                               (self.export_row(data_row) for data_row in self.data))
+        response = StreamingHttpResponse((writer.writerow(row) for row in rows),
+                                         content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = \
+            'attachment; filename="{}.csv"'.format(self.get_filename())
+        return response
+
+    def _write_xlsx(self, workbook: Workbook) -> None:
         worksheet = workbook.add_worksheet()
 
         format = workbook.add_format()
@@ -61,6 +84,11 @@ class ReportFileOutput(ABC):
                 worksheet.write(row_index, col_index, force_str(value), format)
 
         workbook.close()
+
+    def output_xlsx(self):
+        output = io.BytesIO()
+        workbook = Workbook(output, {'in_memory': True})
+        self._write_xlsx(workbook)
         output.seek(0)
 
         # if settings.DEBUG:
@@ -73,6 +101,22 @@ class ReportFileOutput(ABC):
 
         return response
 
+    def output_xlsx_stream(self) -> FileResponse:
+        """
+        In `constant_memory` mode each row is flushed to a temporary file
+        as soon as the next one is written, the resulting file is sent
+        in chunks.
+        """
+        output = tempfile.TemporaryFile()
+        workbook = Workbook(output, {'constant_memory': True})
+        self._write_xlsx(workbook)
+        output.seek(0)
+        content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        response = FileResponse(output, content_type=content_type)
+        response['Content-Disposition'] = \
+            'attachment; filename="{}.xlsx"'.format(self.get_filename())
+        return response
+
     def get_filename(self):
         today = formats.date_format(datetime.now(), "SHORT_DATE_FORMAT")
         return f"report_{today}"
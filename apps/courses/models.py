@@ -602,10 +602,15 @@ class Course(TimezoneAwareMixin, TimeStampedModel, DerivableFieldsMixin):
 
     def get_gradebook_url(self, url_name: str = "teaching:gradebook",
                                 format: Optional[str] = None,
-                                student_group: Optional[int] = None):
-        if format == "csv":
+                                student_group: Optional[int] = None,
+                                streaming: bool = False):
+        kwargs = self.url_kwargs
+        if format == "xlsx" or (format == "csv" and streaming):
+            url_name = f"{url_name}_export"
+            kwargs = {**kwargs, "output_format": format}
+        elif format == "csv":
             url_name = f"{url_name}_csv"
-        url = reverse(url_name, kwargs=self.url_kwargs)
+        url = reverse(url_name, kwargs=kwargs)
         if student_group is not None:
             url += f'?student_group={student_group}'
         return url
@@ -620,7 +625,7 @@ class Course(TimezoneAwareMixin, TimeStampedModel, DerivableFieldsMixin):
     def has_unread(self):
         from notifications.middleware import get_unread_notifications_cache
         cache = get_unread_notifications_cache()
-        return self in cache.courseoffering_news
+        return self.pk in cache.courseoffering_news
 
     @property
     def name(self):
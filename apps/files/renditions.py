@@ -0,0 +1,104 @@
+"""
+HTML renditions of the notebooks. Rendition is stored next to the original
+file in the same storage, its name contains hash of the original file
+content, so replacing the file content invalidates rendition:
+
+    <original file name>.<content hash>.html
+
+Existing renditions are cached by the content hash of the original file
+to avoid looking them up in the storage on each request.
+"""
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+from django.http import Http404
+
+from files.utils import convert_ipynb_to_html
+
+logger = logging.getLogger(__name__)
+
+HTML_RENDITION_CACHE_KEY = 'files.renditions.html.{name_hash}.{content_hash}'
+HTML_RENDITION_CACHE_TIMEOUT = 3600 * 24
+
+
+def is_ipynb_file(file_field: FieldFile) -> bool:
+    _, ext = os.path.splitext(file_field.name)
+    return ext == '.ipynb'
+
+
+def get_content_hash(file_field: FieldFile) -> str:
+    content_hash = hashlib.sha1()
+    with file_field.storage.open(file_field.name) as f:
+        for chunk in f.chunks():
+            content_hash.update(chunk)
+    return content_hash.hexdigest()[:16]
+
+
+def _get_cache_key(rendition_name: str) -> str:
+    # Rendition name contains the original file name and content hash
+    original_name, content_hash, _ = rendition_name.rsplit('.', maxsplit=2)
+    name_hash = hashlib.md5(original_name.encode()).hexdigest()
+    return HTML_RENDITION_CACHE_KEY.format(name_hash=name_hash,
+                                           content_hash=content_hash)
+
+
+def get_html_rendition_name(file_field: FieldFile) -> str:
+    return f"{file_field.name}.{get_content_hash(file_field)}.html"
+
+
+def get_html_rendition(file_field: FieldFile) -> Optional[str]:
+    """
+    Returns storage name of the existing html rendition of the notebook.
+    """
+    try:
+        rendition_name = get_html_rendition_name(file_field)
+    except FileNotFoundError:
+        return None
+    cache_key = _get_cache_key(rendition_name)
+    if cache.get(cache_key) is not None:
+        return rendition_name
+    if not file_field.storage.exists(rendition_name):
+        return None
+    cache.set(cache_key, rendition_name, HTML_RENDITION_CACHE_TIMEOUT)
+    return rendition_name
+
+
+def save_html_rendition(file_field: FieldFile, html_source: ContentFile,
+                        rendition_name: Optional[str] = None) -> str:
+    """Saves already converted notebook next to the original file."""
+    if rendition_name is None:
+        rendition_name = get_html_rendition_name(file_field)
+    storage = file_field.storage
+    cache_key = _get_cache_key(rendition_name)
+    if not storage.exists(rendition_name):
+        rendition_name = storage.save(rendition_name, html_source)
+        logger.debug(f"Created html rendition {rendition_name}")
+    cache.set(cache_key, rendition_name, HTML_RENDITION_CACHE_TIMEOUT)
+    return rendition_name
+
+
+def create_html_rendition(file_field: FieldFile) -> Optional[str]:
+    """
+    Converts notebook to html and saves rendition next to the original file.
+    Returns storage name of the rendition or None if file is not a notebook.
+
+    Raises ConvertError or NotebookValidationError if conversion failed,
+    Http404 if the original file is missing in the storage.
+    """
+    if not file_field or not is_ipynb_file(file_field):
+        return None
+    try:
+        rendition_name = get_html_rendition_name(file_field)
+    except FileNotFoundError:
+        raise Http404
+    if file_field.storage.exists(rendition_name):
+        cache.set(_get_cache_key(rendition_name), rendition_name,
+                  HTML_RENDITION_CACHE_TIMEOUT)
+        return rendition_name
+    html_source = convert_ipynb_to_html(file_field, name=rendition_name)
+    return save_html_rendition(file_field, html_source, rendition_name)
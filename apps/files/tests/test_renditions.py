@@ -0,0 +1,49 @@
+import pytest
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import Http404
+
+from files.renditions import create_html_rendition, get_html_rendition
+from learning.tests.factories import AssignmentCommentFactory
+
+
+@pytest.mark.django_db
+def test_create_html_rendition(mocker, settings):
+    settings.USE_CLOUD_STORAGE = False
+    cache.clear()
+    mock_convert = mocker.patch("files.renditions.convert_ipynb_to_html")
+    mock_convert.side_effect = lambda f, name: ContentFile(b'<html></html>', name=name)
+    submission_comment = AssignmentCommentFactory()
+    file_field = submission_comment.attached_file
+    storage = file_field.storage
+    file_field.name = storage.save('test.ipynb', ContentFile(b'{"cells": []}'))
+    assert get_html_rendition(file_field) is None
+
+    rendition_name = create_html_rendition(file_field)
+
+    assert rendition_name.startswith(file_field.name)
+    assert rendition_name.endswith('.html')
+    assert storage.exists(rendition_name)
+    assert get_html_rendition(file_field) == rendition_name
+    # Rendition is not created twice
+    cache.clear()
+    assert get_html_rendition(file_field) == rendition_name
+    assert create_html_rendition(file_field) == rendition_name
+    assert mock_convert.call_count == 1
+    # New content of the file invalidates cached rendition
+    storage.delete(file_field.name)
+    storage.save(file_field.name, ContentFile(b'{"cells": [{}]}'))
+    assert get_html_rendition(file_field) is None
+    assert create_html_rendition(file_field) != rendition_name
+
+
+@pytest.mark.django_db
+def test_create_html_rendition_missing_file(settings):
+    settings.USE_CLOUD_STORAGE = False
+    submission_comment = AssignmentCommentFactory()
+    file_field = submission_comment.attached_file
+    file_field.name = 'missing.ipynb'
+    assert get_html_rendition(file_field) is None
+    with pytest.raises(Http404):
+        create_html_rendition(file_field)
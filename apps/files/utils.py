@@ -1,5 +1,8 @@
+import io
 import os
-from typing import Optional
+import tempfile
+import zipfile
+from typing import Iterable, Iterator, Optional, Tuple
 
 import requests
 from nbconvert import HTMLExporter
@@ -45,3 +48,72 @@ def convert_ipynb_to_html(file_field: FieldFile,
    
     name = name or file_field.name + '.html'
     return ContentFile(nb_node.encode(), name=name)
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Write-only unseekable buffer. ZipFile writes data descriptors after
+    each entry in this case, so the archive could be sent to the client
+    while it's being built.
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_archive(files: Iterable[Tuple[str, FieldFile]],
+                     chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Yields zip archive with the given files (path in archive, file field)
+    chunk by chunk. Files are read from the storage lazily, so memory usage
+    is bounded by the chunk size. Missing files are skipped.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for path, file_field in files:
+            try:
+                f = file_field.storage.open(file_field.name)
+            except FileNotFoundError:
+                continue
+            with f, zip_file.open(path, mode='w') as entry:
+                for chunk in f.chunks(chunk_size):
+                    entry.write(chunk)
+                    data = buffer.pop()
+                    if data:
+                        yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    # Central directory
+    yield buffer.pop()
+
+
+def tee_to_file(chunks: Iterable[bytes], file_path: str) -> Iterator[bytes]:
+    """
+    Yields chunks and writes them to the file at the same time. File
+    appears under the *file_path* only if the stream was fully consumed.
+    """
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,4 +1,3 @@
-import os
 from abc import ABC, abstractmethod
 
 from nbformat.validator import NotebookValidationError
@@ -10,8 +9,9 @@ from django.http import (
 from django.views import generic
 
 from auth.mixins import PermissionRequiredMixin
+from files.renditions import create_html_rendition, get_html_rendition, is_ipynb_file
 from files.response import XAccelRedirectFileResponse
-from files.utils import convert_ipynb_to_html
+from files.utils import ConvertError
 
 
 class ProtectedFileDownloadView(ABC, PermissionRequiredMixin, generic.View):
@@ -22,6 +22,9 @@ class ProtectedFileDownloadView(ABC, PermissionRequiredMixin, generic.View):
     Supports S3 for the remotely stored files and file system storage for
     the locally stored. Local files are distributed by nginx `X-Accel-Redirect`
     feature.
+
+    Notebooks are returned as html if `?html=1` is provided, see
+    `files.renditions`.
     """
     @property
     @abstractmethod
@@ -52,38 +55,40 @@ class ProtectedFileDownloadView(ABC, PermissionRequiredMixin, generic.View):
         if file_field is None:
             return HttpResponseNotFound()
 
-        # FIXME: preprocess ipynb files and save locally or in S3!
-        if settings.USE_CLOUD_STORAGE:
-            signed_url = file_field.url
-            if getattr(settings, "PROXYING_REMOTE_FILES", False):
-                from urllib.parse import urlparse
-                protocol = urlparse(signed_url).scheme
-                url = signed_url.replace(protocol + '://', '')
-                remote_file_location = f'/remote-files/{protocol}/{url}'
-                content_disposition = 'attachment'
-                return XAccelRedirectFileResponse(remote_file_location,
-                                                  content_disposition)
-            else:
-                return HttpResponseRedirect(redirect_to=signed_url)
-        else:
-            return self.get_local_private_file(file_field)
-
-    def get_local_private_file(self, file_field):
-        media_file_uri = file_field.url
         content_disposition = 'attachment'
-        # Convert *.ipynb to html
-        if self.request.GET.get("html", False):
-            _, ext = os.path.splitext(media_file_uri)
-            if ext == ".ipynb":
-                ipynb_src_path = file_field.path
-                html_ext = ".html"
-                html_dest_path = ipynb_src_path + html_ext
+        file_name = file_field.name
+        # Notebooks are converted to html in background after uploading
+        if self.request.GET.get("html", False) and is_ipynb_file(file_field):
+            rendition_name = get_html_rendition(file_field)
+            if rendition_name is None:
                 try:
-                    exported = convert_ipynb_to_html(ipynb_src_path,
-                                                     html_dest_path)
+                    rendition_name = create_html_rendition(file_field)
                 except NotebookValidationError as e:
                     return HttpResponseBadRequest(e.message)
-                if exported:
-                    media_file_uri = media_file_uri + html_ext
-                    content_disposition = 'inline'
+                except ConvertError:
+                    return HttpResponseNotFound()
+            file_name = rendition_name
+            content_disposition = 'inline'
+        return self.serve_file(file_field.storage, file_name,
+                               content_disposition)
+
+    def serve_file(self, storage, file_name, content_disposition):
+        return serve_file(storage, file_name, content_disposition)
+
+
+def serve_file(storage, file_name, content_disposition):
+    if settings.USE_CLOUD_STORAGE:
+        signed_url = storage.url(file_name)
+        if getattr(settings, "PROXYING_REMOTE_FILES", False):
+            from urllib.parse import urlparse
+            protocol = urlparse(signed_url).scheme
+            url = signed_url.replace(protocol + '://', '')
+            remote_file_location = f'/remote-files/{protocol}/{url}'
+            return XAccelRedirectFileResponse(remote_file_location,
+                                              content_disposition)
+        else:
+            return HttpResponseRedirect(redirect_to=signed_url)
+    else:
+        # Local files are distributed by nginx
+        media_file_uri = storage.url(file_name)
         return XAccelRedirectFileResponse(media_file_uri, content_disposition)
@@ -3,7 +3,7 @@ import re
 from dataclasses import dataclass
 from decimal import ROUND_DOWN, Decimal
 from enum import Enum, IntEnum
-from typing import Iterator, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Union
 
 import requests
 
@@ -241,6 +241,21 @@ class YandexContestAPI:
         logger.debug("Meta data: {}".format(data))
         return data
 
+    def submissions_details(self, contest_id, run_ids: List[int],
+                            timeout: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """
+        Returns full reports (like `submission_details(full=True)`) for
+        all given runs with a single request.
+        """
+        headers = self.base_headers
+        url = self.SUBMISSIONS_URL.format(contest_id=contest_id) + '/multiple'
+        response = self.request_and_check(url, "get", headers=headers,
+                                          params={'runIds': run_ids},
+                                          timeout=timeout)
+        data = response.json()
+        logger.debug("Meta data: {}".format(data))
+        return data
+
     def add_submission(self, contest_id, timeout=3, files=None, **params):
         headers = {
             **self.base_headers,
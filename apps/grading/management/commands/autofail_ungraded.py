@@ -2,10 +2,9 @@ import logging
 
 from django.core.management import BaseCommand
 
-from courses.constants import SemesterTypes
-from courses.models import Semester
-from learning.models import Enrollment
-from learning.settings import GradeTypes
+from learning.services.enrollment_service import (
+    fail_ungraded_enrollments, get_ungraded_enrollments
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,19 +20,9 @@ class Command(BaseCommand):
                                                                     'semesters')
 
     def handle(self, *args, **options):
-        site = options["site"]
-        enrollments = Enrollment.objects.select_related("student_profile__branch__site", "course__semester")
-        current_term = Semester.get_current()
-        if options['prev_sem']:
-            term = Semester.objects.get(year=2020, type=SemesterTypes.AUTUMN)
-            enrollments = enrollments.filter(grade=GradeTypes.NOT_GRADED,
-                                course__semester__gte=term,
-                                course__semester__lt=current_term,
-                                student_profile__branch__site__domain=site)
-        else:
-            enrollments = enrollments.filter(grade=GradeTypes.NOT_GRADED,
-                                             course__semester=current_term,
-                                             student_profile__branch__site__domain=site)
-            logger.info(f"Change grades of {current_term} enrollments from Not Graded to Unsatisfactory")
-        graded = enrollments.update(grade=GradeTypes.UNSATISFACTORY)
+        enrollments = get_ungraded_enrollments(options["site"],
+                                               previous_terms=options['prev_sem'])
+        if not options['prev_sem']:
+            logger.info("Change grades of current term enrollments from Not Graded to Unsatisfactory")
+        graded = fail_ungraded_enrollments(enrollments)
         return str(graded)
@@ -1,12 +1,19 @@
 import logging
+import time
+from collections import defaultdict
 from datetime import timedelta
-from typing import Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
 import django_rq
 from django_rq import job
 
+from django.apps import apps
 from django.db import transaction
+from django.utils import timezone
 
+from core.utils import chunks
+from courses.constants import AssignmentFormat
 from grading.api.yandex_contest import (
     ContestAPIError, SubmissionVerdict, Unavailable, YandexContestAPI
 )
@@ -19,6 +26,22 @@ from grading.utils import YandexContestScoreSource
 
 logger = logging.getLogger(__name__)
 
+# Only one poller job is scheduled at a time, this key is set while
+# the next run is waiting in the scheduler
+YANDEX_CONTEST_POLLER_KEY = 'grading.yandex_contest.poller'
+# Hash with polling state of each contest:
+#   <contest_id> -> <next poll timestamp>:<polling interval in seconds>
+YANDEX_CONTEST_POLLING_STATE_KEY = 'grading.yandex_contest.polling'
+YANDEX_CONTEST_POLLER_TICK = timedelta(seconds=15)
+# Polling interval of the contest is doubled each time no new verdicts
+# are received and reset to the minimum as soon as they are
+YANDEX_CONTEST_POLL_MIN_INTERVAL = 15
+YANDEX_CONTEST_POLL_MAX_INTERVAL = 5 * 60
+YANDEX_CONTEST_UNAVAILABLE_INTERVAL = 10 * 60
+# Remote check is considered as failed if verdict is not ready in time
+YANDEX_CONTEST_CHECK_TIMEOUT = timedelta(hours=1)
+YANDEX_CONTEST_RUNS_PER_REQUEST = 100
+
 
 def get_submission(submission_id) -> Optional["Submission"]:
     from grading.models import Submission
@@ -90,7 +113,7 @@ def add_new_submission_to_checking_system(submission_id: int, *, retries: int) -
     4. If the verification system is unavailable, the function schedules a retry after 10 minutes.
     5. In case of an API error (for example, duplicate sending), updates the sending status and logs the error.
     6. Upon successful sending, it updates the metadata and the status of sending to "CHECKING".
-    7. Schedules a task to monitor the verification status after 15 seconds.
+    7. Makes sure the periodic job that polls verdicts is scheduled.
 
     Parameters:
     ----------
@@ -171,13 +194,9 @@ def add_new_submission_to_checking_system(submission_id: int, *, retries: int) -
         if submission_status in [SubmissionStatus.SUBMIT_FAIL, SubmissionStatus.RETRY]:
             return submission.meta['verdict']
 
-        scheduler = django_rq.get_scheduler('default')
-        scheduler.enqueue_in(timedelta(seconds=15),
-                             monitor_submission_status_in_yandex_contest,
-                             submission_id,
-                             json_data['runId'],
-                             delay_min=1)
-    
+        # Verdicts are pulled in bulk by the contest poller
+        schedule_yandex_contest_poller()
+
     except Exception as e:
         logger.exception(f"Failed e={e!r}")
         submission.status = SubmissionStatus.SUBMIT_FAIL
@@ -186,6 +205,20 @@ def add_new_submission_to_checking_system(submission_id: int, *, retries: int) -
         return submission.meta['verdict']
 
 
+def clean_submission_report(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    # TODO: Investigate how to escape html and store it in json
+    # TODO: g.e. look at encoders in simplejson
+    json_data.pop("source", None)
+    json_data.pop("diff", None)
+    if "checkerLog" in json_data:
+        # Output could contain null character \u0000 which is not valid for
+        # the postgres jsonb field type
+        for row in json_data["checkerLog"]:
+            row.pop("input", None)
+            row.pop("output", None)
+    return json_data
+
+
 @job('default')
 def monitor_submission_status_in_yandex_contest(submission_id: int,
                                                 remote_submission_id: int,
@@ -261,16 +294,7 @@ def monitor_submission_status_in_yandex_contest(submission_id: int,
             submission.save(update_fields=['meta', 'status'])
             return submission.meta['verdict']
 
-        # TODO: Investigate how to escape html and store it in json
-        # TODO: g.e. look at encoders in simplejson
-        json_data.pop("source", None)
-        json_data.pop("diff", None)
-        if "checkerLog" in json_data:
-            # Output could contain null character \u0000 which is not valid for
-            # the postgres jsonb field type
-            for row in json_data["checkerLog"]:
-                row.pop("input", None)
-                row.pop("output", None)
+        clean_submission_report(json_data)
 
         with transaction.atomic():
             submission.meta = json_data
@@ -285,3 +309,180 @@ def monitor_submission_status_in_yandex_contest(submission_id: int,
         submission.meta['verdict'] = str(_("Inner fail"))
         submission.save(update_fields=['meta', 'status'])
         return submission.meta['verdict']
+
+
+def schedule_yandex_contest_poller(delay: timedelta = YANDEX_CONTEST_POLLER_TICK) -> None:
+    """Schedules the next run of the poller unless it's already scheduled."""
+    redis_client = django_rq.get_connection('default')
+    # Key expires in case scheduled job was lost
+    expire = int(delay.total_seconds()) + YANDEX_CONTEST_UNAVAILABLE_INTERVAL
+    if redis_client.set(YANDEX_CONTEST_POLLER_KEY, 1, nx=True, ex=expire):
+        scheduler = django_rq.get_scheduler('default')
+        scheduler.enqueue_in(delay, poll_yandex_contest_submissions)
+
+
+def get_pending_yandex_contest_submissions() -> Dict[Tuple[str, int], List[Submission]]:
+    """
+    Returns submissions waiting for the verdict grouped by
+    (access token, contest id).
+    """
+    checker_path = "assignment_submission__student_assignment__assignment__checker"
+    queryset = (Submission.objects
+                .filter(status=SubmissionStatus.CHECKING,
+                        meta__has_key='runId',
+                        **{f"{checker_path}__checking_system__type": CheckingSystemTypes.YANDEX_CONTEST})
+                .select_related(f"{checker_path}__checking_system")
+                .order_by('pk'))
+    pending = defaultdict(list)
+    for submission in queryset:
+        checker = submission.checker
+        access_token = checker.checking_system.settings['access_token']
+        pending[(access_token, checker.settings['contest_id'])].append(submission)
+    return pending
+
+
+def _fetch_contest_verdicts(api: YandexContestAPI, contest_id: int,
+                            submissions: List[Submission]) -> List[Submission]:
+    """
+    Pulls reports of all pending runs of the contest and returns
+    submissions with the final status.
+    """
+    runs = {int(s.meta['runId']): s for s in submissions}
+    reports = []
+    finished = []
+    for run_ids in chunks(list(runs), YANDEX_CONTEST_RUNS_PER_REQUEST):
+        run_ids = [run_id for run_id in run_ids if run_id is not None]
+        try:
+            reports.extend(api.submissions_details(contest_id, run_ids, timeout=10))
+        except ContestAPIError as e:
+            # Server errors are temporary, try again later
+            if e.code >= 500:
+                raise Unavailable() from e
+            logger.error(f"Yandex.Contest api request error [{contest_id=}] {e.code=} {e.message=}")
+            # Only runs of the failed request are affected
+            for run_id in run_ids:
+                submission = runs.pop(run_id)
+                submission.status = SubmissionStatus.FAILED
+                submission.meta = {"verdict": e.message}
+                finished.append(submission)
+    for json_data in reports:
+        submission = runs.pop(int(json_data['runId']), None)
+        if submission is None or json_data['verdict'] == 'No report':
+            continue
+        submission.meta = clean_submission_report(json_data)
+        if json_data['verdict'] == SubmissionVerdict.OK.value:
+            submission.status = SubmissionStatus.PASSED
+        else:
+            submission.status = SubmissionStatus.FAILED
+        finished.append(submission)
+    started_before = timezone.now() - YANDEX_CONTEST_CHECK_TIMEOUT
+    for run_id, submission in runs.items():
+        if submission.modified_at < started_before:
+            logger.error(f"Remote runId={run_id} check for local submission {submission.pk} has failed!")
+            submission.status = SubmissionStatus.SUBMIT_FAIL
+            submission.meta = {"verdict": str(_("Remote check for local submission has failed!"))}
+            finished.append(submission)
+    return finished
+
+
+def _upload_code_review_submissions(submissions: List[Submission]) -> None:
+    """
+    Bulk update doesn't send `post_save` signal, upload passed solutions
+    to gerrit the same way `add_submission_to_checking_system` does.
+    """
+    if not apps.is_installed("code_reviews"):
+        return
+    from code_reviews.gerrit.tasks import upload_attachment_to_gerrit
+    for submission in submissions:
+        if submission.status != SubmissionStatus.PASSED:
+            continue
+        assignment_submission = submission.assignment_submission
+        submission_type = assignment_submission.student_assignment.assignment.submission_type
+        if submission_type == AssignmentFormat.CODE_REVIEW:
+            upload_func = partial(upload_attachment_to_gerrit.delay,
+                                  assignment_submission.pk)
+            transaction.on_commit(upload_func)
+
+
+def _poll_yandex_contest_submissions(redis_client) -> Tuple[List[Submission], bool]:
+    """
+    Returns submissions with the final status and flag whether there are
+    submissions still waiting for the verdict.
+    """
+    pending = get_pending_yandex_contest_submissions()
+    polling_state = {}
+    for field, value in redis_client.hgetall(YANDEX_CONTEST_POLLING_STATE_KEY).items():
+        next_poll_at, interval = value.decode().split(':')
+        polling_state[int(field)] = (float(next_poll_at), int(interval))
+    now = time.time()
+    finished = []
+    new_polling_state = {}
+    for (access_token, contest_id), submissions in pending.items():
+        next_poll_at, interval = polling_state.get(
+            contest_id, (now, YANDEX_CONTEST_POLL_MIN_INTERVAL))
+        if next_poll_at > now:
+            new_polling_state[contest_id] = (next_poll_at, interval)
+            continue
+        api = YandexContestAPI(access_token=access_token,
+                               refresh_token=access_token)
+        try:
+            contest_finished = _fetch_contest_verdicts(api, contest_id, submissions)
+        except Unavailable:
+            logger.info(f"Remote server is unavailable. Repeat polling "
+                        f"contest {contest_id} in 10 minutes.")
+            interval = YANDEX_CONTEST_UNAVAILABLE_INTERVAL
+        except Exception as e:
+            logger.exception(f"Failed to poll contest {contest_id}: {e!r}")
+            interval = YANDEX_CONTEST_UNAVAILABLE_INTERVAL
+        else:
+            if contest_finished:
+                interval = YANDEX_CONTEST_POLL_MIN_INTERVAL
+            else:
+                interval = min(2 * interval, YANDEX_CONTEST_POLL_MAX_INTERVAL)
+            finished.extend(contest_finished)
+        new_polling_state[contest_id] = (now + interval, interval)
+
+    if finished:
+        modified_at = timezone.now()
+        for submission in finished:
+            submission.modified_at = modified_at
+        with transaction.atomic():
+            Submission.objects.bulk_update(finished, ['status', 'meta', 'modified_at'])
+            _upload_code_review_submissions(finished)
+
+    # Forget about contests without pending submissions
+    finished_ids = {submission.pk for submission in finished}
+    mapping = {}
+    for (access_token, contest_id), submissions in pending.items():
+        if any(s.pk not in finished_ids for s in submissions):
+            next_poll_at, interval = new_polling_state[contest_id]
+            mapping[contest_id] = f"{next_poll_at}:{interval}"
+    pipe = redis_client.pipeline()
+    pipe.delete(YANDEX_CONTEST_POLLING_STATE_KEY)
+    if mapping:
+        pipe.hset(YANDEX_CONTEST_POLLING_STATE_KEY, mapping=mapping)
+        pipe.expire(YANDEX_CONTEST_POLLING_STATE_KEY, 3600 * 24)
+    pipe.execute()
+    return finished, bool(mapping)
+
+
+@job('default')
+def poll_yandex_contest_submissions() -> str:
+    """
+    Pulls verdicts of all submissions in the checking state with one
+    request per contest (per chunk of runs) and saves them with a single
+    bulk update. Each contest is polled with its own interval which grows
+    while there are no new verdicts. Job reschedules itself while there
+    are pending submissions.
+    """
+    redis_client = django_rq.get_connection('default')
+    redis_client.delete(YANDEX_CONTEST_POLLER_KEY)
+    # Poller must not stop on unexpected errors while there are pending
+    # submissions
+    reschedule = True
+    try:
+        finished, reschedule = _poll_yandex_contest_submissions(redis_client)
+    finally:
+        if reschedule:
+            schedule_yandex_contest_poller()
+    return f"Updated {len(finished)} submissions"
@@ -3,10 +3,9 @@ import pytest
 from unittest.mock import MagicMock
 from datetime import timedelta
 
-from pytest_mock import mocker
 from apps.core.timezone.utils import now_local
 from grading.api.yandex_contest import ContestAPIError, SubmissionVerdict, Unavailable
-from apps.grading.tasks import add_new_submission_to_checking_system, monitor_submission_status_in_yandex_contest
+from apps.grading.tasks import add_new_submission_to_checking_system, monitor_submission_status_in_yandex_contest, poll_yandex_contest_submissions
 from apps.grading.tests.factories import CheckerFactory, SubmissionFactory
 from grading.constants import SubmissionStatus
 
@@ -15,6 +14,7 @@ from grading.constants import SubmissionStatus
 def test_add_new_submission_success(mocker):
     mocked_add_submission = mocker.patch("grading.api.yandex_contest.YandexContestAPI.add_submission")
     mocked_django_rq = mocker.patch("django_rq.get_scheduler")
+    mocked_redis = mocker.patch("django_rq.get_connection")
     mocked_add_submission.return_value = {"runId": "456"}
     mocked_django_rq.return_value = MagicMock()
     submission = SubmissionFactory(status=SubmissionStatus.PASSED,
@@ -32,7 +32,12 @@ def test_add_new_submission_success(mocker):
     result = add_new_submission_to_checking_system(submission.pk, retries=3)
     assert result == None
     mocked_add_submission.assert_called_once()
-    mocked_django_rq.return_value.enqueue_in.assert_called_once_with(timedelta(seconds=15), monitor_submission_status_in_yandex_contest, submission.pk, "456", delay_min=1)
+    mocked_django_rq.return_value.enqueue_in.assert_called_once_with(timedelta(seconds=15), poll_yandex_contest_submissions)
+    # Poller is already scheduled
+    mocked_redis.return_value.set.return_value = False
+    mocked_django_rq.return_value.enqueue_in.reset_mock()
+    add_new_submission_to_checking_system(submission.pk, retries=3)
+    assert not mocked_django_rq.return_value.enqueue_in.called
 
 @pytest.mark.django_db
 def test_add_new_submission_not_found(mocker):
@@ -255,3 +260,102 @@ def test_monitor_submission_no_report_fail(mocker):
 
     result = monitor_submission_status_in_yandex_contest(submission.pk, 456, delay_min=11)
     assert result == "Remote check for local submission has failed!"
+
+
+@pytest.mark.django_db
+def test_poll_yandex_contest_submissions(mocker):
+    mocked_submissions_details = mocker.patch("grading.api.yandex_contest.YandexContestAPI.submissions_details")
+    mocked_django_rq = mocker.patch("django_rq.get_scheduler")
+    mocked_redis = mocker.patch("django_rq.get_connection")
+    mocked_redis.return_value.hgetall.return_value = {}
+    checker = CheckerFactory(settings={'contest_id': 15, 'problem_id': 'A'})
+    submissions = SubmissionFactory.create_batch(3, status=SubmissionStatus.CHECKING)
+    for i, submission in enumerate(submissions, start=1):
+        assignment = submission.assignment_submission.student_assignment.assignment
+        assignment.checker = checker
+        assignment.save()
+        submission.meta = {"runId": i}
+        submission.save(update_fields=['meta'])
+    submission1, submission2, submission3 = submissions
+    mocked_submissions_details.return_value = [
+        {"runId": 1, "verdict": SubmissionVerdict.OK.value, "source": "code"},
+        {"runId": 2, "verdict": SubmissionVerdict.WA.value,
+         "checkerLog": [{"verdict": SubmissionVerdict.WA.value, "input": "1", "output": "2"}]},
+        {"runId": 3, "verdict": "No report"},
+    ]
+
+    result = poll_yandex_contest_submissions()
+
+    assert result == "Updated 2 submissions"
+    mocked_submissions_details.assert_called_once_with(15, [1, 2, 3], timeout=10)
+    submission1.refresh_from_db()
+    assert submission1.status == SubmissionStatus.PASSED
+    assert "source" not in submission1.meta
+    submission2.refresh_from_db()
+    assert submission2.status == SubmissionStatus.FAILED
+    assert submission2.meta["checkerLog"] == [{"verdict": SubmissionVerdict.WA.value}]
+    submission3.refresh_from_db()
+    assert submission3.status == SubmissionStatus.CHECKING
+    # Contest with new verdicts is polled with the minimal interval
+    pipe = mocked_redis.return_value.pipeline.return_value
+    mapping = pipe.hset.call_args.kwargs['mapping']
+    next_poll_at, interval = mapping[15].split(':')
+    assert interval == '15'
+    mocked_django_rq.return_value.enqueue_in.assert_called_once_with(timedelta(seconds=15), poll_yandex_contest_submissions)
+    # Interval grows while there are no new verdicts
+    mocked_django_rq.return_value.enqueue_in.reset_mock()
+    mocked_submissions_details.return_value = [{"runId": 3, "verdict": "No report"}]
+    assert poll_yandex_contest_submissions() == "Updated 0 submissions"
+    mapping = pipe.hset.call_args.kwargs['mapping']
+    assert mapping[15].split(':')[1] == '30'
+    # Skip contest until the next poll time
+    mocked_submissions_details.reset_mock()
+    mocked_redis.return_value.hgetall.return_value = {b'15': mapping[15].encode()}
+    poll_yandex_contest_submissions()
+    assert not mocked_submissions_details.called
+    # Nothing to poll
+    mocked_redis.return_value.hgetall.return_value = {}
+    mocked_submissions_details.return_value = [{"runId": 3, "verdict": SubmissionVerdict.OK.value}]
+    mocked_django_rq.return_value.enqueue_in.reset_mock()
+    assert poll_yandex_contest_submissions() == "Updated 1 submissions"
+    assert not mocked_django_rq.return_value.enqueue_in.called
+
+
+@pytest.mark.django_db
+def test_poll_yandex_contest_submissions_errors(mocker):
+    mocker.patch("apps.grading.tasks.YANDEX_CONTEST_RUNS_PER_REQUEST", 2)
+    mocked_submissions_details = mocker.patch("grading.api.yandex_contest.YandexContestAPI.submissions_details")
+    mocked_django_rq = mocker.patch("django_rq.get_scheduler")
+    mocked_redis = mocker.patch("django_rq.get_connection")
+    mocked_redis.return_value.hgetall.return_value = {}
+    checker = CheckerFactory(settings={'contest_id': 15, 'problem_id': 'A'})
+    submissions = SubmissionFactory.create_batch(3, status=SubmissionStatus.CHECKING)
+    for i, submission in enumerate(submissions, start=1):
+        assignment = submission.assignment_submission.student_assignment.assignment
+        assignment.checker = checker
+        assignment.save()
+        submission.meta = {"runId": i}
+        submission.save(update_fields=['meta'])
+    submission1, submission2, submission3 = submissions
+    # Client error fails only runs of the failed request
+    mocked_submissions_details.side_effect = [
+        [{"runId": 1, "verdict": SubmissionVerdict.OK.value},
+         {"runId": 2, "verdict": "No report"}],
+        ContestAPIError(code=400, message="Bad request"),
+    ]
+    assert poll_yandex_contest_submissions() == "Updated 2 submissions"
+    submission1.refresh_from_db()
+    assert submission1.status == SubmissionStatus.PASSED
+    submission2.refresh_from_db()
+    assert submission2.status == SubmissionStatus.CHECKING
+    submission3.refresh_from_db()
+    assert submission3.status == SubmissionStatus.FAILED
+    assert submission3.meta == {"verdict": "Bad request"}
+    mocked_django_rq.return_value.enqueue_in.assert_called_once()
+    # Unexpected error doesn't stop the poller
+    mocked_django_rq.return_value.enqueue_in.reset_mock()
+    mocked_submissions_details.side_effect = ValueError
+    assert poll_yandex_contest_submissions() == "Updated 0 submissions"
+    submission2.refresh_from_db()
+    assert submission2.status == SubmissionStatus.CHECKING
+    mocked_django_rq.return_value.enqueue_in.assert_called_once()
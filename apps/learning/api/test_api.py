@@ -254,3 +254,41 @@ def test_api_view_personal_assignment_output_serializer(lms_resolver, django_cap
     assert json_data['solution_at'] == serialize_dt(student_assignment.stats['solutions']['last'])
     assert student_assignment.stats['solutions']['last'] != student_assignment.stats['solutions']['first']
 
+
+
+@pytest.mark.django_db
+def test_api_view_check_queue(client, django_capture_on_commit_callbacks):
+    teacher = TeacherFactory()
+    course = CourseFactory(teachers=[teacher])
+    course_teacher = CourseTeacher.objects.get(course=course, teacher=teacher)
+    url = reverse('learning-api:v1:check_queue', kwargs={
+        'course_id': course.pk
+    })
+    auth_token = client.get_api_token(teacher)
+    with django_capture_on_commit_callbacks(execute=True):
+        enrollment1, enrollment2, enrollment3 = EnrollmentFactory.create_batch(3, course=course)
+        assignment = AssignmentFactory(course=course)
+        StudentAssignmentFactory()  # Personal assignment from another course
+    student_assignment1, student_assignment2, student_assignment3 = (
+        StudentAssignment.objects.filter(assignment=assignment).order_by('pk'))
+    response = client.get(url, {'limit': 2}, HTTP_AUTHORIZATION=f'Token {auth_token}')
+    assert response.status_code == 200
+    data = response.json()
+    assert [sa['id'] for sa in data['results']] == [student_assignment1.pk,
+                                                    student_assignment2.pk]
+    assert data['next'] == student_assignment2.pk
+    response = client.get(url, {'limit': 2, 'after': data['next']},
+                          HTTP_AUTHORIZATION=f'Token {auth_token}')
+    data = response.json()
+    assert [sa['id'] for sa in data['results']] == [student_assignment3.pk]
+    assert data['next'] is None
+    # Items are maintained on changes
+    with django_capture_on_commit_callbacks(execute=True):
+        student_assignment1.assignee = course_teacher
+        student_assignment1.save()
+        student_assignment2.delete()
+    response = client.get(url, {'assignees': 'unset'}, HTTP_AUTHORIZATION=f'Token {auth_token}')
+    assert [sa['id'] for sa in response.json()['results']] == [student_assignment3.pk]
+    response = client.get(url, {'assignees': str(course_teacher.pk)},
+                          HTTP_AUTHORIZATION=f'Token {auth_token}')
+    assert [sa['id'] for sa in response.json()['results']] == [student_assignment1.pk]
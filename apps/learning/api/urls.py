@@ -12,6 +12,7 @@ urlpatterns = [
             path('courses/<int:course_id>/enrollments/', v.CourseStudentsList.as_view(), name='course_enrollments'),
             path('courses/<int:course_id>/personal-assignments/', v.PersonalAssignmentList.as_view(), name='personal_assignments'),
             path('courses/<int:course_id>/personal-assignments/active/', v.TeacherPersonalAssignmentList.as_view(), name='active_personal_assignments'),
+            path('courses/<int:course_id>/check-queue/', v.CheckQueueList.as_view(), name='check_queue'),
             path('courses/<int:course_id>/assignments/<int:assignment_id>/students/<int:student_id>/', v.StudentAssignmentUpdate.as_view(), name='my_course_student_assignment_update'),
             path('courses/<int:course_id>/assignments/<int:assignment_id>/students/<int:student_id>/assignee', v.StudentAssignmentAssigneeUpdate.as_view(), name='my_course_student_assignment_assignee_update'),
         ]))
@@ -33,6 +33,9 @@ from learning.models import (
     CourseNewsNotification, Enrollment, StudentAssignment
 )
 from learning.permissions import EditStudentAssignment, ViewEnrollments
+from learning.services.check_queue_service import (
+    CHECK_QUEUE_MAX_PAGE_SIZE, CHECK_QUEUE_PAGE_SIZE, get_check_queue_items
+)
 from users.models import User
 
 
@@ -181,6 +184,57 @@ class TeacherPersonalAssignmentList(PersonalAssignmentList):
     personal_assignments_function = staticmethod(course_personal_assignments_for_teachers)
 
 
+class CheckQueueList(RolePermissionRequiredMixin, APIBaseView):
+    """
+    Personal assignments of the course for the assignments check queue.
+    Served from the denormalized check queue table, use id of the last
+    personal assignment as `after` value to get the next page.
+    """
+    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    permission_classes = [CreateAssignment]
+    renderer_classes = (CamelCaseJSONRenderer, CamelCaseBrowsableAPIRenderer)
+    course: Course
+
+    class FilterSerializer(serializers.Serializer):
+        assignments = CharSeparatedField(allow_blank=True, required=False)
+        statuses = CharSeparatedField(allow_blank=True, required=False)
+        assignees = CharSeparatedField(allow_blank=True, required=False)
+        student_groups = CharSeparatedField(allow_blank=True, required=False)
+        program_years = CharSeparatedField(allow_blank=True, required=False)
+        after = serializers.IntegerField(required=False)
+        limit = serializers.IntegerField(min_value=1,
+                                         max_value=CHECK_QUEUE_MAX_PAGE_SIZE,
+                                         default=CHECK_QUEUE_PAGE_SIZE)
+
+    class OutputSerializer(PersonalAssignmentList.OutputSerializer):
+        student = serializers.SerializerMethodField()
+
+        def get_student(self, obj: StudentAssignment):
+            data = UserSerializer(obj.student, fields=('id', 'first_name', 'last_name',
+                                                       'patronymic', 'username')).data
+            data['year_of_curriculum'] = obj.check_queue_item.year_of_curriculum
+            return data
+
+    def initial(self, request, *args, **kwargs):
+        self.course = get_object_or_404(Course.objects.get_queryset(), pk=kwargs['course_id'])
+        super().initial(request, *args, **kwargs)
+
+    def get_permission_object(self) -> Course:
+        return self.course
+
+    def get(self, request: AuthenticatedAPIRequest, **kwargs: Any):
+        filters_serializer = self.FilterSerializer(data=request.query_params)
+        filters_serializer.is_valid(raise_exception=True)
+        filters = filters_serializer.validated_data
+        limit = filters['limit']
+        items = get_check_queue_items(course=self.course, filters=filters,
+                                      after=filters.get('after'), limit=limit)
+        personal_assignments = [item.student_assignment for item in items]
+        data = self.OutputSerializer(personal_assignments, many=True).data
+        next_after = items[-1].student_assignment_id if len(items) == limit else None
+        return Response({"results": data, "next": next_after})
+
+
 class StudentAssignmentUpdate(UpdateAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [EditStudentAssignment]
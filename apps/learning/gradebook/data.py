@@ -1,22 +1,24 @@
 from collections import OrderedDict
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, Optional
+from typing import Dict, Iterator, NamedTuple, Optional
 
 import numpy as np
 
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 from django.utils.functional import cached_property
 
-from core.db.utils import normalize_score
+from core.urls import reverse
 from courses.constants import AssignmentStatus
 from courses.models import Assignment, Course
 from learning.models import Enrollment, StudentAssignment, StudentGroup
+from learning.gradebook.matrix import GradebookMatrix
+from learning.managers import EnrollmentQuerySet
 from learning.settings import GradeTypes, EnrollmentTypes
 
-__all__ = ('GradebookStudent', 'GradeBookData', 'gradebook_data',
-           'get_student_assignment_state')
+__all__ = ('GradebookStudent', 'GradebookCell', 'GradeBookData',
+           'gradebook_data', 'get_student_assignment_state')
 
 
 class GradebookStudent:
@@ -82,6 +84,22 @@ class GradebookAssignment:
     assignment: Assignment
 
 
+class GradebookCell(NamedTuple):
+    """
+    Lightweight read-only view of the personal assignment used for
+    rendering and building the gradebook form.
+    """
+    id: int
+    student_id: int
+    assignment: Assignment
+    score: Optional[Decimal]
+    state_display: str
+
+    def get_teacher_url(self):
+        return reverse('teaching:student_assignment_detail',
+                       kwargs={"pk": self.id})
+
+
 class GradeBookData:
     # Magic "100" constant - width of assignment column
     ASSIGNMENT_COLUMN_WIDTH = 100
@@ -90,19 +108,21 @@ class GradeBookData:
                  course: Course,
                  students: Dict[int, GradebookStudent],
                  assignments: Dict[int, GradebookAssignment],
-                 student_assignments: np.ndarray,
+                 matrix: GradebookMatrix,
                  show_weight: bool = False):
         """
-        X-axis of student_assignments ndarray is students data.
+        X-axis of the matrix is students data.
         We make some assertions on that, but still can fail in case
         of NxN array.
         """
         self.course = course
-        assert student_assignments.shape == (len(students), len(assignments))
+        assert matrix.shape == (len(students), len(assignments))
         self.students = students
         self.assignments = assignments
-        self.student_assignments = student_assignments
+        self.matrix = matrix
         self.show_weight = show_weight
+        self._student_ids = list(students)
+        self._assignment_list = [ga.assignment for ga in assignments.values()]
 
     def get_table_width(self):
         # First 4 columns in gradebook table, see `pages/_gradebook.scss`
@@ -126,15 +146,131 @@ class GradeBookData:
         number_of_fields_is_exceeded = (self.number_of_fields > max_number)
         return len(self.students) > 100 or number_of_fields_is_exceeded
 
+    def iter_cells(self, student: GradebookStudent) -> Iterator[Optional[GradebookCell]]:
+        """
+        Yields personal assignments of the student in the assignments order,
+        `None` if student has no record for grading.
+        """
+        row = student.index
+        ids = self.matrix.id[row]
+        state_display = self.matrix.state_display[row]
+        for column, assignment in enumerate(self._assignment_list):
+            if not ids[column]:
+                yield None
+                continue
+            yield GradebookCell(id=int(ids[column]),
+                                student_id=student.id,
+                                assignment=assignment,
+                                score=self.matrix.get_score(row, column),
+                                state_display=str(state_display[column]))
+
+    def _build_personal_assignment(self, row: int,
+                                   column: int) -> Optional[StudentAssignment]:
+        """
+        Creates model instance from the matrix data without hitting the db.
+        Fields that are not stored in the matrix are deferred.
+        """
+        pk = int(self.matrix.id[row, column])
+        if not pk:
+            return None
+        assignment = self._assignment_list[column]
+        values = {
+            "id": pk,
+            "assignment_id": assignment.pk,
+            "student_id": self._student_ids[row],
+            "status": self.matrix.get_status(row, column),
+            "score": self.matrix.get_score(row, column),
+            "penalty": self.matrix.get_penalty(row, column),
+        }
+        field_names = [f.attname for f in StudentAssignment._meta.concrete_fields
+                       if f.attname in values]
+        instance = StudentAssignment.from_db(StudentAssignment.objects.db,
+                                             field_names,
+                                             [values[f] for f in field_names])
+        instance.assignment = assignment
+        return instance
+
+    @cached_property
+    def student_assignments(self) -> np.ndarray:
+        """
+        Matrix of `StudentAssignment` model instances. Prefer columnar data
+        or `.iter_cells()` since instantiating models is expensive.
+        """
+        student_assignments = np.empty(self.matrix.shape, dtype=object)
+        rows, columns = np.nonzero(self.matrix.exists)
+        for row, column in zip(rows, columns):
+            student_assignments[row][column] = self._build_personal_assignment(row, column)
+        return student_assignments
+
     def get_personal_assignment(self, student_id: int,
-                                assignment_id: int) -> StudentAssignment:
+                                assignment_id: int) -> Optional[StudentAssignment]:
         student_index = self.students[student_id].index
         assignment_index = self.assignments[assignment_id].index
-        return self.student_assignments[student_index][assignment_index]
+        return self._build_personal_assignment(student_index, assignment_index)
+
+
+def get_gradebook_enrollments(course: Course,
+                              student_group: Optional[int] = None) -> EnrollmentQuerySet:
+    """Returns active enrollments in the gradebook order."""
+    course_enrollments = (Enrollment.active
+                          .filter(course=course)
+                          .can_submit_assignments())
+    if student_group is not None:
+        course_enrollments = course_enrollments.filter(student_group=student_group)
+    return (course_enrollments
+            .select_related("student",
+                            "student__yandex_data",
+                            "student_profile__branch",
+                            "student_profile__invitation",
+                            "student_group")
+            .order_by("student__last_name", "pk"))
 
 
-def gradebook_data(course: Course, student_group: Optional[int] = None) -> GradeBookData:
+def get_gradebook_assignments(course: Course,
+                              student_group: Optional[int] = None) -> QuerySet:
+    """Returns course assignments in the gradebook columns order."""
+    queryset = Assignment.objects.filter(course_id=course.pk)
+    if student_group is not None:
+        queryset = queryset.filter(
+            Q(assignmentgroup__group=student_group) |
+            Q(assignmentgroup__group__isnull=True)
+        )
+    return (queryset
+            .only("pk",
+                  "title",
+                  # Assignment constructor caches course id
+                  "course_id",
+                  "submission_type",
+                  "maximum_score",
+                  "passing_score",
+                  "weight")
+            .order_by("deadline_at", "pk"))
+
+
+def get_gradebook_personal_assignments(course: Course,
+                                       student_group: Optional[int] = None) -> QuerySet:
+    """
+    Returns (student_id, assignment_id, id, score, penalty, status) rows
+    of personal assignments data.
+    """
+    filters = [Q(assignment__course_id=course.pk)]
+    if student_group is not None:
+        filters.append(Q(assignment__assignmentgroup__group=student_group) |
+                       Q(assignment__assignmentgroup__group__isnull=True))
+    return (StudentAssignment.objects
+            .filter(*filters)
+            .values_list("student_id", "assignment_id", "pk", "score",
+                         "penalty", "status")
+            .order_by())
+
+
+def gradebook_data(course: Course, student_group: Optional[int] = None, *,
+                   offset: int = 0, limit: Optional[int] = None) -> GradeBookData:
     """
+    Set *offset* and *limit* to collect a window of students (gradebook
+    rows), all assignments are collected anyway since they are needed to
+    calculate total score.
+
     Returns:
         students = OrderedDict(
             1: GradebookStudent(
@@ -152,98 +288,48 @@ def gradebook_data(course: Course, student_group: Optional[int] = None) -> Grade
             1: GradebookAssignment(...)
             ...
         ),
-        student_assignments = [
-            [
-                    {
-                        "id" : 1,  # student_assignment_id
-                        "score": 5
-                    },
-                    {
-                        "id" : 3,
-                        "score": 2
-                    },
-                    None  # if student left the course or was expelled
-                          # and has no record for grading
-            ],
-            [ ... ]
-        ]
+        matrix = GradebookMatrix(...)  # numeric arrays of personal
+                                       # assignments data, zero id if
+                                       # student left the course or was
+                                       # expelled and has no record for grading
     """
     # Collect active enrollments
     enrolled_students = OrderedDict()
-    course_enrollments = (Enrollment.active
-                          .filter(course=course)
-                          .can_submit_assignments())
-    if student_group is not None:
-        course_enrollments = course_enrollments.filter(student_group=student_group)
-    enrollments = (course_enrollments
-                   .select_related("student",
-                                   "student__yandex_data",
-                                   "student_profile__branch",
-                                   "student_profile__invitation",
-                                   "student_group")
-                   .order_by("student__last_name", "pk"))
+    enrollments = get_gradebook_enrollments(course, student_group)
+    if limit is not None:
+        enrollments = enrollments[offset:offset + limit]
+    elif offset:
+        enrollments = enrollments[offset:]
     for index, e in enumerate(enrollments.iterator()):
         enrolled_students[e.student_id] = GradebookStudent(e, index)
     # Collect course assignments
     assignments = OrderedDict()
-    queryset = Assignment.objects.filter(course_id=course.pk)
-    if student_group is not None:
-        queryset = queryset.filter(
-            Q(assignmentgroup__group=student_group) |
-            Q(assignmentgroup__group__isnull=True)
-        )
-    queryset = (queryset
-                .only("pk",
-                      "title",
-                      # Assignment constructor caches course id
-                      "course_id",
-                      "submission_type",
-                      "maximum_score",
-                      "passing_score",
-                      "weight")
-                .order_by("deadline_at", "pk"))
+    queryset = get_gradebook_assignments(course, student_group)
     for index, a in enumerate(queryset.iterator()):
         assignments[a.pk] = GradebookAssignment(index, assignment=a)
     # Collect students progress
-    student_assignments = np.empty((len(enrolled_students), len(assignments)),
-                                   dtype=object)
-    filters = [Q(assignment__course_id=course.pk)]
-    if student_group is not None:
-        filters.append(Q(assignment__assignmentgroup__group=student_group) |
-                       Q(assignment__assignmentgroup__group__isnull=True))
-    queryset = (StudentAssignment.objects
-                .filter(*filters)
-                .only("pk",
-                      "score",
-                      "penalty",
-                      "status",
-                      "meta",
-                      "assignment_id",
-                      "student_id")
-                .order_by("student_id", "assignment_id"))
-    for student_assignment in queryset.iterator():
-        student_id = student_assignment.student_id
+    matrix = GradebookMatrix([ga.assignment for ga in assignments.values()],
+                             number_of_students=len(enrolled_students))
+    queryset = get_gradebook_personal_assignments(course, student_group)
+    if limit is not None or offset:
+        queryset = queryset.filter(student_id__in=list(enrolled_students))
+    rows = []
+    for student_id, assignment_id, *values in queryset.iterator():
         if student_id not in enrolled_students:
             continue
         student_index = enrolled_students[student_id].index
-        gradebook_assignment = assignments[student_assignment.assignment_id]
-        student_assignment.assignment = gradebook_assignment.assignment
-        student_assignments[student_index][gradebook_assignment.index] = student_assignment
+        assignment_index = assignments[assignment_id].index
+        rows.append((student_index, assignment_index, *values))
+    matrix.fill(rows)
     # Aggregate student total score
-    for student_id in enrolled_students:
-        gradebook_student = enrolled_students[student_id]
-        student_progress = student_assignments[gradebook_student.index]
-        total_score = Decimal(0)
-        for s in student_progress:
-            if s is not None and s.final_score is not None:
-                total_score += s.weighted_final_score
-        total_score = normalize_score(total_score)
+    for gradebook_student in enrolled_students.values():
+        total_score = matrix.get_total_score(gradebook_student.index)
         setattr(gradebook_student, "total_score", total_score)
     show_weight = any(ga.assignment.weight < 1 for ga in assignments.values())
     return GradeBookData(course=course,
                          students=enrolled_students,
                          assignments=assignments,
-                         student_assignments=student_assignments,
+                         matrix=matrix,
                          show_weight=show_weight)
 
 
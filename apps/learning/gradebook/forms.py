@@ -1,5 +1,5 @@
 from collections import namedtuple
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from django import forms
 from django.conf import settings
@@ -12,7 +12,7 @@ from django.utils.translation import gettext as _
 from core.forms import ScoreField
 from courses.constants import AssignmentFormat
 from courses.models import Assignment
-from learning.gradebook.data import GradeBookData
+from learning.gradebook.data import GradebookCell, GradeBookData
 from learning.models import Course, Enrollment, StudentAssignment
 
 __all__ = ('ConflictError', 'BaseGradebookForm', 'AssignmentScore',
@@ -21,7 +21,7 @@ __all__ = ('ConflictError', 'BaseGradebookForm', 'AssignmentScore',
 from learning.services import StudentGroupService
 from learning.services.enrollment_service import update_enrollment_grade
 from learning.services.personal_assignment_service import (
-    update_personal_assignment_score
+    PersonalAssignmentScoreUpdate, bulk_update_personal_assignment_scores
 )
 from learning.settings import AssignmentScoreUpdateSource, EnrollmentGradeUpdateSource
 from users.models import User
@@ -55,9 +55,14 @@ class BaseGradebookForm(forms.Form):
     @staticmethod
     def is_assignment_widget_enabled(student_assignment: StudentAssignment,
                                      is_readonly: bool) -> bool:
+        return BaseGradebookForm.is_assignment_column_enabled(student_assignment.assignment,
+                                                              is_readonly)
+
+    @staticmethod
+    def is_assignment_column_enabled(assignment: Assignment,
+                                     is_readonly: bool) -> bool:
         if is_readonly:
             return False
-        assignment = student_assignment.assignment
         # Disallow editing yandex contest results with gradebook form,
         # teachers should use import functionality instead
         if assignment.submission_type == AssignmentFormat.YANDEX_CONTEST:
@@ -79,6 +84,7 @@ class BaseGradebookForm(forms.Form):
 
     def save(self, gradebook: GradeBookData, changed_by: User) -> List[ConflictError]:
         errors = []
+        score_updates = {}
         for field_name in self.changed_data:
             if field_name.startswith(self.ASSIGNMENT_SCORE_PREFIX):
                 field: AssignmentScore = self.fields[field_name]
@@ -86,15 +92,9 @@ class BaseGradebookForm(forms.Form):
                                                                        field.assignment_id)
                 score_old = self._get_initial_value(field_name)
                 score_new = self.cleaned_data[field_name]
-                updated, _ = update_personal_assignment_score(student_assignment=student_assignment,
-                                                              changed_by=changed_by,
-                                                              score_old=score_old,
-                                                              score_new=score_new,
-                                                              source=AssignmentScoreUpdateSource.FORM_GRADEBOOK)
-                if not updated:
-                    ce = ConflictError(field_name=field_name,
-                                       unsaved_value=score_new)
-                    errors.append(ce)
+                score_updates[field_name] = PersonalAssignmentScoreUpdate(student_assignment=student_assignment,
+                                                                          score_old=score_old,
+                                                                          score_new=score_new)
             elif field_name.startswith(self.FINAL_GRADE_PREFIX):
                 grade_old = self._get_initial_value(field_name)
                 grade_new = self.cleaned_data[field_name]
@@ -108,6 +108,15 @@ class BaseGradebookForm(forms.Form):
                     ce = ConflictError(field_name=field_name,
                                        unsaved_value=grade_new)
                     errors.append(ce)
+        conflicts = bulk_update_personal_assignment_scores(updates=list(score_updates.values()),
+                                                           changed_by=changed_by,
+                                                           source=AssignmentScoreUpdateSource.FORM_GRADEBOOK)
+        not_saved = {u.student_assignment.pk for u in conflicts}
+        for field_name, update in score_updates.items():
+            if update.student_assignment.pk in not_saved:
+                ce = ConflictError(field_name=field_name,
+                                   unsaved_value=update.score_new)
+                errors.append(ce)
         self._conflicts = bool(errors)
         return errors
 
@@ -156,7 +165,7 @@ class CustomBoundField(BoundField):
 
 class AssignmentScore(ScoreField):
     def __init__(self, assignment: Assignment,
-                 student_assignment: StudentAssignment) -> None:
+                 student_assignment: Union[StudentAssignment, GradebookCell]) -> None:
         score = student_assignment.score
         widget = forms.TextInput(attrs={
             'class': 'cell __assignment __input',
@@ -226,15 +235,17 @@ class GradeBookFormFactory:
                                         len(gradebook.students) > 100 or
                                         is_number_of_fields_exceeded)
 
-        for student_progress in gradebook.student_assignments:
-            for sa in student_progress:
-                # Student has no record for tracking progress after withdrawal
-                if not sa:
-                    continue
-                assignment = sa.assignment
-                if BaseGradebookForm.is_assignment_widget_enabled(sa, is_assignment_score_readonly):
-                    k = BaseGradebookForm.ASSIGNMENT_SCORE_PREFIX + str(sa.id)
-                    fields[k] = AssignmentScore(assignment, sa)
+        enabled_columns = [BaseGradebookForm.is_assignment_column_enabled(ga.assignment,
+                                                                          is_assignment_score_readonly)
+                           for ga in gradebook.assignments.values()]
+        if any(enabled_columns):
+            for gs in gradebook.students.values():
+                for cell, is_enabled in zip(gradebook.iter_cells(gs), enabled_columns):
+                    # Student has no record for tracking progress after withdrawal
+                    if cell is None or not is_enabled:
+                        continue
+                    k = BaseGradebookForm.ASSIGNMENT_SCORE_PREFIX + str(cell.id)
+                    fields[k] = AssignmentScore(cell.assignment, cell)
 
         for gs in gradebook.students.values():
             k = BaseGradebookForm.FINAL_GRADE_PREFIX + str(gs.enrollment_id)
@@ -248,15 +259,14 @@ class GradeBookFormFactory:
     @classmethod
     def transform_to_initial(cls, gradebook: GradeBookData):
         initial = {}
-        for student_progress in gradebook.student_assignments:
-            for student_assignment in student_progress:
+        for gs in gradebook.students.values():
+            for cell in gradebook.iter_cells(gs):
                 # Student has no record for tracking progress after withdrawal
-                if not student_assignment:
+                if cell is None:
                     continue
-                assignment = student_assignment.assignment
-                if not assignment.is_online:
-                    k = BaseGradebookForm.ASSIGNMENT_SCORE_PREFIX + str(student_assignment.id)
-                    initial[k] = student_assignment.score
+                if not cell.assignment.is_online:
+                    k = BaseGradebookForm.ASSIGNMENT_SCORE_PREFIX + str(cell.id)
+                    initial[k] = cell.score
         for gs in gradebook.students.values():
             k = BaseGradebookForm.FINAL_GRADE_PREFIX + str(gs.enrollment_id)
             initial[k] = gs.final_grade
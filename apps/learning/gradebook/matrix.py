@@ -0,0 +1,170 @@
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from django.utils.functional import cached_property
+
+from core.db.utils import normalize_score
+from courses.constants import AssignmentFormat, AssignmentStatus
+from courses.models import Assignment
+
+__all__ = ('GradebookMatrix', 'to_hundredths', 'from_hundredths')
+
+
+# Status is stored as an index in `AssignmentStatus.values`
+STATUS_CODES = {status: code for code, status in enumerate(AssignmentStatus.values)}
+# Statuses that mean the student has submitted a solution
+HAS_SOLUTION_CODES = [STATUS_CODES[s] for s in (AssignmentStatus.ON_CHECKING,
+                                                AssignmentStatus.NEED_FIXES,
+                                                AssignmentStatus.COMPLETED)]
+EMPTY_STATE = "—"
+HAS_SOLUTION_STATE = "…"
+
+# Personal assignment row as returned by `values_list`
+PersonalAssignmentRow = Tuple[int, int, int, Optional[Decimal],
+                              Optional[Decimal], str]
+
+
+def to_hundredths(value: Decimal) -> int:
+    """
+    Score and weight fields store values with 2 decimal places, keep them
+    as integers to make array arithmetic exact.
+    """
+    return int(value.scaleb(2))
+
+
+def from_hundredths(value: int, exponent: int = 2) -> Decimal:
+    return normalize_score(Decimal(int(value)).scaleb(-exponent))
+
+
+def _format_hundredths(values: np.ndarray) -> np.ndarray:
+    """Vectorized analogue of `str(from_hundredths(value))`."""
+    as_float = values / 100
+    return np.where(values % 100 == 0,
+                    np.char.mod('%d', values // 100),
+                    np.where(values % 10 == 0,
+                             np.char.mod('%.1f', as_float),
+                             np.char.mod('%.2f', as_float)))
+
+
+class GradebookMatrix:
+    """
+    Columnar storage of the personal assignments data. Each cell attribute
+    is a numeric array of shape (number of students, number of assignments),
+    each column attribute is an array of length `number of assignments`.
+
+    Cell without record (e.g. student left the course) has zero `id`.
+    Nullable values are stored with a separate boolean mask.
+    """
+    def __init__(self, assignments: List[Assignment], number_of_students: int):
+        shape = (number_of_students, len(assignments))
+        self.shape = shape
+        self.id = np.zeros(shape, dtype=np.int64)
+        self.score = np.zeros(shape, dtype=np.int64)
+        self.score_isnull = np.ones(shape, dtype=bool)
+        self.penalty = np.zeros(shape, dtype=np.int64)
+        self.penalty_isnull = np.ones(shape, dtype=bool)
+        self.status = np.zeros(shape, dtype=np.int8)
+        # Column attributes
+        self.weight = np.array([to_hundredths(Decimal(a.weight)) for a in assignments],
+                               dtype=np.int64)
+        self.maximum_score = np.array([a.maximum_score for a in assignments],
+                                      dtype=np.int64)
+        self.passing_score = np.array([a.passing_score for a in assignments],
+                                      dtype=np.int64)
+        self.is_penalty = np.array([a.submission_type == AssignmentFormat.PENALTY
+                                    for a in assignments], dtype=bool)
+
+    def fill(self, rows: Iterable[PersonalAssignmentRow]) -> None:
+        """
+        Populates cells with a bulk assignment. Each row is a tuple of
+        (student index, assignment index, id, score, penalty, status).
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        student_index, assignment_index, ids, scores, penalties, statuses = zip(*rows)
+        cells = (np.array(student_index, dtype=np.intp),
+                 np.array(assignment_index, dtype=np.intp))
+        self.id[cells] = ids
+        self.score_isnull[cells] = [s is None for s in scores]
+        self.score[cells] = [0 if s is None else to_hundredths(s) for s in scores]
+        self.penalty_isnull[cells] = [p is None for p in penalties]
+        self.penalty[cells] = [0 if p is None else to_hundredths(p) for p in penalties]
+        self.status[cells] = [STATUS_CODES.get(s, 0) for s in statuses]
+        for attr in ('final_score', 'total_scores', 'state_display'):
+            self.__dict__.pop(attr, None)
+
+    @property
+    def exists(self) -> np.ndarray:
+        return self.id > 0
+
+    @cached_property
+    def final_score(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns sum of score and penalty points (in hundredths) and
+        null mask. See `StudentAssignment.final_score`.
+        """
+        # For `penalty` assignment format negative penalty value is stored
+        # in a score field
+        is_penalty = self.is_penalty[np.newaxis, :]
+        penalty = np.where(self.penalty_isnull, 0, self.penalty)
+        regular = np.where(self.score_isnull, self.penalty, self.score + penalty)
+        regular_isnull = self.score_isnull & self.penalty_isnull
+        values = np.where(is_penalty, -self.score, regular)
+        isnull = np.where(is_penalty, self.score_isnull, regular_isnull)
+        isnull |= ~self.exists
+        return np.where(isnull, 0, values), isnull
+
+    @cached_property
+    def total_scores(self) -> np.ndarray:
+        """
+        Returns weighted sum of final scores for each student
+        in ten-thousandths (hundredths of score x hundredths of weight).
+        """
+        values, _ = self.final_score
+        # Null values are already replaced with zeroes
+        return (values * self.weight[np.newaxis, :]).sum(axis=1, dtype=np.int64)
+
+    def get_total_score(self, student_index: int) -> Decimal:
+        return from_hundredths(self.total_scores[student_index], exponent=4)
+
+    @property
+    def is_passed(self) -> np.ndarray:
+        """Final score is greater or equal to the assignment passing score."""
+        values, isnull = self.final_score
+        return ~isnull & (values >= self.passing_score[np.newaxis, :] * 100)
+
+    @cached_property
+    def state_display(self) -> np.ndarray:
+        """
+        Vectorized analogue of `get_student_assignment_state`. Cells
+        without record have an empty string.
+        """
+        if not self.id.size:
+            return np.full(self.shape, "", dtype=str)
+        _, final_isnull = self.final_score
+        score_display = np.where(self.score_isnull, EMPTY_STATE,
+                                 _format_hundredths(self.score))
+        maximum_score = np.char.mod('/%d', self.maximum_score)[np.newaxis, :]
+        has_solution = np.isin(self.status, HAS_SOLUTION_CODES)
+        state = np.where(final_isnull,
+                         np.where(has_solution, HAS_SOLUTION_STATE, EMPTY_STATE),
+                         np.char.add(score_display.astype(str), maximum_score))
+        return np.where(self.exists, state, "")
+
+    def get_score(self, student_index: int,
+                  assignment_index: int) -> Optional[Decimal]:
+        if self.score_isnull[student_index, assignment_index]:
+            return None
+        return from_hundredths(self.score[student_index, assignment_index])
+
+    def get_penalty(self, student_index: int,
+                    assignment_index: int) -> Optional[Decimal]:
+        if self.penalty_isnull[student_index, assignment_index]:
+            return None
+        return from_hundredths(self.penalty[student_index, assignment_index])
+
+    def get_status(self, student_index: int, assignment_index: int) -> str:
+        return AssignmentStatus.values[self.status[student_index, assignment_index]]
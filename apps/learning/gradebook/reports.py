@@ -0,0 +1,119 @@
+from typing import Any, Iterator, List, Optional
+
+from django.utils.translation import gettext_lazy as _
+
+from auth.models import ConnectedAuthService
+from core.reports import ReportFileOutput
+from core.utils import bucketize, chunks
+from courses.models import Course
+from learning.gradebook.data import (
+    GradebookStudent, get_gradebook_assignments, get_gradebook_enrollments,
+    get_gradebook_personal_assignments
+)
+from learning.gradebook.matrix import GradebookMatrix
+
+__all__ = ('GradebookReport',)
+
+
+class GradebookReport(ReportFileOutput):
+    """
+    Exports gradebook row by row. Enrollments are read with a server-side
+    cursor in the gradebook order, personal assignments and connected
+    services are fetched for each chunk of students, so memory usage
+    doesn't depend on the number of course participants.
+    """
+    CHUNK_SIZE = 500
+
+    def __init__(self, course: Course, student_group: Optional[int] = None):
+        self.course = course
+        self.student_group = student_group
+        self.assignments = list(get_gradebook_assignments(course, student_group))
+        self.show_weight = any(a.weight < 1 for a in self.assignments)
+
+    @property
+    def headers(self) -> List[Any]:
+        headers = [
+            _("Enrollment ID"),
+            _("Last name"),
+            _("First name"),
+            _("Patronymic"),
+            _("Branch"),
+            _("Role"),
+            _("Email"),
+            _("Enrollment type"),
+            _("CSCUser|Curriculum year"),
+            _("Group"),
+            _("Yandex Login"),
+            _("Telegram Username"),
+            "stepik_id",
+            _("Codeforces Handle"),
+            "gitlab.manytask.org ID",
+            "gitlab.manytask.org Login",
+            _("Final grade"),
+            _("Total"),
+        ]
+        for a in self.assignments:
+            if self.show_weight:
+                title = f"{a.title} (вес: {a.weight})"
+            else:
+                title = a.title
+            headers.append(title)
+        return headers
+
+    @property
+    def data(self) -> Iterator[List[Any]]:
+        enrollments = get_gradebook_enrollments(self.course, self.student_group)
+        enrollments_iterator = enrollments.iterator(chunk_size=self.CHUNK_SIZE)
+        for chunk in chunks(enrollments_iterator, self.CHUNK_SIZE):
+            students = [GradebookStudent(e, index) for index, e
+                        in enumerate(e for e in chunk if e is not None)]
+            yield from self._export_chunk(students)
+
+    def _export_chunk(self, students: List[GradebookStudent]) -> Iterator[List[Any]]:
+        student_index = {gs.id: gs.index for gs in students}
+        assignment_index = {a.pk: index for index, a in enumerate(self.assignments)}
+        matrix = GradebookMatrix(self.assignments, number_of_students=len(students))
+        queryset = (get_gradebook_personal_assignments(self.course, self.student_group)
+                    .filter(student_id__in=student_index))
+        matrix.fill((student_index[student_id], assignment_index[assignment_id], *values)
+                    for student_id, assignment_id, *values in queryset.iterator()
+                    if assignment_id in assignment_index)
+        services_queryset = (ConnectedAuthService.objects
+                             .filter(user__in=student_index, provider='gitlab-manytask'))
+        connected_services = bucketize(services_queryset, key=lambda cs: cs.user_id)
+        for gradebook_student in students:
+            student = gradebook_student.student
+            student_profile = gradebook_student.student_profile
+            student_group = gradebook_student.student_group
+            gitlab_manytask = connected_services.get(student.pk, [None])[-1]
+            row = [
+                gradebook_student.enrollment_id,
+                student.last_name,
+                student.first_name,
+                student.patronymic,
+                student_profile.branch.name,
+                student_profile.get_type_display(),
+                student.email,
+                gradebook_student.enrollment_type_display,
+                gradebook_student.year_of_curriculum,
+                (student_group and student_group.name) or "-",
+                student.yandex_login,
+                student.telegram_username,
+                student.stepic_id,
+                student.codeforces_login,
+                gitlab_manytask.uid if gitlab_manytask else "-",
+                gitlab_manytask.login if gitlab_manytask and gitlab_manytask.login else "-",
+                gradebook_student.final_grade_display,
+                matrix.get_total_score(gradebook_student.index),
+            ]
+            for column in range(len(self.assignments)):
+                score = matrix.get_score(gradebook_student.index, column)
+                row.append(score if score is not None else '')
+            yield row
+
+    def export_row(self, row):
+        return row
+
+    def get_filename(self):
+        course = self.course
+        return f"{course.meta_course.slug}-{course.semester.year}-{course.semester.type}"
@@ -20,7 +20,7 @@ from grading.utils import YandexContestScoreSource
 from learning.models import Enrollment, StudentAssignment
 from learning.services.enrollment_service import update_enrollment_grade
 from learning.services.personal_assignment_service import (
-    update_personal_assignment_score
+    PersonalAssignmentScoreUpdate, bulk_update_personal_assignment_scores
 )
 from learning.settings import AssignmentScoreUpdateSource, EnrollmentGradeUpdateSource, GradeTypes
 from users.models import User
@@ -59,6 +59,7 @@ def assignment_import_scores_from_yandex_contest(*, checker: Checker,
 
     access_token = checker.checking_system.settings['access_token']
     client = YandexContestAPI(access_token=access_token, refresh_token=access_token)
+    score_updates = []
     for participant_results in yandex_contest_scoreboard_iterator(client, contest_id):
         if participant_results.yandex_login not in students:
             continue
@@ -87,11 +88,12 @@ def assignment_import_scores_from_yandex_contest(*, checker: Checker,
         else:
             raise serializers.ParseError("Unknown score input")
 
-        update_personal_assignment_score(student_assignment=student_assignment,
-                                         changed_by=triggered_by,
-                                         score_old=score_old,
-                                         score_new=score_new,
-                                         source=AssignmentScoreUpdateSource.API_YANDEX_CONTEST)
+        score_updates.append(PersonalAssignmentScoreUpdate(student_assignment=student_assignment,
+                                                           score_old=score_old,
+                                                           score_new=score_new))
+    bulk_update_personal_assignment_scores(updates=score_updates,
+                                           changed_by=triggered_by,
+                                           source=AssignmentScoreUpdateSource.API_YANDEX_CONTEST)
 
 
 def assignment_import_scores_from_csv(csv_file: IO,
@@ -112,7 +114,7 @@ def assignment_import_scores_from_csv(csv_file: IO,
     logger.info(f"Start processing csv")
 
     found = 0
-    imported = 0
+    score_updates = []
     for row_number, row in enumerate(reader, start=1):
         lookup_value = row[lookup_column_name].strip()
         if transform_value:
@@ -128,16 +130,21 @@ def assignment_import_scores_from_csv(csv_file: IO,
             raise ValidationError(f'Row {row_number}: {e.message}',
                                   code='invalid_score')
             # TODO: collect errors instead?
-        try:
-            update_personal_assignment_score(student_assignment=student_assignment,
-                                             changed_by=changed_by,
-                                             score_old=student_assignment.score,
-                                             score_new=score_new,
-                                             source=audit_log_source)
-            logger.info(f"{score_new} points has written to the personal assignment {student_assignment.pk}")
-        except ValidationError:
+        if score_new is not None and score_new > student_assignment.assignment.maximum_score:
             logger.info(f"Invalid score {score_new} on line {row_number}")
             continue
+        score_updates.append(PersonalAssignmentScoreUpdate(student_assignment=student_assignment,
+                                                           score_old=student_assignment.score,
+                                                           score_new=score_new))
+    conflicts = bulk_update_personal_assignment_scores(updates=score_updates,
+                                                       changed_by=changed_by,
+                                                       source=audit_log_source)
+    not_saved = {u.student_assignment.pk for u in conflicts}
+    imported = 0
+    for update in score_updates:
+        if update.student_assignment.pk in not_saved:
+            continue
+        logger.info(f"{update.score_new} points has written to the personal assignment {update.student_assignment.pk}")
         imported += 1
     return found, imported
 
@@ -30,6 +30,7 @@ from learning.gradebook import (
     BaseGradebookForm, GradeBookFilterForm, GradeBookFormFactory,
     get_student_assignment_state, gradebook_data
 )
+from learning.gradebook.reports import GradebookReport
 from learning.gradebook.services import assignment_import_scores_from_csv
 from learning.gradebook.views import ImportCourseGradesBaseView
 from learning.models import AssignmentSubmissionTypes, Enrollment, StudentAssignment, EnrollmentGradeLog
@@ -154,6 +155,38 @@ def test_view_gradebook_csv_gitlab_manytask_columns(client):
     assert get_column_value(data, "gitlab.manytask.org Login", 1) == "test-login"
 
 
+@pytest.mark.django_db
+def test_view_gradebook_export_streaming(client, mocker):
+    teacher = TeacherFactory()
+    course = CourseFactory(teachers=[teacher])
+    a1, a2 = AssignmentFactory.create_batch(2, course=course, weight=Decimal('0.5'))
+    enrollments = EnrollmentFactory.create_batch(3, course=course)
+    for index, e in enumerate(enrollments):
+        (StudentAssignment.objects
+         .filter(assignment=a1, student=e.student)
+         .update(score=index + 1))
+    ConnectedAuthServiceFactory(user=enrollments[0].student,
+                                provider="gitlab-manytask",
+                                uid="Test UID",
+                                extra_data={"login": "test-login"})
+    client.login(teacher)
+    response = client.get(course.get_gradebook_url(format="csv"))
+    expected = [row for row in csv.reader(io.StringIO(response.content.decode('utf-8'))) if row]
+    # Make sure rows are joined with scores across chunks
+    mocker.patch.object(GradebookReport, 'CHUNK_SIZE', 2)
+    response = client.get(course.get_gradebook_url(format="csv", streaming=True))
+    assert response.status_code == 200
+    assert response.streaming
+    content = b"".join(response.streaming_content).decode('utf-8')
+    data = [row for row in csv.reader(io.StringIO(content)) if row]
+    assert data == expected
+    response = client.get(course.get_gradebook_url(format="xlsx"))
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    assert b"".join(response.streaming_content).startswith(b"PK")
+
+
 @pytest.mark.django_db
 def test_nonempty_gradebook_view(client):
     teacher = TeacherFactory()
@@ -947,6 +980,101 @@ def test_gradebook_import_scores_from_yandex_contest_permissions(settings, clien
     assert response.status_code == 404
 
 
+@pytest.mark.django_db
+def test_gradebook_data_api_window(settings, client):
+    teacher = TeacherFactory()
+    course = CourseFactory(teachers=[teacher])
+    assignments = AssignmentFactory.create_batch(3, course=course,
+                                                 submission_type=AssignmentFormat.NO_SUBMIT)
+    EnrollmentFactory.create_batch(5, course=course)
+    url = reverse('teaching:api:gradebook:data', kwargs={"course_id": course.pk},
+                  subdomain=settings.LMS_SUBDOMAIN)
+    client.login(UserFactory())
+    assert client.get(url).status_code == 403
+    client.login(teacher)
+    response = client.get(url, {"offset": 1, "limit": 2,
+                                "columns_offset": 1, "columns_limit": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data['totalStudents'] == 5
+    assert data['totalAssignments'] == 3
+    assert [a['id'] for a in data['assignments']] == [a.pk for a in assignments[1:]]
+    assert all(a['isEditable'] for a in data['assignments'])
+    gradebook = gradebook_data(course)
+    expected_students = list(gradebook.students)[1:3]
+    assert [s['studentId'] for s in data['students']] == expected_students
+    for student in data['students']:
+        assert len(student['cells']) == 2
+        for cell, assignment in zip(student['cells'], assignments[1:]):
+            sa = StudentAssignment.objects.get(student_id=student['studentId'],
+                                               assignment=assignment)
+            assert cell['id'] == sa.pk
+            assert cell['state'] == get_student_assignment_state(sa)
+    response = client.get(url, {"limit": 1000})
+    assert response.status_code == 400
+    # Student group must belong to the course
+    student_group = StudentGroupFactory(course=course)
+    response = client.get(url, {"student_group": student_group.pk})
+    assert response.status_code == 200
+    assert response.json()['totalStudents'] == 0
+    response = client.get(url, {"student_group": StudentGroupFactory().pk})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_gradebook_cells_update_api(settings, client):
+    teacher, spectator = TeacherFactory.create_batch(2)
+    course = CourseFactory(teachers=[teacher])
+    CourseTeacherFactory(course=course, teacher=spectator,
+                         roles=CourseTeacher.roles.spectator)
+    offline = AssignmentFactory(course=course, maximum_score=10,
+                                submission_type=AssignmentFormat.NO_SUBMIT)
+    online = AssignmentFactory(course=course, submission_type=AssignmentFormat.ONLINE)
+    e1, e2 = EnrollmentFactory.create_batch(2, course=course)
+    sa1 = StudentAssignment.objects.get(assignment=offline, student=e1.student)
+    sa2 = StudentAssignment.objects.get(assignment=offline, student=e2.student)
+    StudentAssignment.objects.filter(pk=sa2.pk).update(score=3)
+    url = reverse('teaching:api:gradebook:cells', kwargs={"course_id": course.pk},
+                  subdomain=settings.LMS_SUBDOMAIN)
+    client.login(spectator)
+    response = client.patch(url, data={}, content_type='application/json')
+    assert response.status_code == 403
+    client.login(teacher)
+    payload = {
+        "scores": [
+            {"student_assignment": sa1.pk, "score_old": None, "score_new": "5"},
+            {"student_assignment": sa2.pk, "score_old": "1", "score_new": "7"},
+        ],
+        "grades": [
+            {"enrollment": e1.pk, "grade_old": e1.grade, "grade_new": GradeTypes.GOOD},
+        ]
+    }
+    response = client.patch(url, data=payload, content_type='application/json')
+    assert response.status_code == 200
+    conflicts = response.json()['conflicts']
+    assert conflicts['grades'] == []
+    assert len(conflicts['scores']) == 1
+    assert conflicts['scores'][0]['studentAssignment'] == sa2.pk
+    assert Decimal(conflicts['scores'][0]['score']) == 3
+    sa1.refresh_from_db()
+    sa2.refresh_from_db()
+    e1.refresh_from_db()
+    assert sa1.score == 5
+    assert sa2.score == 3
+    assert e1.grade == GradeTypes.GOOD
+    # Online assignment score can't be changed with gradebook
+    sa_online = StudentAssignment.objects.get(assignment=online, student=e1.student)
+    payload = {"scores": [{"student_assignment": sa_online.pk,
+                           "score_old": None, "score_new": "1"}]}
+    response = client.patch(url, data=payload, content_type='application/json')
+    assert response.status_code == 400
+    # Personal assignment of another course
+    payload = {"scores": [{"student_assignment": StudentAssignmentFactory().pk,
+                           "score_old": None, "score_new": "1"}]}
+    response = client.patch(url, data=payload, content_type='application/json')
+    assert response.status_code == 400
+
+
 def generate_course(group_one_size: int = 5,
                     group_two_size: int = 5,
                     group_one_type: str = StudentTypes.REGULAR,
@@ -1048,6 +1176,12 @@ def test_view_gradebook_query_param_marks_selected_group(client):
     response = client.get(filter_first_url)
     form = response.context_data["filter_form"]
     assert form.cleaned_data['student_group'] == group_one.pk
+    # Export links keep the selected group
+    html = response.content.decode('utf-8')
+    assert course.get_gradebook_url(format="csv", streaming=True,
+                                    student_group=group_one.pk) in html
+    assert course.get_gradebook_url(format="xlsx",
+                                    student_group=group_one.pk) in html
 
 
 @pytest.mark.django_db
@@ -1216,6 +1350,39 @@ def test_get_student_assignment_state():
     assert get_student_assignment_state(sa) == sa.get_score_verbose_display()
 
 
+@pytest.mark.django_db
+def test_gradebook_matrix_is_consistent_with_models():
+    course = CourseFactory()
+    a1 = AssignmentFactory(course=course, weight=Decimal('0.5'), maximum_score=10)
+    a2 = AssignmentFactory(course=course, maximum_score=3,
+                           submission_type=AssignmentFormat.PENALTY)
+    e1, e2, e3 = EnrollmentFactory.create_batch(3, course=course)
+    StudentAssignment.objects.filter(assignment=a1, student=e1.student).update(score=Decimal('7.25'))
+    StudentAssignment.objects.filter(assignment=a1, student=e2.student).update(status=AssignmentStatus.ON_CHECKING)
+    StudentAssignment.objects.filter(assignment=a2, student=e1.student).update(score=2)
+    StudentAssignment.objects.filter(assignment=a2, student=e3.student).delete()
+    data = gradebook_data(course)
+    for gradebook_student in data.students.values():
+        expected_total = Decimal(0)
+        for cell, sa in zip(data.iter_cells(gradebook_student),
+                            data.student_assignments[gradebook_student.index]):
+            if sa is None:
+                assert cell is None
+                continue
+            db_sa = StudentAssignment.objects.get(pk=sa.pk)
+            assert cell.id == sa.pk == db_sa.pk
+            assert cell.score == sa.score == db_sa.score
+            assert sa.final_score == db_sa.final_score
+            assert cell.state_display == get_student_assignment_state(db_sa)
+            if db_sa.final_score is not None:
+                expected_total += db_sa.weighted_final_score
+        assert gradebook_student.total_score == expected_total
+    assert data.students[e1.student_id].total_score == Decimal('1.625')
+    assert data.student_assignments[data.students[e3.student_id].index][1] is None
+    e1_index = data.students[e1.student_id].index
+    assert data.matrix.is_passed[e1_index].tolist() == [True, False]
+
+
 @pytest.mark.parametrize('teaching_dispatch_name,staff_dispatch_name',
                          [('teaching:gradebook_import_course_grades_by_enrollment_id',
                            'staff:gradebook_import_course_grades_by_enrollment_id'),
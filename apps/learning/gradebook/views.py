@@ -1,15 +1,17 @@
-import csv
-import itertools
 from typing import Any, Optional, IO
 
+from djangorestframework_camel_case.render import (
+    CamelCaseBrowsableAPIRenderer, CamelCaseJSONRenderer
+)
 from rest_framework import serializers, status
 from rest_framework.response import Response
 
 from django.contrib import messages
 from django.conf import settings
 from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
 from django.db.models import Prefetch, Q, Count
-from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
+from django.http import HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.datastructures import MultiValueDictKeyError
 from django.utils.translation import gettext_lazy as _
@@ -19,9 +21,8 @@ from django.contrib.sites.models import Site
 
 from api.views import APIBaseView
 from auth.mixins import PermissionRequiredMixin, RolePermissionRequiredMixin
-from auth.models import ConnectedAuthService
 from core.http import AuthenticatedHttpRequest, HttpRequest
-from core.utils import bucketize, normalize_yandex_login
+from core.utils import normalize_yandex_login
 from courses.constants import AssignmentFormat, SemesterTypes
 from courses.models import Assignment, Course, Semester
 from courses.utils import get_current_term_pair
@@ -32,23 +33,28 @@ from grading.api.yandex_contest import (
 from learning.gradebook import (
     BaseGradebookForm, GradeBookFilterForm, GradeBookFormFactory, gradebook_data
 )
-from learning.gradebook.data import get_student_assignment_state
+from learning.gradebook.data import get_gradebook_enrollments, get_student_assignment_state
+from learning.gradebook.reports import GradebookReport
 from learning.gradebook.services import (
     assignment_import_scores_from_csv, assignment_import_scores_from_yandex_contest,
     get_assignment_checker, enrollment_import_grades_from_csv
 )
-from learning.models import StudentGroup, Enrollment
+from learning.models import StudentGroup, Enrollment, StudentAssignment
 from learning.permissions import EditGradebook, ViewGradebook
-from learning.services.enrollment_service import get_enrollments_by_stepik_id, get_enrollments_by_yandex_login
+from learning.services.enrollment_service import (
+    get_enrollments_by_stepik_id, get_enrollments_by_yandex_login, update_enrollment_grade
+)
 from learning.services.personal_assignment_service import (
+    PersonalAssignmentScoreUpdate, bulk_update_personal_assignment_scores,
     get_personal_assignments_by_enrollment_id, get_personal_assignments_by_stepik_id,
     get_personal_assignments_by_yandex_login
 )
 
 __all__ = [
     "GradeBookView",
-    "GradeBookCSVView", "ImportAssignmentScoresByStepikIDView",
-    "ImportAssignmentScoresByYandexLoginView"
+    "GradeBookCSVView", "GradeBookExportView", "ImportAssignmentScoresByStepikIDView",
+    "ImportAssignmentScoresByYandexLoginView",
+    "GradebookDataAPIView", "GradebookCellsUpdateAPIView"
 ]
 
 from learning.settings import AssignmentScoreUpdateSource, EnrollmentGradeUpdateSource, EnrollmentTypes, GradeTypes
@@ -189,6 +195,8 @@ class GradeBookView(PermissionRequiredMixin, CourseURLParamsMixin,
             'view': self,
             'form': form,
             'filter_form': filter_form,
+            'selected_student_group': (filter_form.cleaned_data['student_group']
+                                       if filter_form.is_valid() else None),
             'StudentTypes': StudentTypes,
             'gradebook': self.gradebook,
             'AssignmentFormat': AssignmentFormat,
@@ -225,77 +233,29 @@ class GradeBookCSVView(PermissionRequiredMixin, CourseURLParamsMixin,
         return self.course
 
     def get(self, request, *args, **kwargs):
-        gradebook = gradebook_data(self.course)
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        filename = "{}-{}-{}.csv".format(kwargs['course_slug'],
-                                         kwargs['semester_year'],
-                                         kwargs['semester_type'])
-        response['Content-Disposition'] = 'attachment; filename="{}"'.format(
-            filename)
-
-        writer = csv.writer(response)
-        headers = [
-            _("Enrollment ID"),
-            _("Last name"),
-            _("First name"),
-            _("Patronymic"),
-            _("Branch"),
-            _("Role"),
-            _("Email"),
-            _("Enrollment type"),
-            _("CSCUser|Curriculum year"),
-            _("Group"),
-            _("Yandex Login"),
-            _("Telegram Username"),
-            "stepik_id",
-            _("Codeforces Handle"),
-            "gitlab.manytask.org ID",
-            "gitlab.manytask.org Login",
-            _("Final grade"),
-            _("Total"),
-        ]
-        for gradebook_assignment in gradebook.assignments.values():
-            a = gradebook_assignment.assignment
-            if gradebook.show_weight:
-                title = f"{a.title} (вес: {a.weight})"
-            else:
-                title = a.title
-            headers.append(title)
-        writer.writerow(headers)
-        students = [gs.student_profile.user_id for gs in gradebook.students.values()]
-        services_queryset = (ConnectedAuthService.objects
-                             .filter(user__in=students))
-        connected_services = bucketize(services_queryset, key=lambda cs: cs.user_id)
-        for gradebook_student in gradebook.students.values():
-            student = gradebook_student.student
-            student_profile = gradebook_student.student_profile
-            student_group = gradebook_student.student_group
-            connected_providers = connected_services.get(student.pk, [])
-            connected_providers = {cp.provider: cp for cp in connected_providers}
-            gitlab_manytask = connected_providers.get('gitlab-manytask')
-            writer.writerow(
-                itertools.chain(
-                    [gradebook_student.enrollment_id,
-                     student.last_name,
-                     student.first_name,
-                     student.patronymic,
-                     student_profile.branch.name,
-                     student_profile.get_type_display(),
-                     student.email,
-                     gradebook_student.enrollment_type_display,
-                     gradebook_student.year_of_curriculum,
-                     (student_group and student_group.name) or "-",
-                     student.yandex_login,
-                     student.telegram_username,
-                     student.stepic_id,
-                     student.codeforces_login,
-                     gitlab_manytask.uid if gitlab_manytask else "-",
-                     gitlab_manytask.login if gitlab_manytask and gitlab_manytask.login else "-",
-                     gradebook_student.final_grade_display,
-                     gradebook_student.total_score],
-                    [(a.score if a and a.score is not None else '')
-                     for a in gradebook.student_assignments[gradebook_student.index]]))
-        return response
+        return GradebookReport(self.course).output_csv()
+
+
+class GradeBookExportView(PermissionRequiredMixin, CourseURLParamsMixin,
+                          generic.base.View):
+    """
+    Streams gradebook in csv or xlsx format. Memory usage doesn't depend
+    on the course size, prefer it over `GradeBookCSVView` for large courses.
+    """
+    permission_required = ViewGradebook.name
+
+    def get_permission_object(self):
+        return self.course
+
+    def get(self, request, *args, **kwargs):
+        filter_form = GradeBookFilterForm(data=request.GET, course=self.course)
+        selected_group = None
+        if filter_form.is_valid():
+            selected_group = filter_form.cleaned_data['student_group']
+        report = GradebookReport(self.course, student_group=selected_group)
+        if kwargs['output_format'] == 'xlsx':
+            return report.output_xlsx_stream()
+        return report.output_csv_stream()
 
 
 class ImportAssignmentScoresBaseView(PermissionRequiredMixin, generic.View):
@@ -508,3 +468,205 @@ class GradebookImportScoresFromYandexContest(RolePermissionRequiredMixin, APIBas
         if isinstance(exc, (Unavailable, ContestAPIError)):
             exc = cast_contest_error(exc)
         return super().handle_exception(exc)
+
+
+GRADEBOOK_API_MAX_ROWS = 200
+GRADEBOOK_API_MAX_COLUMNS = 100
+
+
+class GradebookDataAPIView(RolePermissionRequiredMixin, APIBaseView):
+    """
+    Returns a window of the gradebook: rows (students) are limited with
+    `offset`/`limit`, columns (assignments) - with
+    `columns_offset`/`columns_limit`. Virtualized grid requests only
+    the visible slice, so gradebook size is not limited.
+    """
+    course: Course
+    permission_classes = [ViewGradebook]
+    renderer_classes = (CamelCaseJSONRenderer, CamelCaseBrowsableAPIRenderer)
+
+    class InputSerializer(serializers.Serializer):
+        # Queryset is limited to the student groups of the course in the view
+        student_group = serializers.PrimaryKeyRelatedField(
+            required=False, allow_null=True, default=None,
+            queryset=StudentGroup.objects.none())
+        offset = serializers.IntegerField(min_value=0, default=0)
+        limit = serializers.IntegerField(min_value=1, default=50,
+                                         max_value=GRADEBOOK_API_MAX_ROWS)
+        columns_offset = serializers.IntegerField(min_value=0, default=0)
+        columns_limit = serializers.IntegerField(min_value=1, default=20,
+                                                 max_value=GRADEBOOK_API_MAX_COLUMNS)
+
+    def setup(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        super().setup(request, *args, **kwargs)
+        queryset = (Course.objects
+                    .filter(pk=kwargs['course_id'])
+                    .select_related('meta_course', 'main_branch', 'semester'))
+        self.course = get_object_or_404(queryset)
+
+    def get_permission_object(self) -> Course:
+        return self.course
+
+    def get(self, request: AuthenticatedHttpRequest, *args: Any, **kwargs: Any):
+        serializer = self.InputSerializer(data=request.query_params)
+        serializer.fields['student_group'].queryset = (StudentGroup.objects
+                                                       .filter(course_id=self.course.pk))
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        student_group = params['student_group'] and params['student_group'].pk
+        gradebook = gradebook_data(self.course, student_group,
+                                   offset=params['offset'], limit=params['limit'])
+        total_students = get_gradebook_enrollments(self.course, student_group).count()
+        can_edit = request.user.has_perm(EditGradebook.name, self.course)
+        columns = slice(params['columns_offset'],
+                        params['columns_offset'] + params['columns_limit'])
+        assignments = list(gradebook.assignments.values())[columns]
+        data = {
+            "total_students": total_students,
+            "total_assignments": len(gradebook.assignments),
+            "offset": params['offset'],
+            "columns_offset": params['columns_offset'],
+            "is_readonly": not can_edit,
+            "assignments": [{
+                "id": ga.assignment.pk,
+                "title": ga.assignment.title,
+                "maximum_score": ga.assignment.maximum_score,
+                "passing_score": ga.assignment.passing_score,
+                "weight": ga.assignment.weight,
+                "is_editable": BaseGradebookForm.is_assignment_column_enabled(ga.assignment,
+                                                                              not can_edit)
+            } for ga in assignments],
+            "students": []
+        }
+        for gradebook_student in gradebook.students.values():
+            student = gradebook_student.student
+            cells = list(gradebook.iter_cells(gradebook_student))[columns]
+            data["students"].append({
+                "student_id": student.pk,
+                "enrollment_id": gradebook_student.enrollment_id,
+                "last_name": student.last_name,
+                "first_name": student.first_name,
+                "patronymic": student.patronymic,
+                "year_of_curriculum": gradebook_student.year_of_curriculum,
+                "final_grade": gradebook_student.final_grade,
+                "total_score": gradebook_student.total_score,
+                "cells": [None if cell is None else {
+                    "id": cell.id,
+                    "score": cell.score,
+                    "state": cell.state_display,
+                } for cell in cells]
+            })
+        return Response(status=status.HTTP_200_OK, data=data)
+
+
+class GradebookCellsUpdateAPIView(RolePermissionRequiredMixin, APIBaseView):
+    """
+    Saves edited gradebook cells (assignment scores and final grades).
+    Each cell provides the value seen by the user, the cell is not updated
+    if the current value differs (conflict). Returns current values of
+    conflicting cells.
+    """
+    course: Course
+    permission_classes = [EditGradebook]
+    renderer_classes = (CamelCaseJSONRenderer, CamelCaseBrowsableAPIRenderer)
+
+    class ScoreSerializer(serializers.Serializer):
+        student_assignment = serializers.IntegerField(min_value=1)
+        score_old = serializers.DecimalField(max_digits=6, decimal_places=2,
+                                             min_value=0, allow_null=True)
+        score_new = serializers.DecimalField(max_digits=6, decimal_places=2,
+                                             min_value=0, allow_null=True)
+
+    class GradeSerializer(serializers.Serializer):
+        enrollment = serializers.IntegerField(min_value=1)
+        grade_old = serializers.ChoiceField(choices=GradeTypes.choices)
+        grade_new = serializers.ChoiceField(choices=GradeTypes.choices)
+
+    class InputSerializer(serializers.Serializer):
+        scores = serializers.ListField(required=False, default=list,
+                                       max_length=settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+        grades = serializers.ListField(required=False, default=list,
+                                       max_length=settings.DATA_UPLOAD_MAX_NUMBER_FIELDS)
+
+    def setup(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        super().setup(request, *args, **kwargs)
+        queryset = (Course.objects
+                    .filter(pk=kwargs['course_id'])
+                    .select_related('meta_course', 'main_branch', 'semester'))
+        self.course = get_object_or_404(queryset)
+
+    def get_permission_object(self) -> Course:
+        return self.course
+
+    def patch(self, request: AuthenticatedHttpRequest, *args: Any, **kwargs: Any):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        scores = self.ScoreSerializer(data=serializer.validated_data['scores'], many=True)
+        scores.is_valid(raise_exception=True)
+        grades = self.GradeSerializer(data=serializer.validated_data['grades'], many=True)
+        grades.is_valid(raise_exception=True)
+        with transaction.atomic():
+            score_conflicts = self._update_scores(scores.validated_data)
+            grade_conflicts = self._update_grades(grades.validated_data)
+        return Response(status=status.HTTP_200_OK, data={
+            "conflicts": {
+                "scores": score_conflicts,
+                "grades": grade_conflicts
+            }
+        })
+
+    def _update_scores(self, scores):
+        ids = {s['student_assignment'] for s in scores}
+        queryset = (StudentAssignment.objects
+                    .filter(pk__in=ids, assignment__course=self.course)
+                    .select_related('assignment')
+                    .only('pk', 'score', 'student_id', 'assignment__id',
+                          'assignment__course_id', 'assignment__submission_type',
+                          'assignment__maximum_score'))
+        student_assignments = {sa.pk: sa for sa in queryset}
+        updates = []
+        for data in scores:
+            student_assignment = student_assignments.get(data['student_assignment'])
+            if student_assignment is None:
+                raise ValidationError(f"Personal assignment {data['student_assignment']} "
+                                      f"is not found", code="not_found")
+            if not BaseGradebookForm.is_assignment_column_enabled(student_assignment.assignment,
+                                                                  is_readonly=False):
+                raise ValidationError(f"Personal assignment {student_assignment.pk} "
+                                      f"is readonly", code="readonly")
+            updates.append(PersonalAssignmentScoreUpdate(student_assignment=student_assignment,
+                                                         score_old=data['score_old'],
+                                                         score_new=data['score_new']))
+        conflicts = bulk_update_personal_assignment_scores(updates=updates,
+                                                           changed_by=self.request.user,
+                                                           source=AssignmentScoreUpdateSource.FORM_GRADEBOOK)
+        if not conflicts:
+            return []
+        current_scores = dict(StudentAssignment.objects
+                              .filter(pk__in=[c.student_assignment.pk for c in conflicts])
+                              .values_list('pk', 'score'))
+        return [{"student_assignment": c.student_assignment.pk,
+                 "score": current_scores.get(c.student_assignment.pk),
+                 "unsaved_score": c.score_new} for c in conflicts]
+
+    def _update_grades(self, grades):
+        ids = {g['enrollment'] for g in grades}
+        enrollments = Enrollment.active.filter(pk__in=ids, course=self.course).in_bulk()
+        conflicts = []
+        for data in grades:
+            enrollment = enrollments.get(data['enrollment'])
+            if enrollment is None:
+                raise ValidationError(f"Enrollment {data['enrollment']} is not found",
+                                      code="not_found")
+            enrollment.course = self.course
+            updated, _ = update_enrollment_grade(enrollment,
+                                                 old_grade=data['grade_old'],
+                                                 new_grade=data['grade_new'],
+                                                 editor=self.request.user,
+                                                 source=EnrollmentGradeUpdateSource.GRADEBOOK)
+            if not updated:
+                enrollment.refresh_from_db(fields=['grade'])
+                conflicts.append({"enrollment": enrollment.pk,
+                                  "grade": enrollment.grade,
+                                  "unsaved_grade": data['grade_new']})
+        return conflicts
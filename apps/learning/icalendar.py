@@ -10,13 +10,14 @@ from icalendar import Timezone, TimezoneStandard, vText, vUri
 from icalendar.prop import vInline
 
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from admission.models import Interview
 from admission.roles import Roles
-from courses.models import Assignment, CourseClass
-from learning.models import Event, StudentAssignment
+from courses.models import Assignment, CourseClass, CourseTeacher
+from learning.models import Enrollment, Event, StudentAssignment
 from users.models import User
 
 
@@ -248,3 +249,47 @@ def get_icalendar_links(account: User) -> List[ICalendarURL]:
     if Roles.INTERVIEWER in account.roles:
         urls.append(ICalendarURL(code="interviews", title=str(_("Interviews")), url=account.get_interviews_icalendar_url()))
     return urls
+
+
+ICALENDAR_FEED_CACHE_KEY = 'icalendar.{feed}.{user_id}.{version}.{host}'
+ICALENDAR_FEED_VERSION_CACHE_KEY = 'icalendar.version.{user_id}'
+ICALENDAR_FEED_CACHE_TIMEOUT = 3600
+
+
+def get_icalendar_feed_version(user_id: int) -> int:
+    """
+    Rendered feeds of the user share the same version, deleting version
+    invalidates feeds of the user for all hosts. Version is a timestamp
+    (in ms) of the first access after invalidation, so it's never less
+    than the time of the latest change.
+    """
+    version_key = ICALENDAR_FEED_VERSION_CACHE_KEY.format(user_id=user_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = int(timezone.now().timestamp() * 1000)
+        cache.set(version_key, version, ICALENDAR_FEED_CACHE_TIMEOUT)
+    return version
+
+
+def get_icalendar_feed_cache_key(feed: str, user_id: int, version: int,
+                                 host: str) -> str:
+    return ICALENDAR_FEED_CACHE_KEY.format(feed=feed, user_id=user_id,
+                                           version=version, host=host)
+
+
+def invalidate_icalendar_feeds(user_ids: Iterable[int]) -> None:
+    cache.delete_many([ICALENDAR_FEED_VERSION_CACHE_KEY.format(user_id=user_id)
+                       for user_id in set(user_ids)])
+
+
+def invalidate_course_icalendar_feeds(course_id: int) -> None:
+    """Invalidates feeds of all students and teachers of the course."""
+    students = (Enrollment.objects
+                .filter(course_id=course_id)
+                .values_list('student_id', flat=True)
+                .order_by())
+    teachers = (CourseTeacher.objects
+                .filter(course_id=course_id)
+                .values_list('teacher_id', flat=True)
+                .order_by())
+    invalidate_icalendar_feeds(students.union(teachers))
@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand, CommandError
+
+from courses.constants import AssigneeMode
+from courses.models import Assignment
+from learning.services.personal_assignment_service import (
+    assign_pending_personal_assignments
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Assigns teachers with minimal load to personal assignments with student
+    activity that are still waiting for auto assigning. Works only for
+    assignments in the student group balanced mode.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignment', type=int, help='Assignment ID')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report planned assignees without saving them')
+
+    def handle(self, *args, **options):
+        try:
+            assignment = Assignment.objects.get(pk=options['assignment'])
+        except Assignment.DoesNotExist:
+            raise CommandError(f"Assignment {options['assignment']} not found")
+        if assignment.assignee_mode != AssigneeMode.STUDENT_GROUP_BALANCED:
+            raise CommandError("Assignee mode is not student group balanced")
+        report = assign_pending_personal_assignments(
+            assignment, dry_run=options['dry_run'])
+        for student_assignment, assignee in report.assignees:
+            teacher_id = assignee.teacher_id if assignee else None
+            self.stdout.write(f"StudentAssignment {student_assignment.pk}: "
+                              f"teacher {teacher_id}")
+        for course_teacher_id, load in sorted(report.loads.items()):
+            self.stdout.write(f"CourseTeacher {course_teacher_id}: load {load:.2f}")
+        assigned = sum(1 for _, assignee in report.assignees if assignee)
+        if options['dry_run']:
+            self.stdout.write(f"Planned assignees: {assigned} "
+                              f"of {len(report.assignees)}")
+        else:
+            self.stdout.write(f"Assigned: {assigned} of {len(report.assignees)}")
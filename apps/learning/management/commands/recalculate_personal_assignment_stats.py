@@ -0,0 +1,37 @@
+from django.core.management import BaseCommand
+
+from learning.models import StudentAssignment
+from learning.services.personal_assignment_service import (
+    bulk_recalculate_personal_assignment_stats
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Recalculates stats and execution time of personal assignments which are
+    maintained incrementally on adding/removing submissions. Use it to
+    backfill or repair inconsistent values.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Course ID')
+        parser.add_argument('--assignment', type=int, help='Assignment ID')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the number of inconsistent records only')
+
+    def handle(self, *args, **options):
+        personal_assignments = StudentAssignment.objects.all()
+        if options['course']:
+            personal_assignments = personal_assignments.filter(
+                assignment__course_id=options['course'])
+        if options['assignment']:
+            personal_assignments = personal_assignments.filter(
+                assignment_id=options['assignment'])
+        inconsistent = bulk_recalculate_personal_assignment_stats(
+            personal_assignments, batch_size=options['batch_size'],
+            dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"Inconsistent records: {inconsistent}")
+        else:
+            self.stdout.write(f"Updated records: {inconsistent}")
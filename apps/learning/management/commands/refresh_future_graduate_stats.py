@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from learning.services.graduate_stats_service import refresh_future_graduate_stats
+from learning.settings import StudentStatuses
+from users.models import StudentProfile, StudentTypes
+
+
+class Command(BaseCommand):
+    help = """
+    Recalculates cached statistics on students who will graduate this year.
+    Run it on schedule to keep snapshots warm.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, help='Branch ID')
+
+    def handle(self, *args, **options):
+        if options['branch']:
+            branch_ids = [options['branch']]
+        else:
+            branch_ids = (StudentProfile.objects
+                          .filter(type=StudentTypes.REGULAR,
+                                  status=StudentStatuses.WILL_GRADUATE)
+                          .values_list('branch_id', flat=True)
+                          .order_by('branch_id')
+                          .distinct())
+        for branch_id in branch_ids:
+            stats = refresh_future_graduate_stats(branch_id)
+            self.stdout.write(f"Branch {branch_id}: "
+                              f"{len(stats.student_profiles)} students")
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from learning.services.check_queue_service import update_check_queue
+
+
+class Command(BaseCommand):
+    help = """
+    Rebuilds the assignments check queue table which is maintained
+    incrementally. Use it to backfill or repair the table.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Course ID')
+
+    def handle(self, *args, **options):
+        filters = Q()
+        if options['course']:
+            filters = Q(assignment__course_id=options['course'])
+        updated = update_check_queue(filters)
+        self.stdout.write(f"Updated records: {updated}")
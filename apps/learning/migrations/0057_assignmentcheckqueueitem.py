@@ -0,0 +1,58 @@
+# Generated by Django 3.2.18 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+import django.db.models.deletion
+
+
+def backfill_check_queue(apps, schema_editor):
+    # Items are built with the same statement that maintains them
+    from learning.services.check_queue_service import update_check_queue
+    update_check_queue(Q())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0059_metacourse_index'),
+        ('learning', '0056_alter_enrollmentgradelog_source'),
+        ('users', '0056_user_citizenship'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentCheckQueueItem',
+            fields=[
+                ('student_assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='check_queue_item', serialize=False, to='learning.studentassignment', verbose_name='Personal Assignment')),
+                ('status', models.CharField(choices=[('new', 'AssignmentStatus|New'), ('not_submitted', 'AssignmentStatus|Not submitted'), ('on_checking', 'AssignmentStatus|On checking'), ('need_fixes', 'AssignmentStatus|Need fixes'), ('completed', 'AssignmentStatus|Completed')], max_length=13, verbose_name='Status')),
+                ('year_of_curriculum', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Year of Curriculum')),
+                ('solution_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Solution')),
+                ('is_enrolled', models.BooleanField(help_text='Student has an active enrollment in the course', verbose_name='Enrolled')),
+                ('can_submit', models.BooleanField(help_text='Student enrollment allows to submit assignments', verbose_name='Can Submit')),
+                ('assignee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.courseteacher', verbose_name='Assignee')),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.assignment', verbose_name='Assignment')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course', verbose_name='Course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Student')),
+                ('student_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='learning.studentgroup', verbose_name='Student Group')),
+            ],
+            options={
+                'verbose_name': 'Check Queue Item',
+                'verbose_name_plural': 'Check Queue Items',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='assignmentcheckqueueitem',
+            index=models.Index(fields=['course', 'student_assignment'], name='check_queue_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentcheckqueueitem',
+            index=models.Index(fields=['assignment', 'status', 'student_assignment'], name='check_queue_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentcheckqueueitem',
+            index=models.Index(fields=['assignee', 'status'], name='check_queue_assignee_idx'),
+        ),
+        migrations.RunPython(backfill_check_queue, migrations.RunPython.noop),
+    ]
@@ -821,6 +821,78 @@ class StudentAssignment(SoftDeletionModel, TimezoneAwareMixin, TimeStampedModel,
         return self.__class__.objects.can_be_submitted().filter(pk=self.pk).exists()
 
 
+class AssignmentCheckQueueItem(models.Model):
+    """
+    Denormalized state of the personal assignment used by the teacher's
+    assignments check queue. Items are maintained by
+    `learning.services.check_queue_service`, don't edit them directly.
+    """
+    student_assignment = models.OneToOneField(
+        StudentAssignment,
+        verbose_name=_("Personal Assignment"),
+        primary_key=True,
+        related_name="check_queue_item",
+        on_delete=models.CASCADE)
+    course = models.ForeignKey(
+        Course,
+        verbose_name=_("Course"),
+        related_name="+",
+        on_delete=models.CASCADE)
+    assignment = models.ForeignKey(
+        Assignment,
+        verbose_name=_("Assignment"),
+        related_name="+",
+        on_delete=models.CASCADE)
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("Student"),
+        related_name="+",
+        on_delete=models.CASCADE)
+    status = models.CharField(
+        verbose_name=_("Status"),
+        choices=AssignmentStatus.choices,
+        max_length=13)
+    assignee = models.ForeignKey(
+        CourseTeacher,
+        verbose_name=_("Assignee"),
+        related_name="+",
+        on_delete=models.SET_NULL,
+        blank=True, null=True)
+    student_group = models.ForeignKey(
+        StudentGroup,
+        verbose_name=_("Student Group"),
+        related_name="+",
+        on_delete=models.SET_NULL,
+        blank=True, null=True)
+    year_of_curriculum = models.PositiveSmallIntegerField(
+        verbose_name=_("Year of Curriculum"),
+        blank=True, null=True)
+    solution_at = models.DateTimeField(
+        verbose_name=_("Last Solution"),
+        blank=True, null=True)
+    is_enrolled = models.BooleanField(
+        verbose_name=_("Enrolled"),
+        help_text=_("Student has an active enrollment in the course"))
+    can_submit = models.BooleanField(
+        verbose_name=_("Can Submit"),
+        help_text=_("Student enrollment allows to submit assignments"))
+
+    class Meta:
+        verbose_name = _("Check Queue Item")
+        verbose_name_plural = _("Check Queue Items")
+        indexes = [
+            models.Index(fields=['course', 'student_assignment'],
+                         name='check_queue_course_idx'),
+            models.Index(fields=['assignment', 'status', 'student_assignment'],
+                         name='check_queue_status_idx'),
+            models.Index(fields=['assignee', 'status'],
+                         name='check_queue_assignee_idx'),
+        ]
+
+    def __str__(self):
+        return f"[AssignmentCheckQueueItem] {self.student_assignment_id}"
+
+
 class AssignmentScoreAuditLog(TimestampedModel):
     student_assignment = models.ForeignKey(
         StudentAssignment,
@@ -1,9 +1,9 @@
 import io
 from abc import ABCMeta, abstractmethod
 from operator import attrgetter
-from typing import Dict, List, Literal, Set
+from typing import Any, Dict, List, Literal, Set, Tuple
 
-from pandas import DataFrame, ExcelWriter
+from pandas import DataFrame, ExcelWriter, MultiIndex, Series
 
 from django.conf import settings
 from django.db.models import Case, Count, F, IntegerField, Prefetch, Q, When
@@ -12,6 +12,7 @@ from django.http import HttpResponse, FileResponse
 
 from admission.models import Applicant
 from core.reports import ReportFileOutput
+from core.typings import assert_never
 from courses.constants import SemesterTypes
 from courses.models import Course, MetaCourse, Semester, CourseDurations
 from courses.selectors import course_teachers_prefetch_queryset
@@ -128,6 +129,10 @@ class ProgressReport:
     """
 
     __metaclass__ = ABCMeta
+    # Values of these fields are exported for each course column
+    course_value_fields: Tuple[str, ...] = ("grade", "teachers")
+    # Enrollments are pivoted to the course columns by this frame column
+    course_pivot_column = "meta_course_id"
 
     def __init__(
         self,
@@ -195,113 +200,174 @@ class ProgressReport:
 
     def generate(self, queryset=None) -> DataFrame:
         student_profiles = queryset or self.get_queryset()
+        context = self.get_context(student_profiles)
+        headers = self._generate_headers(**context)
+        data = [self._export_row(student_profile, **context)
+                for student_profile in student_profiles]
+        return DataFrame.from_records(columns=headers, data=data, index="ID")
+
+    def get_context(self, student_profiles) -> Dict[str, Any]:
+        """
+        Resolves course duplicates and builds course columns for all
+        students at once. Result is passed to `._generate_headers` and
+        `._export_row` as keyword arguments.
+        """
+        students = [sp.user for sp in student_profiles]
         # It's possible to prefetch all related courses but nested
         # .prefetch_related() for course teachers is extremely slow
-        students = (sp.user for sp in student_profiles)
         unique_courses: Dict[int, Course] = {
             c.pk: c for c in self.get_courses_queryset(students)
         }
-        unique_meta_courses: Dict[int, MetaCourse] = {}
+        enrollments = self.get_enrollments_frame(students, unique_courses)
+        self.process_enrollments(enrollments, students)
+        enrollments = enrollments[~self.skip_enrollments(enrollments)]
+        enrollments = self.resolve_course_duplicates(enrollments)
+        success_total = (enrollments[enrollments["is_satisfactory"]]
+                         .groupby("student_id").size())
+        # Alphabetically sort meta courses by name
+        meta_course_list = [unique_courses[course_id].meta_course for course_id
+                            in enrollments.drop_duplicates("meta_course_id")["course_id"]]
+        meta_course_list.sort(key=lambda mc: (mc.name, mc.pk))
+        meta_courses: Dict[int, MetaCourse] = {mc.pk: mc for mc in meta_course_list}
+        course_values = self.get_course_values(enrollments, unique_courses,
+                                               meta_courses)
+        empty_values = [""] * len(course_values.columns)
+        course_rows = dict(zip(course_values.index, course_values.values.tolist()))
         # Aggregate max number of courses for each type. Result headers
         # depend on these values.
         shads_max, online_max, projects_max = 0, 0, 0
-        for student_profile in student_profiles:
-            student_account = student_profile.user
-            self.process_student(student_account, unique_courses, unique_meta_courses)
-            shads_max = max(shads_max, len(student_account.shads))
-            online_max = max(online_max, len(student_account.online_courses))
-            projects_max = max(projects_max, len(student_account.projects_progress))
+        for student in students:
+            student.course_values = course_rows.get(student.pk, empty_values)
+            student.success_enrollments_total = int(success_total.get(student.pk, 0))
+            self.process_student(student)
+            shads_max = max(shads_max, len(student.shads))
+            online_max = max(online_max, len(student.online_courses))
+            projects_max = max(projects_max, len(student.projects_progress))
+        return {
+            "courses": unique_courses,
+            "meta_courses": meta_courses,
+            "shads_max": shads_max,
+            "online_max": online_max,
+            "projects_max": projects_max,
+        }
 
-        # Alphabetically sort meta courses by name
-        meta_course_names = [(mc.name, mc.pk) for mc in unique_meta_courses.values()]
-        meta_course_names.sort()
-        meta_courses: Dict[int, MetaCourse] = {}
-        for _, pk in meta_course_names:
-            meta_courses[pk] = unique_meta_courses[pk]
-
-        headers = self._generate_headers(
-            courses=unique_courses,
-            meta_courses=meta_courses,
-            shads_max=shads_max,
-            online_max=online_max,
-            projects_max=projects_max,
-        )
+    def get_enrollments_frame(self, students, courses: Dict[int, Course]) -> DataFrame:
+        """
+        Returns one row per prefetched enrollment, course attributes are
+        joined from the courses frame.
+        """
+        enrollments = DataFrame.from_records(
+            [(student.pk, e.course_id, e.grade)
+             for student in students for e in student.enrollments_progress],
+            columns=["student_id", "course_id", "grade"])
+        # Original order is used to break ties
+        enrollments["position"] = range(len(enrollments))
+        courses_frame = DataFrame.from_records(
+            [(c.pk, c.meta_course_id, c.semester_id, c.semester.index,
+              c.is_club_course) for c in courses.values()],
+            columns=["course_id", "meta_course_id", "semester_id",
+                     "semester_index", "is_club_course"])
+        enrollments = enrollments.merge(courses_frame, on="course_id", how="inner")
+        satisfactory_grades = list(GradeTypes.satisfactory_grades)
+        enrollments["is_satisfactory"] = enrollments["grade"].isin(satisfactory_grades)
+        return enrollments.sort_values("position", kind="stable")
+
+    def process_enrollments(self, enrollments: DataFrame, students) -> None:
+        """
+        Hook for collecting stats. Called with all enrollments before
+        .skip_enrollments method.
+        """
+        pass
 
-        data = []
-        for student_profile in student_profiles:
-            row = self._export_row(
-                student_profile,
-                courses=unique_courses,
-                meta_courses=meta_courses,
-                shads_max=shads_max,
-                online_max=online_max,
-                projects_max=projects_max,
-            )
-            data.append(row)
-        return DataFrame.from_records(columns=headers, data=data, index="ID")
+    def skip_enrollments(self, enrollments: DataFrame) -> Series:
+        """Returns mask of enrollments excluded from the course columns."""
+        return Series(False, index=enrollments.index, dtype=bool)
 
-    def process_student(self, student, unique_courses, unique_meta_courses):
-        grades: Dict[int, Enrollment] = {}
-        for enrollment in student.enrollments_progress:
-            self.before_skip_enrollment(enrollment, student, unique_courses)
-            if self.skip_enrollment(enrollment, student, unique_courses):
-                continue
-            course = unique_courses[enrollment.course_id]
-            meta_course_id = course.meta_course_id
-            unique_meta_courses[meta_course_id] = course.meta_course
-            if meta_course_id in grades:
-                current_enrollment = grades[meta_course_id]
-                # Store the latest satisfactory grade
-                if self.on_course_duplicate == "store_last":
-                    current_course = unique_courses[current_enrollment.course_id]
-                    is_current_grade_satisfactory = (
-                        current_enrollment.grade in GradeTypes.satisfactory_grades
-                    )
-                    is_grade_satisfactory = (
-                        enrollment.grade in GradeTypes.satisfactory_grades
-                    )
-                    is_grade_newer = (
-                        course.semester.index > current_course.semester.index
-                    )
-                    if is_grade_satisfactory and (
-                        is_grade_newer or not is_current_grade_satisfactory
-                    ):
-                        grades[meta_course_id] = enrollment
-                # Stores the highest grade
-                elif self.on_course_duplicate == "store_max":
-                    # The behavior is not specified if different grading systems were
-                    # used in different terms (e.g. 10-point scale and binary)
-                    if grade_to_mark(enrollment.grade) > grade_to_mark(
-                        current_enrollment.grade
-                    ):
-                        grades[meta_course_id] = enrollment
-            else:
-                grades[meta_course_id] = enrollment
-        student.unique_enrollments = grades
-
-    def before_skip_enrollment(self, enrollment, student, courses) -> None:
+    def resolve_course_duplicates(self, enrollments: DataFrame) -> DataFrame:
+        """
+        Keeps one enrollment for each (student, meta course) pair.
+        """
+        if self.on_course_duplicate == "store_last":
+            # The latest satisfactory grade or the first one if student
+            # has no satisfactory grades for the course
+            enrollments = enrollments.assign(
+                rank=enrollments["semester_index"].where(
+                    enrollments["is_satisfactory"], -1))
+            sort_by = ["rank", "position"]
+            ascending = [False, True]
+        elif self.on_course_duplicate == "store_max":
+            # The behavior is not specified if different grading systems were
+            # used in different terms (e.g. 10-point scale and binary)
+            marks = {g: grade_to_mark(g) for g in enrollments["grade"].unique()}
+            enrollments = enrollments.assign(
+                rank=enrollments["grade"].map(marks))
+            sort_by = ["rank", "position"]
+            ascending = [False, True]
+        else:
+            assert_never(self.on_course_duplicate)
+        return (enrollments
+                .sort_values(sort_by, ascending=ascending, kind="stable")
+                .drop_duplicates(["student_id", "meta_course_id"])
+                .drop(columns="rank")
+                .sort_values("position", kind="stable"))
+
+    def get_course_columns(self, meta_courses) -> List[int]:
+        """Returns values of the `course_pivot_column` in header order."""
+        return list(meta_courses)
+
+    def get_course_values(self, enrollments: DataFrame, courses: Dict[int, Course],
+                          meta_courses) -> DataFrame:
         """
-        Hook for collecting stats. Called before .skip_enrollment method.
+        Returns wide table indexed by student id with
+        `course_value_fields` for each course column.
         """
+        fields = list(self.course_value_fields)
+        columns = MultiIndex.from_product(
+            [self.get_course_columns(meta_courses), fields])
+        if enrollments.empty or not len(columns):
+            return DataFrame(columns=columns)
+        enrollments = enrollments.assign(
+            **{field: self.get_course_field_values(field, enrollments, courses)
+               for field in fields})
+        wide = enrollments.pivot(index="student_id",
+                                 columns=self.course_pivot_column, values=fields)
+        return (wide
+                .swaplevel(axis=1)
+                .reindex(columns=columns)
+                .fillna(""))
+
+    def get_course_field_values(self, field, enrollments: DataFrame,
+                                courses: Dict[int, Course]) -> Series:
+        if field == "grade":
+            # Grade getter could depend on the course settings, call it
+            # once for each unique (course, grade) pair
+            pairs = enrollments[["course_id", "grade"]].drop_duplicates()
+            labels = {
+                (course_id, grade): str(self.grade_getter(
+                    Enrollment(course=courses[course_id], grade=grade))).lower()
+                for course_id, grade in pairs.itertuples(index=False)
+            }
+            return Series([labels[pair] for pair in zip(enrollments["course_id"],
+                                                        enrollments["grade"])],
+                          index=enrollments.index, dtype=object)
+        elif field == "teachers":
+            teachers = {
+                course_id: ", ".join(ct.teacher.get_abbreviated_name()
+                                     for ct in course.course_teachers.all())
+                for course_id, course in courses.items()
+            }
+            return enrollments["course_id"].map(teachers)
+        elif field == "semester":
+            return enrollments["course_id"].map(
+                {course_id: c.semester for course_id, c in courses.items()})
+        raise ValueError(f"Unknown course field {field}")
+
+    def process_student(self, student) -> None:
+        """Hook for collecting stats not related to the enrollments."""
         pass
 
-    def skip_enrollment(self, enrollment, student, courses):
-        return False
-
     def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        step = 2  # Number of columns for each course
-        values = [""] * len(meta_courses) * step
-        for i, meta_course_id in enumerate(meta_courses):
-            if meta_course_id in student.unique_enrollments:
-                enrollment = student.unique_enrollments[meta_course_id]
-                course = courses[enrollment.course_id]
-                teachers = ", ".join(
-                    ct.teacher.get_abbreviated_name()
-                    for ct in course.course_teachers.all()
-                )
-                values[i * step] = self.grade_getter(enrollment).lower()
-                values[i * step + 1] = teachers
-        return values
+        return student.course_values
 
     def _export_projects(self, student, projects_max) -> List[str]:
         step = 4  # Number of columns for each project
@@ -336,6 +402,8 @@ class ProgressReport:
 
 
 class FutureGraduateDiplomasReport(ProgressReport):
+    course_value_fields = ("grade", "teachers", "semester")
+
     def __init__(self, branch, **kwargs):
         super().__init__(**kwargs)
         self.branch = branch
@@ -451,22 +519,6 @@ class FutureGraduateDiplomasReport(ProgressReport):
             *self._export_projects(student, projects_max),
         ]
 
-    def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        step = 3  # Number of columns for each course
-        values = [""] * len(meta_courses) * step
-        for i, meta_course_id in enumerate(meta_courses):
-            if meta_course_id in student.unique_enrollments:
-                enrollment = student.unique_enrollments[meta_course_id]
-                course = courses[enrollment.course_id]
-                teachers = ", ".join(
-                    ct.teacher.get_abbreviated_name()
-                    for ct in course.course_teachers.all()
-                )
-                values[i * step] = self.grade_getter(enrollment).lower()
-                values[i * step + 1] = teachers
-                values[i * step + 2] = course.semester
-        return values
-
     def _export_shad_courses(self, student, shads_max) -> List[str]:
         step = 4  # Number of columns for each shad course
         values = [""] * shads_max * step
@@ -479,70 +531,29 @@ class FutureGraduateDiplomasReport(ProgressReport):
 
     @staticmethod
     def passed_courses_total(student, courses):
-        center = 0
-        club = 0
+        # Center and club courses
+        enrollments = student.success_enrollments_total
         shad = 0
         online = len(student.online_courses)
-        for enrollment in student.unique_enrollments.values():
-            if enrollment.grade in GradeTypes.satisfactory_grades:
-                course = courses[enrollment.course_id]
-                if course.is_club_course:
-                    club += 1
-                else:
-                    center += 1
         for course in student.shads:
             shad += int(course.grade in GradeTypes.satisfactory_grades)
-        return center + club + shad + online
+        return enrollments + shad + online
 
 
 class OfficialDiplomasReport(ProgressReport):
+    course_value_fields = ("grade",)
+
     def __init__(self, diploma_issued_on, **kwargs):
         super().__init__(**kwargs)
         self.diploma_issued_on = diploma_issued_on
 
-    def generate(self, queryset=None) -> DataFrame:
-        student_profiles = queryset or self.get_queryset()
-        # It's possible to prefetch all related courses but nested
-        # .prefetch_related() is extremely slow, that's why we use map instead
-        students = (sp.user for sp in student_profiles)
-        unique_courses: Dict[int, Course] = {}
-        for c in self.get_courses_queryset(students):
-            unique_courses[c.pk] = c
-
-        unique_meta_courses: Dict[int, MetaCourse] = {}
+    def get_context(self, student_profiles) -> Dict[str, Any]:
+        context = super().get_context(student_profiles)
         unique_shad_courses: Set[str] = set()
-        # Aggregate max number of courses for each type. Result headers
-        # depend on these values.
-        shads_max, online_max, projects_max = 0, 0, 0
-        for student_profile in student_profiles:
-            student = student_profile.user
-            self.process_student(student, unique_courses, unique_meta_courses)
-            self.process_shad(student, unique_shad_courses)
-            shads_max = max(shads_max, len(student.shads))
-            online_max = max(online_max, len(student.online_courses))
-            projects_max = max(projects_max, len(student.projects_progress))
-
-        headers = self._generate_headers(
-            courses=unique_courses,
-            meta_courses=unique_meta_courses,
-            shad_courses=unique_shad_courses,
-            shads_max=shads_max,
-            online_max=online_max,
-            projects_max=projects_max,
-        )
-        data = []
         for student_profile in student_profiles:
-            row = self._export_row(
-                student_profile,
-                courses=unique_courses,
-                meta_courses=unique_meta_courses,
-                shad_courses=unique_shad_courses,
-                shads_max=shads_max,
-                online_max=online_max,
-                projects_max=projects_max,
-            )
-            data.append(row)
-        return DataFrame.from_records(columns=headers, data=data, index="ID")
+            self.process_shad(student_profile.user, unique_shad_courses)
+        context["shad_courses"] = unique_shad_courses
+        return context
 
     def get_queryset(self):
         exclude_grades = [*GradeTypes.unsatisfactory_grades, *GradeTypes.unset_grades]
@@ -638,14 +649,6 @@ class OfficialDiplomasReport(ProgressReport):
             *self._export_projects(student, projects_max),
         ]
 
-    def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        values = [""] * len(meta_courses)
-        for i, meta_course_id in enumerate(meta_courses):
-            if meta_course_id in student.unique_enrollments:
-                enrollment = student.unique_enrollments[meta_course_id]
-                values[i] = self.grade_getter(enrollment).lower()
-        return values
-
     def _export_projects(self, student, projects_max) -> List[str]:
         values = [""] * projects_max
         for i, ps in enumerate(student.projects_progress):
@@ -661,10 +664,9 @@ class OfficialDiplomasReport(ProgressReport):
                 values[i] = course.grade_display.lower()
         return values
 
-    def skip_enrollment(self, enrollment, student, courses):
+    def skip_enrollments(self, enrollments: DataFrame) -> Series:
         """Skip club courses"""
-        course = courses[enrollment.course_id]
-        return course.is_club_course
+        return enrollments["is_club_course"]
 
     def process_shad(self, student, unique_shad_courses):
         student_shad_courses = set(c.name for c in student.shads)
@@ -672,6 +674,8 @@ class OfficialDiplomasReport(ProgressReport):
 
 
 class ProgressReportFull(ProgressReport):
+    course_value_fields = ("grade",)
+
     def get_queryset(self, base_queryset=None):
         enrollments_prefetch = get_enrollments_progress(
             lookup="user__enrollment_set",
@@ -905,14 +909,6 @@ class ProgressReportFull(ProgressReport):
             *self._export_online_courses(student_account, online_max),
         ]
 
-    def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        values = [""] * len(meta_courses)
-        for i, meta_course_id in enumerate(meta_courses):
-            if meta_course_id in student.unique_enrollments:
-                enrollment = student.unique_enrollments[meta_course_id]
-                values[i] = self.grade_getter(enrollment).lower()
-        return values
-
 
 class ProgressReportForSemester(ProgressReport):
     """
@@ -921,6 +917,7 @@ class ProgressReportForSemester(ProgressReport):
     Exported data contains club and center courses if target term already
     passed and additionally shad- and online-courses if target term is current.
     """
+    course_value_fields = ("grade",)
 
     def __init__(self, term):
         self.target_semester = term
@@ -967,16 +964,7 @@ class ProgressReportForSemester(ProgressReport):
             .order_by("user__last_name", "user__first_name", "user__pk")
         )
 
-    def process_student(self, student, unique_courses, unique_meta_courses):
-        student.enrollments_eq_target_semester = 0
-        # During one term student can't enroll on 1 course twice, but for
-        # previous terms we should consider this situation and count only
-        # unique course ids
-        student.success_eq_target_semester = 0
-        student.success_lt_target_semester = set()
-        # Process enrollments
-        super().process_student(student, unique_courses, unique_meta_courses)
-        student.success_lt_target_semester = len(student.success_lt_target_semester)
+    def process_student(self, student):
         # Shad courses stats
         student.shad_eq_target_semester = 0
         student.success_shad_eq_target_semester = 0
@@ -1014,21 +1002,27 @@ class ProgressReportForSemester(ProgressReport):
             success_external_projects_lt_target_semester
         )
 
-    def before_skip_enrollment(self, enrollment: Enrollment, student, courses):
+    def process_enrollments(self, enrollments: DataFrame, students) -> None:
         """Count stats for enrollments from the passed terms."""
-        course = courses[enrollment.course_id]
-        if course.semester_id == self.target_semester.pk:
-            student.enrollments_eq_target_semester += 1
-            if enrollment.grade in GradeTypes.satisfactory_grades:
-                student.success_eq_target_semester += 1
-        else:
-            if enrollment.grade in GradeTypes.satisfactory_grades:
-                student.success_lt_target_semester.add(course.meta_course_id)
+        is_target_semester = enrollments["semester_id"] == self.target_semester.pk
+        is_satisfactory = enrollments["is_satisfactory"]
+        enrollments_eq = (enrollments[is_target_semester]
+                          .groupby("student_id").size())
+        success_eq = (enrollments[is_target_semester & is_satisfactory]
+                      .groupby("student_id").size())
+        # During one term student can't enroll on 1 course twice, but for
+        # previous terms we should consider this situation and count only
+        # unique course ids
+        success_lt = (enrollments[~is_target_semester & is_satisfactory]
+                      .groupby("student_id")["meta_course_id"].nunique())
+        for student in students:
+            student.enrollments_eq_target_semester = int(enrollments_eq.get(student.pk, 0))
+            student.success_eq_target_semester = int(success_eq.get(student.pk, 0))
+            student.success_lt_target_semester = int(success_lt.get(student.pk, 0))
 
-    def skip_enrollment(self, enrollment: Enrollment, student, courses):
+    def skip_enrollments(self, enrollments: DataFrame) -> Series:
         """Show enrollments for the target term only."""
-        course = courses[enrollment.course_id]
-        return course.semester_id != self.target_semester.pk
+        return enrollments["semester_id"] != self.target_semester.pk
 
     def _generate_headers(
         self, *, courses, meta_courses, shads_max, online_max, projects_max
@@ -1139,16 +1133,10 @@ class ProgressReportForSemester(ProgressReport):
             *self._export_online_courses(student, online_max),
         ]
 
-    def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        values = [""] * len(meta_courses)
-        for i, meta_course_id in enumerate(meta_courses):
-            if meta_course_id in student.unique_enrollments:
-                enrollment = student.unique_enrollments[meta_course_id]
-                values[i] = self.grade_getter(enrollment).lower()
-        return values
-
 
 class ProgressReportForInvitation(ProgressReportForSemester):
+    course_pivot_column = "course_id"
+
     def __init__(self, invitation):
         self.invitation = invitation
         term = invitation.semester
@@ -1281,15 +1269,8 @@ class ProgressReportForInvitation(ProgressReportForSemester):
             *self._export_online_courses(student, online_max),
         ]
 
-    def _export_courses(self, student, courses, meta_courses) -> List[str]:
-        course_grades = {course.course_id: "" for course in self.course_invitations}
-        
-        for enrollment in student.unique_enrollments.values():
-            if enrollment.course_id in course_grades:
-                course_grades[enrollment.course_id] = self.grade_getter(enrollment).lower()
-        
-        values = [course_grades[ci.course_id] for ci in self.course_invitations]
-        return values
+    def get_course_columns(self, meta_courses) -> List[int]:
+        return [ci.course_id for ci in self.course_invitations]
 
 
 class WillGraduateStatsReport(ReportFileOutput):
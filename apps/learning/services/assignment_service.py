@@ -1,18 +1,100 @@
 from datetime import timedelta
-from itertools import islice
-from typing import Iterable, List, Optional, Union
+from typing import Any, Iterable, List, NamedTuple, Tuple, Union
 
 from django.core.files.uploadedfile import UploadedFile
-from django.db import router
-from django.db.models import Avg, Q
+from django.db import connection, router, transaction
+from django.db.models import Avg, Q, QuerySet
+from django.utils import timezone
 
 from core.services import SoftDeleteService
+from courses.constants import AssignmentStatus
 from courses.models import Assignment, AssignmentAttachment, CourseTeacher
 from learning.models import (
-    AssignmentNotification, Enrollment, StudentAssignment, StudentGroup
+    AssignmentComment, AssignmentGroup, AssignmentNotification, Enrollment,
+    StudentAssignment, StudentGroup
 )
-from learning.services.notification_service import notify_student_new_assignment
+from learning.services.check_queue_service import update_check_queue_on_commit
 from learning.settings import EnrollmentTypes, GradeTypes, StudentStatuses
+from notifications.cache import invalidate_unread_notifications_cache
+
+
+class StudentAssignmentFanOut(NamedTuple):
+    created: int
+    restored: int
+    notified: int
+
+
+def _fan_out_student_assignments_sql(assignments: QuerySet, enrollments: QuerySet, *,
+                                     notify: bool) -> Tuple[str, List[Any]]:
+    """
+    Personal assignments are created with INSERT ... SELECT from the
+    enrollments available for the assignment, soft deleted records are
+    restored with a single UPDATE along with comments deleted at the same
+    time. Returns ids of the created and restored records, the number of
+    restored comments and recipients of the notifications.
+    """
+    sa_table = StudentAssignment._meta.db_table
+    assignment_table = Assignment._meta.db_table
+    enrollment_table = Enrollment._meta.db_table
+    restricted_to_table = AssignmentGroup._meta.db_table
+    comment_table = AssignmentComment._meta.db_table
+    notification_table = AssignmentNotification._meta.db_table
+    assignments_sql, assignments_params = assignments.order_by().values('pk').query.sql_with_params()
+    enrollments_sql, enrollments_params = enrollments.order_by().values('pk').query.sql_with_params()
+    now = timezone.now()
+    sql = (f'WITH targets AS ('
+           f' SELECT a.id AS assignment_id, e.student_id, '
+           f' (e.grade <> %s AND NOT e.is_grade_recredited AND e.type <> %s) AS can_submit '
+           f' FROM "{assignment_table}" AS a '
+           f' INNER JOIN "{enrollment_table}" AS e ON e.course_id = a.course_id '
+           f' WHERE a.id IN ({assignments_sql}) AND e.id IN ({enrollments_sql}) '
+           f' AND (NOT EXISTS (SELECT 1 FROM "{restricted_to_table}" AS ag '
+           f'                  WHERE ag.assignment_id = a.id) '
+           f'      OR e.student_group_id IN (SELECT ag.group_id FROM "{restricted_to_table}" AS ag '
+           f'                                WHERE ag.assignment_id = a.id))), '
+           f'trashed AS ('
+           f' SELECT sa.id, sa.deleted_at FROM "{sa_table}" AS sa '
+           f' INNER JOIN targets AS t '
+           f'  ON t.assignment_id = sa.assignment_id AND t.student_id = sa.student_id '
+           f' WHERE sa.deleted_at IS NOT NULL), '
+           f'restored AS ('
+           f' UPDATE "{sa_table}" AS sa SET deleted_at = NULL, modified = %s '
+           f' FROM trashed WHERE sa.id = trashed.id '
+           f' RETURNING sa.id, sa.assignment_id, sa.student_id), '
+           f'restored_comments AS ('
+           f' UPDATE "{comment_table}" AS c SET deleted_at = NULL '
+           f' FROM trashed '
+           f' WHERE c.student_assignment_id = trashed.id AND c.deleted_at = trashed.deleted_at '
+           f' RETURNING c.id), '
+           f'created AS ('
+           f' INSERT INTO "{sa_table}" (created, modified, assignment_id, student_id, '
+           f'                          status, score_changed, trigger_auto_assign) '
+           f' SELECT %s, %s, t.assignment_id, t.student_id, %s, %s, TRUE '
+           f' FROM targets AS t '
+           f' WHERE NOT EXISTS (SELECT 1 FROM "{sa_table}" AS sa '
+           f'                   WHERE sa.assignment_id = t.assignment_id '
+           f'                     AND sa.student_id = t.student_id) '
+           f' ON CONFLICT (assignment_id, student_id) DO NOTHING '
+           f' RETURNING id, assignment_id, student_id), '
+           f'changed AS (SELECT * FROM restored UNION ALL SELECT * FROM created), '
+           f'notified AS ('
+           f' INSERT INTO "{notification_table}" (created, modified, user_id, student_assignment_id, '
+           f'                                    is_about_passed, is_about_creation, '
+           f'                                    is_about_deadline, is_unread, is_notified) '
+           f' SELECT %s, %s, changed.student_id, changed.id, FALSE, TRUE, FALSE, TRUE, FALSE '
+           f' FROM changed INNER JOIN targets AS t USING (assignment_id, student_id) '
+           f' WHERE t.can_submit AND %s '
+           f' RETURNING user_id) '
+           f'SELECT ARRAY(SELECT id FROM created), ARRAY(SELECT id FROM restored), '
+           f'(SELECT COUNT(*) FROM restored_comments), '
+           f'ARRAY(SELECT DISTINCT user_id FROM notified)')
+    params = [GradeTypes.RE_CREDIT, EnrollmentTypes.LECTIONS_ONLY]
+    params.extend(assignments_params)
+    params.extend(enrollments_params)
+    params.extend([now,
+                   now, now, AssignmentStatus.NOT_SUBMITTED, now,
+                   now, now, notify])
+    return sql, params
 
 
 class AssignmentService:
@@ -30,34 +112,44 @@ class AssignmentService:
         assignment.assignees.add(*teachers)
 
     @classmethod
-    def create_or_restore_student_assignment(cls, assignment: Assignment,
-                                             enrollment: Enrollment) -> Optional[StudentAssignment]:
-        """
-        Creates or restores record for tracking student progress on assignment
-        if the assignment is not restricted for the student's group.
+    def fan_out_student_assignments(cls, assignments: QuerySet,
+                                    enrollments: QuerySet, *,
+                                    notify: bool = True) -> StudentAssignmentFanOut:
         """
-        restricted_to = list(sg.pk for sg in assignment.restricted_to.all())
-        if restricted_to and enrollment.student_group_id not in restricted_to:
-            return None
-        student_assignment, _ = StudentAssignment.base.update_or_create(
-            assignment=assignment, student_id=enrollment.student_id,
-            # FIXME: is it really necessary to reset score and execution_time?
-            defaults={'deleted_at': None, 'score': None, 'execution_time': None})
-        return student_assignment
+        Creates missing or restores soft deleted personal assignments for
+        each enrollment from the course of the assignment if the assignment
+        is not restricted for the student's group. Everything is done in
+        a single statement, see `_fan_out_student_assignments_sql`.
 
-    @classmethod
-    def _restore_student_assignments(cls, assignment: Assignment,
-                                     student_ids: Iterable[int]):
-        qs = (StudentAssignment.trash
-              .filter(assignment=assignment, student_id__in=student_ids))
-        for student_assignment in qs:
-            # TODO: reset score? execution_time?
-            student_assignment.restore()
+        Notifications about new assignment are generated for created and
+        restored records if the student can submit the assignment.
+        """
+        sql, params = _fan_out_student_assignments_sql(assignments, enrollments,
+                                                       notify=notify)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                created, restored, comments_restored, notified = cursor.fetchone()
+            changed = [*created, *restored]
+            if comments_restored:
+                # Restored comments are not taken into account in stats
+                from learning.services.personal_assignment_service import (
+                    bulk_recalculate_personal_assignment_stats
+                )
+                bulk_recalculate_personal_assignment_stats(
+                    StudentAssignment.objects.filter(pk__in=restored))
+            if changed:
+                update_check_queue_on_commit(Q(pk__in=changed))
+        # Cache is invalidated on commit of the outer transaction
+        invalidate_unread_notifications_cache(notified)
+        return StudentAssignmentFanOut(created=len(created),
+                                       restored=len(restored),
+                                       notified=len(notified))
 
     # TODO: send notification to teachers
     @classmethod
     def bulk_create_student_assignments(cls, assignment: Assignment,
-                                        for_groups: Iterable[Union[int, None]] = None):
+                                        for_groups: Iterable[Union[int, None]] = None) -> StudentAssignmentFanOut:
         """
         Generates personal assignments to store student progress.
         By default it creates record for each enrolled student who's not
@@ -74,58 +166,18 @@ class AssignmentService:
             Q(course_id=assignment.course_id),
             ~Q(student_profile__status__in=StudentStatuses.inactive_statuses)
         ]
-        restrict_to = list(sg.pk for sg in assignment.restricted_to.all())
-        # Filter out enrollments not in the targeted course groups
+        # Enrollments not in the targeted course groups are filtered out
+        # by the fan-out statement
         if for_groups is not None:
             has_null = None in for_groups
-            if restrict_to:
-                for_groups = [pk for pk in for_groups if pk in restrict_to]
             # Queryset should be empty if `for_groups` is an empty list
-            groups_q = Q(student_group_id__in=for_groups)
+            groups_q = Q(student_group_id__in=[pk for pk in for_groups if pk is not None])
             if has_null:
                 groups_q |= Q(student_group__isnull=True)
             filters.append(groups_q)
-        elif restrict_to:
-            filters.append(Q(student_group_id__in=restrict_to))
-        students = list(Enrollment.active
-                        .filter(*filters)
-                        .values_list("student_id", flat=True))
-        # Records could exist in case of transferring students from one
-        # group to another
-        already_exist = set(StudentAssignment.objects
-                            .filter(assignment=assignment, student__in=students)
-                            .values_list('student_id', flat=True))
-        # Restore personal assignments
-        in_trash = set(StudentAssignment.trash
-                       .filter(assignment=assignment, student__in=students)
-                       .values_list('student_id', flat=True))
-        if in_trash:
-            cls._restore_student_assignments(assignment, in_trash)
-        # Create personal assignments if necessary
-        already_created = already_exist | in_trash
-        batch_size = 100
-        to_create = (sid for sid in students if sid not in already_created)
-        objs = (StudentAssignment(assignment=assignment, student_id=student_id)
-                for student_id in to_create)
-        while True:
-            batch = list(islice(objs, batch_size))
-            if not batch:
-                break
-            StudentAssignment.objects.bulk_create(batch, batch_size)
-        # TODO: move to the separated method
-        # Generate notifications
-        to_notify = [sid for sid in students if sid not in already_exist]
-        created = (StudentAssignment.objects.can_be_submitted()
-                   .filter(assignment=assignment, student_id__in=to_notify)
-                   .values_list('pk', 'student_id', named=True))
-        objs = (notify_student_new_assignment(sa, commit=False) for sa
-                in created)
-        batch_size = 100
-        while True:
-            batch = list(islice(objs, batch_size))
-            if not batch:
-                break
-            AssignmentNotification.objects.bulk_create(batch, batch_size)
+        enrollments = Enrollment.active.filter(*filters)
+        assignments = Assignment.objects.filter(pk=assignment.pk)
+        return cls.fan_out_student_assignments(assignments, enrollments)
 
     @classmethod
     def bulk_remove_student_assignments(cls, assignment: Assignment,
@@ -159,9 +211,11 @@ class AssignmentService:
         using = router.db_for_write(StudentAssignment)
         SoftDeleteService(using).delete(student_assignments)
         # Hard delete notifications
-        (AssignmentNotification.objects
-         .filter(student_assignment__in=student_assignments)
-         .delete())
+        notifications = (AssignmentNotification.objects
+                         .filter(student_assignment__in=student_assignments))
+        recipients = set(notifications.values_list('user_id', flat=True))
+        notifications.delete()
+        invalidate_unread_notifications_cache(recipients)
 
     @classmethod
     def sync_student_assignments(cls, assignment: Assignment):
@@ -0,0 +1,126 @@
+"""
+Teacher's assignments check queue is served from the denormalized
+`AssignmentCheckQueueItem` table. Items are rebuilt from personal
+assignments, enrollments and student profiles with a single
+`INSERT ... SELECT ... ON CONFLICT DO UPDATE` statement on each change
+of the source records.
+"""
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+
+from courses.constants import AssignmentStatus
+from courses.models import Assignment, Course
+from learning.models import AssignmentCheckQueueItem, Enrollment, StudentAssignment
+from learning.settings import EnrollmentTypes, GradeTypes
+from users.models import StudentProfile
+
+# Personal assignments of students who can't submit assignments anymore
+# are still visible if they need the teacher's attention
+CHECK_QUEUE_GRADED_STATUSES = (AssignmentStatus.NEED_FIXES,
+                               AssignmentStatus.COMPLETED)
+CHECK_QUEUE_PAGE_SIZE = 100
+CHECK_QUEUE_MAX_PAGE_SIZE = 500
+
+
+def _upsert_check_queue_items_sql(personal_assignments: QuerySet) -> Tuple[str, List[Any]]:
+    table = AssignmentCheckQueueItem._meta.db_table
+    sa_table = StudentAssignment._meta.db_table
+    assignment_table = Assignment._meta.db_table
+    enrollment_table = Enrollment._meta.db_table
+    profile_table = StudentProfile._meta.db_table
+    pks_sql, pks_params = personal_assignments.order_by().values('pk').query.sql_with_params()
+    columns = ['course_id', 'assignment_id', 'student_id', 'status',
+               'assignee_id', 'student_group_id', 'year_of_curriculum',
+               'solution_at', 'is_enrolled', 'can_submit']
+    update_columns = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns)
+    sql = (f'INSERT INTO "{table}" ("student_assignment_id", {", ".join(columns)}) '
+           f'SELECT sa.id, a.course_id, sa.assignment_id, sa.student_id, '
+           f'sa.status, sa.assignee_id, e.student_group_id, '
+           f'(SELECT sp.year_of_curriculum FROM "{profile_table}" AS sp '
+           f' WHERE sp.user_id = sa.student_id AND sp.site_id = %s '
+           f' ORDER BY sp.priority, sp.year_of_admission DESC, sp.id DESC '
+           f' LIMIT 1), '
+           f"COALESCE(sa.meta #>> '{{stats,solutions,last}}', "
+           f"         sa.meta #>> '{{stats,solutions,first}}')::timestamptz, "
+           f'COALESCE(NOT e.is_deleted, FALSE), '
+           f'COALESCE(NOT e.is_deleted AND e.grade <> %s '
+           f'         AND NOT e.is_grade_recredited AND e.type <> %s, FALSE) '
+           f'FROM "{sa_table}" AS sa '
+           f'INNER JOIN "{assignment_table}" AS a ON a.id = sa.assignment_id '
+           f'LEFT OUTER JOIN "{enrollment_table}" AS e '
+           f' ON e.student_id = sa.student_id AND e.course_id = a.course_id '
+           f'WHERE sa.deleted_at IS NULL AND sa.id IN ({pks_sql}) '
+           f'ON CONFLICT ("student_assignment_id") DO UPDATE SET {update_columns}')
+    params = [settings.SITE_ID, GradeTypes.RE_CREDIT, EnrollmentTypes.LECTIONS_ONLY]
+    params.extend(pks_params)
+    return sql, params
+
+
+def update_check_queue(filters: Q) -> int:
+    """
+    Rebuilds check queue items of personal assignments matching the filters,
+    items of soft deleted personal assignments are removed.
+    Returns the number of inserted or updated items.
+    """
+    personal_assignments = StudentAssignment.base.filter(filters)
+    with transaction.atomic():
+        (AssignmentCheckQueueItem.objects
+         .filter(student_assignment__in=(personal_assignments
+                                         .filter(deleted_at__isnull=False)
+                                         .order_by()
+                                         .values('pk')))
+         .delete())
+        with connection.cursor() as cursor:
+            cursor.execute(*_upsert_check_queue_items_sql(personal_assignments))
+            return cursor.rowcount
+
+
+def update_check_queue_on_commit(filters: Q) -> None:
+    transaction.on_commit(partial(update_check_queue, filters))
+
+
+def get_check_queue_items(*, course: Course, filters: Dict[str, Any],
+                          after: Optional[int] = None,
+                          limit: int = CHECK_QUEUE_PAGE_SIZE) -> List[AssignmentCheckQueueItem]:
+    """
+    Returns page of the check queue items ordered by the personal assignment
+    id. Use id of the last item on the page as `after` value to get
+    the next page (keyset pagination).
+    """
+    queryset = (AssignmentCheckQueueItem.objects
+                .filter(Q(can_submit=True) | Q(status__in=CHECK_QUEUE_GRADED_STATUSES),
+                        course=course)
+                .select_related('student_assignment',
+                                'student_assignment__student',
+                                'student_assignment__assignee__teacher')
+                .order_by('student_assignment_id'))
+    if filters.get('assignments'):
+        queryset = queryset.filter(assignment_id__in=filters['assignments'])
+    if filters.get('statuses'):
+        queryset = queryset.filter(status__in=filters['statuses'])
+    assignees = filters.get('assignees')
+    if assignees:
+        assignees_q = Q(assignee_id__in=[a for a in assignees if a != 'unset'])
+        if 'unset' in assignees:
+            assignees_q |= Q(assignee__isnull=True)
+        queryset = queryset.filter(assignees_q)
+    if filters.get('student_groups'):
+        queryset = queryset.filter(student_group_id__in=filters['student_groups'])
+    if filters.get('program_years'):
+        queryset = queryset.filter(year_of_curriculum__in=filters['program_years'])
+    if after is not None:
+        queryset = queryset.filter(student_assignment_id__gt=after)
+    return list(queryset[:limit])
+
+
+def get_check_queue_program_years(course: Course) -> List[int]:
+    return list(AssignmentCheckQueueItem.objects
+                .filter(course=course, is_enrolled=True,
+                        year_of_curriculum__isnull=False)
+                .values_list('year_of_curriculum', flat=True)
+                .distinct()
+                .order_by('year_of_curriculum'))
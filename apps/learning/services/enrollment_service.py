@@ -1,19 +1,27 @@
 import datetime
-from typing import Any, Optional, Dict
+from typing import Any, Callable, Optional, Dict
 
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.db import transaction
-from django.db.models import Count, F, Func, OuterRef, Q, Subquery, TextField, Value
+from django.db.models import (
+    Case, Count, F, Func, OuterRef, Q, QuerySet, Subquery, TextField, Value, When
+)
 from django.db.models.functions import Coalesce, Concat
 from django.db.models.signals import post_save
 
-from core.timezone import now_local
+from core.timezone import get_now_utc, now_local
 from core.timezone.constants import DATE_FORMAT_RU
 from core.utils import normalize_yandex_login
-from courses.constants import AssignmentFormat
-from courses.models import Course, CourseGroupModes
-from learning.models import Enrollment, StudentGroup, EnrollmentGradeLog
+from courses.constants import AssignmentFormat, SemesterTypes
+from courses.models import Course, CourseGroupModes, Semester
+from learning.models import Enrollment, EnrollmentGradeLog, StudentAssignment, StudentGroup
 from learning.services import AssignmentService
+from learning.services.assignment_service import StudentAssignmentFanOut
+from learning.services.check_queue_service import update_check_queue_on_commit
+from learning.services.graduate_stats_service import (
+    invalidate_student_future_graduate_stats_on_commit,
+    invalidate_students_future_graduate_stats_on_commit
+)
 from learning.services.notification_service import (
     remove_course_notifications_for_student
 )
@@ -166,19 +174,34 @@ def update_course_listeners_count(course_id: int) -> None:
     )
 
 
-def recreate_assignments_for_student(enrollment: Enrollment) -> None:
+def recreate_assignments_for_student(enrollment: Enrollment) -> StudentAssignmentFanOut:
     """
     Resets progress for existing and creates missing assignments
     Adds a student to the gerrit project if the course has code review assignments
     """
-    has_code_review = False
-    for a in enrollment.course.assignment_set.all():
-        AssignmentService.create_or_restore_student_assignment(a, enrollment)
-        if a.submission_type == AssignmentFormat.CODE_REVIEW:
-            has_code_review = True
+    assignments = enrollment.course.assignment_set.all()
+    result = AssignmentService.fan_out_student_assignments(
+        assignments, Enrollment.objects.filter(pk=enrollment.pk), notify=False)
+    # Assignments restricted to the other student groups are not targeted
+    # by the fan-out, don't touch them either
+    targeted_assignments = (assignments
+                            .filter(Q(restricted_to__isnull=True) |
+                                    Q(restricted_to=enrollment.student_group_id))
+                            .values('pk'))
+    # FIXME: is it really necessary to reset score and execution_time?
+    (StudentAssignment.objects
+     .filter(assignment_id__in=targeted_assignments,
+             student_id=enrollment.student_id)
+     .update(score=None, execution_time=None,
+             score_changed=Case(When(score__isnull=True, then=F('score_changed')),
+                                default=Value(get_now_utc()))))
+    has_code_review = (assignments
+                       .filter(submission_type=AssignmentFormat.CODE_REVIEW)
+                       .exists())
     if has_code_review:
         from code_reviews.gerrit.tasks import add_student_to_gerrit_project
         transaction.on_commit(lambda: add_student_to_gerrit_project.delay(enrollment.pk))
+    return result
 
 
 def is_course_failed_by_student(course: Course, student: User,
@@ -214,6 +237,11 @@ def update_enrollment_grade(enrollment: Enrollment, *,
     if not updated:
         return False, enrollment
     enrollment.grade = new_grade
+    # Re-credited enrollment hides personal assignments from the check queue
+    update_check_queue_on_commit(Q(assignment__course_id=enrollment.course_id,
+                                   student_id=enrollment.student_id))
+    # Queryset update bypasses the post_save signal
+    invalidate_student_future_graduate_stats_on_commit(enrollment.student_id)
 
     log_entry = EnrollmentGradeLog(grade=new_grade,
                                    enrollment_id=enrollment.pk,
@@ -226,6 +254,53 @@ def update_enrollment_grade(enrollment: Enrollment, *,
     return True, enrollment
 
 
+UNGRADED_ENROLLMENTS_CHUNK_SIZE = 1000
+
+
+def get_ungraded_enrollments(site_domain: str, *,
+                             previous_terms: bool = False) -> QuerySet:
+    """
+    Returns not graded enrollments of the current term or enrollments
+    from Autumn 2020 till the previous term if *previous_terms* is True.
+    """
+    current_term = Semester.get_current()
+    enrollments = Enrollment.objects.filter(
+        grade=GradeTypes.NOT_GRADED,
+        student_profile__branch__site__domain=site_domain)
+    if previous_terms:
+        term = Semester.objects.get(year=2020, type=SemesterTypes.AUTUMN)
+        return enrollments.filter(course__semester__gte=term,
+                                  course__semester__lt=current_term)
+    return enrollments.filter(course__semester=current_term)
+
+
+def fail_ungraded_enrollments(enrollments: QuerySet, *,
+                              chunk_size: int = UNGRADED_ENROLLMENTS_CHUNK_SIZE,
+                              on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Sets unsatisfactory grade to not graded enrollments. Enrollments are
+    updated in chunks and the grade is checked again on update, so it's
+    safe to rerun after failure. Returns the number of updated enrollments.
+    """
+    ungraded = list(enrollments
+                    .filter(grade=GradeTypes.NOT_GRADED)
+                    .order_by('pk')
+                    .values_list('pk', 'student_id'))
+    total = len(ungraded)
+    graded = 0
+    for offset in range(0, total, chunk_size):
+        chunk = ungraded[offset:offset + chunk_size]
+        graded += (Enrollment.objects
+                   .filter(pk__in=[pk for pk, _ in chunk],
+                           grade=GradeTypes.NOT_GRADED)
+                   .update(grade=GradeTypes.UNSATISFACTORY))
+        invalidate_students_future_graduate_stats_on_commit(
+            student_id for _, student_id in chunk)
+        if on_progress is not None:
+            on_progress(offset + len(chunk), total)
+    return graded
+
+
 def get_enrollments_by_stepik_id(course: Course) -> Dict[str, Enrollment]:
     enrollments = (Enrollment.active
                    .filter(course=course)
@@ -0,0 +1,292 @@
+"""
+Statistics on students who will graduate this year are calculated with
+SQL aggregates and cached as a snapshot per branch. The snapshot is
+invalidated on changes of grades and student statuses and is warmed up
+by the `refresh_future_graduate_stats` command on schedule.
+"""
+import datetime
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Iterable, List, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, QuerySet
+from django.utils import timezone
+
+from courses.constants import SemesterTypes
+from courses.models import CourseClass, CourseTeacher
+from courses.utils import get_term_index
+from learning.models import Enrollment, GraduateProfile
+from learning.settings import AcademicDegreeLevels, GradeTypes, StudentStatuses
+from projects.constants import ProjectGradeTypes
+from projects.models import Project, ProjectStudent
+from users.models import SHADCourseRecord, StudentProfile, StudentTypes
+
+FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN = "future_graduate_stats_{branch_id}"
+FUTURE_GRADUATE_STATS_CACHE_TIMEOUT = 3600 * 24  # seconds
+BAD_GRADES = [*GradeTypes.unsatisfactory_grades, *GradeTypes.unset_grades]
+BAD_PROJECT_GRADES = [
+    ProjectGradeTypes.UNSATISFACTORY,
+    ProjectGradeTypes.NOT_GRADED,
+]
+# Project is counted as passed in the first 2 years of learning if it
+# was completed no later than 4 terms after the autumn term of admission
+FIRST_TWO_YEARS_TERMS = 4
+
+
+class FutureGraduateStats(NamedTuple):
+    calculated_at: datetime.datetime
+    # Student profiles are ordered by student name
+    student_profiles: List[int]
+    unique_teachers_count: int
+    total_hours: int
+    total_passed_courses: int
+    excellent_total: int
+    good_total: int
+    unique_courses: List[int]
+    unique_projects: List[int]
+    # Values below are user ids or maps user id to the metric value
+    most_courses_students: List[int]
+    most_courses_in_term_students: List[int]
+    most_open_courses_students: Dict[int, int]
+    most_failed_courses: Dict[int, int]
+    less_failed_courses: Dict[int, int]
+    enrolled_on_first_course: List[int]
+    finished_two_or_more_programs: List[int]
+    all_three_practicies_are_internal: List[int]
+    passed_practicies_in_first_two_years: List[int]
+    passed_internal_practicies_in_first_two_years: List[int]
+    # Maps year of admission to student profile ids
+    by_enrollment_year: Dict[int, List[int]]
+
+
+def get_future_graduates(branch_id: int) -> QuerySet:
+    return (StudentProfile.objects
+            .filter(type=StudentTypes.REGULAR,
+                    branch_id=branch_id,
+                    status=StudentStatuses.WILL_GRADUATE)
+            .order_by("user__last_name", "user__first_name", "user_id"))
+
+
+def _get_leaders(values: Dict[int, int], *, lowest=False) -> Dict[int, int]:
+    if not values:
+        return {}
+    best = min(values.values()) if lowest else max(values.values())
+    return {user_id: value for user_id, value in values.items()
+            if value == best}
+
+
+def _sum_by_student(*querysets: QuerySet, field: str) -> Dict[int, int]:
+    totals: Dict[int, int] = defaultdict(int)
+    for queryset in querysets:
+        for row in queryset:
+            totals[row['student_id']] += row[field]
+    return totals
+
+
+def calculate_future_graduate_stats(branch_id: int) -> FutureGraduateStats:
+    student_profiles = list(get_future_graduates(branch_id)
+                            .values('pk', 'user_id', 'year_of_admission',
+                                    'level_of_education_on_admission'))
+    user_ids = {sp['user_id'] for sp in student_profiles}
+    passed = ~Q(grade__in=BAD_GRADES)
+    # Summer courses are not counted in totals
+    not_summer = ~Q(course__semester__type=SemesterTypes.SUMMER)
+    enrollments = Enrollment.active.filter(student_id__in=user_ids)
+    shad_records = SHADCourseRecord.objects.filter(student_id__in=user_ids)
+
+    enrollment_stats = (enrollments
+                        .values('student_id')
+                        .annotate(passed_total=Count('pk', filter=passed),
+                                  club_total=Count('pk', filter=passed & Q(
+                                      course__main_branch__site_id=settings.CLUB_SITE_ID)),
+                                  failed_total=Count('pk', filter=~passed & not_summer))
+                        .order_by())
+    shad_stats = (shad_records
+                  .values('student_id')
+                  .annotate(passed_total=Count('pk', filter=passed),
+                            failed_total=Count('pk', filter=~passed))
+                  .order_by())
+    enrollment_stats = list(enrollment_stats)
+    shad_stats = list(shad_stats)
+    passed_courses = _sum_by_student(enrollment_stats, shad_stats,
+                                     field='passed_total')
+    failed_courses = _sum_by_student(enrollment_stats, shad_stats,
+                                     field='failed_total')
+    club_courses = _sum_by_student(enrollment_stats, field='club_total')
+
+    courses_by_term: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    passed_by_term = (enrollments
+                      .filter(passed & not_summer)
+                      .values('student_id', 'course__semester_id')
+                      .annotate(total=Count('pk'))
+                      .order_by())
+    for row in passed_by_term:
+        courses_by_term[row['student_id']][row['course__semester_id']] += row['total']
+    shad_passed_by_term = (shad_records
+                           .filter(passed)
+                           .values('student_id', 'semester_id')
+                           .annotate(total=Count('pk'))
+                           .order_by())
+    for row in shad_passed_by_term:
+        courses_by_term[row['student_id']][row['semester_id']] += row['total']
+
+    passed_enrollments = enrollments.filter(passed & not_summer)
+    totals = passed_enrollments.aggregate(
+        total=Count('pk'),
+        excellent=Count('pk', filter=Q(grade__in=GradeTypes.excellent_grades)),
+        good=Count('pk', filter=Q(grade__in=GradeTypes.good_grades)))
+    enrollments_by_course = dict(passed_enrollments
+                                 .values('course_id')
+                                 .annotate(total=Count('pk'))
+                                 .order_by()
+                                 .values_list('course_id', 'total'))
+    classes_by_course = (CourseClass.objects
+                         .filter(course_id__in=enrollments_by_course)
+                         .values('course_id')
+                         .annotate(total=Count('pk'))
+                         .order_by()
+                         .values_list('course_id', 'total'))
+    total_classes = sum(enrollments_by_course[course_id] * classes_total
+                        for course_id, classes_total in classes_by_course)
+    unique_teachers_count = (CourseTeacher.objects
+                             .filter(course_id__in=enrollments_by_course)
+                             .values('teacher_id')
+                             .distinct()
+                             .count())
+    unique_courses = list(passed_enrollments
+                          .values_list('course__meta_course_id', flat=True)
+                          .order_by()
+                          .distinct())
+
+    passed_projects = (ProjectStudent.objects
+                       .filter(student_id__in=user_ids)
+                       .exclude(final_grade__in=BAD_PROJECT_GRADES)
+                       .exclude(project__status=Project.Statuses.CANCELED))
+    unique_projects = list(passed_projects
+                           .values_list('project_id', flat=True)
+                           .order_by()
+                           .distinct())
+    projects_by_term = defaultdict(list)
+    project_stats = (passed_projects
+                     .values('student_id', 'project__semester__index',
+                             'project__is_external')
+                     .annotate(total=Count('pk'))
+                     .order_by())
+    for row in project_stats:
+        projects_by_term[row['student_id']].append(row)
+
+    finished_two_or_more_programs = (GraduateProfile.active
+                                     .filter(student_profile__in=[sp['pk'] for sp in student_profiles])
+                                     .annotate(disciplines_total=Count('academic_disciplines'))
+                                     .filter(disciplines_total__gte=2)
+                                     .values_list('student_profile__user_id', flat=True))
+
+    by_enrollment_year = defaultdict(list)
+    enrolled_on_first_course = []
+    all_three_practicies_are_internal = []
+    passed_practicies_in_first_two_years = []
+    passed_internal_practicies_in_first_two_years = []
+    for student_profile in student_profiles:
+        user_id = student_profile['user_id']
+        year_of_admission = student_profile['year_of_admission']
+        by_enrollment_year[year_of_admission].append(student_profile['pk'])
+        level_of_education = student_profile['level_of_education_on_admission']
+        if level_of_education == AcademicDegreeLevels.BACHELOR_SPECIALITY_1:
+            enrolled_on_first_course.append(user_id)
+        enrollment_term_index = get_term_index(year_of_admission,
+                                               SemesterTypes.AUTUMN)
+        internal_projects = 0
+        first_two_years_projects = 0
+        first_two_years_internal_projects = 0
+        for row in projects_by_term[user_id]:
+            is_internal = not row['project__is_external']
+            internal_projects += row['total'] * is_internal
+            term_offset = row['project__semester__index'] - enrollment_term_index
+            if 0 <= term_offset <= FIRST_TWO_YEARS_TERMS:
+                first_two_years_projects += row['total']
+                first_two_years_internal_projects += row['total'] * is_internal
+        if internal_projects == 3:
+            all_three_practicies_are_internal.append(user_id)
+        if first_two_years_projects >= 3:
+            passed_practicies_in_first_two_years.append(user_id)
+        if first_two_years_internal_projects >= 3:
+            passed_internal_practicies_in_first_two_years.append(user_id)
+
+    max_courses_in_term = {user_id: max(courses_by_term[user_id].values(), default=0)
+                           for user_id in user_ids}
+    return FutureGraduateStats(
+        calculated_at=timezone.now(),
+        student_profiles=[sp['pk'] for sp in student_profiles],
+        unique_teachers_count=unique_teachers_count,
+        total_hours=int(total_classes * 1.5),
+        total_passed_courses=totals['total'],
+        excellent_total=totals['excellent'],
+        good_total=totals['good'],
+        unique_courses=unique_courses,
+        unique_projects=unique_projects,
+        most_courses_students=list(_get_leaders({
+            user_id: passed_courses[user_id] for user_id in user_ids})),
+        most_courses_in_term_students=list(_get_leaders(max_courses_in_term)),
+        most_open_courses_students=_get_leaders({
+            user_id: club_courses[user_id] for user_id in user_ids}),
+        most_failed_courses=_get_leaders({
+            user_id: failed_courses[user_id] for user_id in user_ids}),
+        less_failed_courses=_get_leaders({
+            user_id: failed_courses[user_id] for user_id in user_ids},
+            lowest=True),
+        enrolled_on_first_course=enrolled_on_first_course,
+        finished_two_or_more_programs=list(set(finished_two_or_more_programs)),
+        all_three_practicies_are_internal=all_three_practicies_are_internal,
+        passed_practicies_in_first_two_years=passed_practicies_in_first_two_years,
+        passed_internal_practicies_in_first_two_years=passed_internal_practicies_in_first_two_years,
+        by_enrollment_year=dict(by_enrollment_year),
+    )
+
+
+def refresh_future_graduate_stats(branch_id: int) -> FutureGraduateStats:
+    stats = calculate_future_graduate_stats(branch_id)
+    cache_key = FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN.format(branch_id=branch_id)
+    cache.set(cache_key, stats, FUTURE_GRADUATE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def get_future_graduate_stats(branch_id: int) -> FutureGraduateStats:
+    cache_key = FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN.format(branch_id=branch_id)
+    stats = cache.get(cache_key)
+    if stats is None:
+        stats = refresh_future_graduate_stats(branch_id)
+    return stats
+
+
+def invalidate_future_graduate_stats(branch_ids: Iterable[int]) -> None:
+    cache.delete_many([FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN.format(branch_id=branch_id)
+                       for branch_id in branch_ids])
+
+
+def _invalidate_students_future_graduate_stats(student_ids: Iterable[int]) -> None:
+    branch_ids = (StudentProfile.objects
+                  .filter(user_id__in=student_ids,
+                          type=StudentTypes.REGULAR,
+                          status=StudentStatuses.WILL_GRADUATE)
+                  .values_list('branch_id', flat=True)
+                  .distinct())
+    invalidate_future_graduate_stats(branch_ids)
+
+
+def invalidate_students_future_graduate_stats_on_commit(student_ids: Iterable[int]) -> None:
+    """
+    Invalidates snapshots of the branches where the students are going to
+    graduate. Call it on changes of the student progress records, bulk
+    updates bypass model signals.
+    """
+    student_ids = set(student_ids)
+    if student_ids:
+        transaction.on_commit(partial(_invalidate_students_future_graduate_stats,
+                                      student_ids))
+
+
+def invalidate_student_future_graduate_stats_on_commit(student_id: int) -> None:
+    invalidate_students_future_graduate_stats_on_commit([student_id])
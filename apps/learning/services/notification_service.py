@@ -3,6 +3,9 @@ from learning.models import (
     AssignmentComment, AssignmentNotification, AssignmentSubmissionTypes,
     CourseNewsNotification, Enrollment, StudentAssignment
 )
+from notifications.cache import (
+    add_unread_assignment_notifications, invalidate_unread_notifications_cache
+)
 
 
 # TODO: store it closer to services or here?
@@ -15,6 +18,7 @@ def remove_course_notifications_for_student(enrollment: Enrollment):
      .filter(user_id=enrollment.student_id,
              course_offering_news__course_id=enrollment.course_id)
      .delete())
+    invalidate_unread_notifications_cache([enrollment.student_id])
 
 
 def notify_student_new_assignment(student_assignment, commit=True):
@@ -60,4 +64,5 @@ def create_notifications_about_new_submission(submission: AssignmentComment):
                                        is_about_passed=is_solution)
             notifications.append(n)
     AssignmentNotification.objects.bulk_create(notifications)
+    add_unread_assignment_notifications(notifications)
     return len(notifications)
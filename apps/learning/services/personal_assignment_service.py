@@ -1,22 +1,27 @@
+import heapq
+import json
 import logging
 from collections import defaultdict
-from datetime import timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
-from functools import partial
-from typing import Any, Dict, List, Optional, Tuple
+from fractions import Fraction
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from rest_framework.utils.encoders import JSONEncoder
 
 from django.core.exceptions import ValidationError, MultipleObjectsReturned
 from django.core.files.uploadedfile import UploadedFile
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import (
-    Case, Count, DateTimeField, F, IntegerField, Max, Min, When, Window
+    Case, Count, DateTimeField, Exists, F, IntegerField, Max, Min, OuterRef, Q,
+    QuerySet, Sum, When, Window
 )
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 from core.timezone import get_now_utc
 from core.typings import assert_never
-from core.utils import _empty, normalize_yandex_login
+from core.utils import _empty, chunks, normalize_yandex_login
 from courses.constants import AssigneeMode, AssignmentStatus
 from courses.models import Assignment, CourseTeacher
 from courses.selectors import personal_assignments_list
@@ -26,12 +31,46 @@ from learning.models import (
     PersonalAssignmentActivity, StudentAssignment, StudentGroup, StudentGroupTeacherBucket
 )
 from learning.services import StudentGroupService
+from learning.services.check_queue_service import update_check_queue_on_commit
 from learning.settings import AssignmentScoreUpdateSource
 from users.models import User
 
 logger = logging.getLogger(__name__)
 
 
+def _get_submission_activity(submission: AssignmentComment,
+                             student_id: int) -> PersonalAssignmentActivity:
+    if submission.type == AssignmentSubmissionTypes.SOLUTION:
+        return PersonalAssignmentActivity.SOLUTION
+    elif submission.type == AssignmentSubmissionTypes.COMMENT:
+        is_student = submission.author_id == student_id
+        if is_student:
+            return PersonalAssignmentActivity.STUDENT_COMMENT
+        else:
+            return PersonalAssignmentActivity.TEACHER_COMMENT
+    else:
+        raise ValueError('Unknown submission type')
+
+
+def build_personal_assignment_stats(*, activity: PersonalAssignmentActivity,
+                                    comments_total: int, solutions_total: int,
+                                    solution_first: Optional[datetime],
+                                    solution_last: Optional[datetime]) -> Dict[str, Any]:
+    new_stats = {'activity': str(activity)}
+    if comments_total:
+        new_stats['comments'] = comments_total
+    # Omit default or null values to save space
+    if solutions_total:
+        solution_stats = {
+            'count': solutions_total,
+            'first': solution_first.replace(microsecond=0),
+        }
+        if solutions_total > 1:
+            solution_stats['last'] = solution_last.replace(microsecond=0)
+        new_stats['solutions'] = solution_stats
+    return new_stats
+
+
 def update_personal_assignment_stats(*, personal_assignment: StudentAssignment) -> None:
     """
     Calculates personal assignment stats and saves it in a `stats` property
@@ -47,6 +86,10 @@ def update_personal_assignment_stats(*, personal_assignment: StudentAssignment)
             },
             "activity": "sc",  // code of the latest activity
         }
+
+    Stats are maintained incrementally by
+    `apply_personal_assignment_stats_delta`, use this function to
+    recalculate them from scratch.
     """
     solutions_count = Count(
         Case(When(type=AssignmentSubmissionTypes.SOLUTION,
@@ -75,38 +118,193 @@ def update_personal_assignment_stats(*, personal_assignment: StudentAssignment)
     if latest_submission is None:
         return
 
-    if latest_submission.type == AssignmentSubmissionTypes.SOLUTION:
-        latest_activity = PersonalAssignmentActivity.SOLUTION
-    elif latest_submission.type == AssignmentSubmissionTypes.COMMENT:
-        is_student = latest_submission.author_id == personal_assignment.student_id
-        if is_student:
-            latest_activity = PersonalAssignmentActivity.STUDENT_COMMENT
-        else:
-            latest_activity = PersonalAssignmentActivity.TEACHER_COMMENT
-    else:
-        raise ValueError('Unknown submission type')
+    latest_activity = _get_submission_activity(latest_submission,
+                                               personal_assignment.student_id)
     # Django 3.2 doesn't support partial update of the json field,
     # better to select_for_update
     meta = personal_assignment.meta or {}
-    new_stats = {'activity': str(latest_activity)}
     comments_total = latest_submission.submissions_total - latest_submission.solutions_total
-    if comments_total:
-        new_stats['comments'] = comments_total
-    # Omit default or null values to save space
-    if latest_submission.solutions_total:
-        solution_stats = {
-            'count': latest_submission.solutions_total,
-            'first': latest_submission.solution_first.replace(microsecond=0),
-        }
-        if latest_submission.solutions_total > 1:
-            solution_stats['last'] = latest_submission.solution_latest.replace(microsecond=0)
-        new_stats['solutions'] = solution_stats
-    meta['stats'] = new_stats
+    meta['stats'] = build_personal_assignment_stats(
+        activity=latest_activity,
+        comments_total=comments_total,
+        solutions_total=latest_submission.solutions_total,
+        solution_first=latest_submission.solution_first,
+        solution_last=latest_submission.solution_latest)
     (StudentAssignment.objects
      .filter(pk=personal_assignment.pk)
      .update(meta=meta))
 
 
+def apply_personal_assignment_stats_delta(*, submission: AssignmentComment,
+                                          removed: bool = False,
+                                          restored: bool = False) -> None:
+    """
+    Applies published submission that was just added, restored or removed
+    to the personal assignment stats and execution time instead of
+    aggregating all submissions again. Personal assignment row is locked
+    until the end of the transaction, call it in the same transaction as
+    the submission write.
+
+    New submission is considered as the latest activity. Boundaries of the
+    solutions range are queried only on removal, the latest activity -
+    on removal or restoring.
+    """
+    with transaction.atomic():
+        personal_assignment = (StudentAssignment.objects
+                               .select_for_update()
+                               .only('pk', 'student_id', 'meta', 'execution_time')
+                               .filter(pk=submission.student_assignment_id)
+                               .first())
+        if personal_assignment is None:
+            return
+        is_solution = submission.type == AssignmentSubmissionTypes.SOLUTION
+        execution_time = personal_assignment.execution_time
+        if is_solution and submission.execution_time is not None:
+            if removed:
+                execution_time = (execution_time or timedelta()) - submission.execution_time
+            else:
+                execution_time = (execution_time or timedelta()) + submission.execution_time
+            # The same as aggregation over empty set
+            if execution_time <= timedelta():
+                execution_time = None
+        meta = personal_assignment.meta or {}
+        stats = personal_assignment.stats
+        if stats is None:
+            # Stats were never calculated
+            personal_assignment.meta = meta
+            update_personal_assignment_stats(personal_assignment=personal_assignment)
+        else:
+            meta['stats'] = _get_stats_with_delta(personal_assignment, stats,
+                                                  submission, removed, restored)
+            if meta['stats'] is None:
+                del meta['stats']
+        update_fields = {'execution_time': execution_time}
+        if stats is not None:
+            update_fields['meta'] = meta
+        (StudentAssignment.objects
+         .filter(pk=personal_assignment.pk)
+         .update(**update_fields))
+    # Keep in sync cached instance
+    if AssignmentComment.student_assignment.is_cached(submission):
+        submission.student_assignment.execution_time = execution_time
+
+
+def _get_stats_with_delta(personal_assignment: StudentAssignment,
+                          stats: Dict[str, Any], submission: AssignmentComment,
+                          removed: bool, restored: bool) -> Optional[Dict[str, Any]]:
+    published = (AssignmentComment.published
+                 .filter(student_assignment_id=personal_assignment.pk)
+                 .exclude(pk=submission.pk))
+    solution_stats = stats.get('solutions') or {}
+    solutions_total = solution_stats.get('count', 0)
+    solution_first = solution_stats.get('first')
+    solution_last = solution_stats.get('last')
+    comments_total = stats.get('comments', 0)
+    if submission.type == AssignmentSubmissionTypes.SOLUTION:
+        if removed:
+            solutions_total = max(solutions_total - 1, 0)
+            if solutions_total:
+                boundaries = (published
+                              .filter(type=AssignmentSubmissionTypes.SOLUTION)
+                              .aggregate(first=Min('created'), last=Max('created')))
+                solution_first = boundaries['first']
+                solution_last = boundaries['last']
+        else:
+            solutions_total += 1
+            created = submission.created.replace(microsecond=0)
+            solution_first = min(solution_first or created, created)
+            solution_last = max(solution_last or created, created)
+    elif removed:
+        comments_total = max(comments_total - 1, 0)
+    else:
+        comments_total += 1
+    if removed:
+        latest_submission = (published
+                             .only('type', 'author_id')
+                             .order_by('created')
+                             .last())
+        if latest_submission is None:
+            return None
+    elif restored:
+        # Restored submission is not necessarily the latest one
+        latest_submission = (AssignmentComment.published
+                             .filter(student_assignment_id=personal_assignment.pk)
+                             .only('type', 'author_id')
+                             .order_by('created')
+                             .last())
+    else:
+        latest_submission = submission
+    activity = _get_submission_activity(latest_submission,
+                                        personal_assignment.student_id)
+    return build_personal_assignment_stats(activity=activity,
+                                           comments_total=comments_total,
+                                           solutions_total=solutions_total,
+                                           solution_first=solution_first,
+                                           solution_last=solution_last)
+
+
+def bulk_recalculate_personal_assignment_stats(personal_assignments: QuerySet,
+                                               batch_size: int = 1000,
+                                               dry_run: bool = False) -> int:
+    """
+    Recalculates stats and execution time of personal assignments from
+    scratch with a couple of aggregation queries per batch. Only
+    inconsistent records are updated.
+
+    Returns the number of inconsistent records.
+    """
+    solution = Q(type=AssignmentSubmissionTypes.SOLUTION)
+    queryset = (personal_assignments
+                .only('pk', 'student_id', 'meta', 'execution_time')
+                .order_by('pk'))
+    inconsistent = 0
+    for batch in chunks(queryset.iterator(chunk_size=batch_size), batch_size):
+        batch = {pa.pk: pa for pa in batch if pa is not None}
+        published = AssignmentComment.published.filter(student_assignment_id__in=batch)
+        aggregates = (published
+                      .order_by()
+                      .values('student_assignment_id')
+                      .annotate(total=Count('pk'),
+                                solutions_total=Count('pk', filter=solution),
+                                solution_first=Min('created', filter=solution),
+                                solution_last=Max('created', filter=solution),
+                                execution_time=Sum('execution_time', filter=solution)))
+        aggregates = {row['student_assignment_id']: row for row in aggregates}
+        latest_submissions = (published
+                              .only('student_assignment_id', 'type', 'author_id')
+                              .order_by('student_assignment_id', '-created')
+                              .distinct('student_assignment_id'))
+        latest_submissions = {s.student_assignment_id: s for s in latest_submissions}
+        to_update = []
+        for pk, personal_assignment in batch.items():
+            meta = dict(personal_assignment.meta or {})
+            row = aggregates.get(pk)
+            if row is None:
+                execution_time = None
+                meta.pop('stats', None)
+            else:
+                execution_time = row['execution_time']
+                activity = _get_submission_activity(latest_submissions[pk],
+                                                    personal_assignment.student_id)
+                stats = build_personal_assignment_stats(
+                    activity=activity,
+                    comments_total=row['total'] - row['solutions_total'],
+                    solutions_total=row['solutions_total'],
+                    solution_first=row['solution_first'],
+                    solution_last=row['solution_last'])
+                meta['stats'] = json.loads(json.dumps(stats, cls=JSONEncoder))
+            if (meta.get('stats') != (personal_assignment.meta or {}).get('stats') or
+                    execution_time != personal_assignment.execution_time):
+                personal_assignment.meta = meta or None
+                personal_assignment.execution_time = execution_time
+                to_update.append(personal_assignment)
+        inconsistent += len(to_update)
+        if to_update and not dry_run:
+            StudentAssignment.objects.bulk_update(to_update, ['meta', 'execution_time'])
+            update_check_queue_on_commit(Q(pk__in=[sa.pk for sa in to_update]))
+    return inconsistent
+
+
 def create_assignment_solution(*, personal_assignment: StudentAssignment,
                                created_by: User,
                                execution_time: Optional[timedelta] = None,
@@ -135,10 +333,8 @@ def create_assignment_solution(*, personal_assignment: StudentAssignment,
                                  text=message,
                                  meta=meta,
                                  attached_file=attachment)
+    # Stats are updated by the `post_save` signal
     solution.save()
-    from learning.tasks import update_student_assignment_stats
-    update_stats = partial(update_student_assignment_stats.delay, personal_assignment.pk)
-    transaction.on_commit(update_stats)
 
     return solution
 
@@ -201,11 +397,10 @@ def create_assignment_comment(*, personal_assignment: StudentAssignment,
             **(comment.meta or {}),
             **meta
         }
-    comment.save()
-
-    from learning.tasks import update_student_assignment_stats
-    update_stats = partial(update_student_assignment_stats.delay, personal_assignment.pk)
-    transaction.on_commit(update_stats)
+    # Published comment updates stats in the `post_save` signal,
+    # make it atomic with the comment write
+    with transaction.atomic():
+        comment.save()
 
     return comment
 
@@ -243,6 +438,7 @@ def update_personal_assignment_status(*, student_assignment: StudentAssignment,
                .update(status=status_new, modified=get_now_utc()))
     if updated:
         student_assignment.status = status_new
+        update_check_queue_on_commit(Q(pk=student_assignment.pk))
     return updated
 
 
@@ -273,6 +469,86 @@ def update_personal_assignment_score(*, student_assignment: StudentAssignment,
     return True, student_assignment
 
 
+class PersonalAssignmentScoreUpdate(NamedTuple):
+    student_assignment: StudentAssignment
+    score_old: Optional[Decimal]
+    score_new: Optional[Decimal]
+
+
+# Max number of rows in the VALUES list of the bulk update statement
+BULK_SCORE_UPDATE_BATCH_SIZE = 1000
+
+
+def _bulk_update_scores_sql(updates: List[PersonalAssignmentScoreUpdate],
+                            changed_at) -> Tuple[str, List[Any]]:
+    table = StudentAssignment._meta.db_table
+    score = StudentAssignment._meta.get_field('score').column
+    score_changed = StudentAssignment._meta.get_field('score_changed').column
+    values = ", ".join(["(%s::integer, %s::numeric, %s::numeric)"] * len(updates))
+    sql = (f'UPDATE "{table}" AS sa '
+           f'SET "{score}" = v.score_new, "{score_changed}" = %s '
+           f'FROM (VALUES {values}) AS v(id, score_old, score_new) '
+           f'WHERE sa.id = v.id '
+           f'AND sa.deleted_at IS NULL '
+           f'AND sa."{score}" IS NOT DISTINCT FROM v.score_old '
+           f'RETURNING sa.id')
+    params: List[Any] = [changed_at]
+    for update in updates:
+        params.extend([update.student_assignment.pk, update.score_old, update.score_new])
+    return sql, params
+
+
+def bulk_update_personal_assignment_scores(*, updates: List[PersonalAssignmentScoreUpdate],
+                                           changed_by: User,
+                                           source: AssignmentScoreUpdateSource) -> List[PersonalAssignmentScoreUpdate]:
+    """
+    Batch version of the `update_personal_assignment_score`. All scores are
+    written in one transaction with a single `UPDATE ... FROM (VALUES ...)`
+    statement (per batch), the score is updated only if the current db value
+    matches `score_old` (optimistic locking).
+
+    Returns updates that were not applied because of the conflict.
+    """
+    # The last update wins in case of duplicates
+    unique_updates: Dict[int, PersonalAssignmentScoreUpdate] = {}
+    for update in updates:
+        student_assignment = update.student_assignment
+        score_new = update.score_new
+        if score_new is not None and score_new > student_assignment.assignment.maximum_score:
+            raise ValidationError(f"Score {score_new} is greater than the maximum "
+                                  f"score {student_assignment.assignment.maximum_score}",
+                                  code="score_overflow")
+        if student_assignment.pk in unique_updates:
+            score_old = unique_updates[student_assignment.pk].score_old
+            update = update._replace(score_old=score_old)
+        unique_updates[student_assignment.pk] = update
+    if not unique_updates:
+        return []
+    updates = list(unique_updates.values())
+    changed_at = get_now_utc()
+    applied = set()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for batch_start in range(0, len(updates), BULK_SCORE_UPDATE_BATCH_SIZE):
+                batch = updates[batch_start:batch_start + BULK_SCORE_UPDATE_BATCH_SIZE]
+                cursor.execute(*_bulk_update_scores_sql(batch, changed_at))
+                applied.update(pk for pk, in cursor.fetchall())
+        audit_logs = []
+        for update in updates:
+            student_assignment = update.student_assignment
+            if student_assignment.pk not in applied:
+                continue
+            student_assignment.score = update.score_new
+            if update.score_new != update.score_old:
+                audit_logs.append(AssignmentScoreAuditLog(student_assignment=student_assignment,
+                                                          changed_by=changed_by,
+                                                          score_old=update.score_old,
+                                                          score_new=update.score_new,
+                                                          source=source))
+        AssignmentScoreAuditLog.objects.bulk_create(audit_logs)
+    return [u for u in updates if u.student_assignment.pk not in applied]
+
+
 def create_personal_assignment_review(*,
                                       student_assignment: StudentAssignment,
                                       reviewer: User,
@@ -387,7 +663,7 @@ def get_assignee_with_minimal_load(student_assignment: StudentAssignment) -> Lis
         logger.info(f"StudentGroup {student_group_id} in none of the buckets.")
         return []
     except MultipleObjectsReturned:
-        logger.error(f"Buckets are in inconsistent states.")
+        logger.error("Buckets are in inconsistent states.")
         raise
     teachers_load = calculate_teachers_overall_expected_load_in_bucket(target_bucket)
     for sa in assignees_load:
@@ -400,6 +676,182 @@ def get_assignee_with_minimal_load(student_assignment: StudentAssignment) -> Lis
     return result
 
 
+class AssigneeLoadBalancer:
+    """
+    Load of the teachers responsible for the student groups of the assignment
+    in the `AssigneeMode.STUDENT_GROUP_BALANCED` mode.
+
+    Load of the teacher is the number of assigned personal assignments plus
+    expected load calculated the same way as in
+    `calculate_teachers_overall_expected_load_in_bucket`. Loads are
+    calculated once and then updated in memory on each assignment.
+    Teachers of each bucket are kept in a min-heap, stale heap entries are
+    skipped on read.
+    """
+    def __init__(self, assignment: Assignment):
+        self.assignment = assignment
+        self.teachers: Dict[int, CourseTeacher] = {}
+        self.bucket_teachers: Dict[int, List[int]] = {}
+        self.teacher_buckets: Dict[int, List[int]] = defaultdict(list)
+        self.group_bucket: Dict[int, int] = {}
+        buckets = (StudentGroupTeacherBucket.objects
+                   .filter(assignment=assignment)
+                   .prefetch_related('groups', 'teachers')
+                   .order_by('pk'))
+        for bucket in buckets:
+            self.bucket_teachers[bucket.pk] = []
+            for teacher in bucket.teachers.all():
+                self.teachers[teacher.pk] = teacher
+                self.bucket_teachers[bucket.pk].append(teacher.pk)
+                self.teacher_buckets[teacher.pk].append(bucket.pk)
+            for group in bucket.groups.all():
+                if group.pk in self.group_bucket:
+                    logger.error("Buckets are in inconsistent states.")
+                    raise MultipleObjectsReturned
+                self.group_bucket[group.pk] = bucket.pk
+        self.loads: Dict[int, Fraction] = self._get_loads()
+        self._versions: Dict[int, int] = defaultdict(int)
+        self._heaps: Dict[int, List[Tuple[Fraction, int, int]]] = {}
+        for bucket_id, teacher_ids in self.bucket_teachers.items():
+            heap = [(self.loads[t], t, 0) for t in teacher_ids]
+            heapq.heapify(heap)
+            self._heaps[bucket_id] = heap
+
+    def _get_loads(self) -> Dict[int, Fraction]:
+        loads = {teacher_id: Fraction(0) for teacher_id in self.teachers}
+        assignees_load = (StudentAssignment.objects
+                          .filter(assignment=self.assignment,
+                                  assignee__in=list(self.teachers))
+                          .values('assignee_id')
+                          .annotate(assignee_count=Count('pk'))
+                          .order_by())
+        for sa in assignees_load:
+            loads[sa['assignee_id']] += sa['assignee_count']
+        student_group_field = 'student__enrollment__student_group'
+        expected_groups_load = (StudentAssignment.objects
+                                .filter(assignee__isnull=True,
+                                        assignment=self.assignment,
+                                        student__enrollment__course_id=self.assignment.course_id,
+                                        student__enrollment__is_deleted=False,
+                                        student__enrollment__student_group__in=list(self.group_bucket))
+                                .values(student_group_field)
+                                .annotate(count=Count('pk'))
+                                .order_by())
+        for sa in expected_groups_load:
+            bucket_id = self.group_bucket[sa[student_group_field]]
+            teacher_ids = self.bucket_teachers[bucket_id]
+            for teacher_id in teacher_ids:
+                loads[teacher_id] += Fraction(sa['count'], len(teacher_ids))
+        return loads
+
+    def _push(self, teacher_id: int) -> None:
+        self._versions[teacher_id] += 1
+        entry = (self.loads[teacher_id], teacher_id, self._versions[teacher_id])
+        for bucket_id in self.teacher_buckets[teacher_id]:
+            heapq.heappush(self._heaps[bucket_id], entry)
+
+    def get_assignee(self, student_group_id: int) -> Optional[CourseTeacher]:
+        """Returns teacher with minimal load from the student group bucket."""
+        bucket_id = self.group_bucket.get(student_group_id)
+        if bucket_id is None:
+            return None
+        heap = self._heaps[bucket_id]
+        while heap:
+            _, teacher_id, version = heap[0]
+            if version == self._versions[teacher_id]:
+                return self.teachers[teacher_id]
+            heapq.heappop(heap)
+        return None
+
+    def assign(self, student_group_id: int, assignee: CourseTeacher) -> None:
+        """
+        Moves expected load of the personal assignment from the teachers of
+        the student group bucket to the assignee.
+        """
+        teacher_ids = self.bucket_teachers[self.group_bucket[student_group_id]]
+        for teacher_id in teacher_ids:
+            self.loads[teacher_id] -= Fraction(1, len(teacher_ids))
+        self.loads[assignee.pk] += 1
+        for teacher_id in teacher_ids:
+            self._push(teacher_id)
+
+
+class AutoAssignReport(NamedTuple):
+    assignees: List[Tuple[StudentAssignment, Optional[CourseTeacher]]]
+    # Course teacher id -> load after assigning
+    loads: Dict[int, float]
+
+
+def get_personal_assignments_pending_auto_assign(assignment: Assignment) -> QuerySet:
+    """
+    Returns personal assignments without assignee with student activity
+    that hasn't been processed by auto assigning yet.
+    """
+    student_activity = (AssignmentComment.published
+                        .filter(student_assignment=OuterRef('pk'),
+                                author_id=OuterRef('student_id')))
+    return (StudentAssignment.objects
+            .filter(assignment=assignment,
+                    assignee__isnull=True,
+                    trigger_auto_assign=True)
+            .filter(Exists(student_activity))
+            .order_by('pk'))
+
+
+def assign_pending_personal_assignments(assignment: Assignment, *,
+                                        dry_run: bool = False) -> AutoAssignReport:
+    """
+    Assigns teachers with minimal load to all pending personal assignments
+    of the assignment in the `AssigneeMode.STUDENT_GROUP_BALANCED` mode.
+    Batches of the same assignment are processed one at a time since the
+    assignment row is locked until the end of the transaction.
+
+    Personal assignments whose student group is in none of the buckets are
+    left without assignee. Personal assignments of students who left the
+    course are not updated until the student re-enter the course.
+    """
+    with transaction.atomic():
+        pending = get_personal_assignments_pending_auto_assign(assignment)
+        if not dry_run:
+            Assignment.objects.select_for_update().only('pk').get(pk=assignment.pk)
+            pending = pending.select_for_update()
+        personal_assignments = list(pending)
+        if not personal_assignments:
+            return AutoAssignReport(assignees=[], loads={})
+        student_groups = dict(Enrollment.active
+                              .filter(course_id=assignment.course_id,
+                                      student_id__in=[sa.student_id for sa in personal_assignments])
+                              .values_list('student_id', 'student_group_id'))
+        balancer = AssigneeLoadBalancer(assignment)
+        assignees = []
+        for student_assignment in personal_assignments:
+            student_group_id = student_groups.get(student_assignment.student_id)
+            assignee = None
+            if student_group_id is not None:
+                assignee = balancer.get_assignee(student_group_id)
+            if assignee is not None:
+                balancer.assign(student_group_id, assignee)
+            assignees.append((student_assignment, assignee))
+        if not dry_run:
+            modified = now()
+            updated = []
+            for student_assignment, assignee in assignees:
+                # Left auto assigning trigger until student re-enter the course
+                if student_assignment.student_id not in student_groups:
+                    continue
+                student_assignment.assignee = assignee
+                student_assignment.trigger_auto_assign = False
+                student_assignment.modified = modified
+                updated.append(student_assignment)
+            StudentAssignment.objects.bulk_update(
+                updated,
+                fields=['assignee', 'trigger_auto_assign', 'modified'],
+                batch_size=1000)
+            update_check_queue_on_commit(Q(pk__in=[sa.pk for sa in updated]))
+    loads = {teacher_id: float(load) for teacher_id, load in balancer.loads.items()}
+    return AutoAssignReport(assignees=assignees, loads=loads)
+
+
 def resolve_assignees_for_personal_assignment(student_assignment: StudentAssignment) -> List[CourseTeacher]:
     """
     Returns candidates who can be auto-assign as a responsible teacher for the
@@ -449,6 +901,18 @@ def maybe_set_assignee_for_personal_assignment(submission_id: int) -> None:
         return None
     if not student_assignment.trigger_auto_assign:
         return None
+    assignment = student_assignment.assignment
+    if (not student_assignment.assignee_id and
+            assignment.assignee_mode == AssigneeMode.STUDENT_GROUP_BALANCED):
+        # Pending personal assignments of other students are assigned
+        # in the same batch, their jobs will find nothing to do.
+        report = assign_pending_personal_assignments(assignment)
+        if any(sa.pk == student_assignment.pk for sa, _ in report.assignees):
+            return None
+        # Could be already processed by the concurrent batch
+        student_assignment.refresh_from_db(fields=['assignee', 'trigger_auto_assign'])
+        if not student_assignment.trigger_auto_assign:
+            return None
     update_fields = ['trigger_auto_assign', 'modified']
     # Do not overwrite assignee if someone already set the value.
     if not student_assignment.assignee_id:
@@ -19,6 +19,7 @@ from learning.models import (
     StudentGroup, StudentGroupAssignee, StudentGroupTeacherBucket
 )
 from learning.services.assignment_service import AssignmentService
+from learning.services.check_queue_service import update_check_queue_on_commit
 from users.models import StudentProfile, StudentTypes
 
 CourseTeacherId = int
@@ -407,6 +408,8 @@ class StudentGroupService:
         if updated != len(enrollments):
             # Enrollments are not in a source group
             raise IntegrityError("Some students have not been moved. Abort")
+        update_check_queue_on_commit(Q(assignment__course_id=source.course_id,
+                                       student__enrollment__in=enrollments))
 
         source_group_assignments = cls.available_assignments(source)
         target_group_assignments = cls.available_assignments(destination)
@@ -1,20 +1,42 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from courses.models import (
-    Assignment, Course, CourseBranch, CourseGroupModes, CourseNews, CourseTeacher,
-    StudentGroupTypes
+    Assignment, AssignmentAttachment, Course, CourseBranch, CourseClass, CourseGroupModes, CourseNews,
+    CourseTeacher, StudentGroupTypes
+)
+from learning.icalendar import (
+    invalidate_course_icalendar_feeds, invalidate_icalendar_feeds
 )
 from learning.models import (
-    AssignmentComment, AssignmentNotification, AssignmentSubmissionTypes,
-    CourseNewsNotification, Enrollment, StudentAssignment, StudentGroup
+    AssignmentComment, AssignmentNotification, CourseNewsNotification, Enrollment,
+    StudentAssignment, StudentGroup
 )
 from learning.services import StudentGroupService
+from learning.services.check_queue_service import update_check_queue_on_commit
+from learning.services.graduate_stats_service import (
+    invalidate_future_graduate_stats, invalidate_student_future_graduate_stats_on_commit
+)
+from learning.services.personal_assignment_service import (
+    apply_personal_assignment_stats_delta
+)
 from learning.services.enrollment_service import update_course_learners_count, update_course_listeners_count
 from learning.settings import EnrollmentTypes
+from notifications.cache import (
+    add_unread_assignment_notifications, add_unread_course_news_notifications,
+    invalidate_unread_notifications_cache
+)
 # FIXME: post_delete нужен? Что лучше - удалять StudentGroup + SET_NULL у Enrollment или делать soft-delete?
 # FIXME: группу лучше удалить, т.к. она будет предлагаться для новых заданий, хотя типа уже удалена.
-from learning.tasks import convert_assignment_submission_ipynb_file_to_html
+from learning.tasks import (
+    convert_assignment_attachment_ipynb_file_to_html,
+    convert_assignment_submission_ipynb_file_to_html
+)
+from users.models import SHADCourseRecord, StudentProfile, StudentTypes, User
 
 
 @receiver(post_save, sender=Course)
@@ -74,6 +96,52 @@ def create_notifications_about_course_news(sender, instance: CourseNews,
             CourseNewsNotification(user_id=co_t.teacher_id,
                                    course_offering_news_id=instance.pk))
     CourseNewsNotification.objects.bulk_create(notifications)
+    add_unread_course_news_notifications(notifications, course_id=co_id)
+
+
+@receiver(post_save, sender=AssignmentNotification)
+def update_unread_assignment_notifications_cache(sender, instance, created,
+                                                 *args, **kwargs):
+    if created:
+        add_unread_assignment_notifications([instance])
+    else:
+        invalidate_unread_notifications_cache([instance.user_id])
+
+
+@receiver(post_save, sender=CourseNewsNotification)
+def update_unread_course_news_notifications_cache(sender, instance, created,
+                                                  *args, **kwargs):
+    if created:
+        add_unread_course_news_notifications([instance])
+    else:
+        invalidate_unread_notifications_cache([instance.user_id])
+
+
+@receiver(post_save, sender=CourseClass)
+@receiver(post_delete, sender=CourseClass)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def invalidate_course_participants_icalendar(sender, instance, *args, **kwargs):
+    invalidate_course_icalendar_feeds(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_student_icalendar(sender, instance: Enrollment, *args, **kwargs):
+    invalidate_icalendar_feeds([instance.student_id])
+
+
+@receiver(post_save, sender=CourseTeacher)
+@receiver(post_delete, sender=CourseTeacher)
+def invalidate_teacher_icalendar(sender, instance: CourseTeacher, *args, **kwargs):
+    invalidate_icalendar_feeds([instance.teacher_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_icalendar(sender, instance: User, created, *args, **kwargs):
+    # Calendar depends on the user time zone and name
+    if not created:
+        invalidate_icalendar_feeds([instance.pk])
 
 
 @receiver(post_save, sender=Assignment)
@@ -109,19 +177,83 @@ def convert_ipynb_files(sender, instance: AssignmentComment, *args, **kwargs):
         convert_assignment_submission_ipynb_file_to_html.delay(**kwargs)
 
 
-# TODO: move to the create_assignment_solution service method
+@receiver(post_save, sender=AssignmentAttachment)
+def convert_assignment_attachment_ipynb_files(sender, instance: AssignmentAttachment,
+                                              *args, **kwargs):
+    if instance.file_ext == '.ipynb':
+        convert_func = partial(convert_assignment_attachment_ipynb_file_to_html.delay,
+                               assignment_attachment_id=instance.pk)
+        transaction.on_commit(convert_func)
+
+
 @receiver(post_save, sender=AssignmentComment)
-def save_student_solution(sender, instance: AssignmentComment, *args, **kwargs):
-    """Updates aggregated execution time value on StudentAssignment model"""
-    if instance.type != AssignmentSubmissionTypes.SOLUTION:
+def update_personal_assignment_stats_on_save(sender, instance: AssignmentComment,
+                                             created, *args, **kwargs):
+    """
+    Applies new published submission to the personal assignment stats
+    and the aggregated execution time.
+    """
+    if not instance.is_published:
         return
-    instance.student_assignment.compute_fields('execution_time')
+    if created or instance.tracker.has_changed('is_published'):
+        apply_personal_assignment_stats_delta(submission=instance)
+        update_check_queue_on_commit(Q(pk=instance.student_assignment_id))
 
 
 @receiver(post_delete, sender=AssignmentComment)
-def delete_student_solution(sender, instance: AssignmentComment,
-                            *args, **kwargs):
-    """Updates aggregated execution time value on StudentAssignment model"""
-    if instance.type != AssignmentSubmissionTypes.SOLUTION:
+def update_personal_assignment_stats_on_delete(sender, instance: AssignmentComment,
+                                               *args, **kwargs):
+    """
+    Called on both hard and soft deletion (e.g. through admin interface),
+    restoring as well.
+    """
+    if not instance.is_published:
+        return
+    is_stored = AssignmentComment.base.filter(pk=instance.pk).exists()
+    if is_stored and instance.deleted_at is None:
+        apply_personal_assignment_stats_delta(submission=instance, restored=True)
+    elif is_stored or instance.deleted_at is None:
+        apply_personal_assignment_stats_delta(submission=instance, removed=True)
+    else:
+        # Soft deleted submission is already excluded from the stats
+        return
+    update_check_queue_on_commit(Q(pk=instance.student_assignment_id))
+
+
+@receiver(post_save, sender=StudentAssignment)
+@receiver(post_delete, sender=StudentAssignment)
+def update_check_queue_on_personal_assignment_change(sender, instance: StudentAssignment,
+                                                     *args, **kwargs):
+    """Called on both hard and soft deletion, restoring as well"""
+    update_check_queue_on_commit(Q(pk=instance.pk))
+
+
+@receiver(post_save, sender=Enrollment)
+def update_check_queue_on_enrollment_change(sender, instance: Enrollment,
+                                            *args, **kwargs):
+    update_check_queue_on_commit(Q(assignment__course_id=instance.course_id,
+                                   student_id=instance.student_id))
+
+
+@receiver(post_save, sender=StudentProfile)
+def update_check_queue_on_student_profile_change(sender, instance: StudentProfile,
+                                                 *args, **kwargs):
+    # Program year of the student is taken from the profile
+    update_check_queue_on_commit(Q(student_id=instance.user_id))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=SHADCourseRecord)
+@receiver(post_delete, sender=SHADCourseRecord)
+def invalidate_future_graduate_stats_on_grade_change(sender, instance, *args, **kwargs):
+    invalidate_student_future_graduate_stats_on_commit(instance.student_id)
+
+
+@receiver(post_save, sender=StudentProfile)
+def invalidate_future_graduate_stats_on_status_change(sender, instance: StudentProfile,
+                                                      created, *args, **kwargs):
+    if instance.type != StudentTypes.REGULAR:
         return
-    instance.student_assignment.compute_fields('execution_time')
+    if created or instance.tracker.has_changed('status'):
+        transaction.on_commit(partial(invalidate_future_graduate_stats,
+                                      [instance.branch_id]))
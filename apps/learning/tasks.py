@@ -2,14 +2,19 @@ import logging
 import os
 
 from django_rq import job
+from nbformat.validator import NotebookValidationError
 
-from files.utils import convert_ipynb_to_html
-from learning.models import AssignmentComment, StudentAssignment, SubmissionAttachment
+from courses.models import AssignmentAttachment
+from files.renditions import (
+    create_html_rendition, get_html_rendition, save_html_rendition
+)
+from files.utils import ConvertError, convert_ipynb_to_html
+from learning.models import AssignmentComment, SubmissionAttachment
 from learning.services.notification_service import (
     create_notifications_about_new_submission
 )
 from learning.services.personal_assignment_service import (
-    update_personal_assignment_stats, maybe_set_assignee_for_personal_assignment
+    maybe_set_assignee_for_personal_assignment
 )
 
 logger = logging.getLogger(__file__)
@@ -27,25 +32,34 @@ def convert_assignment_submission_ipynb_file_to_html(*, assignment_submission_id
     file_name = original_file_name + '.html'
     # Actually it could be any file with the same name
     file_field = SubmissionAttachment._meta.get_field('attachment')
-    if file_field.storage.exists(file_name):
+    attachment_exists = file_field.storage.exists(file_name)
+    rendition_exists = get_html_rendition(submission.attached_file) is not None
+    if attachment_exists and rendition_exists:
         return
     html_source = convert_ipynb_to_html(submission.attached_file,
                                         name=file_name)
     if html_source is None:
         logger.debug("File not converted")
         return
-    SubmissionAttachment.objects.create(submission=submission,
-                                        attachment=html_source)
+    if not rendition_exists:
+        save_html_rendition(submission.attached_file, html_source)
+    if not attachment_exists:
+        SubmissionAttachment.objects.create(submission=submission,
+                                            attachment=html_source)
 
 
 @job('default')
-def update_student_assignment_stats(student_assignment_id: int) -> None:
-    student_assignment = (StudentAssignment.objects
-                          .filter(pk=student_assignment_id)
-                          .first())
-    if not student_assignment:
+def convert_assignment_attachment_ipynb_file_to_html(*, assignment_attachment_id):
+    attachment = (AssignmentAttachment.objects
+                  .filter(pk=assignment_attachment_id)
+                  .first())
+    if not attachment:
+        logger.debug(f"Assignment attachment with id={assignment_attachment_id} not found")
         return
-    update_personal_assignment_stats(personal_assignment=student_assignment)
+    try:
+        create_html_rendition(attachment.attachment)
+    except (ConvertError, NotebookValidationError) as e:
+        logger.warning(f"Failed to convert {attachment.attachment.name}: {e!r}")
 
 
 @job('high')
@@ -1,6 +1,7 @@
 import csv
 import datetime
 import io
+import zipfile
 from itertools import chain
 
 import pytest
@@ -22,14 +23,16 @@ from courses.tests.factories import (
 from grading.api.yandex_contest import SubmissionVerdict
 from grading.constants import SubmissionStatus
 from grading.tests.factories import SubmissionFactory
-from learning.models import StudentAssignment, AssignmentSubmissionTypes
+from learning.models import Enrollment, StudentAssignment, AssignmentSubmissionTypes
 from learning.permissions import ViewStudentAssignment, ViewStudentAssignmentList
 from learning.services.personal_assignment_service import create_assignment_solution, create_personal_assignment_review
 from learning.settings import Branches, AssignmentScoreUpdateSource, EnrollmentTypes, GradeTypes
 from learning.tests.factories import (
     AssignmentCommentFactory, EnrollmentFactory, StudentAssignmentFactory
 )
-from users.tests.factories import CuratorFactory, StudentFactory, TeacherFactory
+from users.tests.factories import (
+    CuratorFactory, StudentFactory, StudentProfileFactory, TeacherFactory
+)
 
 
 @pytest.mark.django_db
@@ -59,6 +62,32 @@ def test_assignments_check_queue_view_permissions(client, lms_resolver,
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_view_assignments_check_queue_program_year(settings, client,
+                                                   django_capture_on_commit_callbacks):
+    teacher = TeacherFactory()
+    branch = BranchFactory(site=SiteFactory(pk=settings.SITE_ID))
+    course = CourseFactory(main_branch=branch, teachers=[teacher])
+    with django_capture_on_commit_callbacks(execute=True):
+        student_profile = StudentProfileFactory(branch=branch, year_of_curriculum=2020)
+        EnrollmentFactory(course=course, student=student_profile.user,
+                          student_profile=student_profile)
+        AssignmentFactory(course=course)
+    client.login(teacher)
+    url = reverse('teaching:assignments_check_queue')
+    response = client.get(url)
+    assert response.context_data['app_data']['props']['programYear'] == [
+        {"value": "2020", "label": 2020}
+    ]
+    # Options are maintained on enrollment changes
+    with django_capture_on_commit_callbacks(execute=True):
+        enrollment = Enrollment.objects.get(course=course)
+        enrollment.is_deleted = True
+        enrollment.save()
+    response = client.get(url)
+    assert response.context_data['app_data']['props']['programYear'] == []
+
+
 @pytest.mark.django_db
 def test_view_assignments_check_queue(settings, client):
     teacher = TeacherFactory(time_zone=pytz.timezone('Asia/Novosibirsk'))
@@ -77,6 +106,8 @@ def test_view_assignments_check_queue(settings, client):
     assert 'courseOptions' in app_data['props']
     assert course.pk == app_data['state']['course']
     assert app_data['state']['selectedAssignments'] == []
+    assert app_data['props']['checkQueueUrl'] == reverse(
+        'learning-api:v1:check_queue', kwargs={'course_id': course.pk})
     assert len(app_data['props']['courseTeachers']) == 2
     assert app_data['props']['courseTeachers'][0]['value'] == 'unset'
     course_teacher = CourseTeacher.objects.get(course=course, teacher=teacher)
@@ -656,3 +687,46 @@ def test_view_assignment_student_answers_csv(client):
     assert data[1] == student_one_row
     assert data[2] == student_one_row_extra
     assert data[3] == student_two_row
+
+
+@pytest.mark.django_db
+def test_view_assignment_download_solution_attachments(client, settings, tmpdir,
+                                                       django_assert_max_num_queries):
+    settings.SOLUTION_ATTACHMENTS_CACHE_DIR = str(tmpdir)
+    teacher = TeacherFactory()
+    student_one, student_two = StudentFactory.create_batch(2)
+    course = CourseFactory(teachers=[teacher])
+    EnrollmentFactory(course=course, student=student_one)
+    EnrollmentFactory(course=course, student=student_two)
+    assignment = AssignmentFactory(course=course)
+    sa_one = StudentAssignment.objects.get(student=student_one)
+    sa_two = StudentAssignment.objects.get(student=student_two)
+    AssignmentCommentFactory(student_assignment=sa_one, author=student_one,
+                             type=AssignmentSubmissionTypes.SOLUTION)
+    AssignmentCommentFactory(student_assignment=sa_one, author=student_one,
+                             type=AssignmentSubmissionTypes.SOLUTION)
+    AssignmentCommentFactory(student_assignment=sa_two, author=student_two,
+                             type=AssignmentSubmissionTypes.COMMENT)
+    url = reverse('teaching:assignment_download_solution_attachments',
+                  args=[assignment.pk])
+    client.login(teacher)
+    # Number of queries doesn't depend on the number of students
+    with django_assert_max_num_queries(10):
+        response = client.get(url)
+        assert response.streaming
+        content = b"".join(response.streaming_content)
+    assert response['Content-Type'] == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+        assert len(zip_file.namelist()) == 2
+        assert zip_file.testzip() is None
+    assert len(tmpdir.listdir()) == 1
+    # Cached archive
+    response = client.get(url)
+    assert b"".join(response.streaming_content) == content
+    # New solution invalidates cache
+    AssignmentCommentFactory(student_assignment=sa_two, author=student_two,
+                             type=AssignmentSubmissionTypes.SOLUTION)
+    response = client.get(url)
+    with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as zip_file:
+        assert len(zip_file.namelist()) == 3
+    assert len(tmpdir.listdir()) == 1
@@ -40,6 +40,11 @@ student_group_api_patterns = [
     path('student-groups/<int:source_student_group>/transfer/', StudentGroupTransferStudentsView.as_view(), name='transfer'),
 ]
 
+gradebook_api_patterns = [
+    path('<int:course_id>/', gv.GradebookDataAPIView.as_view(), name='data'),
+    path('<int:course_id>/cells/', gv.GradebookCellsUpdateAPIView.as_view(), name='cells'),
+]
+
 import_scores_api_patterns = [
     path('<int:course_id>/import/yandex-contest/', gv.GradebookImportScoresFromYandexContest.as_view(), name='yandex_contest')
 ]
@@ -81,6 +86,7 @@ urlpatterns = [
         re_path(RE_COURSE_URI, include([
             path('', gv.GradeBookView.as_view(), name='gradebook'),
             path('csv/', gv.GradeBookCSVView.as_view(), name='gradebook_csv'),
+            re_path(r'^export/(?P<output_format>csv|xlsx)/$', gv.GradeBookExportView.as_view(), name='gradebook_export'),
         ])),
         path('<int:course_id>/import/csv/', include([
             path('assignments-stepik', gv.ImportAssignmentScoresByStepikIDView.as_view(), name='gradebook_import_scores_by_stepik_id'),
@@ -94,6 +100,7 @@ urlpatterns = [
     path('api/', include(([
         path('', include((student_group_api_patterns, 'student-groups'))),
         path('scores/', include((import_scores_api_patterns, 'import-scores'))),
+        path('gradebook/', include((gradebook_api_patterns, 'gradebook'))),
         path('v1/', include((scores_api_patterns, 'scores'))),
     ], 'api'))),
 ]
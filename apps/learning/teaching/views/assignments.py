@@ -1,9 +1,9 @@
 import csv
 import datetime
+import glob
+import hashlib
 import os.path
-import tempfile
-import zipfile
-from typing import Any, Dict, Iterator, List, NamedTuple
+from typing import Any, Dict, List, NamedTuple
 
 from rest_framework import serializers
 from vanilla import TemplateView
@@ -14,7 +14,10 @@ from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import transaction
 from django.db.models import FileField, F, OuterRef, Subquery, Prefetch
-from django.http import FileResponse, HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse
+)
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect
 from django.views import generic
@@ -36,6 +39,7 @@ from courses.selectors import (
     assignments_list, course_teachers_prefetch_queryset, get_course_teachers
 )
 from courses.services import CourseService
+from files.utils import iter_zip_archive, tee_to_file
 from grading.api.yandex_contest import SubmissionVerdict
 from grading.constants import SubmissionStatus
 from learning.forms import AssignmentModalCommentForm, AssignmentReviewForm
@@ -48,6 +52,7 @@ from learning.permissions import (
 )
 from learning.selectors import get_enrollment, get_teacher_not_spectator_courses
 from learning.services import AssignmentService, StudentGroupService
+from learning.services.check_queue_service import get_check_queue_program_years
 from learning.services.personal_assignment_service import (
     create_personal_assignment_review, get_assignment_update_history_message,
     get_draft_comment
@@ -55,7 +60,7 @@ from learning.services.personal_assignment_service import (
 from learning.settings import AssignmentScoreUpdateSource
 from learning.utils import humanize_duration
 from learning.views import AssignmentCommentUpsertView, AssignmentSubmissionBaseView
-from users.models import StudentProfile, User
+from users.models import User
 
 
 def _check_queue_filters(course: Course, query_params):
@@ -91,26 +96,8 @@ def _check_queue_filters(course: Course, query_params):
         label = g.get_name(branch_details=sites_total > 1)
         student_groups.append({"value": g.pk, "label": label, "selected": False})
 
-    student_ids = (Enrollment.active
-                  .filter(course=course)
-                  .select_related('student')
-                  .values_list('student_id', flat=True)
-                  .distinct())
-
-    student_profiles = (StudentProfile.objects
-                       .filter(user_id__in=student_ids, site_id=settings.SITE_ID)
-                       .select_related('user', 'branch')
-                       .order_by('priority', '-year_of_admission', '-pk'))
-
-    profiles_by_user = set()
-    program_years = set()
-    for profile in student_profiles:
-        if profile.user_id not in profiles_by_user:
-            profiles_by_user.add(profile.user_id)
-            if profile.year_of_curriculum:
-                program_years.add(profile.year_of_curriculum)
-
-    program_year = [{"value": str(year), "label": year} for year in sorted(program_years)]
+    program_year = [{"value": str(year), "label": year}
+                    for year in get_check_queue_program_years(course)]
 
     return {
         "assignments": assignments,
@@ -172,6 +159,9 @@ class AssignmentCheckQueueView(PermissionRequiredMixin, TemplateView):
                     "courseTeachers": filters["courseTeachers"],
                     "courseGroups": filters["courseGroups"],
                     "programYear": filters["programYear"],
+                    # Queue is served page by page from the check queue table
+                    "checkQueueUrl": reverse('learning-api:v1:check_queue',
+                                             kwargs={"course_id": course.pk}),
                     "statusOptions": [{'value': v, 'label': str(l)} for v, l in AssignmentStatus.choices
                                       if v != AssignmentStatus.NEW]
                 },
@@ -509,58 +499,79 @@ class StudentAssignmentCommentCreateView(PermissionRequiredMixin,
 class SolutionAttachmentZipFile(NamedTuple):
     path: str
     file_field: FileField
+    modified: datetime.datetime
 
 
-def _solution_attachments(assignment: Assignment) -> Iterator[SolutionAttachmentZipFile]:
+def _solution_attachments(assignment: Assignment) -> List[SolutionAttachmentZipFile]:
     enrollments = (Enrollment.active
                    .filter(course_id=assignment.course_id)
                    .prefetch_related('student_group'))
     student_groups = {e.student_id: e.student_group.get_name() for e in enrollments}
-    active_students = student_groups.keys()
-    personal_assignments = (StudentAssignment.objects
-                            .filter(assignment=assignment,
-                                    student__in=active_students)
-                            .select_related('student'))
+    solutions = (AssignmentComment.published
+                 .filter(student_assignment__assignment=assignment,
+                         student_assignment__deleted_at__isnull=True,
+                         student_assignment__student__in=student_groups.keys(),
+                         type=AssignmentSubmissionTypes.SOLUTION)
+                 .select_related('student_assignment__student')
+                 .order_by('student_assignment_id', 'created'))
     root_name = f"{assignment.pk}-{assignment.title}"
-    for student_assignment in personal_assignments:
-        solutions = list(AssignmentComment.published
-                         .filter(student_assignment=student_assignment,
-                                 type=AssignmentSubmissionTypes.SOLUTION))
-        if solutions:
-            student_group = student_groups[student_assignment.student_id]
-            dir_name = student_assignment.student.get_abbreviated_short_name()
-            for solution in solutions:
-                file_field = solution.attached_file
-                file_name = os.path.basename(file_field.name)
-                yield SolutionAttachmentZipFile(
-                    path=f"{root_name}/{student_group}/{dir_name}/{file_name}",
-                    file_field=file_field)
+    attachments = []
+    for solution in solutions:
+        student = solution.student_assignment.student
+        student_group = student_groups[student.pk]
+        dir_name = student.get_abbreviated_short_name()
+        file_field = solution.attached_file
+        file_name = os.path.basename(file_field.name)
+        attachments.append(SolutionAttachmentZipFile(
+            path=f"{root_name}/{student_group}/{dir_name}/{file_name}",
+            file_field=file_field,
+            modified=solution.modified))
+    return attachments
+
+
+def _solution_attachments_cache_path(assignment: Assignment,
+                                     attachments: List[SolutionAttachmentZipFile]) -> str:
+    """
+    Archive is identified by the latest solution timestamp, hash of the
+    file list takes into account deleted solutions and left students.
+    """
+    latest = max((a.modified for a in attachments), default=None)
+    version = latest.strftime("%Y%m%d%H%M%S%f") if latest else "0"
+    files_hash = hashlib.md5()
+    for a in attachments:
+        files_hash.update(f"{a.path}:{a.file_field.name}\n".encode())
+    file_name = f"{assignment.pk}-{version}-{files_hash.hexdigest()}.zip"
+    return os.path.join(settings.SOLUTION_ATTACHMENTS_CACHE_DIR, file_name)
 
 
 class AssignmentDownloadSolutionAttachmentsView(PermissionRequiredMixin, generic.View):
+    """
+    Streams zip archive with solutions of all active students. The archive
+    is built on the fly while attachments are read from the storage.
+    Fully sent archive is stored in `settings.SOLUTION_ATTACHMENTS_CACHE_DIR`
+    (if set) and reused until a new solution is submitted.
+    """
     permission_required = DownloadAssignmentSolutions.name
 
     def get(self, request, *args, **kwargs):
         assignment_id = kwargs['pk']
         assignment = get_object_or_404(Assignment.objects.filter(pk=assignment_id))
-        files = _solution_attachments(assignment)
-
-        in_memory_size = 1024 * 1024 * 25  # 25 mb
-        temp_file = tempfile.SpooledTemporaryFile(max_size=in_memory_size)
-        with zipfile.ZipFile(temp_file, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_file:
-            for attachment in files:
-                file_field = attachment.file_field
-                try:
-                    with file_field.storage.open(file_field.name) as f:
-                        zip_file.writestr(attachment.path, f.read())
-                except FileNotFoundError:
-                    pass
-
-        file_size = temp_file.tell()
-        temp_file.seek(0)
+        attachments = _solution_attachments(assignment)
         file_name = 'download.zip'
 
-        response = FileResponse(temp_file, content_type='application/zip')
+        stream = iter_zip_archive((a.path, a.file_field) for a in attachments)
+        if getattr(settings, 'SOLUTION_ATTACHMENTS_CACHE_DIR', None):
+            cache_path = _solution_attachments_cache_path(assignment, attachments)
+            if os.path.exists(cache_path):
+                return FileResponse(open(cache_path, 'rb'), as_attachment=True,
+                                    filename=file_name,
+                                    content_type='application/zip')
+            # Outdated versions of the archive
+            cache_dir = os.path.dirname(cache_path)
+            for stale_path in glob.glob(os.path.join(cache_dir, f"{assignment.pk}-*.zip")):
+                os.remove(stale_path)
+            stream = tee_to_file(stream, cache_path)
+
+        response = StreamingHttpResponse(stream, content_type='application/zip')
         response['Content-Disposition'] = f'attachment; filename={file_name}'
-        response['Content-Length'] = file_size
         return response
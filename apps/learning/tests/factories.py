@@ -136,7 +136,9 @@ class EnrollmentFactory(factory.django.DjangoModelFactory):
     def recreate_assignments(self, create, extracted, **kwargs):
         if not create:
             return
-        # Make sure student group is already assigned here
+        # Make sure student group is already assigned here, personal
+        # assignments are generated from the stored enrollment
+        self.save(update_fields=['student_group'])
         recreate_assignments_for_student(self)
         
     @classmethod
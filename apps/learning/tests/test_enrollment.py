@@ -19,10 +19,13 @@ from learning.models import (
     Enrollment, EnrollmentPeriod, StudentAssignment, StudentGroup
 )
 from learning.services import EnrollmentService, StudentGroupService
-from learning.services.enrollment_service import CourseCapacityFull
+from learning.services.enrollment_service import (
+    CourseCapacityFull, fail_ungraded_enrollments, recreate_assignments_for_student
+)
 from learning.settings import Branches, StudentStatuses, EnrollmentTypes, InvitationEnrollmentTypes, GradeTypes
 from learning.tests.factories import (
-    CourseInvitationFactory, EnrollmentFactory, StudentGroupFactory
+    CourseInvitationFactory, EnrollmentFactory, StudentAssignmentFactory,
+    StudentGroupFactory
 )
 from users.services import get_student_profile
 from users.tests.factories import (
@@ -434,6 +437,28 @@ def test_reenrollment(client):
     assert StudentAssignment.objects.filter(student_id=student.pk).count() == 2
 
 
+@pytest.mark.django_db
+def test_recreate_assignments_for_student_restricted_assignment():
+    course = CourseFactory()
+    enrollment = EnrollmentFactory(course=course)
+    student_group_other = StudentGroupFactory(course=course)
+    assignment = AssignmentFactory(course=course)
+    assignment_restricted = AssignmentFactory(course=course,
+                                              restricted_to=[student_group_other])
+    # Personal assignment was created before the restriction has been added
+    StudentAssignmentFactory(assignment=assignment_restricted,
+                             student=enrollment.student)
+    (StudentAssignment.objects
+     .filter(student=enrollment.student)
+     .update(score=3))
+    recreate_assignments_for_student(enrollment)
+    student_assignment = StudentAssignment.objects.get(assignment=assignment)
+    assert student_assignment.score is None
+    student_assignment_restricted = StudentAssignment.objects.get(
+        assignment=assignment_restricted)
+    assert student_assignment_restricted.score == 3
+
+
 @pytest.mark.django_db
 def test_enrollment_in_other_branch(client):
     branch_spb = BranchFactory(code=Branches.SPB)
@@ -753,3 +778,25 @@ def test_enrollment_add_teacher_to_project(mocker, django_capture_on_commit_call
                       submission_type=AssignmentFormat.CODE_REVIEW)
     CourseTeacher(course=course, teacher=t2).save()
     mocked.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_fail_ungraded_enrollments():
+    current_term = SemesterFactory.create_current()
+    enrollments = EnrollmentFactory.create_batch(3, course__semester=current_term)
+    graded = EnrollmentFactory(course__semester=current_term,
+                               grade=GradeTypes.GOOD)
+    progress = []
+    queryset = Enrollment.objects.filter(course__semester=current_term)
+    updated = fail_ungraded_enrollments(
+        queryset, chunk_size=2,
+        on_progress=lambda processed, total: progress.append((processed, total)))
+    assert updated == 3
+    assert progress == [(2, 3), (3, 3)]
+    for enrollment in enrollments:
+        enrollment.refresh_from_db()
+        assert enrollment.grade == GradeTypes.UNSATISFACTORY
+    graded.refresh_from_db()
+    assert graded.grade == GradeTypes.GOOD
+    # Rerun is a no-op
+    assert fail_ungraded_enrollments(queryset) == 0
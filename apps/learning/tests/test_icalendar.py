@@ -92,6 +92,31 @@ def test_assignments(client, settings, mocker):
                evt['SUMMARY'] for evt in cal.subcomponents if isinstance(evt, Event)}
 
 
+@pytest.mark.django_db
+def test_course_classes_conditional_get(client):
+    student = StudentFactory()
+    course = CourseFactory()
+    EnrollmentFactory(student=student, course=course)
+    course_class = CourseClassFactory(course=course)
+    url = student.get_classes_icalendar_url()
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert response['Last-Modified']
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not response.content
+    # Rendered feed is invalidated on course class changes
+    course_class.name = 'New Name'
+    course_class.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    cal = Calendar.from_ical(response.content)
+    assert 'New Name' in {evt['SUMMARY'] for evt in cal.subcomponents
+                          if isinstance(evt, Event)}
+
+
 @pytest.mark.django_db
 def test_interviews(client, settings, mocker):
     user = UserFactory(groups=[Roles.INTERVIEWER])
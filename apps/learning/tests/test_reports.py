@@ -587,3 +587,22 @@ def test_export_highest_or_max_grade(settings):
     assert df[meta_course.name].iloc[0] == GradeTypes.EXCELLENT
     df = ProgressReportFull(on_course_duplicate='store_last').generate()
     assert df[meta_course.name].iloc[0] == GradeTypes.GOOD
+
+
+def test_resolve_course_duplicates():
+    enrollments = DataFrame.from_records(
+        [(1, 1, 10, GradeTypes.EXCELLENT, 1, True),
+         (1, 2, 10, GradeTypes.GOOD, 2, True),
+         (1, 3, 10, GradeTypes.NOT_GRADED, 3, False),
+         (2, 4, 10, GradeTypes.UNSATISFACTORY, 1, False),
+         (2, 5, 10, GradeTypes.NOT_GRADED, 2, False)],
+        columns=["student_id", "position", "meta_course_id", "grade",
+                 "semester_index", "is_satisfactory"])
+    report = ProgressReportFull(on_course_duplicate='store_last')
+    resolved = report.resolve_course_duplicates(enrollments)
+    # The latest satisfactory grade or the first one if there are no
+    # satisfactory grades
+    assert resolved["position"].tolist() == [2, 4]
+    report = ProgressReportFull(on_course_duplicate='store_max')
+    resolved = report.resolve_course_duplicates(enrollments)
+    assert resolved["position"].tolist() == [1, 4]
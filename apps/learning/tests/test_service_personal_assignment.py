@@ -12,7 +12,7 @@ from courses.constants import AssigneeMode, AssignmentFormat, AssignmentStatus
 from courses.models import CourseGroupModes, CourseTeacher
 from courses.tests.factories import AssignmentFactory, CourseFactory, CourseTeacherFactory
 from learning.models import (
-    AssignmentComment, AssignmentSubmissionTypes, Enrollment,
+    AssignmentComment, AssignmentScoreAuditLog, AssignmentSubmissionTypes, Enrollment,
     PersonalAssignmentActivity, StudentAssignment, StudentGroupTeacherBucket
 )
 from learning.services import EnrollmentService, StudentGroupService
@@ -21,7 +21,9 @@ from learning.services.personal_assignment_service import (
     create_personal_assignment_review, resolve_assignees_for_personal_assignment,
     update_personal_assignment_score, update_personal_assignment_stats,
     update_personal_assignment_status, get_assignee_with_minimal_load,
-    calculate_teachers_overall_expected_load_in_bucket
+    calculate_teachers_overall_expected_load_in_bucket,
+    PersonalAssignmentScoreUpdate, bulk_update_personal_assignment_scores,
+    bulk_recalculate_personal_assignment_stats, assign_pending_personal_assignments
 )
 from learning.settings import AssignmentScoreUpdateSource
 from learning.tests.factories import (
@@ -150,6 +152,87 @@ def test_service_update_personal_assignment_stats_published(django_capture_on_co
     assert fixed_dt - delta <= solutions_stats['last'] <= fixed_dt + delta
 
 
+@pytest.mark.django_db
+def test_service_apply_personal_assignment_stats_delta():
+    curator = CuratorFactory()
+    student_assignment = StudentAssignmentFactory()
+    student = student_assignment.student
+    create_assignment_comment(personal_assignment=student_assignment,
+                              is_draft=True, created_by=curator,
+                              message='Draft')
+    student_assignment.refresh_from_db()
+    assert student_assignment.stats is None
+    # Publish draft
+    create_assignment_comment(personal_assignment=student_assignment,
+                              is_draft=False, created_by=curator,
+                              message='Comment')
+    student_assignment.refresh_from_db()
+    assert student_assignment.stats == {'activity': PersonalAssignmentActivity.TEACHER_COMMENT,
+                                        'comments': 1}
+    solution1 = create_assignment_solution(personal_assignment=student_assignment,
+                                           created_by=student,
+                                           execution_time=timedelta(hours=1),
+                                           message="solution1")
+    solution2 = create_assignment_solution(personal_assignment=student_assignment,
+                                           created_by=student,
+                                           execution_time=timedelta(minutes=30),
+                                           message="solution2")
+    student_assignment.refresh_from_db()
+    assert student_assignment.execution_time == timedelta(hours=1, minutes=30)
+    stats = student_assignment.stats
+    assert stats['activity'] == PersonalAssignmentActivity.SOLUTION
+    assert stats['comments'] == 1
+    assert stats['solutions']['count'] == 2
+    assert stats['solutions']['first'] == solution1.created.replace(microsecond=0)
+    assert stats['solutions']['last'] == solution2.created.replace(microsecond=0)
+    create_assignment_comment(personal_assignment=student_assignment,
+                              is_draft=False, created_by=student,
+                              message='Student comment')
+    student_assignment.refresh_from_db()
+    assert student_assignment.stats['activity'] == PersonalAssignmentActivity.STUDENT_COMMENT
+    assert student_assignment.stats['comments'] == 2
+    expected_meta = student_assignment.meta
+    # Incremental stats are consistent with full recalculation
+    assert bulk_recalculate_personal_assignment_stats(StudentAssignment.objects.all()) == 0
+    # Soft delete
+    solution2.delete()
+    student_assignment.refresh_from_db()
+    assert student_assignment.execution_time == timedelta(hours=1)
+    assert student_assignment.stats['solutions']['count'] == 1
+    assert student_assignment.stats['solutions']['last'] == solution1.created.replace(microsecond=0)
+    assert student_assignment.stats['activity'] == PersonalAssignmentActivity.STUDENT_COMMENT
+    assert bulk_recalculate_personal_assignment_stats(StudentAssignment.objects.all()) == 0
+    solution2.restore()
+    student_assignment.refresh_from_db()
+    assert student_assignment.meta == expected_meta
+    assert student_assignment.execution_time == timedelta(hours=1, minutes=30)
+    # Hard deletion of the soft deleted submission doesn't change stats
+    solution2.delete()
+    solution2.delete(permanent=True)
+    student_assignment.refresh_from_db()
+    assert student_assignment.execution_time == timedelta(hours=1)
+    assert student_assignment.stats['solutions']['count'] == 1
+    assert bulk_recalculate_personal_assignment_stats(StudentAssignment.objects.all()) == 0
+    create_assignment_solution(personal_assignment=student_assignment,
+                               created_by=student,
+                               execution_time=timedelta(minutes=30),
+                               message="solution3")
+    student_assignment.refresh_from_db()
+    expected_meta = student_assignment.meta
+    (StudentAssignment.objects
+     .filter(pk=student_assignment.pk)
+     .update(meta=None, execution_time=None))
+    # Repair
+    queryset = StudentAssignment.objects.filter(pk=student_assignment.pk)
+    assert bulk_recalculate_personal_assignment_stats(queryset, dry_run=True) == 1
+    student_assignment.refresh_from_db()
+    assert student_assignment.meta is None
+    assert bulk_recalculate_personal_assignment_stats(queryset) == 1
+    student_assignment.refresh_from_db()
+    assert student_assignment.meta == expected_meta
+    assert student_assignment.execution_time == timedelta(hours=1, minutes=30)
+
+
 @pytest.mark.django_db
 def test_maybe_set_assignee_for_personal_assignment_already_assigned():
     """Don't overwrite assignee if someone was set before student activity."""
@@ -408,6 +491,51 @@ def test_update_personal_assignment_score_fake_update():
     assert sa.score is None
 
 
+@pytest.mark.django_db
+def test_bulk_update_personal_assignment_scores(django_assert_num_queries):
+    teacher = TeacherFactory()
+    course = CourseFactory(teachers=[teacher])
+    assignment = AssignmentFactory(course=course, maximum_score=10)
+    sa1, sa2, sa3 = StudentAssignmentFactory.create_batch(3, assignment=assignment)
+    StudentAssignment.objects.filter(pk=sa3.pk).update(score=Decimal('4'))
+    updates = [
+        PersonalAssignmentScoreUpdate(student_assignment=sa1,
+                                      score_old=None, score_new=Decimal('5.5')),
+        PersonalAssignmentScoreUpdate(student_assignment=sa2,
+                                      score_old=None, score_new=None),
+        # Conflict: score has been changed by someone else
+        PersonalAssignmentScoreUpdate(student_assignment=sa3,
+                                      score_old=Decimal('3'), score_new=Decimal('7')),
+    ]
+    # Savepoint, UPDATE, INSERT audit logs, release savepoint
+    with django_assert_num_queries(4):
+        conflicts = bulk_update_personal_assignment_scores(
+            updates=updates, changed_by=teacher,
+            source=AssignmentScoreUpdateSource.FORM_GRADEBOOK)
+    assert [c.student_assignment for c in conflicts] == [sa3]
+    sa1.refresh_from_db()
+    sa3.refresh_from_db()
+    assert sa1.score == Decimal('5.5')
+    assert sa3.score == Decimal('4')
+    audit_log = list(AssignmentScoreAuditLog.objects.all())
+    assert len(audit_log) == 1
+    assert audit_log[0].student_assignment_id == sa1.pk
+    assert audit_log[0].score_old is None
+    assert audit_log[0].score_new == Decimal('5.5')
+    assert audit_log[0].source == AssignmentScoreUpdateSource.FORM_GRADEBOOK
+    # Score overflow
+    with pytest.raises(ValidationError) as e:
+        bulk_update_personal_assignment_scores(
+            updates=[PersonalAssignmentScoreUpdate(student_assignment=sa2,
+                                                   score_old=None,
+                                                   score_new=Decimal('11'))],
+            changed_by=teacher, source=AssignmentScoreUpdateSource.FORM_GRADEBOOK)
+    assert e.value.code == "score_overflow"
+    assert bulk_update_personal_assignment_scores(
+        updates=[], changed_by=teacher,
+        source=AssignmentScoreUpdateSource.FORM_GRADEBOOK) == []
+
+
 @pytest.mark.django_db
 def test_create_personal_assignment_review(django_capture_on_commit_callbacks):
     teacher = TeacherFactory()
@@ -1233,3 +1361,69 @@ def test_get_assignee_with_minial_load_assignment_load_independency():
     # Independency check in both directions
     assignee_a2_sa1 = get_assignee_with_minimal_load(sg1_a2_sa)[0]
     assert assignee_a2_sa1 == teachers[1]
+
+
+@pytest.mark.django_db
+def test_assign_pending_personal_assignments():
+    course, teachers, student_groups, buckets = create_buckets_testing_environment(
+        group_sizes=[0, 2, 3, 1],  # One group not in any of buckets
+        buckets_structs={
+            (0, 1, 2): {0, 1}
+        }
+    ).values()
+    assignment = buckets[0].assignment
+    personal_assignments = StudentAssignment.objects.filter(assignment=assignment)
+    for student_assignment in personal_assignments:
+        AssignmentCommentFactory(student_assignment=student_assignment,
+                                 author=student_assignment.student)
+    personal_assignments.update(assignee=None, trigger_auto_assign=True)
+    # Teacher's activity is not taken into account
+    sg2_sa = personal_assignments.get(student=student_groups[1].enrollments.first().student_id)
+    sg2_sa.assignmentcomment_set.all().delete()
+    AssignmentCommentFactory(student_assignment=sg2_sa, author=teachers[0].teacher)
+    report = assign_pending_personal_assignments(assignment, dry_run=True)
+    assert len(report.assignees) == 5
+    # Expected load of the personal assignment without student activity is
+    # still shared among bucket teachers
+    assert report.loads == {teachers[0].pk: 2.5, teachers[1].pk: 2.5}
+    planned = [assignee for _, assignee in report.assignees if assignee]
+    assert len(planned) == 4
+    assert planned.count(teachers[0]) == 2
+    assert not personal_assignments.filter(assignee__isnull=False).exists()
+    report = assign_pending_personal_assignments(assignment)
+    assert len(report.assignees) == 5
+    assert personal_assignments.filter(assignee=teachers[0]).count() == 2
+    assert personal_assignments.filter(assignee=teachers[1]).count() == 2
+    assert personal_assignments.filter(trigger_auto_assign=True).get() == sg2_sa
+    # Nothing to assign
+    report = assign_pending_personal_assignments(assignment)
+    assert not report.assignees
+
+
+@pytest.mark.django_db
+def test_assign_pending_personal_assignments_student_left_course():
+    course, teachers, student_groups, buckets = create_buckets_testing_environment(
+        group_sizes=[2],
+        buckets_structs={
+            (0,): {0}
+        }
+    ).values()
+    assignment = buckets[0].assignment
+    personal_assignments = StudentAssignment.objects.filter(assignment=assignment)
+    for student_assignment in personal_assignments:
+        AssignmentCommentFactory(student_assignment=student_assignment,
+                                 author=student_assignment.student)
+    personal_assignments.update(assignee=None, trigger_auto_assign=True)
+    left_enrollment = student_groups[0].enrollments.first()
+    Enrollment.objects.filter(pk=left_enrollment.pk).update(is_deleted=True)
+    assign_pending_personal_assignments(assignment)
+    left_sa = personal_assignments.get(student=left_enrollment.student_id)
+    assert left_sa.assignee is None
+    # Trigger is kept until student re-enter the course
+    assert left_sa.trigger_auto_assign
+    assert personal_assignments.filter(assignee=teachers[0]).count() == 1
+    Enrollment.objects.filter(pk=left_enrollment.pk).update(is_deleted=False)
+    assign_pending_personal_assignments(assignment)
+    left_sa.refresh_from_db()
+    assert left_sa.assignee == teachers[0]
+    assert not left_sa.trigger_auto_assign
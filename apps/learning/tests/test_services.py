@@ -1,6 +1,7 @@
 from datetime import timedelta
 
 import pytest
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.utils.timezone import now
 
@@ -14,7 +15,12 @@ from learning.models import (
     AssignmentNotification, Enrollment, StudentAssignment, StudentGroup, EnrollmentGradeLog
 )
 from learning.services import AssignmentService
-from learning.services.enrollment_service import update_enrollment_grade
+from learning.services.enrollment_service import (
+    fail_ungraded_enrollments, update_enrollment_grade
+)
+from learning.services.graduate_stats_service import (
+    FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN, calculate_future_graduate_stats
+)
 from learning.services.notification_service import (
     create_notifications_about_new_submission
 )
@@ -107,6 +113,32 @@ def test_assignment_service_bulk_create_personal_assignments(settings):
     assert StudentAssignment.objects.can_be_submitted().get(assignment=assignment).student_id == student_profile_spb.user_id
 
 
+@pytest.mark.django_db
+def test_assignment_service_bulk_create_restores_personal_assignments():
+    course = CourseFactory()
+    enrollment1, enrollment2 = EnrollmentFactory.create_batch(2, course=course)
+    assignment = AssignmentFactory(course=course)
+    assert StudentAssignment.objects.filter(assignment=assignment).count() == 2
+    assert AssignmentNotification.objects.filter(is_about_creation=True).count() == 2
+    personal_assignment = StudentAssignment.objects.get(assignment=assignment,
+                                                        student=enrollment1.student)
+    comment = AssignmentCommentFactory(student_assignment=personal_assignment)
+    personal_assignment.delete()
+    comment.refresh_from_db()
+    assert comment.is_deleted
+    result = AssignmentService.bulk_create_student_assignments(assignment)
+    assert result.created == 0
+    assert result.restored == 1
+    assert result.notified == 1
+    personal_assignment.refresh_from_db()
+    assert not personal_assignment.is_deleted
+    comment.refresh_from_db()
+    assert not comment.is_deleted
+    # Nothing to do for the second time
+    result = AssignmentService.bulk_create_student_assignments(assignment)
+    assert result == (0, 0, 0)
+
+
 @pytest.mark.parametrize("inactive_status", [StudentStatuses.ACADEMIC_LEAVE,
                                              StudentStatuses.ACADEMIC_LEAVE_SECOND,
                                              StudentStatuses.EXPELLED])
@@ -501,3 +533,60 @@ def test_update_enrollment_grade_concurrency():
     assert enrollment.grade == GradeTypes.EXCELLENT  # db values has been changed
     logs = EnrollmentGradeLog.objects.all()
     assert logs.count() == 2
+
+
+@pytest.mark.django_db
+def test_calculate_future_graduate_stats():
+    branch = BranchFactory()
+    student_profile1 = StudentProfileFactory(branch=branch,
+                                             status=StudentStatuses.WILL_GRADUATE)
+    student_profile2 = StudentProfileFactory(branch=branch,
+                                             status=StudentStatuses.WILL_GRADUATE)
+    # Students of the other branches are not counted
+    student_profile3 = StudentProfileFactory(status=StudentStatuses.WILL_GRADUATE)
+    course1, course2 = CourseFactory.create_batch(2, main_branch=branch)
+    EnrollmentFactory(course=course1, student=student_profile1.user,
+                      student_profile=student_profile1,
+                      grade=GradeTypes.EXCELLENT)
+    EnrollmentFactory(course=course2, student=student_profile1.user,
+                      student_profile=student_profile1,
+                      grade=GradeTypes.GOOD)
+    EnrollmentFactory(course=course1, student=student_profile2.user,
+                      student_profile=student_profile2,
+                      grade=GradeTypes.UNSATISFACTORY)
+    EnrollmentFactory(course=course2, student=student_profile3.user,
+                      student_profile=student_profile3,
+                      grade=GradeTypes.GOOD)
+    stats = calculate_future_graduate_stats(branch.pk)
+    assert set(stats.student_profiles) == {student_profile1.pk, student_profile2.pk}
+    assert stats.total_passed_courses == 2
+    assert stats.excellent_total == 1
+    assert stats.good_total == 1
+    assert set(stats.unique_courses) == {course1.meta_course_id,
+                                         course2.meta_course_id}
+    assert stats.most_courses_students == [student_profile1.user_id]
+    assert stats.most_failed_courses == {student_profile2.user_id: 1}
+    assert stats.less_failed_courses == {student_profile1.user_id: 0}
+
+
+@pytest.mark.django_db
+def test_future_graduate_stats_invalidation_on_grade_update(django_capture_on_commit_callbacks):
+    student_profile = StudentProfileFactory(status=StudentStatuses.WILL_GRADUATE)
+    enrollment1, enrollment2 = EnrollmentFactory.create_batch(
+        2, student=student_profile.user, student_profile=student_profile,
+        grade=GradeTypes.NOT_GRADED)
+    cache_key = FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN.format(
+        branch_id=student_profile.branch_id)
+    cache.set(cache_key, 'snapshot')
+    # Grades are updated by queryset, post_save signal is not sent
+    with django_capture_on_commit_callbacks(execute=True):
+        update_enrollment_grade(enrollment1,
+                                old_grade=GradeTypes.NOT_GRADED,
+                                new_grade=GradeTypes.GOOD,
+                                editor=CuratorFactory(),
+                                source=EnrollmentGradeUpdateSource.GRADEBOOK)
+    assert cache.get(cache_key) is None
+    cache.set(cache_key, 'snapshot')
+    with django_capture_on_commit_callbacks(execute=True):
+        fail_ungraded_enrollments(Enrollment.objects.filter(pk=enrollment2.pk))
+    assert cache.get(cache_key) is None
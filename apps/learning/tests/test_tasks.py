@@ -10,6 +10,8 @@ def test_convert_assignment_submission_ipynb_file_to_html_success(mocker):
     submission_comment = AssignmentCommentFactory()
     mock_get_field = mocker.patch('learning.tasks.SubmissionAttachment._meta.get_field')
     mock_convert = mocker.patch('learning.tasks.convert_ipynb_to_html')
+    mocker.patch('learning.tasks.get_html_rendition', return_value=None)
+    mock_save_rendition = mocker.patch('learning.tasks.save_html_rendition')
     origin_name = os.path.splitext(os.path.basename(submission_comment.attached_file.name))[0]
 
     mock_storage = MagicMock()
@@ -21,6 +23,7 @@ def test_convert_assignment_submission_ipynb_file_to_html_success(mocker):
     convert_assignment_submission_ipynb_file_to_html(assignment_submission_id=submission_comment.pk)
 
     mock_convert.assert_called_once_with(submission_comment.attached_file, name=origin_name + '.html')
+    mock_save_rendition.assert_called_once_with(submission_comment.attached_file, "html_content")
     
 
     assert len(SubmissionAttachment.objects.all()) == 1
@@ -31,6 +34,7 @@ def test_convert_assignment_submission_ipynb_file_to_html_already_have_file(mock
     submission_comment = AssignmentCommentFactory()
     mock_get_field = mocker.patch('learning.tasks.SubmissionAttachment._meta.get_field')
     mock_convert = mocker.patch('learning.tasks.convert_ipynb_to_html')
+    mocker.patch('learning.tasks.get_html_rendition', return_value='test.ipynb.hash.html')
 
     mock_storage = MagicMock()
     mock_storage.exists.return_value = True
@@ -50,6 +54,7 @@ def test_convert_assignment_submission_ipynb_file_to_html_cant_convert(mocker):
     submission_comment = AssignmentCommentFactory()
     mock_get_field = mocker.patch('learning.tasks.SubmissionAttachment._meta.get_field')
     mock_convert = mocker.patch('learning.tasks.convert_ipynb_to_html')
+    mocker.patch('learning.tasks.get_html_rendition', return_value=None)
     origin_name = os.path.splitext(os.path.basename(submission_comment.attached_file.name))[0]
 
     mock_storage = MagicMock()
@@ -1,12 +1,17 @@
-from typing import Iterable, NamedTuple
+import hashlib
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
 
 from braces.views import UserPassesTestMixin
 from django.conf import settings
 from django.core import signing
+from django.core.cache import cache
 from django.db.models import Q
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
 from django.views import generic
 from django.contrib.sites.models import Site
 
@@ -14,7 +19,9 @@ from admission.selectors import get_ongoing_interviews
 from learning.icalendar import (
     StudentAssignmentICalendarEvent, StudentClassICalendarEvent,
     StudyEventICalendarEvent, TeacherAssignmentICalendarEvent,
-    TeacherClassICalendarEvent, generate_icalendar, InterviewICalendarEvent
+    TeacherClassICalendarEvent, generate_icalendar, InterviewICalendarEvent,
+    ICALENDAR_FEED_CACHE_TIMEOUT, get_icalendar_feed_cache_key,
+    get_icalendar_feed_version
 )
 from learning.models import StudentAssignment
 from learning.selectors import (
@@ -30,24 +37,70 @@ class ICalendarMeta(NamedTuple):
 
 
 class UserICalendarView(generic.base.View):
+    """
+    Calendar clients poll feeds every few minutes. Responses have
+    `ETag` and `Last-Modified` headers to answer with 304 Not Modified
+    for the unchanged feed. Set `feed_cache_code` to store rendered feed
+    in a cache, it must be invalidated with
+    `learning.icalendar.invalidate_icalendar_feeds`.
+    """
+    feed_cache_code: Optional[str] = None
+
     def get(self, request, *args, **kwargs):
         user = self.get_user()
+        if self.feed_cache_code is not None:
+            version = get_icalendar_feed_version(user.pk)
+            cache_key = get_icalendar_feed_cache_key(self.feed_cache_code, user.pk,
+                                                     version, request.get_host())
+            feed = cache.get(cache_key)
+            if feed is None:
+                feed = self.render_feed(user)
+                cache.set(cache_key, feed, ICALENDAR_FEED_CACHE_TIMEOUT)
+            content, file_name, last_modified = feed
+            # Removed events or new enrollment don't affect max modified
+            # value of the events, but they change the feed version
+            last_modified = max(last_modified or 0, version // 1000)
+        else:
+            content, file_name, last_modified = self.render_feed(user)
+        etag = quote_etag(hashlib.md5(content).hexdigest())
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(content,
+                                    content_type="text/calendar; charset=UTF-8")
+            response['Content-Disposition'] = "attachment; filename=\"{}\"".format(
+                file_name)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def render_feed(self, user):
+        """
+        Returns calendar content, file name and timestamp of the latest
+        modification among calendar events if it's known.
+        """
         site = Site.objects.get(pk=settings.SITE_ID)
-        url_builder = request.build_absolute_uri
+        url_builder = self.request.build_absolute_uri
         product_id = f"-//{site.name} Calendar//{site.domain}//"
         tz = user.time_zone or settings.DEFAULT_TIMEZONE
         calendar_meta = self.get_calendar_meta(user, site, url_builder, tz)
+        self.last_modified: Optional[datetime] = None
         events = self.get_calendar_events(user, site, url_builder, tz)
         cal = generate_icalendar(product_id,
                                  name=calendar_meta.name,
                                  description=calendar_meta.description,
                                  time_zone=tz,
                                  events=events)
-        response = HttpResponse(cal.to_ical(),
-                                content_type="text/calendar; charset=UTF-8")
-        response['Content-Disposition'] = "attachment; filename=\"{}\"".format(
-            calendar_meta.file_name)
-        return response
+        content = cal.to_ical()
+        last_modified = None
+        if self.last_modified is not None:
+            last_modified = int(self.last_modified.timestamp())
+        return content, calendar_meta.file_name, last_modified
+
+    def track_modified(self, modified: datetime) -> None:
+        if self.last_modified is None or modified > self.last_modified:
+            self.last_modified = modified
 
     def get_user(self):
         encoded_pk = self.kwargs['encoded_pk']
@@ -65,6 +118,8 @@ class UserICalendarView(generic.base.View):
 
 
 class ICalClassesView(UserICalendarView):
+    feed_cache_code = "classes"
+
     @staticmethod
     def get_calendar_meta(user, site, url_builder, tz) -> ICalendarMeta:
         return ICalendarMeta(
@@ -77,13 +132,17 @@ class ICalClassesView(UserICalendarView):
         event_factory = StudentClassICalendarEvent(tz, url_builder, site)
         # FIXME: filter out past course classes?
         for course_class in get_student_classes(user, with_venue=True):
+            self.track_modified(course_class.modified)
             yield event_factory.create(course_class, user)
         event_factory = TeacherClassICalendarEvent(tz, url_builder, site)
         for course_class in get_teacher_classes(user, with_venue=True):
+            self.track_modified(course_class.modified)
             yield event_factory.create(course_class, user)
 
 
 class ICalAssignmentsView(UserICalendarView):
+    feed_cache_code = "assignments"
+
     @staticmethod
     def get_calendar_meta(user, site, url_builder, tz) -> ICalendarMeta:
         description = "Календарь сроков выполнения заданий {} ({})".format(
@@ -96,12 +155,14 @@ class ICalAssignmentsView(UserICalendarView):
     def get_calendar_events(self, user, site, url_builder, tz):
         event_factory = TeacherAssignmentICalendarEvent(tz, url_builder, site)
         for assignment in get_teacher_assignments(user).with_future_deadline():
+            self.track_modified(assignment.modified)
             yield event_factory.create(assignment, user)
         event_factory = StudentAssignmentICalendarEvent(tz, url_builder, site)
         queryset = (StudentAssignment.objects
                     .for_student(user)
                     .with_future_deadline())
         for sa in queryset:
+            self.track_modified(sa.assignment.modified)
             yield event_factory.create(sa, user)
 
 
@@ -28,6 +28,9 @@ from learning.permissions import (
 )
 from learning.services.personal_assignment_service import create_assignment_comment
 from learning.study.forms import AssignmentCommentForm
+from notifications.cache import (
+    mark_assignment_notifications_read, mark_course_news_notifications_read
+)
 from users.mixins import TeacherOnlyMixin
 
 logger = logging.getLogger(__name__)
@@ -119,9 +122,11 @@ class AssignmentSubmissionBaseView(StudentAssignmentURLParamsMixin,
         sa = self.student_assignment
         user = self.request.user
         # Not sure if it's the best place for this, but it's the simplest one
-        (AssignmentNotification.unread
-         .filter(student_assignment=sa, user=user)
-         .update(is_unread=False))
+        updated = (AssignmentNotification.unread
+                   .filter(student_assignment=sa, user=user)
+                   .update(is_unread=False))
+        if updated:
+            mark_assignment_notifications_read(user.pk, sa.pk)
         # TODO: move to the StudentAssignment model?
         # Let's consider the last minute of the deadline in favor of the student
         deadline_at = sa.assignment.deadline_at + datetime.timedelta(minutes=1)
@@ -206,6 +211,9 @@ class CourseNewsNotificationUpdate(LoginRequiredMixin, CourseURLParamsMixin,
                    .filter(course_offering_news__course=self.course,
                            user_id=self.request.user.pk)
                    .update(is_unread=False))
+        if updated:
+            mark_course_news_notifications_read(self.request.user.pk,
+                                                self.course.pk)
         return JsonResponse({"updated": bool(updated)})
 
 
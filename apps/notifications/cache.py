@@ -0,0 +1,277 @@
+"""
+Unread notifications state of the user stored in a redis hash:
+
+    a:<student_assignment_id> -> <assignment_id>:<student_id>
+    c:<course_id> -> 1
+
+Hash is populated from the DB on a cache miss and then maintained by
+the code that creates or marks notifications as read. Operations that are
+hard to track incrementally (e.g. bulk deletion) invalidate the state
+of affected users. Changes are applied after the current transaction is
+committed, so a concurrent rebuild from the DB can't miss them and
+rolled back changes never get to the cache.
+"""
+import logging
+from functools import partial
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+from redis.exceptions import RedisError, WatchError
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from core.locks import get_shared_connection
+from learning.models import AssignmentNotification, CourseNewsNotification
+
+logger = logging.getLogger(__name__)
+
+# Redis connection is shared among all projects, but the database could be not
+UNREAD_NOTIFICATIONS_CACHE_KEY = 'notifications.unread.{db}.{user_id}'
+UNREAD_NOTIFICATIONS_CACHE_TIMEOUT = 3600 * 24
+# Distinguishes cached empty state from the partially filled hash
+LOADED_FIELD = '_'
+ASSIGNMENT_FIELD_PREFIX = 'a:'
+COURSE_FIELD_PREFIX = 'c:'
+
+
+class UnreadAssignment(NamedTuple):
+    assignment_id: int
+    student_id: int
+
+
+def is_cache_enabled() -> bool:
+    return getattr(settings, 'UNREAD_NOTIFICATIONS_CACHE_ENABLED', False)
+
+
+def get_cache_key(user_id: int) -> str:
+    db_name = settings.DATABASES['default']['NAME']
+    return UNREAD_NOTIFICATIONS_CACHE_KEY.format(db=db_name, user_id=user_id)
+
+
+class UnreadNotificationsCache:
+    """
+    Unread notifications of the user. State is loaded on first access,
+    redis is queried only once per instance.
+    """
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+
+    @cached_property
+    def _state(self):
+        if is_cache_enabled():
+            try:
+                state = _get_cached_state(self.user_id)
+                if state is None:
+                    state = _load_state(self.user_id)
+                return state
+            except RedisError as e:
+                logger.exception(e)
+        return _get_state_from_db(self.user_id)
+
+    @property
+    def assignments(self) -> Dict[int, UnreadAssignment]:
+        """Student assignment id -> unread assignment"""
+        return self._state[0]
+
+    @cached_property
+    def assignments_student(self) -> Dict[int, UnreadAssignment]:
+        return {sa_id: a for sa_id, a in self.assignments.items()
+                if a.student_id == self.user_id}
+
+    @cached_property
+    def assignments_teacher(self) -> Dict[int, UnreadAssignment]:
+        return {sa_id: a for sa_id, a in self.assignments.items()
+                if a.student_id != self.user_id}
+
+    @cached_property
+    def assignment_ids_set(self) -> Set[int]:
+        return {a.assignment_id for a in self.assignments.values()}
+
+    @property
+    def courseoffering_news(self) -> Set[int]:
+        """Set of course ids with unread news"""
+        return self._state[1]
+
+
+def _get_state_from_db(user_id: int):
+    assignments_qs = (AssignmentNotification.unread
+                      .filter(user_id=user_id)
+                      .values_list('student_assignment_id',
+                                   'student_assignment__assignment_id',
+                                   'student_assignment__student_id')
+                      .order_by())
+    assignments = {sa_id: UnreadAssignment(assignment_id, student_id)
+                   for sa_id, assignment_id, student_id in assignments_qs}
+    courses_qs = (CourseNewsNotification.unread
+                  .filter(user_id=user_id)
+                  .values_list('course_offering_news__course_id', flat=True)
+                  .order_by())
+    return assignments, set(courses_qs)
+
+
+def _get_cached_state(user_id: int):
+    data = get_shared_connection().hgetall(get_cache_key(user_id))
+    if LOADED_FIELD.encode() not in data:
+        return None
+    assignments = {}
+    courses = set()
+    for field, value in data.items():
+        field = field.decode()
+        if field.startswith(ASSIGNMENT_FIELD_PREFIX):
+            sa_id = int(field[len(ASSIGNMENT_FIELD_PREFIX):])
+            assignment_id, student_id = value.decode().split(':')
+            assignments[sa_id] = UnreadAssignment(int(assignment_id),
+                                                  int(student_id))
+        elif field.startswith(COURSE_FIELD_PREFIX):
+            courses.add(int(field[len(COURSE_FIELD_PREFIX):]))
+    return assignments, courses
+
+
+def _load_state(user_id: int):
+    """
+    Populates the cached state from the DB. The key is watched while
+    the state is read, so the rebuild is discarded if it was concurrently
+    modified (new notification added or state invalidated), the cache
+    will be populated on the next access then.
+    """
+    key = get_cache_key(user_id)
+    pipe = get_shared_connection().pipeline()
+    try:
+        pipe.watch(key)
+        assignments, courses = _get_state_from_db(user_id)
+        mapping = {LOADED_FIELD: 1}
+        for sa_id, a in assignments.items():
+            mapping[_assignment_field(sa_id)] = _assignment_value(a)
+        for course_id in courses:
+            mapping[f"{COURSE_FIELD_PREFIX}{course_id}"] = 1
+        pipe.multi()
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, UNREAD_NOTIFICATIONS_CACHE_TIMEOUT)
+        pipe.execute()
+    except WatchError:
+        pass
+    finally:
+        pipe.reset()
+    return assignments, courses
+
+
+def _assignment_field(student_assignment_id: int) -> str:
+    return f"{ASSIGNMENT_FIELD_PREFIX}{student_assignment_id}"
+
+
+def _assignment_value(unread_assignment: UnreadAssignment) -> str:
+    return f"{unread_assignment.assignment_id}:{unread_assignment.student_id}"
+
+
+def _execute(pipe) -> None:
+    try:
+        pipe.execute()
+    except RedisError as e:
+        # Stale state will expire after timeout
+        logger.exception(e)
+
+
+def _execute_on_commit(pipe) -> None:
+    transaction.on_commit(partial(_execute, pipe))
+
+
+def invalidate_unread_notifications_cache(user_ids: Iterable[int]) -> None:
+    if not is_cache_enabled():
+        return
+    keys = [get_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        pipe = get_shared_connection().pipeline(transaction=False)
+        pipe.delete(*keys)
+        _execute_on_commit(pipe)
+
+
+def invalidate_all_unread_notifications_cache() -> None:
+    if not is_cache_enabled():
+        return
+    client = get_shared_connection()
+    pattern = get_cache_key(user_id='*')
+    try:
+        for key in client.scan_iter(match=pattern, count=1000):
+            client.delete(key)
+    except RedisError as e:
+        logger.exception(e)
+
+
+def _update_cached_state(mapping: Dict[int, Dict[str, str]],
+                         to_invalidate: Set[int]) -> None:
+    pipe = get_shared_connection().pipeline(transaction=False)
+    for user_id, fields in mapping.items():
+        key = get_cache_key(user_id)
+        # Partially filled hash without loaded field is considered as
+        # a cache miss, set timeout to be sure it will be evicted
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, UNREAD_NOTIFICATIONS_CACHE_TIMEOUT)
+    if to_invalidate:
+        pipe.delete(*(get_cache_key(user_id) for user_id in to_invalidate))
+    _execute_on_commit(pipe)
+
+
+def add_unread_assignment_notifications(
+        notifications: Iterable[AssignmentNotification]) -> None:
+    """
+    Adds new unread notifications to the cached state of recipients.
+    State is invalidated if notification has no student assignment object
+    attached since it's not possible to resolve assignment id without
+    a query.
+    """
+    if not is_cache_enabled():
+        return
+    mapping: Dict[int, Dict[str, str]] = {}
+    to_invalidate = set()
+    for notification in notifications:
+        if not notification.is_unread:
+            continue
+        if not AssignmentNotification.student_assignment.is_cached(notification):
+            to_invalidate.add(notification.user_id)
+            continue
+        student_assignment = notification.student_assignment
+        unread = UnreadAssignment(student_assignment.assignment_id,
+                                  student_assignment.student_id)
+        fields = mapping.setdefault(notification.user_id, {})
+        fields[_assignment_field(student_assignment.pk)] = _assignment_value(unread)
+    _update_cached_state(mapping, to_invalidate)
+
+
+def add_unread_course_news_notifications(
+        notifications: Iterable[CourseNewsNotification],
+        course_id: Optional[int] = None) -> None:
+    if not is_cache_enabled():
+        return
+    mapping: Dict[int, Dict[str, str]] = {}
+    to_invalidate = set()
+    for notification in notifications:
+        if not notification.is_unread:
+            continue
+        news_course_id = course_id
+        if news_course_id is None:
+            if not CourseNewsNotification.course_offering_news.is_cached(notification):
+                to_invalidate.add(notification.user_id)
+                continue
+            news_course_id = notification.course_offering_news.course_id
+        fields = mapping.setdefault(notification.user_id, {})
+        fields[f"{COURSE_FIELD_PREFIX}{news_course_id}"] = '1'
+    _update_cached_state(mapping, to_invalidate)
+
+
+def mark_assignment_notifications_read(user_id: int,
+                                       student_assignment_id: int) -> None:
+    if not is_cache_enabled():
+        return
+    pipe = get_shared_connection().pipeline(transaction=False)
+    pipe.hdel(get_cache_key(user_id), _assignment_field(student_assignment_id))
+    _execute_on_commit(pipe)
+
+
+def mark_course_news_notifications_read(user_id: int, course_id: int) -> None:
+    if not is_cache_enabled():
+        return
+    pipe = get_shared_connection().pipeline(transaction=False)
+    pipe.hdel(get_cache_key(user_id), f"{COURSE_FIELD_PREFIX}{course_id}")
+    _execute_on_commit(pipe)
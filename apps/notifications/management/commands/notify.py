@@ -1,19 +1,20 @@
 import logging
-import smtplib
 import time
+from collections import defaultdict
 from datetime import datetime
 from functools import partial
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+from botocore.exceptions import BotoCoreError, ClientError
 from django_ses import SESBackend
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.core.mail.backends import smtp
 from django.core.management.base import BaseCommand
 from django.db.models import Exists, OuterRef
 
-from django.template.loader import render_to_string
+from django.template.loader import get_template, render_to_string
 from django.utils import translation
 from django.utils.decorators import method_decorator
 from django.utils.encoding import smart_str
@@ -23,12 +24,18 @@ from django.utils.module_loading import import_string
 from core.locks import distributed_lock, get_shared_connection
 from core.models import Branch, SiteConfiguration
 from core.urls import replace_hostname
+from core.utils import bucketize
 from courses.models import Course
-from learning.models import AssignmentNotification, CourseNewsNotification, StudentAssignment
+from learning.models import (
+    AssignmentNotification, CourseNewsNotification, Enrollment, StudentAssignment
+)
 from users.models import User
 
 logger = logging.getLogger(__name__)
 
+# SMTP errors are subclasses of OSError
+EMAIL_TRANSPORT_ERRORS = (OSError, BotoCoreError, ClientError)
+
 
 class EmailServiceError(Exception):
     pass
@@ -83,14 +90,187 @@ def resolve_course_participant_branch(course: Course, participant: User):
     return branch
 
 
+class NotificationContextBuilder:
+    """
+    Precomputes data shared between notifications of a single run.
+    Participant branches are resolved with one query for all
+    (user, course) pairs, absolute url builders are memoized per branch
+    and email templates are compiled once per (template, language) pair.
+    """
+    def __init__(self, participants: Iterable[Tuple[User, Course]]):
+        participants = list(participants)
+        user_ids = {user.pk for user, _ in participants}
+        course_ids = {course.pk for _, course in participants}
+        enrollments = (Enrollment.active
+                       .filter(student_id__in=user_ids, course_id__in=course_ids)
+                       .select_related('student_profile__branch__site')
+                       .order_by())
+        # Enrollment stores student profile they used to enroll in the course
+        self._branches = {(e.student_id, e.course_id): e.student_profile.branch
+                          for e in enrollments}
+        self._url_builders: Dict[int, Callable[[str], str]] = {}
+        self._templates = {}
+
+    def get_participant_branch(self, course: Course, participant: User) -> Branch:
+        """See `resolve_course_participant_branch`"""
+        key = (participant.pk, course.pk)
+        if key in self._branches:
+            return self._branches[key]
+        return course.main_branch
+
+    def get_abs_url_builder(self, branch: Branch) -> Callable[[str], str]:
+        if branch.pk not in self._url_builders:
+            domain_name = get_lms_domain_name(branch)
+            self._url_builders[branch.pk] = _get_abs_url_builder(domain_name)
+        return self._url_builders[branch.pk]
+
+    def render(self, template_name: str, context: Dict) -> str:
+        key = (template_name, translation.get_language())
+        if key not in self._templates:
+            self._templates[key] = get_template(template_name)
+        return self._templates[key].render(context)
+
+
 def report(f, s):
     dt = datetime.now().strftime("%Y.%m.%d %H:%M:%S")
     f.write("{0} {1}".format(dt, s))
 
 
+class TokenBucket:
+    """
+    Limits the average sending rate to `rate` messages per second and
+    allows bursts up to `capacity` messages. Tokens can go into debt
+    when a whole batch is acquired at once, in that case the caller waits
+    until the debt is repaid.
+    """
+    def __init__(self, rate: Optional[float], capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self, tokens: int = 1) -> None:
+        if not self.rate:
+            return
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.tokens -= tokens
+        if self.tokens < 0:
+            time.sleep(-self.tokens / self.rate)
+
+
+class NotificationOutbox:
+    """
+    Collects email messages grouped by site configuration and sends
+    them in batches over one keep-alive connection per site. Delivered
+    notifications are marked as notified with one UPDATE per batch.
+
+    Note:
+        Messages of the batch that were not delivered due to the email
+        service failure are not marked as notified and will be sent on
+        the next run.
+    """
+    def __init__(self, site_configurations: Dict[int, SiteConfiguration],
+                 stdout, batch_size: Optional[int] = None):
+        self.site_configurations = site_configurations
+        self.stdout = stdout
+        self.batch_size = batch_size or settings.EMAIL_SEND_BATCH_SIZE
+        self._pending: Dict[int, List[Tuple[Any, EmailMessage]]] = defaultdict(list)
+        self._connections = {}
+        self._rate_limiters = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, notification, message: EmailMessage,
+            site_settings: SiteConfiguration) -> None:
+        pending = self._pending[site_settings.site_id]
+        pending.append((notification, message))
+        if len(pending) >= self.batch_size:
+            self._send_batch(site_settings)
+
+    def flush(self) -> None:
+        for site_id in list(self._pending):
+            self._send_batch(self.site_configurations[site_id])
+
+    def close(self) -> None:
+        self.flush()
+        for connection in self._connections.values():
+            try:
+                connection.close()
+            except Exception as e:
+                logger.exception(e)
+        self._connections = {}
+
+    def _get_connection(self, site_settings: SiteConfiguration):
+        site_id = site_settings.site_id
+        if site_id not in self._connections:
+            connection = get_email_connection(site_settings)
+            # Connection stays open until the outbox is closed,
+            # otherwise backend reconnects on each `send_messages` call
+            connection.open()
+            self._connections[site_id] = connection
+        return self._connections[site_id]
+
+    def _get_rate_limiter(self, site_settings: SiteConfiguration) -> TokenBucket:
+        site_id = site_settings.site_id
+        if site_id not in self._rate_limiters:
+            cooldown = settings.EMAIL_SEND_COOLDOWN
+            rate = 1 / cooldown if cooldown else None
+            self._rate_limiters[site_id] = TokenBucket(rate, capacity=self.batch_size)
+        return self._rate_limiters[site_id]
+
+    def _send_batch(self, site_settings: SiteConfiguration) -> None:
+        batch = self._pending.pop(site_settings.site_id, None)
+        if not batch:
+            return
+        if site_settings.service_health_status == EmailServiceHealthCheck.FAIL:
+            for notification, _ in batch:
+                report(self.stdout, f"skip {notification}. SMTP service "
+                                    f"{site_settings.default_from_email} is unavailable.")
+            return
+        self._get_rate_limiter(site_settings).consume(len(batch))
+        delivered = []
+        try:
+            connection = self._get_connection(site_settings)
+            connection.send_messages(_track_delivery(batch, delivered))
+        except EMAIL_TRANSPORT_ERRORS as e:
+            site_settings.service_health_status = EmailServiceHealthCheck.FAIL
+            logger.exception(e)
+            report(self.stdout, f"Email service {site_settings.default_from_email} is unhealthy")
+        finally:
+            notifications = bucketize(delivered, key=type,
+                                      value_transform=lambda n: n.pk)
+            for model_class, notification_ids in notifications.items():
+                (model_class.objects
+                 .filter(pk__in=notification_ids)
+                 .update(is_notified=True))
+
+
+def _track_delivery(batch: List[Tuple[Any, EmailMessage]], delivered: List):
+    """
+    Yields messages of the batch to the email backend. Backends send
+    messages one by one while iterating, so the message is delivered
+    once the next one is requested.
+    """
+    for notification, message in batch:
+        yield message
+        delivered.append(notification)
+
+
 def send_notification(notification, template, context, stdout,
-                      site_settings: SiteConfiguration):
-    """Sends email notification, then updates notification state in DB"""
+                      site_settings: SiteConfiguration,
+                      outbox: NotificationOutbox,
+                      context_builder: Optional[NotificationContextBuilder] = None):
+    """
+    Renders email notification and puts it into the outbox. Notification
+    state is updated in DB after the message is delivered.
+    """
     # XXX: Note that email is mandatory now
     if settings.ENABLE_NON_AUTH_NOTIFICATIONS:
         if not notification.user.email:
@@ -108,30 +288,21 @@ def send_notification(notification, template, context, stdout,
             report(stdout, msg)
             return
 
-        connection = get_email_connection(site_settings)
         from_email = site_settings.default_from_email
         subject = "[{}] {}".format(context['course_name'], template['subject'])
-        html_content = linebreaks(render_to_string(template['template_name'],
-                                                   context))
+        if context_builder is not None:
+            content = context_builder.render(template['template_name'], context)
+        else:
+            content = render_to_string(template['template_name'], context)
+        html_content = linebreaks(content)
         text_content = strip_tags(html_content)
         msg = EmailMultiAlternatives(subject=subject,
                                      body=text_content,
                                      from_email=from_email,
-                                     to=[notification.user.email],
-                                     connection=connection)
+                                     to=[notification.user.email])
         msg.attach_alternative(html_content, "text/html")
         report(stdout, f"sending {notification} ({template})")
-        try:
-            # FIXME: use .send_messages instead to reuse connection and Keep-Alive feature
-            msg.send()
-        except smtplib.SMTPException as e:
-            site_settings.service_health_status = EmailServiceHealthCheck.FAIL
-            logger.exception(e)
-            report(stdout, f"SMTP service {site_settings.default_from_email} is unhealthy")
-            return
-        notification.is_notified = True
-        notification.save()
-        time.sleep(settings.EMAIL_SEND_COOLDOWN)
+        outbox.add(notification, msg, site_settings)
 
 
 def get_assignment_notification_template(notification: AssignmentNotification):
@@ -171,11 +342,13 @@ def _get_abs_url_builder(domain_name):
 
 def get_assignment_notification_context(
         notification: AssignmentNotification,
-        participant_branch: Branch) -> Dict:
+        participant_branch: Branch,
+        abs_url_builder: Optional[Callable[[str], str]] = None) -> Dict:
     a_s = notification.student_assignment
     tz_override = notification.user.time_zone
-    domain_name = get_lms_domain_name(participant_branch)
-    abs_url_builder = _get_abs_url_builder(domain_name)
+    if abs_url_builder is None:
+        domain_name = get_lms_domain_name(participant_branch)
+        abs_url_builder = _get_abs_url_builder(domain_name)
     context = {
         'a_s_link_student': abs_url_builder(a_s.get_student_url()),
         'a_s_link_teacher': abs_url_builder(a_s.get_teacher_url()),
@@ -193,9 +366,11 @@ def get_assignment_notification_context(
 
 def get_course_news_notification_context(
         notification: CourseNewsNotification,
-        participant_branch: Branch) -> Dict:
-    domain_name = get_lms_domain_name(participant_branch)
-    abs_url_builder = _get_abs_url_builder(domain_name)
+        participant_branch: Branch,
+        abs_url_builder: Optional[Callable[[str], str]] = None) -> Dict:
+    if abs_url_builder is None:
+        domain_name = get_lms_domain_name(participant_branch)
+        abs_url_builder = _get_abs_url_builder(domain_name)
     course = notification.course_offering_news.course
     context = {
         'course_link': abs_url_builder(course.get_absolute_url()),
@@ -226,13 +401,14 @@ def get_email_connection(site_settings: SiteConfiguration):
 
 
 def send_assignment_notifications(site_configurations: Dict[int, SiteConfiguration],
-                                  stdout) -> None:
+                                  stdout, outbox: NotificationOutbox) -> None:
     prefetch = [
         'user__groups',
         'student_assignment',
         'student_assignment__assignment',
         'student_assignment__assignment__course',
         'student_assignment__assignment__course__meta_course',
+        'student_assignment__assignment__course__main_branch__site',
         'student_assignment__student',
     ]
     # AssignmentNotification with unactive StudentAssignment should not exist at this point, but just in case
@@ -245,34 +421,47 @@ def send_assignment_notifications(site_configurations: Dict[int, SiteConfigurati
                         user__is_notification_allowed=True)
                      .select_related("user", "user__branch")
                      .prefetch_related(*prefetch))
+    notifications = list(notifications)
+    context_builder = NotificationContextBuilder(
+        (n.user, n.student_assignment.assignment.course) for n in notifications)
     for notification in notifications:
         template = get_assignment_notification_template(notification)
         course = notification.student_assignment.assignment.course
-        branch = resolve_course_participant_branch(course, notification.user)
-        context = get_assignment_notification_context(notification, branch)
+        branch = context_builder.get_participant_branch(course, notification.user)
+        abs_url_builder = context_builder.get_abs_url_builder(branch)
+        context = get_assignment_notification_context(notification, branch,
+                                                      abs_url_builder)
         site_settings: SiteConfiguration = site_configurations[branch.site_id]
-        send_notification(notification, template, context, stdout, site_settings)
+        send_notification(notification, template, context, stdout,
+                          site_settings, outbox, context_builder)
 
 
 def send_course_news_notifications(site_configurations: Dict[int, SiteConfiguration],
-                                   stdout) -> None:
+                                   stdout, outbox: NotificationOutbox) -> None:
     prefetch = [
         'user__groups',
         'course_offering_news__course',
         'course_offering_news__course__meta_course',
         'course_offering_news__course__semester',
+        'course_offering_news__course__main_branch__site',
     ]
     notifications = (CourseNewsNotification.objects
                      .filter(is_unread=True, is_notified=False, user__is_notification_allowed=True)
                      .select_related("user", "course_offering_news")
                      .prefetch_related(*prefetch))
+    notifications = list(notifications)
+    context_builder = NotificationContextBuilder(
+        (n.user, n.course_offering_news.course) for n in notifications)
     for notification in notifications:
         template = EMAIL_TEMPLATES['new_course_news']
         course = notification.course_offering_news.course
-        branch = resolve_course_participant_branch(course, notification.user)
-        context = get_course_news_notification_context(notification, branch)
+        branch = context_builder.get_participant_branch(course, notification.user)
+        abs_url_builder = context_builder.get_abs_url_builder(branch)
+        context = get_course_news_notification_context(notification, branch,
+                                                       abs_url_builder)
         site_settings: SiteConfiguration = site_configurations[branch.site_id]
-        send_notification(notification, template, context, stdout, site_settings)
+        send_notification(notification, template, context, stdout,
+                          site_settings, outbox, context_builder)
 
 
 class EmailServiceHealthCheck:
@@ -306,13 +495,15 @@ class Command(BaseCommand):
         for s in site_settings.values():
             s.service_health_status = EmailServiceHealthCheck.HEALTH
 
-        send_course_news_notifications(site_settings, self.stdout)
+        with NotificationOutbox(site_settings, self.stdout) as outbox:
+            send_course_news_notifications(site_settings, self.stdout, outbox)
+            outbox.flush()
 
-        if all(s.service_health_status == EmailServiceHealthCheck.FAIL for s
-               in site_settings.values()):
-            report(self.stdout, 'All services are unhealthy. Try again later.')
-            return
+            if all(s.service_health_status == EmailServiceHealthCheck.FAIL for s
+                   in site_settings.values()):
+                report(self.stdout, 'All services are unhealthy. Try again later.')
+                return
 
-        send_assignment_notifications(site_settings, self.stdout)
+            send_assignment_notifications(site_settings, self.stdout, outbox)
 
         translation.deactivate()
@@ -4,6 +4,7 @@ from django.core.management.base import BaseCommand
 
 from courses.models import Semester
 from learning.models import AssignmentNotification, CourseNewsNotification
+from notifications.cache import invalidate_all_unread_notifications_cache
 
 
 class Command(BaseCommand):
@@ -21,3 +22,4 @@ class Command(BaseCommand):
                    .update(is_unread=False))
         msg = f"{updated} CourseNewsNotifications are marked as read"
         self.stdout.write(msg)
+        invalidate_all_unread_notifications_cache()
@@ -1,7 +1,8 @@
 from threading import local
 
 from django.core.exceptions import ImproperlyConfigured
-from django.utils.functional import cached_property
+
+from notifications.cache import UnreadNotificationsCache
 
 _thread_locals = local()
 _installed_middleware = False
@@ -16,42 +17,6 @@ def get_unread_notifications_cache():
     return _thread_locals.unread_notifications_cache
 
 
-# TODO: move to `.cache` module?
-# FIXME: replace with a redis cache?
-class UnreadNotificationsCache:
-    def __init__(self, assignments_qs, coursenews_qs):
-        assert assignments_qs is not None
-        assert coursenews_qs is not None
-        self.assignments_qs = assignments_qs
-        self.coursenews_qs = coursenews_qs
-
-    @cached_property
-    def assignments(self):
-        return {obj.student_assignment_id: obj
-                for obj in self.assignments_qs.all()}
-
-    @cached_property
-    def assignments_student(self):
-        return {a_s: obj
-                for a_s, obj in self.assignments.items()
-                if a_s.student_id == obj.user.id}
-
-    @cached_property
-    def assignments_teacher(self):
-        return {a_s: obj
-                for a_s, obj in self.assignments.items()
-                if a_s.student_id != obj.user.id}
-
-    @cached_property
-    def assignment_ids_set(self):
-        return {a_s.assignment_id for a_s in self.assignments}
-
-    @cached_property
-    def courseoffering_news(self):
-        return {obj.course_offering_news.course: obj
-                for obj in self.coursenews_qs.all()}
-
-
 class UnreadNotificationsCacheMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -65,16 +30,7 @@ class UnreadNotificationsCacheMiddleware:
         # when it's unique for each request
         _thread_locals.unread_notifications_cache = None
         if request.user.is_authenticated:
-            cache = UnreadNotificationsCache(
-                (request.user
-                 .assignmentnotification_set
-                 .filter(is_unread=True)
-                 .select_related('student_assignment')),
-                (request.user
-                 .coursenewsnotification_set
-                 .filter(is_unread=True)
-                 .select_related('course_offering_news',
-                                 'course_offering_news__course')))
+            cache = UnreadNotificationsCache(request.user.pk)
             _thread_locals.unread_notifications_cache = cache
             setattr(request, 'unread_notifications_cache', cache)
 
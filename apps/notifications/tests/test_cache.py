@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock
+
+import pytest
+from redis.exceptions import RedisError, WatchError
+
+from learning.tests.factories import (
+    AssignmentNotificationFactory, CourseNewsNotificationFactory,
+    StudentAssignmentFactory
+)
+from notifications.cache import (
+    UnreadAssignment, UnreadNotificationsCache, add_unread_assignment_notifications,
+    get_cache_key
+)
+from users.tests.factories import TeacherFactory
+
+
+@pytest.mark.django_db
+def test_unread_notifications_cache_from_db(settings):
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = False
+    teacher = TeacherFactory()
+    student_assignment1, student_assignment2 = StudentAssignmentFactory.create_batch(2)
+    student = student_assignment2.student
+    AssignmentNotificationFactory(user=teacher, student_assignment=student_assignment1)
+    AssignmentNotificationFactory(user=student, student_assignment=student_assignment2)
+    AssignmentNotificationFactory(user=teacher, student_assignment=student_assignment2,
+                                  is_unread=False)
+    news_notification = CourseNewsNotificationFactory(user=teacher)
+    cache = UnreadNotificationsCache(teacher.pk)
+    assert cache.assignments == {
+        student_assignment1.pk: UnreadAssignment(student_assignment1.assignment_id,
+                                                 student_assignment1.student_id)
+    }
+    assert cache.assignments_teacher == cache.assignments
+    assert not cache.assignments_student
+    assert cache.assignment_ids_set == {student_assignment1.assignment_id}
+    assert cache.courseoffering_news == {news_notification.course_offering_news.course_id}
+    cache = UnreadNotificationsCache(student.pk)
+    assert set(cache.assignments_student) == {student_assignment2.pk}
+    assert not cache.assignments_teacher
+    assert not cache.courseoffering_news
+
+
+@pytest.mark.django_db
+def test_unread_notifications_cache_hit(settings, mocker, django_assert_num_queries):
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = True
+    redis_client = MagicMock()
+    redis_client.hgetall.return_value = {b'_': b'1', b'a:10': b'3:5', b'c:7': b'1'}
+    mocker.patch('notifications.cache.get_shared_connection', return_value=redis_client)
+    cache = UnreadNotificationsCache(5)
+    with django_assert_num_queries(0):
+        assert cache.assignments == {10: UnreadAssignment(3, 5)}
+        assert cache.assignments_student == {10: UnreadAssignment(3, 5)}
+        assert cache.courseoffering_news == {7}
+    redis_client.hgetall.assert_called_once_with(get_cache_key(5))
+
+
+@pytest.mark.django_db
+def test_unread_notifications_cache_miss(settings, mocker):
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = False
+    notification = AssignmentNotificationFactory()
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = True
+    redis_client = MagicMock()
+    # Partially filled hash is considered as a cache miss
+    redis_client.hgetall.return_value = {b'a:10': b'3:5'}
+    mocker.patch('notifications.cache.get_shared_connection', return_value=redis_client)
+    cache = UnreadNotificationsCache(notification.user_id)
+    assert set(cache.assignments) == {notification.student_assignment_id}
+    pipe = redis_client.pipeline.return_value
+    pipe.hset.assert_called_once()
+    mapping = pipe.hset.call_args.kwargs['mapping']
+    assert f"a:{notification.student_assignment_id}" in mapping
+    pipe.watch.assert_called_once_with(get_cache_key(notification.user_id))
+    # Rebuild is discarded if the state was modified concurrently
+    pipe.execute.side_effect = WatchError
+    cache = UnreadNotificationsCache(notification.user_id)
+    assert set(cache.assignments) == {notification.student_assignment_id}
+    # Fallback to the DB if redis is unavailable
+    redis_client.hgetall.side_effect = RedisError
+    cache = UnreadNotificationsCache(notification.user_id)
+    assert set(cache.assignments) == {notification.student_assignment_id}
+
+
+@pytest.mark.django_db
+def test_add_unread_assignment_notifications(settings, mocker,
+                                            django_capture_on_commit_callbacks):
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = False
+    student_assignment = StudentAssignmentFactory()
+    notification = AssignmentNotificationFactory.build(
+        user=TeacherFactory(), student_assignment=student_assignment)
+    settings.UNREAD_NOTIFICATIONS_CACHE_ENABLED = True
+    redis_client = MagicMock()
+    mocker.patch('notifications.cache.get_shared_connection', return_value=redis_client)
+    pipe = redis_client.pipeline.return_value
+    with django_capture_on_commit_callbacks(execute=True):
+        add_unread_assignment_notifications([notification])
+        # Cached state is updated after the transaction is committed
+        assert not pipe.execute.called
+    pipe.execute.assert_called_once()
+    key = get_cache_key(notification.user_id)
+    value = f"{student_assignment.assignment_id}:{student_assignment.student_id}"
+    pipe.hset.assert_called_once_with(key, mapping={f"a:{student_assignment.pk}": value})
+    assert not pipe.delete.called
@@ -1,3 +1,4 @@
+import smtplib
 from io import StringIO as OutputIO
 from unittest.mock import MagicMock
 
@@ -15,6 +16,7 @@ from learning.tests.factories import (
     AssignmentNotificationFactory, CourseFactory, CourseNewsNotificationFactory,
     EnrollmentFactory
 )
+from notifications.management.commands import notify
 from notifications.management.commands.notify import resolve_course_participant_branch
 from users.tests.factories import CuratorFactory, UserFactory, TeacherFactory
 
@@ -72,6 +74,62 @@ def test_command_notify(settings, mocker):
     assert not AssignmentNotification.objects.get(pk=an.pk).is_notified
     assert "sending notification for" not in out.getvalue()
 
+
+@pytest.mark.django_db
+def test_command_notify_batches(settings, mocker):
+    mocker.patch('core.locks.get_shared_connection', MagicMock())
+    settings.EMAIL_SEND_BATCH_SIZE = 2
+    get_email_connection = mocker.spy(notify, 'get_email_connection')
+    notifications = AssignmentNotificationFactory.create_batch(
+        5, is_about_passed=True)
+    mail.outbox = []
+    management.call_command("notify", stdout=OutputIO())
+    if settings.ENABLE_NON_AUTH_NOTIFICATIONS:
+        assert len(mail.outbox) == 5
+        # Connection is reused between batches
+        assert get_email_connection.call_count == 1
+        ids = [n.pk for n in notifications]
+        assert all(n.is_notified for n in
+                   AssignmentNotification.objects.filter(pk__in=ids))
+
+
+@pytest.mark.django_db
+def test_command_notify_partially_delivered_batch(settings, mocker):
+    mocker.patch('core.locks.get_shared_connection', MagicMock())
+    settings.ENABLE_NON_AUTH_NOTIFICATIONS = True
+
+    def send_messages(messages):
+        next(messages)
+        next(messages)
+        raise smtplib.SMTPServerDisconnected()
+
+    connection = MagicMock()
+    connection.send_messages.side_effect = send_messages
+    mocker.patch.object(notify, 'get_email_connection', return_value=connection)
+    AssignmentNotificationFactory.create_batch(3, is_about_passed=True)
+    management.call_command("notify", stdout=OutputIO())
+    # Batch is sent with one call
+    assert connection.send_messages.call_count == 1
+    # Only the delivered message is marked, the others are sent next time
+    assert AssignmentNotification.objects.filter(is_notified=True).count() == 1
+    connection.send_messages.side_effect = OSError
+    management.call_command("notify", stdout=OutputIO())
+    assert AssignmentNotification.objects.filter(is_notified=True).count() == 1
+
+
+def test_token_bucket(mocker):
+    mocked_sleep = mocker.patch('time.sleep')
+    mocker.patch('time.monotonic', return_value=100)
+    bucket = notify.TokenBucket(rate=2, capacity=4)
+    bucket.consume(4)
+    assert not mocked_sleep.called
+    bucket.consume(3)
+    mocked_sleep.assert_called_once_with(1.5)
+    unlimited = notify.TokenBucket(rate=None, capacity=1)
+    unlimited.consume(100)
+    assert mocked_sleep.call_count == 1
+
+
 @pytest.mark.django_db
 def test_command_notification_cleanup(client, settings):
     current_term = SemesterFactory.create_current()
@@ -100,3 +158,21 @@ def test_resolve_course_participant_branch():
     assert resolve_course_participant_branch(course, other_teacher) == course.main_branch
     assert resolve_course_participant_branch(course, curator) == course.main_branch
     assert resolve_course_participant_branch(course, student) == enrollment.student_profile.branch
+
+
+@pytest.mark.django_db
+def test_notification_context_builder(django_assert_num_queries):
+    main_branch = BranchFactory()
+    teacher = TeacherFactory(branch=BranchFactory())
+    course = CourseFactory(main_branch=main_branch, teachers=[teacher])
+    enrollment1, enrollment2 = EnrollmentFactory.create_batch(2, course=course)
+    participants = [(teacher, course), (enrollment1.student, course),
+                    (enrollment2.student, course)]
+    with django_assert_num_queries(1):
+        context_builder = notify.NotificationContextBuilder(participants)
+    for participant, course in participants:
+        branch = context_builder.get_participant_branch(course, participant)
+        assert branch == resolve_course_participant_branch(course, participant)
+    branch = enrollment1.student_profile.branch
+    abs_url_builder = context_builder.get_abs_url_builder(branch)
+    assert context_builder.get_abs_url_builder(branch) is abs_url_builder
@@ -1,9 +1,23 @@
-from typing import Dict
+import logging
+from typing import Callable, Dict, Optional
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from courses.models import Semester
+from learning.services.graduate_stats_service import (
+    invalidate_students_future_graduate_stats_on_commit
+)
+from projects.constants import ProjectGradeTypes
 from projects.models import (
     Project, ProjectStudent, Report, ReportingPeriod, ReportingPeriodKey
 )
-from users.models import User
+from users.models import StudentProfile, User
+
+logger = logging.getLogger(__name__)
+
+AUTOGRADE_PROJECTS_CHUNK_SIZE = 500
 
 
 def get_project_reporting_periods(student, term) -> Dict[ProjectStudent, ReportingPeriod]:
@@ -46,3 +60,89 @@ def get_student_projects(student_account: User):
             .select_related('project',
                             'project__semester')
             .order_by('project__semester__index'))
+
+
+def _get_student_profiles(user_ids, site_id: int) -> Dict[int, StudentProfile]:
+    """Returns the most actual student profile on site for each user."""
+    student_profiles = {}
+    queryset = (StudentProfile.objects
+                .filter(user_id__in=user_ids, site_id=site_id)
+                .select_related('branch')
+                .order_by('user_id', 'priority', '-year_of_admission', '-pk'))
+    for student_profile in queryset:
+        student_profiles.setdefault(student_profile.user_id, student_profile)
+    return student_profiles
+
+
+def autograde_projects(term: Semester, *, site_id: Optional[int] = None,
+                       chunk_size: int = AUTOGRADE_PROJECTS_CHUNK_SIZE,
+                       on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Sets final grade for term projects to students who met all the
+    requirements. Rules applied in order for converting final score to grade:
+        score >= ReportingPeriod.score_excellent -> `ProjectGradeTypes.excellent`
+        score >= ReportingPeriod.score_good -> `ProjectGradeTypes.good`
+        score >= ReportingPeriod.score_pass -> `ProjectGradeTypes.pass`
+        score < ReportingPeriod.score_pass -> `ProjectGradeTypes.unsatisfactory`
+
+    Only not graded projects are processed chunk by chunk, so it's safe to
+    rerun after failure. Returns the number of graded projects.
+    """
+    site_id = site_id or settings.SITE_ID
+    periods = ReportingPeriod.get_final_periods(term)
+    if not periods:
+        raise ValidationError(f"Для семестра '{term}' не "
+                              f"найдены отчетные периоды.")
+    # Make sure all final periods have score settings
+    for period in periods.values():
+        attrs = ('score_excellent', 'score_good', 'score_pass')
+        if any(getattr(period, attr) is None for attr in attrs):
+            raise ValidationError(f"Для отчетного периода '{period}' не "
+                                  f"выставлены настройки с оценками.")
+    project_student_ids = list(ProjectStudent.objects
+                               .filter(project__semester_id=term.pk,
+                                       final_grade=ProjectGradeTypes.NOT_GRADED)
+                               .order_by('pk')
+                               .values_list('pk', flat=True))
+    total = len(project_student_ids)
+    graded = 0
+    for offset in range(0, total, chunk_size):
+        chunk = project_student_ids[offset:offset + chunk_size]
+        with transaction.atomic():
+            project_students = list(ProjectStudent.objects
+                                    .select_for_update(of=('self',))
+                                    .filter(pk__in=chunk,
+                                            final_grade=ProjectGradeTypes.NOT_GRADED)
+                                    .select_related('project')
+                                    .prefetch_related('reports'))
+            student_profiles = _get_student_profiles(
+                {ps.student_id for ps in project_students}, site_id)
+            to_update = []
+            for ps in project_students:
+                if ps.presentation_grade is None:
+                    continue
+                # For external project `supervisor_grade` value is optional
+                if not ps.project.is_external and ps.supervisor_grade is None:
+                    continue
+                student_profile = student_profiles.get(ps.student_id)
+                if not student_profile:
+                    logger.error(f"Student profile not found for user {ps.student_id}")
+                    continue
+                key = ReportingPeriodKey(branch_code=student_profile.branch.code,
+                                         project_type=ps.project.project_type)
+                if key not in periods:
+                    logger.warning(f"Не найден отчетный период. "
+                                   f"Семестр {term}, "
+                                   f"отделение: {student_profile.branch}, "
+                                   f"тип проекта: {ps.project.project_type}")
+                    continue
+                period = periods[key]
+                ps.final_grade = period.score_to_grade(ps.total_score, ps.project)
+                to_update.append(ps)
+            ProjectStudent.objects.bulk_update(to_update, fields=['final_grade'])
+            invalidate_students_future_graduate_stats_on_commit(
+                ps.student_id for ps in to_update)
+            graded += len(to_update)
+        if on_progress is not None:
+            on_progress(offset + len(chunk), total)
+    return graded
@@ -4,6 +4,9 @@ from django.db import transaction
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
+from learning.services.graduate_stats_service import (
+    invalidate_student_future_graduate_stats_on_commit
+)
 from notifications import NotificationTypes
 from notifications.signals import notify
 from projects.constants import ProjectGradeTypes
@@ -52,6 +55,12 @@ def post_save_project_student(sender, instance, *args, **kwargs):
          .update(status=Project.Statuses.CANCELED))
 
 
+@receiver(post_save, sender=ProjectStudent)
+def invalidate_future_graduate_stats_on_project_grade_change(sender, instance,
+                                                            *args, **kwargs):
+    invalidate_student_future_graduate_stats_on_commit(instance.student_id)
+
+
 @receiver(post_save, sender=Project)
 def post_save_project(sender, instance, created, *args, **kwargs):
     from projects.tasks import \
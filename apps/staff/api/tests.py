@@ -24,7 +24,8 @@ def test_api_create_alumni_profiles(client, settings, lms_resolver):
     assert any(error['field'] == 'graduated_on' for error in json_data['errors'])
     # Correct case
     response = client.post(url, data={"graduated_on": "2020-08-22"})
-    assert response.status_code == 201
+    assert response.status_code == 202
+    assert response.json()["job_id"] == f"curator.create_alumni_profiles.{settings.SITE_ID}"
     student_profile.refresh_from_db()
     assert student_profile.status == StudentStatuses.GRADUATE
     assert StudentStatusLog.objects.count() == 1
@@ -13,9 +13,9 @@ from api.views import APIBaseView
 from core.http import HttpRequest
 from learning.api.serializers import StudentProfileSerializer
 from learning.models import GraduateProfile
+from staff.tasks import enqueue_curator_operation
 from users.filters import StudentFilter
 from users.models import StudentProfile
-from users.services import create_graduate_profiles
 
 
 class StudentOffsetPagination(LimitOffsetPagination):
@@ -64,6 +64,9 @@ class CreateAlumniProfiles(APIBaseView):
         serializer.is_valid(raise_exception=True)
 
         graduated_on = serializer.validated_data['graduated_on']
-        create_graduate_profiles(Site.objects.get(id=settings.SITE_ID), graduated_on, created_by=request.user)
+        job_id = enqueue_curator_operation("create_alumni_profiles",
+                                           settings.SITE_ID, graduated_on,
+                                           request.user.pk)
 
-        return Response(status=status.HTTP_201_CREATED)
+        return Response(status=status.HTTP_202_ACCEPTED,
+                        data={"job_id": job_id})
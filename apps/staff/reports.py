@@ -0,0 +1,258 @@
+"""
+Staff reports that could be generated in the background. Generated file
+is stored in the private storage and reused until the data watermark
+changes:
+
+    staff-reports/<report type>/<params hash>/<watermark>/<file name>
+
+Watermark is the number of the current hour, so a report requested
+a few times within the same hour is built only once.
+"""
+import datetime
+import hashlib
+import json
+import posixpath
+import re
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+
+from admission.models import Campaign
+from admission.reports import (
+    AdmissionApplicantsCampaignReport, AdmissionApplicantsYearReport,
+    AdmissionExamReport
+)
+from core.models import Branch
+from courses.constants import SemesterTypes
+from courses.models import Semester
+from files.storage import private_storage
+from learning.models import Invitation
+from learning.reports import (
+    FutureGraduateDiplomasReport, ProgressReportForInvitation,
+    ProgressReportForSemester, ProgressReportFull, WillGraduateStatsReport,
+    dataframe_to_response
+)
+
+REPORT_ARTIFACTS_LOCATION = 'staff-reports'
+REPORT_ARTIFACT_TTL = 3600  # seconds
+
+
+def get_report_watermark() -> int:
+    return int(time.time() // REPORT_ARTIFACT_TTL)
+
+
+def _report_file_output(report, output_format: str) -> HttpResponse:
+    if output_format == "csv":
+        return report.output_csv()
+    elif output_format == "xlsx":
+        return report.output_xlsx()
+    raise ValueError("Supported output formats: csv, xlsx")
+
+
+def build_progress_report_full(*, output_format: str) -> HttpResponse:
+    report = ProgressReportFull(grade_getter="grade_honest")
+    today = datetime.datetime.now().strftime("%d.%m.%Y")
+    file_name = f"sheet_{today}"
+    return dataframe_to_response(report.generate(), output_format, file_name)
+
+
+def build_progress_report_for_semester(*, term_year: int, term_type: str,
+                                       output_format: str) -> HttpResponse:
+    semester = Semester.objects.get(year=term_year, type=term_type)
+    report = ProgressReportForSemester(semester)
+    file_name = "sheet_{}_{}".format(semester.year, semester.type)
+    return dataframe_to_response(report.generate(), output_format, file_name)
+
+
+def build_progress_report_for_invitation(*, invitation_id: int,
+                                         output_format: str) -> HttpResponse:
+    invitation = (Invitation.objects
+                  .select_related('semester')
+                  .get(pk=invitation_id))
+    report = ProgressReportForInvitation(invitation)
+    term = invitation.semester
+    file_name = f"sheet_invitation_{invitation.pk}_{term.year}_{term.type}"
+    return dataframe_to_response(report.generate(), output_format, file_name)
+
+
+def build_future_graduate_diplomas_report(*, branch_id: int) -> HttpResponse:
+    branch = Branch.objects.get(pk=branch_id)
+    report = FutureGraduateDiplomasReport(branch)
+    today = datetime.datetime.now()
+    file_name = "diplomas_{}".format(today.year)
+    return dataframe_to_response(report.generate(), "csv", file_name)
+
+
+def build_admission_applicants_campaign_report(*, campaign_id: int,
+                                               output_format: str) -> HttpResponse:
+    campaign = Campaign.objects.get(pk=campaign_id,
+                                    branch__site_id=settings.SITE_ID)
+    report = AdmissionApplicantsCampaignReport(campaign=campaign)
+    return _report_file_output(report, output_format)
+
+
+def build_admission_applicants_year_report(*, year: int,
+                                           output_format: str) -> HttpResponse:
+    report = AdmissionApplicantsYearReport(year=year)
+    return _report_file_output(report, output_format)
+
+
+def build_admission_exam_report(*, campaign_id: int,
+                                output_format: str) -> HttpResponse:
+    campaign = Campaign.objects.get(pk=campaign_id,
+                                    branch__site_id=settings.SITE_ID)
+    report = AdmissionExamReport(campaign=campaign)
+    return dataframe_to_response(report.generate(), output_format,
+                                 report.get_filename())
+
+
+def build_will_graduate_stats_report(*, output_format: str) -> HttpResponse:
+    report = WillGraduateStatsReport()
+    return _report_file_output(report, output_format)
+
+
+def _output_format(value: str) -> str:
+    if value not in ("csv", "xlsx"):
+        raise ValueError("Supported output formats: csv, xlsx")
+    return value
+
+
+def _term_type(value: str) -> str:
+    if value not in SemesterTypes.values:
+        raise ValueError(f"Unknown term type {value}")
+    return value
+
+
+class StaffReport(NamedTuple):
+    build: Callable[..., HttpResponse]
+    # Maps param name to the function that converts query param value
+    params: Dict[str, Callable[[str], Any]]
+
+
+STAFF_REPORTS: Dict[str, StaffReport] = {
+    'progress_full': StaffReport(
+        build=build_progress_report_full,
+        params={'output_format': _output_format}),
+    'progress_semester': StaffReport(
+        build=build_progress_report_for_semester,
+        params={'term_year': int, 'term_type': _term_type,
+                'output_format': _output_format}),
+    'progress_invitation': StaffReport(
+        build=build_progress_report_for_invitation,
+        params={'invitation_id': int, 'output_format': _output_format}),
+    'future_graduate_diplomas': StaffReport(
+        build=build_future_graduate_diplomas_report,
+        params={'branch_id': int}),
+    'admission_applicants_campaign': StaffReport(
+        build=build_admission_applicants_campaign_report,
+        params={'campaign_id': int, 'output_format': _output_format}),
+    'admission_applicants_year': StaffReport(
+        build=build_admission_applicants_year_report,
+        params={'year': int, 'output_format': _output_format}),
+    'admission_exam': StaffReport(
+        build=build_admission_exam_report,
+        params={'campaign_id': int, 'output_format': _output_format}),
+    'will_graduate_stats': StaffReport(
+        build=build_will_graduate_stats_report,
+        params={'output_format': _output_format}),
+}
+
+
+def parse_report_params(report_type: str, data) -> Dict[str, Any]:
+    """
+    Returns report params converted from the query dict.
+
+    Raises KeyError if report type is unknown or param is missing and
+    ValueError if param value is not valid.
+    """
+    report = STAFF_REPORTS[report_type]
+    return {name: converter(data[name])
+            for name, converter in report.params.items()}
+
+
+def _get_params_hash(params: Dict[str, Any]) -> str:
+    serialized = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode()).hexdigest()[:16]
+
+
+def get_report_key(report_type: str, params: Dict[str, Any],
+                   watermark: Optional[int] = None) -> str:
+    """
+    Report key identifies the generated file, it's also used as an id
+    of the background job.
+    """
+    if watermark is None:
+        watermark = get_report_watermark()
+    return f"{report_type}.{_get_params_hash(params)}.{watermark}"
+
+
+_REPORT_KEY_RE = re.compile(r"^(?P<report_type>\w+)\.[0-9a-f]{16}\.\d+$")
+
+
+def is_valid_report_key(key: str) -> bool:
+    match = _REPORT_KEY_RE.match(key)
+    return match is not None and match.group('report_type') in STAFF_REPORTS
+
+
+def _get_artifact_dir(key: str) -> str:
+    if not is_valid_report_key(key):
+        raise ValueError(f"Invalid report key {key}")
+    report_type, params_hash, watermark = key.split('.')
+    return posixpath.join(REPORT_ARTIFACTS_LOCATION, report_type,
+                          params_hash, watermark)
+
+
+def get_report_artifact(key: str) -> Optional[str]:
+    """Returns storage name of the generated report file if it exists."""
+    artifact_dir = _get_artifact_dir(key)
+    try:
+        _, files = private_storage.listdir(artifact_dir)
+    except FileNotFoundError:
+        return None
+    if not files:
+        return None
+    return posixpath.join(artifact_dir, files[0])
+
+
+_FILENAME_RE = re.compile(r"filename\*=utf-8''(?P<quoted>[^;]+)|"
+                          r'filename="?(?P<plain>[^";]+)"?', re.IGNORECASE)
+
+
+def _get_response_filename(response: HttpResponse, key: str) -> str:
+    content_disposition = response.get('Content-Disposition', '')
+    match = _FILENAME_RE.search(content_disposition)
+    if match is None:
+        return key
+    if match.group('quoted'):
+        return unquote(match.group('quoted'))
+    return match.group('plain')
+
+
+def save_report_artifact(key: str, response: HttpResponse) -> str:
+    """
+    Saves content of the report response to the private storage, files
+    of the same report generated for the previous watermarks are removed.
+    """
+    if response.streaming:
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    file_name = _get_response_filename(response, key)
+    artifact_dir = _get_artifact_dir(key)
+    artifact_name = private_storage.save(posixpath.join(artifact_dir, file_name),
+                                         ContentFile(content))
+    report_dir = posixpath.dirname(artifact_dir)
+    current_watermark = posixpath.basename(artifact_dir)
+    watermarks, _ = private_storage.listdir(report_dir)
+    for watermark in watermarks:
+        if watermark == current_watermark:
+            continue
+        stale_dir = posixpath.join(report_dir, watermark)
+        _, files = private_storage.listdir(stale_dir)
+        for stale_file in files:
+            private_storage.delete(posixpath.join(stale_dir, stale_file))
+    return artifact_name
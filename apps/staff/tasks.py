@@ -0,0 +1,172 @@
+import datetime
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+import django_rq
+from rq import get_current_job
+from rq.job import JobStatus
+
+from django.contrib.sites.models import Site
+from django.core.exceptions import ValidationError
+
+from courses.models import Semester
+from learning.services.enrollment_service import (
+    fail_ungraded_enrollments, get_ungraded_enrollments
+)
+from projects.services import autograde_projects
+from staff.reports import (
+    REPORT_ARTIFACT_TTL, STAFF_REPORTS, get_report_artifact, get_report_key,
+    save_report_artifact
+)
+from users.models import User
+from users.services import create_graduate_profiles
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOB_TIMEOUT = 1800  # seconds
+CURATOR_OPERATION_TIMEOUT = 3600  # seconds
+CURATOR_OPERATION_RESULT_TTL = 3600 * 24  # seconds
+
+
+def _set_job_progress(progress: int) -> None:
+    current_job = get_current_job()
+    if current_job is not None:
+        current_job.meta['progress'] = progress
+        current_job.save_meta()
+
+
+def generate_staff_report(report_type: str, params: Dict[str, Any],
+                          key: str) -> str:
+    if get_report_artifact(key) is not None:
+        return key
+    report = STAFF_REPORTS[report_type]
+    _set_job_progress(10)
+    response = report.build(**params)
+    _set_job_progress(80)
+    save_report_artifact(key, response)
+    _set_job_progress(100)
+    logger.info(f"Staff report {key} has been generated")
+    return key
+
+
+def enqueue_staff_report(report_type: str, params: Dict[str, Any]) -> str:
+    """
+    Enqueues generation of the report unless the same report is already
+    generated or in progress. Returns report key.
+    """
+    key = get_report_key(report_type, params)
+    if get_report_artifact(key) is not None:
+        return key
+    queue = django_rq.get_queue('default')
+    report_job = queue.fetch_job(key)
+    if report_job is None or report_job.get_status() == JobStatus.FAILED:
+        queue.enqueue(generate_staff_report, report_type, params, key,
+                      job_id=key, job_timeout=REPORT_JOB_TIMEOUT,
+                      result_ttl=REPORT_ARTIFACT_TTL,
+                      failure_ttl=REPORT_ARTIFACT_TTL)
+    return key
+
+
+class StaffReportState(NamedTuple):
+    status: str
+    progress: int
+    artifact: Optional[str]
+
+
+def get_staff_report_state(key: str) -> Optional[StaffReportState]:
+    artifact = get_report_artifact(key)
+    if artifact is not None:
+        return StaffReportState(status=JobStatus.FINISHED, progress=100,
+                                artifact=artifact)
+    queue = django_rq.get_queue('default')
+    report_job = queue.fetch_job(key)
+    if report_job is None:
+        return None
+    return StaffReportState(status=report_job.get_status(),
+                            progress=report_job.meta.get('progress', 0),
+                            artifact=None)
+
+
+def _on_chunk_processed(processed: int, total: int) -> None:
+    _set_job_progress(processed * 100 // total if total else 100)
+
+
+def _set_job_error(error: ValidationError) -> None:
+    current_job = get_current_job()
+    if current_job is not None:
+        current_job.meta['error'] = " ".join(error.messages)
+        current_job.save_meta()
+
+
+def autograde_projects_job(site_id: int, term_id: int) -> Optional[int]:
+    term = Semester.objects.get(pk=term_id)
+    try:
+        return autograde_projects(term, site_id=site_id,
+                                  on_progress=_on_chunk_processed)
+    except ValidationError as e:
+        _set_job_error(e)
+        return None
+
+
+def autofail_ungraded_job(site_id: int) -> int:
+    site = Site.objects.get(pk=site_id)
+    enrollments = get_ungraded_enrollments(site.domain)
+    return fail_ungraded_enrollments(enrollments,
+                                     on_progress=_on_chunk_processed)
+
+
+def create_alumni_profiles_job(site_id: int, graduated_on: datetime.date,
+                               created_by_id: int) -> int:
+    site = Site.objects.get(pk=site_id)
+    created_by = User.objects.get(pk=created_by_id)
+    return create_graduate_profiles(site, graduated_on, created_by=created_by,
+                                    on_progress=_on_chunk_processed)
+
+
+CURATOR_OPERATIONS = {
+    'autograde_projects': autograde_projects_job,
+    'autofail_ungraded': autofail_ungraded_job,
+    'create_alumni_profiles': create_alumni_profiles_job,
+}
+
+
+def enqueue_curator_operation(operation: str, site_id: int, *args) -> str:
+    """
+    Enqueues curator operation unless the same operation for the site
+    is already in progress. Returns job id.
+    """
+    job_id = f"curator.{operation}.{site_id}"
+    queue = django_rq.get_queue('default')
+    operation_job = queue.fetch_job(job_id)
+    in_progress = (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED,
+                   JobStatus.SCHEDULED)
+    if operation_job is None or operation_job.get_status() not in in_progress:
+        queue.enqueue(CURATOR_OPERATIONS[operation], site_id, *args,
+                      job_id=job_id,
+                      job_timeout=CURATOR_OPERATION_TIMEOUT,
+                      result_ttl=CURATOR_OPERATION_RESULT_TTL,
+                      failure_ttl=CURATOR_OPERATION_RESULT_TTL)
+    return job_id
+
+
+class CuratorOperationState(NamedTuple):
+    operation: str
+    status: str
+    progress: int
+    result: Any
+    error: Optional[str]
+
+
+def get_curator_operation_state(job_id: str) -> Optional[CuratorOperationState]:
+    if not job_id.startswith("curator."):
+        return None
+    queue = django_rq.get_queue('default')
+    operation_job = queue.fetch_job(job_id)
+    if operation_job is None:
+        return None
+    _, operation, _ = job_id.split(".")
+    return CuratorOperationState(operation=operation,
+                                 status=operation_job.get_status(),
+                                 progress=operation_job.meta.get('progress', 0),
+                                 result=operation_job.result,
+                                 error=operation_job.meta.get('error'))
@@ -0,0 +1,26 @@
+import pytest
+
+from files.storage import private_storage
+from staff.reports import get_report_artifact, get_report_key
+from staff.tasks import generate_staff_report
+
+
+@pytest.mark.django_db
+def test_generate_staff_report_artifact():
+    params = {"output_format": "csv"}
+    key = get_report_key("will_graduate_stats", params, watermark=1)
+    assert get_report_artifact(key) is None
+    generate_staff_report("will_graduate_stats", params, key)
+    artifact = get_report_artifact(key)
+    assert artifact is not None
+    assert artifact.endswith(".csv")
+    # The artifact of the previous watermark is removed
+    new_key = get_report_key("will_graduate_stats", params, watermark=2)
+    assert new_key != key
+    generate_staff_report("will_graduate_stats", params, new_key)
+    assert get_report_artifact(new_key) is not None
+    assert get_report_artifact(key) is None
+    private_storage.delete(get_report_artifact(new_key))
+    # Params are part of the key
+    assert get_report_key("will_graduate_stats", {"output_format": "xlsx"},
+                          watermark=2) != new_key
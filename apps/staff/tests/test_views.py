@@ -3,13 +3,20 @@ import io
 import pytest
 from django.conf import settings
 from django.contrib.messages import get_messages
+from django.core.cache import cache
 
 from core.models import Branch
+from core.tests.factories import BranchFactory
 from core.urls import reverse
-from learning.settings import StudentStatuses
+from courses.tests.factories import CourseFactory
+from learning.services.graduate_stats_service import (
+    FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN, calculate_future_graduate_stats
+)
+from learning.settings import GradeTypes, StudentStatuses
+from learning.tests.factories import EnrollmentFactory
 from staff.tests.factories import StudentStatusLogFactory, StudentAcademicDisciplineLogFactory
 from study_programs.tests.factories import AcademicDisciplineFactory
-from users.tests.factories import CuratorFactory, UserFactory
+from users.tests.factories import CuratorFactory, StudentProfileFactory, UserFactory
 
 
 @pytest.mark.django_db
@@ -274,3 +281,46 @@ def test_badge_number_from_csv_view(client):
     messages = [msg.message for msg in get_messages(response.wsgi_request)]
     expected_messages = ['Номера пропусков успешно выставлены. Обработано 2 пользователей']
     assert all(message in messages for message in expected_messages)
+
+
+@pytest.mark.django_db
+def test_view_student_search_csv(client):
+    client.login(CuratorFactory())
+    response = client.get(reverse('staff:student_search_csv'))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_view_report_job_invalid_key(client):
+    client.login(CuratorFactory())
+    for key in ["invalid", "unknown.0123456789abcdef.1", "progress_full.hash.1"]:
+        response = client.get(reverse('staff:report_job', kwargs={"key": key}))
+        assert response.status_code == 404
+        response = client.get(reverse('staff:report_job_download', kwargs={"key": key}))
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_view_future_graduate_stats_deleted_student_profile(client):
+    branch = BranchFactory()
+    student_profile1, student_profile2 = StudentProfileFactory.create_batch(
+        2, branch=branch, status=StudentStatuses.WILL_GRADUATE)
+    course = CourseFactory(main_branch=branch)
+    EnrollmentFactory(course=course, student=student_profile1.user,
+                      student_profile=student_profile1,
+                      grade=GradeTypes.GOOD)
+    EnrollmentFactory(course=course, student=student_profile2.user,
+                      student_profile=student_profile2,
+                      grade=GradeTypes.UNSATISFACTORY)
+    stats = calculate_future_graduate_stats(branch.pk)
+    assert student_profile2.user_id in stats.most_failed_courses
+    student_profile2.delete()
+    # Snapshot was calculated before the student profile has been deleted
+    cache_key = FUTURE_GRADUATE_STATS_CACHE_KEY_PATTERN.format(branch_id=branch.pk)
+    cache.set(cache_key, stats)
+    client.login(CuratorFactory())
+    url = reverse('staff:export_future_graduates_stats',
+                  kwargs={"branch_id": branch.pk})
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.context_data['most_failed_courses'] == []
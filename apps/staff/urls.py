@@ -2,19 +2,20 @@ from django.urls import include, path, re_path, register_converter
 
 from courses.urls import RE_COURSE_URI
 from learning.gradebook.views import (
-    GradeBookCSVView, GradeBookView, ImportAssignmentScoresByEnrollmentIDView,
+    GradeBookCSVView, GradeBookExportView, GradeBookView, ImportAssignmentScoresByEnrollmentIDView,
     ImportAssignmentScoresByStepikIDView, ImportAssignmentScoresByYandexLoginView,
     ImportCourseGradesByEnrollmentIDView, ImportCourseGradesByYandexLoginView, ImportCourseGradesByStepikIDView
 )
 from staff.api.views import CreateAlumniProfiles, StudentSearchJSONView
 from staff.views.views import (
     AdmissionApplicantsCampaignReportView, AdmissionExamReportView,
-    AdmissionInterviewsReportView, CourseParticipantsIntersectionView,
+    AdmissionInterviewsReportView, CourseParticipantsIntersectionView, CuratorOperationView,
     EnrollmentInvitationListView, ExportsView, FutureGraduateDiplomasCSVView,
     FutureGraduateDiplomasTeXView, FutureGraduateStatsView, GradeBookListView,
     HintListView, InterviewerFacesView, InvitationStudentsProgressReportView,
     OfficialDiplomasCSVView, OfficialDiplomasListView, OfficialDiplomasTeXView,
-    ProgressReportForSemesterView, ProgressReportFullView, StudentFacesView,
+    ProgressReportForSemesterView, ProgressReportFullView, ReportJobCreateView,
+    ReportJobDownloadView, ReportJobView, StudentFacesView,
     StudentSearchCSVView, StudentSearchView, SurveySubmissionsReportView,
     SurveySubmissionsStatsView, WillGraduateStatsReportView, AdmissionApplicantsYearReportView,
     StudentAcademicDisciplineLogListView, StudentStatusLogListView, badge_number_from_csv_view, export_for_electronic_diplomas_view, merge_users_view
@@ -45,6 +46,7 @@ urlpatterns = [
         re_path(RE_COURSE_URI, include([
             path('', GradeBookView.as_view(is_for_staff=True, permission_required="teaching.view_gradebook"), name='gradebook'),
             path('csv/', GradeBookCSVView.as_view(permission_required="teaching.view_gradebook"), name='gradebook_csv'),
+            path('export/<export_fmt:output_format>/', GradeBookExportView.as_view(permission_required="teaching.view_gradebook"), name='gradebook_export'),
         ])),
         path('<int:course_id>/import/', include([
             path('assignments-stepik', ImportAssignmentScoresByStepikIDView.as_view(), name='gradebook_import_scores_by_stepik_id'),
@@ -73,6 +75,7 @@ urlpatterns = [
     path('commands/export_for_electronic_diplomas/', export_for_electronic_diplomas_view, name='export_for_electronic_diplomas'),
     path('commands/confirm_send_letters/', ConfirmView.as_view(), name='confirm_send_letters'),
     path('commands/send_letters/', SendView.as_view(), name='send_letters'),
+    path('commands/jobs/<str:job_id>/', CuratorOperationView.as_view(), name='curator_operation'),
     
 
     path('course-participants/', CourseParticipantsIntersectionView.as_view(), name='course_participants_intersection'),
@@ -113,6 +116,11 @@ urlpatterns = [
     path('reports/admission/<int:campaign_id>/exam/<export_fmt:output_format>/', AdmissionExamReportView.as_view(), name='exports_report_admission_exam'),
     re_path(r'^reports/surveys/(?P<survey_pk>\d+)/(?P<output_format>csv|xlsx)/$', SurveySubmissionsReportView.as_view(), name='exports_report_survey_submissions'),
     re_path(r'^reports/surveys/(?P<survey_pk>\d+)/txt/$', SurveySubmissionsStatsView.as_view(), name='exports_report_survey_submissions_stats'),
+    path('reports/jobs/', include([
+        path('new/<slug:report_type>/', ReportJobCreateView.as_view(), name='report_job_create'),
+        path('<str:key>/', ReportJobView.as_view(), name='report_job'),
+        path('<str:key>/download/', ReportJobDownloadView.as_view(), name='report_job_download'),
+    ])),
 
 
     path('warehouse/', HintListView.as_view(), name='staff_warehouse'),
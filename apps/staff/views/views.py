@@ -1,6 +1,5 @@
 import csv
 import datetime
-from collections import defaultdict
 
 from django.utils import timezone, formats
 from django.utils.safestring import mark_safe
@@ -11,7 +10,6 @@ from vanilla import TemplateView
 
 from django.conf import settings
 from django.contrib import messages
-from django.core.management import CommandError, call_command
 from django.db.models import Count, Prefetch
 from django.http import HttpResponseBadRequest, HttpResponseRedirect
 from django.http.response import Http404, HttpResponseForbidden, HttpResponse
@@ -22,37 +20,50 @@ from django.contrib.sites.models import Site
 
 import core.utils
 from admission.models import Campaign, Interview
-from admission.reports import (
-    AdmissionApplicantsCampaignReport,
-    AdmissionExamReport,
-    generate_admission_interviews_report, AdmissionApplicantsYearReport,
-)
+from admission.reports import generate_admission_interviews_report
 from core.http import HttpRequest
 from core.models import Branch
-from core.typings import assert_never
 from core.urls import reverse
 from core.utils import bucketize
 from courses.constants import SemesterTypes
 from courses.models import Course, MetaCourse, Semester, CourseDurations
-from courses.utils import get_current_term_pair, get_term_index
+from courses.utils import get_current_term_pair
 from learning.gradebook.views import GradeBookListBaseView
 from learning.models import Enrollment, GraduateProfile, Invitation
+from files.storage import private_storage
+from files.views import serve_file
 from learning.reports import (
     FutureGraduateDiplomasReport,
     OfficialDiplomasReport,
-    ProgressReportForInvitation,
-    ProgressReportForSemester,
     ProgressReportFull,
-    WillGraduateStatsReport,
     dataframe_to_response,
 )
-from learning.settings import AcademicDegreeLevels, GradeTypes, StudentStatuses
-from projects.constants import ProjectGradeTypes
+from learning.services.graduate_stats_service import get_future_graduate_stats
+from learning.settings import StudentStatuses
 from staff.filters import EnrollmentInvitationFilter, StudentProfileFilter, StudentAcademicDisciplineLogFilter, \
     StudentStatusLogFilter
 from staff.forms import BadgeNumberFromCSVForm, ExportForDiplomas, GraduationForm, MergeUsersForm, SendLettersForm
 from staff.models import Hint
+from staff.reports import (
+    build_admission_applicants_campaign_report,
+    build_admission_applicants_year_report,
+    build_admission_exam_report,
+    build_future_graduate_diplomas_report,
+    build_progress_report_for_invitation,
+    build_progress_report_for_semester,
+    build_progress_report_full,
+    build_will_graduate_stats_report,
+    get_report_artifact,
+    is_valid_report_key,
+    parse_report_params,
+)
 from staff.services.diploma_export import ElectronicDiplomaExportService
+from staff.tasks import (
+    enqueue_curator_operation,
+    enqueue_staff_report,
+    get_curator_operation_state,
+    get_staff_report_state,
+)
 from staff.tex import generate_tex_student_profile_for_diplomas
 from study_programs.models import AcademicDiscipline
 from surveys.models import CourseSurvey
@@ -63,9 +74,7 @@ from users.mixins import CuratorOnlyMixin
 from users.models import PartnerTag, StudentProfile, StudentTypes, User, StudentAcademicDisciplineLog, StudentStatusLog, SHADCourseRecord
 from users.services import (
     badge_number_from_csv,
-    create_graduate_profiles,
-    get_graduate_profile,
-    get_student_progress, merge_users,
+    merge_users,
 )
 
 
@@ -189,190 +198,57 @@ class ExportsView(CuratorOnlyMixin, generic.TemplateView):
 
 class FutureGraduateStatsView(CuratorOnlyMixin, generic.TemplateView):
     template_name = "staff/diplomas_stats.html"
-    BAD_GRADES = [*GradeTypes.unsatisfactory_grades, *GradeTypes.unset_grades]
-    BAD_PROJECT_GRADES = [
-        ProjectGradeTypes.UNSATISFACTORY,
-        ProjectGradeTypes.NOT_GRADED,
-    ]
 
     def get_context_data(self, branch_id, **kwargs):
-        student_profiles = (
-            StudentProfile.objects.filter(
-                type=StudentTypes.REGULAR,
-                branch_id=branch_id,
-                status=StudentStatuses.WILL_GRADUATE,
-            )
-            .select_related("user")
-            .order_by("user__last_name", "user__first_name", "user_id")
-        )
-        progress = get_student_progress(student_profiles)
-        unique_teachers = set()
-        total_hours = 0
-        total_passed_courses = 0
-        unique_projects = set()
-        unique_courses = set()
-        excellent_total = 0
-        good_total = 0
-        most_courses_students = set()
-        most_courses_in_term_students = set()
-        most_open_courses_students = set()
-        enrolled_on_first_course = set()
-        by_year_of_admission = defaultdict(set)
-        finished_two_or_more_programs = set()
-        all_three_practicies_are_internal = set()
-        passed_practicies_in_first_two_years = set()
-        passed_internal_practicies_in_first_two_years = set()
-        most_failed_courses = set()
-        less_failed_courses = set()
-
-        for student_profile in student_profiles:
-            s = student_profile.user
-            enrollments = progress[s.id].get("enrollments", [])
-            projects = progress[s.id].get("projects", [])
-            shad = progress[s.id].get("shad", [])
-            graduate_profile = get_graduate_profile(student_profile)
-            if (
-                graduate_profile
-                and len(graduate_profile.academic_disciplines.all()) >= 2
-            ):
-                finished_two_or_more_programs.add(s)
-            by_year_of_admission[student_profile.year_of_admission].add(student_profile)
-            degree_year = AcademicDegreeLevels.BACHELOR_SPECIALITY_1
-            if student_profile.level_of_education_on_admission == degree_year:
-                enrolled_on_first_course.add(s)
-            # Count most_courses_students
-            s.passed_courses = sum(
-                1 for e in enrollments if e.grade not in self.BAD_GRADES
-            )
-            s.passed_courses += sum(1 for c in shad if c.grade not in self.BAD_GRADES)
-            if not most_courses_students:
-                most_courses_students = {s}
-            else:
-                most_courses_student = next(iter(most_courses_students))
-                if s.passed_courses == most_courses_student.passed_courses:
-                    most_courses_students.add(s)
-                elif s.passed_courses > most_courses_student.passed_courses:
-                    most_courses_students = {s}
-            s.pass_open_courses = sum(
-                e.course.is_club_course
-                for e in enrollments
-                if e.grade not in self.BAD_GRADES
-            )
-            if not most_open_courses_students:
-                most_open_courses_students.add(s)
-            else:
-                most_open_courses_student = next(iter(most_open_courses_students))
-                if s.pass_open_courses == most_open_courses_student.pass_open_courses:
-                    most_open_courses_students.add(s)
-                elif s.pass_open_courses > most_open_courses_student.pass_open_courses:
-                    most_open_courses_students = {s}
-
-            internal_projects_cnt = 0
-            projects_in_first_two_years_of_learning = 0
-            internal_projects_in_first_two_years_of_learning = 0
-            enrollment_term_index = get_term_index(
-                student_profile.year_of_admission, SemesterTypes.AUTUMN
-            )
-            for ps in projects:
-                if ps.final_grade in self.BAD_PROJECT_GRADES or ps.project.is_canceled:
-                    continue
-                unique_projects.add(ps.project)
-                internal_projects_cnt += int(not ps.project.is_external)
-                if 0 <= ps.project.semester.index - enrollment_term_index <= 4:
-                    projects_in_first_two_years_of_learning += 1
-                    if not ps.project.is_external:
-                        internal_projects_in_first_two_years_of_learning += 1
-            if internal_projects_cnt == 3:
-                all_three_practicies_are_internal.add(s)
-            if projects_in_first_two_years_of_learning >= 3:
-                passed_practicies_in_first_two_years.add(s)
-            if internal_projects_in_first_two_years_of_learning >= 3:
-                passed_internal_practicies_in_first_two_years.add(s)
-
-            courses_by_term = defaultdict(int)
-            failed_courses = 0
-            # Add shad courses
-            for c in shad:
-                if c.grade in self.BAD_GRADES:
-                    failed_courses += 1
-                    continue
-                courses_by_term[c.semester_id] += 1
-            for enrollment in enrollments:
-                # Skip summer courses
-                if enrollment.course.semester.type == SemesterTypes.SUMMER:
-                    continue
-                if enrollment.grade in self.BAD_GRADES:
-                    failed_courses += 1
-                    continue
-                courses_by_term[enrollment.course.semester_id] += 1
-                total_passed_courses += 1
-                if enrollment.grade in GradeTypes.excellent_grades:
-                    excellent_total += 1
-                elif enrollment.grade in GradeTypes.good_grades:
-                    good_total += 1
-                unique_courses.add(enrollment.course.meta_course)
-                total_hours += enrollment.course.courseclass_set.count() * 1.5
-                for course_teacher in enrollment.course.course_teachers.all():
-                    unique_teachers.add(course_teacher.teacher_id)
-
-            s.failed_courses = failed_courses
-            if not most_failed_courses:
-                most_failed_courses = {s}
-            else:
-                most_failed_course_student = next(iter(most_failed_courses))
-                if s.failed_courses == most_failed_course_student.failed_courses:
-                    most_failed_courses.add(s)
-                elif s.failed_courses > most_failed_course_student.failed_courses:
-                    most_failed_courses = {s}
-            # Less failed courses
-            if not less_failed_courses:
-                less_failed_courses = {s}
-            else:
-                less_failed_course_student = next(iter(most_failed_courses))
-                if s.failed_courses == less_failed_course_student.failed_courses:
-                    less_failed_courses.add(s)
-                elif s.failed_courses < less_failed_course_student.failed_courses:
-                    less_failed_courses = {s}
-
-            try:
-                s.max_courses_in_term = max(courses_by_term.values())
-            except ValueError:
-                s.max_courses_in_term = 0
-            if not most_courses_in_term_students:
-                most_courses_in_term_students = {s}
-            else:
-                most_courses_in_term_student = next(iter(most_courses_in_term_students))
-                if (
-                    s.max_courses_in_term
-                    == most_courses_in_term_student.max_courses_in_term
-                ):
-                    most_courses_in_term_students.add(s)
-                elif (
-                    s.max_courses_in_term
-                    > most_courses_in_term_student.max_courses_in_term
-                ):
-                    most_courses_in_term_students = {s}
+        branch = get_object_or_404(Branch, pk=branch_id)
+        stats = get_future_graduate_stats(branch.pk)
+        student_profiles = list(StudentProfile.objects
+                                .filter(pk__in=stats.student_profiles)
+                                .select_related("user")
+                                .order_by("user__last_name", "user__first_name",
+                                          "user_id"))
+        students = {sp.user_id: sp.user for sp in student_profiles}
+        # Cached snapshot could refer to student profiles deleted since then
+        for user_id, failed_courses in stats.most_failed_courses.items():
+            if user_id in students:
+                students[user_id].failed_courses = failed_courses
+        for user_id, failed_courses in stats.less_failed_courses.items():
+            if user_id in students:
+                students[user_id].failed_courses = failed_courses
+        for user_id, pass_open_courses in stats.most_open_courses_students.items():
+            if user_id in students:
+                students[user_id].pass_open_courses = pass_open_courses
+        by_enrollment_year = {}
+        for year, profile_ids in stats.by_enrollment_year.items():
+            by_enrollment_year[year] = [sp for sp in student_profiles
+                                        if sp.pk in profile_ids]
+
+        def get_students(user_ids):
+            return [students[user_id] for user_id in user_ids
+                    if user_id in students]
+
         context = {
-            "branch": Branch.objects.get(pk=branch_id),
-            "less_failed_courses": less_failed_courses,
-            "most_failed_courses": most_failed_courses,
-            "all_three_practicies_are_internal": all_three_practicies_are_internal,
-            "passed_practicies_in_first_two_years": passed_practicies_in_first_two_years,
-            "passed_internal_practicies_in_first_two_years": passed_internal_practicies_in_first_two_years,
-            "finished_two_or_more_programs": finished_two_or_more_programs,
-            "by_enrollment_year": dict(by_year_of_admission),
-            "enrolled_on_first_course": enrolled_on_first_course,
-            "most_courses_students": most_courses_students,
-            "most_courses_in_term_students": most_courses_in_term_students,
-            "most_open_courses_students": most_open_courses_students,
+            "branch": branch,
+            "calculated_at": stats.calculated_at,
+            "less_failed_courses": get_students(stats.less_failed_courses),
+            "most_failed_courses": get_students(stats.most_failed_courses),
+            "all_three_practicies_are_internal": get_students(stats.all_three_practicies_are_internal),
+            "passed_practicies_in_first_two_years": get_students(stats.passed_practicies_in_first_two_years),
+            "passed_internal_practicies_in_first_two_years": get_students(stats.passed_internal_practicies_in_first_two_years),
+            "finished_two_or_more_programs": get_students(stats.finished_two_or_more_programs),
+            "by_enrollment_year": by_enrollment_year,
+            "enrolled_on_first_course": get_students(stats.enrolled_on_first_course),
+            "most_courses_students": get_students(stats.most_courses_students),
+            "most_courses_in_term_students": get_students(stats.most_courses_in_term_students),
+            "most_open_courses_students": get_students(stats.most_open_courses_students),
             "student_profiles": student_profiles,
-            "unique_teachers_count": len(unique_teachers),
-            "total_hours": int(total_hours),
-            "unique_courses": unique_courses,
-            "good_total": good_total,
-            "excellent_total": excellent_total,
-            "total_passed_courses": total_passed_courses,
-            "unique_projects": unique_projects,
+            "unique_teachers_count": stats.unique_teachers_count,
+            "total_hours": stats.total_hours,
+            "unique_courses": MetaCourse.objects.filter(pk__in=stats.unique_courses).order_by("name"),
+            "good_total": stats.good_total,
+            "excellent_total": stats.excellent_total,
+            "total_passed_courses": stats.total_passed_courses,
+            "unique_projects": stats.unique_projects,
         }
         return context
 
@@ -401,20 +277,13 @@ class FutureGraduateDiplomasTeXView(CuratorOnlyMixin, generic.TemplateView):
 
 class FutureGraduateDiplomasCSVView(CuratorOnlyMixin, generic.base.View):
     def get(self, request, branch_id, *args, **kwargs):
-        branch = get_object_or_404(Branch.objects.filter(pk=branch_id))
-        report = FutureGraduateDiplomasReport(branch)
-        df = report.generate()
-        today = datetime.datetime.now()
-        file_name = "diplomas_{}".format(today.year)
-        return dataframe_to_response(df, "csv", file_name)
+        get_object_or_404(Branch.objects.filter(pk=branch_id))
+        return build_future_graduate_diplomas_report(branch_id=branch_id)
 
 
 class ProgressReportFullView(CuratorOnlyMixin, generic.base.View):
     def get(self, request, output_format, *args, **kwargs):
-        report = ProgressReportFull(grade_getter="grade_honest")
-        today = datetime.datetime.now().strftime("%d.%m.%Y")
-        file_name = f"sheet_{today}"
-        return dataframe_to_response(report.generate(), output_format, file_name)
+        return build_progress_report_full(output_format=output_format)
 
 
 class ProgressReportForSemesterView(CuratorOnlyMixin, generic.base.View):
@@ -428,12 +297,12 @@ class ProgressReportForSemesterView(CuratorOnlyMixin, generic.base.View):
             if term_type not in SemesterTypes.values:
                 raise ValueError("ProgressReportForSemester: Wrong term format")
             filters = {"year": term_year, "type": term_type}
-            semester = get_object_or_404(Semester, **filters)
+            get_object_or_404(Semester, **filters)
         except (KeyError, ValueError):
             return HttpResponseBadRequest()
-        report = ProgressReportForSemester(semester)
-        file_name = "sheet_{}_{}".format(semester.year, semester.type)
-        return dataframe_to_response(report.generate(), output_format, file_name)
+        return build_progress_report_for_semester(term_year=term_year,
+                                                  term_type=term_type,
+                                                  output_format=output_format)
 
 
 class EnrollmentInvitationListView(CuratorOnlyMixin, TemplateView):
@@ -472,36 +341,24 @@ class EnrollmentInvitationListView(CuratorOnlyMixin, TemplateView):
 
 class InvitationStudentsProgressReportView(CuratorOnlyMixin, View):
     def get(self, request, output_format, invitation_id, *args, **kwargs):
-        invitation = get_object_or_404(Invitation.objects.filter(pk=invitation_id))
-        report = ProgressReportForInvitation(invitation)
-        term = invitation.semester
-        file_name = f"sheet_invitation_{invitation.pk}_{term.year}_{term.type}"
-        return dataframe_to_response(report.generate(), output_format, file_name)
+        get_object_or_404(Invitation.objects.filter(pk=invitation_id))
+        return build_progress_report_for_invitation(invitation_id=invitation_id,
+                                                    output_format=output_format)
 
 
 class AdmissionApplicantsCampaignReportView(CuratorOnlyMixin, generic.base.View):
     def get(self, request, campaign_id, output_format, **kwargs):
-        campaign = get_object_or_404(
+        get_object_or_404(
             Campaign.objects.filter(pk=campaign_id, branch__site_id=settings.SITE_ID)
         )
-        report = AdmissionApplicantsCampaignReport(campaign=campaign)
-        if output_format == "csv":
-            return report.output_csv()
-        elif output_format == "xlsx":
-            return report.output_xlsx()
-        else:
-            assert_never(output_format)
+        return build_admission_applicants_campaign_report(
+            campaign_id=campaign_id, output_format=output_format)
 
 
 class AdmissionApplicantsYearReportView(CuratorOnlyMixin, generic.base.View):
     def get(self, request, output_format, year, **kwargs):
-        report = AdmissionApplicantsYearReport(year=year)
-        if output_format == "csv":
-            return report.output_csv()
-        elif output_format == "xlsx":
-            return report.output_xlsx()
-        else:
-            assert_never(output_format)
+        return build_admission_applicants_year_report(
+            year=year, output_format=output_format)
 
 
 class AdmissionInterviewsReportView(CuratorOnlyMixin, generic.base.View):
@@ -519,22 +376,59 @@ class AdmissionInterviewsReportView(CuratorOnlyMixin, generic.base.View):
 
 class AdmissionExamReportView(CuratorOnlyMixin, generic.base.View):
     def get(self, request, campaign_id, output_format, **kwargs):
-        campaign = get_object_or_404(
+        get_object_or_404(
             Campaign.objects.filter(pk=campaign_id, branch__site_id=settings.SITE_ID)
         )
-        report = AdmissionExamReport(campaign=campaign)
-        return dataframe_to_response(
-            report.generate(), output_format, report.get_filename()
-        )
+        return build_admission_exam_report(campaign_id=campaign_id,
+                                           output_format=output_format)
 
 
 class WillGraduateStatsReportView(CuratorOnlyMixin, generic.base.View):
     def get(self, *args, output_format, **kwargs):
-        report = WillGraduateStatsReport()
-        if output_format == "csv":
-            return report.output_csv()
-        elif output_format == "xlsx":
-            return report.output_xlsx()
+        return build_will_graduate_stats_report(output_format=output_format)
+
+
+class ReportJobCreateView(CuratorOnlyMixin, generic.base.View):
+    """
+    Enqueues generation of the report with params from the query string
+    and redirects to the report job page.
+    """
+    def get(self, request, report_type, *args, **kwargs):
+        try:
+            params = parse_report_params(report_type, request.GET)
+        except KeyError:
+            raise Http404
+        except ValueError:
+            return HttpResponseBadRequest()
+        key = enqueue_staff_report(report_type, params)
+        return HttpResponseRedirect(reverse("staff:report_job",
+                                            kwargs={"key": key}))
+
+
+class ReportJobView(CuratorOnlyMixin, generic.TemplateView):
+    template_name = "staff/report_job.html"
+
+    def get_context_data(self, **kwargs):
+        key = self.kwargs["key"]
+        if not is_valid_report_key(key):
+            raise Http404
+        state = get_staff_report_state(key)
+        if state is None:
+            raise Http404
+        return {
+            "key": key,
+            "state": state,
+        }
+
+
+class ReportJobDownloadView(CuratorOnlyMixin, generic.base.View):
+    def get(self, request, key, *args, **kwargs):
+        if not is_valid_report_key(key):
+            raise Http404
+        artifact = get_report_artifact(key)
+        if artifact is None:
+            raise Http404
+        return serve_file(private_storage, artifact, 'attachment')
 
 
 class HintListView(CuratorOnlyMixin, generic.ListView):
@@ -666,27 +560,19 @@ class CourseParticipantsIntersectionView(CuratorOnlyMixin, generic.TemplateView)
 def autograde_projects(request):
     if not request.user.is_curator:
         return HttpResponseForbidden()
-    try:
-        graded = call_command("autograde_projects")
-        messages.success(
-            request, f"Операция выполнена успешно.<br>" f"Выставлено оценок: {graded}"
-        )
-    except CommandError as e:
-        messages.error(request, str(e))
-    return HttpResponseRedirect(reverse("staff:exports"))
+    current_term = Semester.get_current()
+    job_id = enqueue_curator_operation("autograde_projects", settings.SITE_ID,
+                                       current_term.pk)
+    return HttpResponseRedirect(reverse("staff:curator_operation",
+                                        kwargs={"job_id": job_id}))
 
 
 def autofail_ungraded(request):
     if not request.user.is_curator:
         return HttpResponseForbidden()
-    try:
-        graded = call_command("autofail_ungraded", Site.objects.get(pk=settings.SITE_ID))
-        messages.success(
-            request, f"Операция выполнена успешно.<br>" f"Выставлено незачетов: {graded}"
-        )
-    except CommandError as e:
-        messages.error(request, str(e))
-    return HttpResponseRedirect(reverse("staff:exports"))
+    job_id = enqueue_curator_operation("autofail_ungraded", settings.SITE_ID)
+    return HttpResponseRedirect(reverse("staff:curator_operation",
+                                        kwargs={"job_id": job_id}))
 
 
 # FIXME: replace with staff.api.views.CreateAlumniProfiles (already tested) - needs to write js part
@@ -697,13 +583,26 @@ def create_alumni_profiles(request: HttpRequest):
     form = GraduationForm(data=request.POST)
     if form.is_valid():
         graduated_on = form.cleaned_data["graduated_on"]
-        create_graduate_profiles(Site.objects.get(pk=settings.SITE_ID), graduated_on, created_by=request.user)
-        messages.success(request, "Операция выполнена успешно")
+        job_id = enqueue_curator_operation("create_alumni_profiles",
+                                           settings.SITE_ID, graduated_on,
+                                           request.user.pk)
+        return HttpResponseRedirect(reverse("staff:curator_operation",
+                                            kwargs={"job_id": job_id}))
     else:
         messages.error(request, "Неверный формат даты выпуска")
     return HttpResponseRedirect(reverse("staff:exports"))
 
 
+class CuratorOperationView(CuratorOnlyMixin, generic.TemplateView):
+    template_name = "staff/curator_operation.html"
+
+    def get_context_data(self, **kwargs):
+        state = get_curator_operation_state(self.kwargs["job_id"])
+        if state is None:
+            raise Http404
+        return {"state": state}
+
+
 def merge_users_view(request: HttpRequest):
     if not request.user.is_curator:
         return HttpResponseForbidden()
@@ -5,7 +5,7 @@ import re
 from collections import defaultdict
 from enum import Enum, auto
 from itertools import islice
-from typing import Any, Dict, List, Optional, Tuple, TypeVar, Type
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Type
 
 from registration.models import RegistrationProfile
 
@@ -144,30 +144,80 @@ def get_or_create_graduate_profile(*, student_profile: StudentProfile,
     return graduate, created
 
 
+GRADUATE_PROFILES_CHUNK_SIZE = 100
+
+
 def create_graduate_profiles(site: Site, graduated_on: datetime.date,
-                             created_by: Optional[User] = None) -> None:
+                             created_by: Optional[User] = None, *,
+                             chunk_size: int = GRADUATE_PROFILES_CHUNK_SIZE,
+                             on_progress: Optional[Callable[[int, int], None]] = None) -> int:
     """
     Generate graduate profile for students with `will graduate` status. Update
     student profile status to `graduate` if graduation date already passed.
+
+    Student profiles are processed in chunks, each chunk in a separate
+    transaction, so it's safe to rerun after failure. Returns the number
+    of processed student profiles.
     """
-    student_profiles = (StudentProfile.objects
-                        .filter(status=StudentStatuses.WILL_GRADUATE,
-                                branch__site=site)
-                        .select_related('user')
-                        .prefetch_related('academic_disciplines'))
+    student_profile_ids = list(StudentProfile.objects
+                               .filter(status=StudentStatuses.WILL_GRADUATE,
+                                       branch__site=site)
+                               .order_by('pk')
+                               .values_list('pk', flat=True))
     is_update_student_status = timezone.now().date() >= graduated_on
     if is_update_student_status and not created_by:
         created_by = User.objects.has_role(Roles.CURATOR).order_by('pk').first()
-    for student_profile in student_profiles:
+    total = len(student_profile_ids)
+    processed = 0
+    disciplines_through = GraduateProfile.academic_disciplines.through
+    for offset in range(0, total, chunk_size):
+        chunk = student_profile_ids[offset:offset + chunk_size]
         with transaction.atomic():
-            get_or_create_graduate_profile(student_profile=student_profile,
-                                           graduated_on=graduated_on)
+            student_profiles = list(StudentProfile.objects
+                                    .select_for_update(of=('self',))
+                                    .filter(pk__in=chunk,
+                                            status=StudentStatuses.WILL_GRADUATE)
+                                    .select_related('user')
+                                    .prefetch_related('academic_disciplines'))
+            graduate_profiles = {g.student_profile_id: g for g in
+                                 (GraduateProfile.objects
+                                  .select_for_update(of=('self',))
+                                  .filter(student_profile__in=student_profiles))}
+            new_graduate_profiles = []
+            for student_profile in student_profiles:
+                graduate = graduate_profiles.get(student_profile.pk)
+                if graduate is None:
+                    graduate = GraduateProfile(student_profile=student_profile,
+                                               details={})
+                    new_graduate_profiles.append(graduate)
+                # Bulk operations don't call .save()
+                graduate.graduated_on = graduated_on
+                graduate.graduation_year = graduated_on.year
+                graduate.is_active = True
+            GraduateProfile.objects.bulk_update(
+                graduate_profiles.values(),
+                fields=['graduated_on', 'graduation_year', 'is_active'])
+            GraduateProfile.objects.bulk_create(new_graduate_profiles)
+            # Copy academic disciplines from the student profile
+            disciplines_through.objects.bulk_create([
+                disciplines_through(academicdiscipline_id=discipline.pk,
+                                    graduateprofile_id=graduate.pk)
+                for graduate in new_graduate_profiles
+                for discipline in graduate.student_profile.academic_disciplines.all()
+            ])
             if is_update_student_status:
-                update_student_status(student_profile, new_status=StudentStatuses.GRADUATE,
-                                      editor=created_by, changed_at=graduated_on)
+                for student_profile in student_profiles:
+                    update_student_status(student_profile,
+                                          new_status=StudentStatuses.GRADUATE,
+                                          editor=created_by,
+                                          changed_at=graduated_on)
+        processed += len(chunk)
+        if on_progress is not None:
+            on_progress(processed, total)
     cache_key_pattern = GraduateProfile.HISTORY_CACHE_KEY_PATTERN
     cache_key = cache_key_pattern.format(site_id=site.pk)
     cache.delete(cache_key)
+    return total
 
 
 def get_graduate_profile(student_profile: StudentProfile) -> Optional[GraduateProfile]:
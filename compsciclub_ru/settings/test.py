@@ -39,6 +39,8 @@ MIGRATION_MODULES = {}
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 EMAIL_SEND_COOLDOWN = 0
 
+UNREAD_NOTIFICATIONS_CACHE_ENABLED = False
+
 LANGUAGE_CODE = 'en'
 
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
@@ -408,7 +408,8 @@ class ApplicationYDSFormSerializer(serializers.ModelSerializer):
         super().__init__(instance, data, **kwargs)
         self.fields["new_track"].required = True
         self.fields["patronymic"].required = True
-        msk_campaign = (Campaign.with_open_registration()
+        registered_at = self.context.get('registered_at')
+        msk_campaign = (Campaign.with_open_registration(registered_at)
                         .filter(branch__site_id=settings.SITE_ID,
                                 branch__code='msk')
                         .first())
@@ -1,6 +1,7 @@
 import json
 
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.status import HTTP_201_CREATED
@@ -8,9 +9,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 
 from application.api.serializers import ApplicationYDSFormSerializer
+from application.intake import stage_application_form, validate_application_form
 from application.views import SESSION_LOGIN_KEY
 from auth.views import YANDEX_OAUTH_BACKEND_PREFIX
 from lk_yandexdataschool_ru.apps.application.tasks import register_new_application_form
@@ -51,24 +54,30 @@ class ApplicantCreateFromYDSFormAPIView(CreateAPIView):
     permission_classes = (AllowAny,)
     serializer_class = ApplicationYDSFormSerializer
 
-    def create(self, request, *args, **kwargs):
+    def get_form_data(self, request):
         data = json.loads(request.data['payload'].read().decode('utf-8'))
+        if not isinstance(data, dict):
+            raise ValidationError({'payload': ['Ожидается JSON-объект.']})
+        # Insert yandex login if session value were found, otherwise remove it
+        data['yandex_profile'] = {}
+        for field_name in ["id", "login", "display_name", "real_name", "first_name", "last_name"]:
+            key_name = f"{YANDEX_OAUTH_BACKEND_PREFIX}_{field_name}"
+            value = self.request.session.get(key_name, None)
+            data['yandex_profile'][key_name] = value
+        yandex_login = self.request.session.get(SESSION_LOGIN_KEY, None)
+        if yandex_login:
+            data["yandex_login"] = yandex_login
+        elif "yandex_login" in data:
+            del data["yandex_login"]
+        return data
+
+    def create(self, request, *args, **kwargs):
+        data = self.get_form_data(request)
+        if settings.APPLICATION_FORM_INTAKE_ENABLED:
+            return self.stage(request, data)
         data['photo'] = request.data['photo']
         if 'mipt_grades_file' in request.data:
             data['mipt_grades_file'] = request.data['mipt_grades_file']
-        # Insert yandex login if session value were found, otherwise remove it
-        if data:
-            data = data.copy()
-            data['yandex_profile'] = {}
-            for field_name in ["id", "login", "display_name", "real_name", "first_name", "last_name"]:
-                key_name = f"{YANDEX_OAUTH_BACKEND_PREFIX}_{field_name}"
-                value = self.request.session.get(key_name, None)
-                data['yandex_profile'][key_name] = value
-            yandex_login = self.request.session.get(SESSION_LOGIN_KEY, None)
-            if yandex_login:
-                data["yandex_login"] = yandex_login
-            elif "yandex_login" in data:
-                del data["yandex_login"]
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -77,3 +86,18 @@ class ApplicantCreateFromYDSFormAPIView(CreateAPIView):
         self.request.session.pop(SESSION_LOGIN_KEY, None)
         return Response(serializer.data, status=status.HTTP_201_CREATED,
                         headers=headers)
+
+    def stage(self, request, data):
+        """
+        Stages the submission after cheap validation, applicant is created
+        later by the intake consumer.
+        """
+        photo = request.data.get('photo')
+        validate_application_form(data, photo)
+        with transaction.atomic():
+            submission = stage_application_form(
+                data, photo=photo,
+                mipt_grades_file=request.data.get('mipt_grades_file'),
+                language_code=request.LANGUAGE_CODE)
+        self.request.session.pop(SESSION_LOGIN_KEY, None)
+        return Response({"id": submission.pk}, status=status.HTTP_202_ACCEPTED)
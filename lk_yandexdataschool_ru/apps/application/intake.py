@@ -0,0 +1,287 @@
+"""
+Intake mode of the application form. The form is validated cheaply,
+the raw submission is staged with uploaded files streamed to the private
+storage and acknowledged at once. The background consumer turns staged
+submissions into applicants in batches. Resubmissions of the same email
+to the same campaign are processed together, the latest valid one wins.
+"""
+import logging
+import os
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import django_rq
+from rest_framework.exceptions import ValidationError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Lower
+from django.utils import timezone, translation
+
+from admission.constants import ApplicantStatuses, ApplicationFormSubmissionStatuses
+from admission.models import Applicant, ApplicationFormSubmission, Campaign
+from application.api.serializers import ApplicationYDSFormSerializer
+
+logger = logging.getLogger(__name__)
+
+INTAKE_BATCH_SIZE = 50
+# Consumer drains the queue in batches until the time limit is exceeded,
+# then reschedules itself
+INTAKE_CONSUMER_TIME_LIMIT = timedelta(minutes=4)
+# The last batch is started before the time limit and may exceed it
+INTAKE_CONSUMER_JOB_TIMEOUT = int((2 * INTAKE_CONSUMER_TIME_LIMIT).total_seconds())
+# Only one consumer run is scheduled at a time, this key is set while
+# the next run is waiting in the scheduler
+INTAKE_CONSUMER_KEY = 'application.intake.consumer'
+# Submissions that arrive within the delay are processed in one batch
+INTAKE_CONSUMER_DELAY = timedelta(seconds=5)
+INTAKE_OPEN_CAMPAIGNS_CACHE_KEY = 'application.intake.campaigns'
+INTAKE_OPEN_CAMPAIGNS_CACHE_TIMEOUT = 60  # seconds
+ALREADY_REGISTERED_ERROR = (
+    "Если вы уже зарегистрировали анкету на указанный email и "
+    "хотите внести изменения, напишите на shad@yandex-team.ru "
+    "с этой почты."
+)
+
+
+class ApplicationFormIntakeStats(NamedTuple):
+    pending: int
+    failed: int
+    processed_last_hour: int
+    # Age of the oldest pending submission in seconds
+    lag: Optional[float]
+
+
+class ApplicationFormBatchResults(NamedTuple):
+    processed: int
+    duplicates: int
+    failed: int
+
+
+def _get_open_campaign_ids() -> List[int]:
+    campaign_ids = cache.get(INTAKE_OPEN_CAMPAIGNS_CACHE_KEY)
+    if campaign_ids is None:
+        campaign_ids = list(Campaign.with_open_registration()
+                            .filter(branch__site_id=settings.SITE_ID)
+                            .values_list('pk', flat=True))
+        cache.set(INTAKE_OPEN_CAMPAIGNS_CACHE_KEY, campaign_ids,
+                  INTAKE_OPEN_CAMPAIGNS_CACHE_TIMEOUT)
+    return campaign_ids
+
+
+def validate_application_form(data: Dict[str, Any], photo) -> None:
+    """
+    Checks only what is required to stage the submission, the rest of the
+    form is validated by the consumer. Campaign id is normalized to int.
+    """
+    errors = {}
+    if photo is None:
+        errors['photo'] = ['Обязательное поле.']
+    try:
+        campaign_id = int(data.get('campaign'))
+    except (TypeError, ValueError):
+        campaign_id = None
+    if campaign_id not in _get_open_campaign_ids():
+        errors['campaign'] = ['Приемная кампания окончена либо не существует']
+    else:
+        data['campaign'] = campaign_id
+    email = data.get('email')
+    try:
+        validate_email(email)
+    except DjangoValidationError as e:
+        errors['email'] = e.messages
+    if errors:
+        raise ValidationError(errors)
+    is_registered = (Applicant.objects
+                     .filter(campaign_id=campaign_id, email__iexact=email)
+                     .exclude(status__in=ApplicantStatuses.UNUNIQUE_EMAIL_STATUSES)
+                     .exists())
+    if is_registered:
+        raise ValidationError({'non_field_errors': [ALREADY_REGISTERED_ERROR]})
+
+
+def stage_application_form(data: Dict[str, Any], *, photo,
+                           mipt_grades_file=None,
+                           language_code: str) -> ApplicationFormSubmission:
+    meta = {
+        'language_code': language_code,
+        'photo_content_type': photo.content_type,
+    }
+    if mipt_grades_file is not None:
+        meta['mipt_grades_file_content_type'] = mipt_grades_file.content_type
+    # Uploaded files are saved to the storage chunk by chunk
+    submission = ApplicationFormSubmission.objects.create(
+        campaign_id=data['campaign'],
+        email=data['email'].strip().lower(),
+        payload=data,
+        photo=photo,
+        mipt_grades_file=mipt_grades_file,
+        meta=meta)
+    transaction.on_commit(schedule_application_form_consumer)
+    return submission
+
+
+def schedule_application_form_consumer(delay: timedelta = INTAKE_CONSUMER_DELAY) -> None:
+    """Schedules the next run of the consumer unless it's already scheduled."""
+    from lk_yandexdataschool_ru.apps.application.tasks import (
+        process_application_form_submissions
+    )
+    redis_client = django_rq.get_connection('high')
+    # Key expires in case scheduled job was lost
+    expire = int((delay + INTAKE_CONSUMER_TIME_LIMIT).total_seconds())
+    if redis_client.set(INTAKE_CONSUMER_KEY, 1, nx=True, ex=expire):
+        scheduler = django_rq.get_scheduler('high')
+        scheduler.enqueue_in(delay, process_application_form_submissions,
+                             timeout=INTAKE_CONSUMER_JOB_TIMEOUT)
+
+
+def _get_staged_file(field_file, content_type: str) -> Optional[UploadedFile]:
+    if not field_file:
+        return None
+    field_file.open('rb')
+    return UploadedFile(file=field_file.file,
+                        name=os.path.basename(field_file.name),
+                        content_type=content_type,
+                        size=field_file.size)
+
+
+def _create_applicant(submission: ApplicationFormSubmission) -> Applicant:
+    data = {**submission.payload, 'campaign': submission.campaign_id}
+    data['photo'] = _get_staged_file(submission.photo,
+                                     submission.meta.get('photo_content_type'))
+    mipt_grades_file = _get_staged_file(
+        submission.mipt_grades_file,
+        submission.meta.get('mipt_grades_file_content_type'))
+    if mipt_grades_file is not None:
+        data['mipt_grades_file'] = mipt_grades_file
+    language_code = submission.meta.get('language_code', settings.LANGUAGE_CODE)
+    # Registration could be closed after the form was staged
+    context = {'registered_at': submission.created}
+    with translation.override(language_code):
+        serializer = ApplicationYDSFormSerializer(data=data, context=context)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+
+def _delete_staged_files(names: List[str]) -> None:
+    for name in names:
+        ApplicationFormSubmission.photo.field.storage.delete(name)
+
+
+def _process_resubmissions(submissions: List[ApplicationFormSubmission],
+                           applicant_id: Optional[int]) -> None:
+    """
+    Sets the processing status of the submissions of the same email to the
+    same campaign ordered from the latest one. The latest submission that
+    is valid creates the applicant, the older ones are duplicates. Failed
+    submissions keep the errors.
+    """
+    if applicant_id is not None:
+        # Registered by the submission processed in the previous batches
+        latest = submissions[0]
+        latest.status = ApplicationFormSubmissionStatuses.FAILED
+        latest.errors = {'non_field_errors': [ALREADY_REGISTERED_ERROR]}
+        latest.applicant_id = applicant_id
+        submissions = submissions[1:]
+    for submission in submissions:
+        if applicant_id is not None:
+            submission.status = ApplicationFormSubmissionStatuses.DUPLICATE
+            submission.applicant_id = applicant_id
+            continue
+        try:
+            with transaction.atomic():
+                applicant = _create_applicant(submission)
+        except ValidationError as e:
+            submission.status = ApplicationFormSubmissionStatuses.FAILED
+            submission.errors = e.detail
+        except Exception as e:
+            logger.exception(f"Failed to process application form "
+                             f"submission {submission.pk}")
+            submission.status = ApplicationFormSubmissionStatuses.FAILED
+            submission.errors = {'non_field_errors': [repr(e)]}
+        else:
+            submission.status = ApplicationFormSubmissionStatuses.PROCESSED
+            submission.applicant_id = applicant_id = applicant.pk
+
+
+def process_application_form_batch(batch_size: int = INTAKE_BATCH_SIZE) -> Optional[ApplicationFormBatchResults]:
+    """
+    Creates applicants from the oldest staged submissions. Pending
+    resubmissions of the batch submissions are processed in the same batch
+    even if they are out of the batch size. Returns None if there is
+    nothing to process.
+    """
+    with transaction.atomic():
+        submissions = list(ApplicationFormSubmission.objects
+                           .filter(status=ApplicationFormSubmissionStatuses.NEW)
+                           .select_for_update(skip_locked=True)
+                           .order_by('pk')[:batch_size])
+        if not submissions:
+            return None
+        campaign_ids = {s.campaign_id for s in submissions}
+        emails = {s.email for s in submissions}
+        keys = {(s.campaign_id, s.email) for s in submissions}
+        resubmissions = (ApplicationFormSubmission.objects
+                         .filter(status=ApplicationFormSubmissionStatuses.NEW,
+                                 campaign_id__in=campaign_ids,
+                                 email__in=emails,
+                                 pk__gt=submissions[-1].pk)
+                         .select_for_update(skip_locked=True)
+                         .order_by('pk'))
+        submissions.extend(s for s in resubmissions
+                           if (s.campaign_id, s.email) in keys)
+        grouped = {}
+        for submission in reversed(submissions):
+            key = (submission.campaign_id, submission.email)
+            grouped.setdefault(key, []).append(submission)
+        registered = (Applicant.objects
+                      .annotate(email_lower=Lower('email'))
+                      .filter(campaign_id__in=campaign_ids,
+                              email_lower__in=emails)
+                      .exclude(status__in=ApplicantStatuses.UNUNIQUE_EMAIL_STATUSES)
+                      .values_list('campaign_id', 'email_lower', 'pk'))
+        applicants = {(campaign_id, email): pk for campaign_id, email, pk in registered}
+        for key, group in grouped.items():
+            _process_resubmissions(group, applicants.get(key))
+        processed_at = timezone.now()
+        staged_files = []
+        for submission in submissions:
+            submission.processed_at = processed_at
+            submission.modified = processed_at
+            # Files of failed submissions are kept for investigation
+            if submission.status != ApplicationFormSubmissionStatuses.FAILED:
+                for field_file in (submission.photo, submission.mipt_grades_file):
+                    if field_file:
+                        field_file.close()
+                        staged_files.append(field_file.name)
+                submission.photo = submission.mipt_grades_file = ''
+        ApplicationFormSubmission.objects.bulk_update(
+            submissions, ['status', 'applicant', 'errors', 'processed_at',
+                          'modified', 'photo', 'mipt_grades_file'])
+        transaction.on_commit(lambda: _delete_staged_files(staged_files))
+    statuses = [s.status for s in submissions]
+    return ApplicationFormBatchResults(
+        processed=statuses.count(ApplicationFormSubmissionStatuses.PROCESSED),
+        duplicates=statuses.count(ApplicationFormSubmissionStatuses.DUPLICATE),
+        failed=statuses.count(ApplicationFormSubmissionStatuses.FAILED))
+
+
+def get_application_form_intake_stats() -> ApplicationFormIntakeStats:
+    now = timezone.now()
+    is_pending = Q(status=ApplicationFormSubmissionStatuses.NEW)
+    stats = ApplicationFormSubmission.objects.aggregate(
+        pending=Count('pk', filter=is_pending),
+        failed=Count('pk', filter=Q(status=ApplicationFormSubmissionStatuses.FAILED)),
+        processed_last_hour=Count('pk', filter=Q(processed_at__gte=now - timedelta(hours=1))),
+        oldest_pending=Min('created', filter=is_pending))
+    oldest_pending = stats['oldest_pending']
+    return ApplicationFormIntakeStats(
+        pending=stats['pending'],
+        failed=stats['failed'],
+        processed_last_hour=stats['processed_last_hour'],
+        lag=(now - oldest_pending).total_seconds() if oldest_pending else None)
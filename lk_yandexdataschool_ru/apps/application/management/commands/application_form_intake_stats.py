@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from application.intake import get_application_form_intake_stats
+
+
+class Command(BaseCommand):
+    help = """Shows the state of the application form intake queue."""
+
+    def handle(self, *args, **options):
+        stats = get_application_form_intake_stats()
+        lag = f"{stats.lag:.0f}s" if stats.lag is not None else "-"
+        self.stdout.write(f"Pending: {stats.pending}\n"
+                          f"Lag: {lag}\n"
+                          f"Processed in the last hour: {stats.processed_last_hour}\n"
+                          f"Failed: {stats.failed}")
@@ -1,13 +1,23 @@
+import logging
+
+import django_rq
 from django_rq import job
 
 from django.conf import settings
-from django.utils import translation
+from django.utils import timezone, translation
 
 from admission.models import Applicant
 from admission.tasks import register_in_yandex_contest
 from lk_yandexdataschool_ru.apps.application.api.serializers import (
     ApplicantYandexFormSerializer
 )
+from lk_yandexdataschool_ru.apps.application.intake import (
+    INTAKE_CONSUMER_JOB_TIMEOUT, INTAKE_CONSUMER_KEY, INTAKE_CONSUMER_TIME_LIMIT,
+    get_application_form_intake_stats, process_application_form_batch,
+    schedule_application_form_consumer
+)
+
+logger = logging.getLogger(__name__)
 
 
 @job('high')
@@ -22,3 +32,28 @@ def register_new_application_form(*, answer_id, language_code, form_data):
     new_applicant = serializer.save(meta={"answer_id": answer_id})
     if new_applicant.pk:
         register_in_yandex_contest.delay(new_applicant.pk, settings.LANGUAGE_CODE)
+
+
+@job('high', timeout=INTAKE_CONSUMER_JOB_TIMEOUT)
+def process_application_form_submissions():
+    # Submissions staged from now on will schedule the next run
+    django_rq.get_connection('high').delete(INTAKE_CONSUMER_KEY)
+    started_at = timezone.now()
+    while timezone.now() - started_at < INTAKE_CONSUMER_TIME_LIMIT:
+        try:
+            results = process_application_form_batch()
+        except Exception as e:
+            # Batch is rolled back and is retried on the next run
+            logger.exception(f"Failed to process application form "
+                             f"submissions batch e={e!r}")
+            break
+        if results is None:
+            break
+        logger.info(f"Application form submissions: {results.processed} "
+                    f"processed, {results.duplicates} duplicates, "
+                    f"{results.failed} failed")
+    stats = get_application_form_intake_stats()
+    logger.info(f"Application form intake: {stats.pending} pending, "
+                f"lag {stats.lag} seconds")
+    if stats.pending:
+        schedule_application_form_consumer()
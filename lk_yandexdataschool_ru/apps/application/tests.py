@@ -8,11 +8,18 @@ from django.utils.timezone import now
 import pytest
 from django.conf import settings
 
-from admission.constants import ContestTypes
-from admission.models import Contest, Applicant, CampaignCity
+from admission.constants import ApplicationFormSubmissionStatuses, ContestTypes
+from admission.models import (
+    Contest, Applicant, ApplicationFormSubmission, Campaign, CampaignCity
+)
 from admission.tests.factories import CampaignFactory, ContestFactory
 from core.tests.factories import BranchFactory
 from core.urls import reverse
+from lk_yandexdataschool_ru.apps.application import tasks
+from lk_yandexdataschool_ru.apps.application.intake import (
+    ALREADY_REGISTERED_ERROR, ApplicationFormIntakeStats,
+    get_application_form_intake_stats, process_application_form_batch
+)
 from universities.tests.factories import UniversityFactory, CityFactory
 
 yds_post_data = {
@@ -218,3 +225,123 @@ def test_valid_data_YDS_form(settings, client):
                    "Telegram username may only contain 5-32 alphanumeric characters or single underscores."
                    " Should begin only with letter and end with alphanumeric."],
                "internship_beginning": ["Ensure this value is greater than or equal to 1900-01-01."]}
+
+
+@pytest.mark.django_db
+def test_application_form_intake(settings, client, mocker):
+    mocker.patch("django_rq.get_connection")
+    mocker.patch("django_rq.get_scheduler")
+    settings.APPLICATION_FORM_INTAKE_ENABLED = True
+    data = {**yds_post_data}
+    data['university_city'] = {'is_exists': True, 'pk': CityFactory().pk}
+    data['university'] = UniversityFactory().pk
+    branch = BranchFactory(code='distance', site_id=settings.SITE_ID)
+    campaign = CampaignFactory(branch=branch, year=now().year, current=True)
+    CampaignCity.objects.create(campaign=campaign, city=None)
+    ContestFactory(campaign=campaign, type=ContestTypes.TEST)
+    data['campaign'] = campaign.pk
+    url = reverse('applicant_create')
+    session = client.session
+    session["application_ya_login"] = data['yandex_login']
+    session.save()
+    response = client.post(url, data=make_post_data(data))
+    assert response.status_code == 202
+    assert not Applicant.objects.exists()
+    # Resubmission of the form is staged too, only the latest one is processed
+    session["application_ya_login"] = data['yandex_login']
+    session.save()
+    data['first_name'] = 'Другое имя'
+    data['email'] = data['email'].upper()
+    response = client.post(url, data=make_post_data(data))
+    assert response.status_code == 202
+    submission = ApplicationFormSubmission.objects.get(pk=response.data['id'])
+    assert submission.email == yds_post_data['email']
+    assert get_application_form_intake_stats().pending == 2
+    results = process_application_form_batch()
+    assert results.processed == 1
+    assert results.duplicates == 1
+    assert results.failed == 0
+    applicant = Applicant.objects.get()
+    assert applicant.first_name == 'Другое имя'
+    submission.refresh_from_db()
+    assert submission.status == ApplicationFormSubmissionStatuses.PROCESSED
+    assert submission.applicant_id == applicant.pk
+    assert process_application_form_batch() is None
+    stats = get_application_form_intake_stats()
+    assert stats.pending == 0
+    assert stats.processed_last_hour == 2
+    # Cheap validation
+    response = client.post(url, data=make_post_data({**data, 'campaign': 0}))
+    assert response.status_code == 400
+    assert 'campaign' in response.data
+    response = client.post(url, data=make_post_data({**data, 'campaign': 'msk'}))
+    assert response.status_code == 400
+    assert 'campaign' in response.data
+    # String campaign id is accepted as in the synchronous path
+    session["application_ya_login"] = data['yandex_login']
+    session.save()
+    response = client.post(url, data=make_post_data({**data,
+                                                     'email': 'other@example.com',
+                                                     'campaign': str(campaign.pk)}))
+    assert response.status_code == 202
+    submission = ApplicationFormSubmission.objects.get(pk=response.data['id'])
+    assert submission.campaign_id == campaign.pk
+    assert submission.payload['campaign'] == campaign.pk
+
+
+@pytest.mark.django_db
+def test_application_form_intake_resubmissions(settings, client, mocker):
+    mocker.patch("django_rq.get_connection")
+    mocker.patch("django_rq.get_scheduler")
+    settings.APPLICATION_FORM_INTAKE_ENABLED = True
+    data = {**yds_post_data}
+    data['university_city'] = {'is_exists': True, 'pk': CityFactory().pk}
+    data['university'] = UniversityFactory().pk
+    branch = BranchFactory(code='distance', site_id=settings.SITE_ID)
+    campaign = CampaignFactory(branch=branch, year=now().year, current=True)
+    CampaignCity.objects.create(campaign=campaign, city=None)
+    ContestFactory(campaign=campaign, type=ContestTypes.TEST)
+    data['campaign'] = campaign.pk
+    url = reverse('applicant_create')
+    session = client.session
+    for payload in (data, {**data, 'phone': '+12 345-678-90'}):
+        session["application_ya_login"] = data['yandex_login']
+        session.save()
+        response = client.post(url, data=make_post_data(payload))
+        assert response.status_code == 202
+    # Registration is checked at the time the form was staged
+    Campaign.objects.filter(pk=campaign.pk).update(application_ends_at=now())
+    # Resubmission is processed in the same batch, the older one is used
+    # if the latest one is invalid
+    results = process_application_form_batch(batch_size=1)
+    assert results.processed == 1
+    assert results.failed == 1
+    older, latest = ApplicationFormSubmission.objects.order_by('pk')
+    assert older.status == ApplicationFormSubmissionStatuses.PROCESSED
+    assert latest.status == ApplicationFormSubmissionStatuses.FAILED
+    assert 'phone' in latest.errors
+    applicant = Applicant.objects.get()
+    assert applicant.phone == data['phone']
+    # Correction staged after the applicant was registered is not dropped
+    # silently
+    submission = ApplicationFormSubmission.objects.create(
+        campaign=campaign, email=data['email'], payload=data)
+    results = process_application_form_batch()
+    assert results.failed == 1
+    submission.refresh_from_db()
+    assert submission.status == ApplicationFormSubmissionStatuses.FAILED
+    assert submission.errors == {'non_field_errors': [ALREADY_REGISTERED_ERROR]}
+    assert submission.applicant_id == applicant.pk
+
+
+def test_process_application_form_submissions_failed_batch(mocker):
+    mocker.patch("django_rq.get_connection")
+    mocker.patch.object(tasks, 'process_application_form_batch',
+                        side_effect=RuntimeError)
+    mocker.patch.object(tasks, 'get_application_form_intake_stats',
+                        return_value=ApplicationFormIntakeStats(
+                            pending=1, failed=0, processed_last_hour=0, lag=10))
+    schedule = mocker.patch.object(tasks, 'schedule_application_form_consumer')
+    tasks.process_application_form_submissions()
+    # Pending submissions are processed on the next run
+    schedule.assert_called_once()
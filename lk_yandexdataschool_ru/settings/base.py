@@ -63,5 +63,9 @@ for template in TEMPLATES:
         template["DIRS"] = [str(PROJECT_DIR / "templates")] + template["DIRS"]
 
 
+# Application form submissions are staged and turned into applicants by
+# the background consumer instead of the request-response cycle
+APPLICATION_FORM_INTAKE_ENABLED = False
+
 # Application form webhook authorization token. Send it over https only.
 APPLICATION_FORM_SECRET_TOKEN = 'eb224e98-fffa-4e21-ab92-744f2e95e551-3f2a5499-89bf-4f8b-9c90-117b960f0fdf'
@@ -44,6 +44,8 @@ MEDIA_URL = "/media/"
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 EMAIL_SEND_COOLDOWN = 0
 
+UNREAD_NOTIFICATIONS_CACHE_ENABLED = False
+
 MIGRATION_MODULES = {}
 
 LANGUAGE_CODE = 'en'
@@ -93,6 +93,9 @@ else:
         # Relative path must be relative to the ROOT_DIR
         PRIVATE_MEDIA_ROOT = str(ROOT_DIR.joinpath(PRIVATE_MEDIA_ROOT).resolve())
     PRIVATE_MEDIA_URL = "/media/private/"
+# Local directory for caching zip archives with assignment solutions,
+# archives are built on every request if not set
+SOLUTION_ATTACHMENTS_CACHE_DIR = env.str("SOLUTION_ATTACHMENTS_CACHE_DIR", default=None)
 
 # Static Files Settings
 DJANGO_ASSETS_ROOT = ROOT_DIR / "assets"
@@ -146,6 +149,7 @@ MIDDLEWARE = [
     "core.middleware.HealthCheckMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "auth.middleware.AuthenticationMiddleware",
+    "auth.middleware.PermissionCacheMiddleware",
     "django.contrib.sites.middleware.CurrentSiteMiddleware",
     # EN language is not supported at this moment anyway
     "core.middleware.HardCodedLocaleMiddleware",
@@ -317,7 +321,10 @@ EMAIL_HOST_PASSWORD = env.str("DJANGO_EMAIL_HOST_PASSWORD")
 EMAIL_PORT = env.int("DJANGO_EMAIL_PORT", default=465)
 EMAIL_USE_TLS = False
 EMAIL_USE_SSL = True
+# Average delay between messages sent by the `notify` command
 EMAIL_SEND_COOLDOWN = 0.5
+# Number of messages sent over one SMTP connection in a single call
+EMAIL_SEND_BATCH_SIZE = 50
 EMAIL_BACKEND = env.str(
     "DJANGO_EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
 )
@@ -658,3 +665,5 @@ ENVIRONMENT_NAME = env.str("ENVIRONMENT_NAME", default="Production Server")
 ENVIRONMENT_COLOR = env.str("ENVIRONMENT_COLOR", default="#FF2222")
 
 ENABLE_NON_AUTH_NOTIFICATIONS = True
+# Store unread notifications state of the user in a shared redis db
+UNREAD_NOTIFICATIONS_CACHE_ENABLED = True